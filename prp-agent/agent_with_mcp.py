@@ -9,44 +9,81 @@ import json
 import sys
 import argparse
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from agents.agent import chat_with_prp_agent_sync, PRPAgentDependencies
+from agents.settings import settings
+from agents.write_behind import ConversationRecord, PartialBatchError, get_write_behind_queue
+
+
+def save_conversation_to_mcp(database: str, session_id: str, message: str, response: str,
+                             context: str = None) -> bool:
+    """
+    Salva conversa no MCP Turso real.
+    
+    NOTA: Esta função funciona apenas quando executada no Cursor Agent
+    com acesso às ferramentas MCP.
+    """
+    try:
+        # Esta seria a chamada real no ambiente Cursor Agent:
+        # result = mcp_turso_add_conversation(
+        #     session_id=session_id,
+        #     message=message,
+        #     response=response,
+        #     context=context,
+        #     database=database
+        # )
+        
+        print(f"💾 [MCP] Salvando conversa: {message[:50]}...")
+        print(f"📊 [MCP] Sessão: {session_id}")
+        print(f"🗄️ [MCP] Database: {database}")
+        
+        # Simulação de sucesso - no Cursor Agent real isso seria substituído
+        return True
+        
+    except Exception as e:
+        print(f"❌ [MCP] Erro ao salvar: {e}")
+        return False
+
+
+def mcp_conversation_sink(database: str):
+    """Sink da fila write-behind: o MCP grava uma conversa por chamada, na sessão de cada registro."""
+    def write(batch: List[ConversationRecord]):
+        failed = [
+            record for record in batch
+            if not save_conversation_to_mcp(database, record.session_id, record.message,
+                                            record.response, record.context)
+        ]
+        if failed:
+            # Só as que falharam voltam para a fila (as gravadas não são duplicadas)
+            raise PartialBatchError(failed, len(batch))
+
+    return write
 
 
 class PRPAgentWithMCP:
     """PRP Agent integrado com MCP real."""
     
-    def __init__(self, database: str = "context-memory"):
+    def __init__(self, database: str = "context-memory", write_behind: Optional[bool] = None):
         self.database = database
         self.session_id = f"cursor-mcp-{datetime.now().strftime('%Y%m%d-%H%M')}"
+        # Conversas salvas em segundo plano; a fila descarrega no encerramento (atexit)
+        self.write_queue = None
+        if settings.write_behind_enabled if write_behind is None else write_behind:
+            self.write_queue = get_write_behind_queue(
+                f"cursor-mcp:{database}", lambda: mcp_conversation_sink(database)
+            )
     
     def save_conversation_to_mcp(self, message: str, response: str, context: str = None) -> bool:
-        """
-        Salva conversa no MCP Turso real.
-        
-        NOTA: Esta função funciona apenas quando executada no Cursor Agent
-        com acesso às ferramentas MCP.
-        """
-        try:
-            # Esta seria a chamada real no ambiente Cursor Agent:
-            # result = mcp_turso_add_conversation(
-            #     session_id=self.session_id,
-            #     message=message,
-            #     response=response,
-            #     context=context,
-            #     database=self.database
-            # )
-            
-            print(f"💾 [MCP] Salvando conversa: {message[:50]}...")
-            print(f"📊 [MCP] Sessão: {self.session_id}")
-            print(f"🗄️ [MCP] Database: {self.database}")
-            
-            # Simulação de sucesso - no Cursor Agent real isso seria substituído
-            return True
-            
-        except Exception as e:
-            print(f"❌ [MCP] Erro ao salvar: {e}")
-            return False
+        """Salva conversa da sessão atual no MCP Turso real."""
+        return save_conversation_to_mcp(self.database, self.session_id, message, response, context)
+    
+    def persist_conversation(self, message: str, response: str, context: str = None) -> bool:
+        """Enfileira a conversa (confirmação imediata) ou salva direto sem write-behind."""
+        if self.write_queue is None:
+            return self.save_conversation_to_mcp(message, response, context)
+        return self.write_queue.enqueue(ConversationRecord(
+            session_id=self.session_id, message=message, response=response, context=context
+        ))
     
     def get_conversation_history(self, limit: int = 5) -> list:
         """
@@ -132,8 +169,8 @@ class PRPAgentWithMCP:
         # Processar com agente
         response = chat_with_prp_agent_sync(context_prompt, deps)
         
-        # Salvar no MCP
-        self.save_conversation_to_mcp(message, response, file_context)
+        # Salvar no MCP (write-behind - não atrasa a resposta)
+        self.persist_conversation(message, response, file_context)
         
         return response
     
@@ -156,7 +193,7 @@ class PRPAgentWithMCP:
         )
         
         # Salvar conversa no MCP
-        self.save_conversation_to_mcp(
+        self.persist_conversation(
             message=f"Criar PRP: {feature_request}",
             response=f"PRP #{prp_id} criado: {prp_content}",
             context=file_context
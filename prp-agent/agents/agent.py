@@ -8,6 +8,8 @@ import logging
 from pydantic_ai import Agent, RunContext
 from .providers import get_llm_model, get_test_model
 from .dependencies import PRPAgentDependencies
+from .instrumentation import GenAIInstrumentedModel, invoke_agent_span, record_response, record_usage
+from .traffic_replay import RecordingModel, active_replay_model, traffic_session
 from .tools import (
     create_prp, 
     search_prps, 
@@ -120,6 +122,24 @@ prp_agent.tool(analyze_prp_with_llm)
 prp_agent.tool(get_prp_details)
 prp_agent.tool(update_prp_status)
 
+PRP_AGENT_NAME = "PRP Agent"
+
+def instrumented_model(use_test_model: bool = False) -> GenAIInstrumentedModel:
+    """
+    Modelo do agente (real ou de teste) com um span gen_ai.chat por requisição ao LLM.
+
+    Gravado quando há sessão de tráfego; durante um replay (agents/traffic_replay.py)
+    o modelo é o FunctionModel com as respostas gravadas.
+    """
+    model = active_replay_model() or (get_test_model() if use_test_model else prp_agent.model)
+    return GenAIInstrumentedModel(RecordingModel(model))
+
+def record_agent_run(span, result):
+    """Registrar resposta e tokens de uma execução do agente no span gen_ai.invoke_agent."""
+    usage = result.usage()
+    record_usage(span, usage.request_tokens, usage.response_tokens, usage.total_tokens)
+    record_response(span, str(result.output))
+
 # Função principal para conversar com o agente
 async def chat_with_prp_agent(
     message: str, 
@@ -141,14 +161,16 @@ async def chat_with_prp_agent(
         deps = PRPAgentDependencies()
     
     try:
-        if use_test_model:
-            # Usar modelo de teste para desenvolvimento
-            test_model = get_test_model()
-            with prp_agent.override(model=test_model):
-                result = await prp_agent.run(message, deps=deps)
-        else:
-            # Usar modelo real
+        # Modelo de teste (desenvolvimento) ou real, instrumentado
+        model = instrumented_model(use_test_model)
+        with traffic_session("chat_with_prp_agent", message) as traffic, invoke_agent_span(
+            PRP_AGENT_NAME, model.model_name, system=model.system,
+            messages=[{"role": "user", "content": message}]
+        ) as span, prp_agent.override(model=model):
             result = await prp_agent.run(message, deps=deps)
+            record_agent_run(span, result)
+            if traffic:
+                traffic.output = result.output
         
         return result.data
         
@@ -176,14 +198,16 @@ def chat_with_prp_agent_sync(
         deps = PRPAgentDependencies()
     
     try:
-        if use_test_model:
-            # Usar modelo de teste para desenvolvimento
-            test_model = get_test_model()
-            with prp_agent.override(model=test_model):
-                result = prp_agent.run_sync(message, deps=deps)
-        else:
-            # Usar modelo real
+        # Modelo de teste (desenvolvimento) ou real, instrumentado
+        model = instrumented_model(use_test_model)
+        with traffic_session("chat_with_prp_agent", message) as traffic, invoke_agent_span(
+            PRP_AGENT_NAME, model.model_name, system=model.system,
+            messages=[{"role": "user", "content": message}]
+        ) as span, prp_agent.override(model=model):
             result = prp_agent.run_sync(message, deps=deps)
+            record_agent_run(span, result)
+            if traffic:
+                traffic.output = result.output
         
         return result.data
         
@@ -10,24 +10,189 @@ Este arquivo mostra como o agente DEVERIA funcionar:
 
 import asyncio
 import logging
-from typing import Optional, Dict, Any, List
+import os
+import time
+from typing import Optional, Dict, Any, List, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 
 # Imports do agente original
-from .agent import prp_agent
+from .agent import instrumented_model, prp_agent, record_agent_run
 from .dependencies import PRPAgentDependencies
-from .providers import get_llm_model, get_test_model
+from .tools import get_db_connection
+from .ranking import CandidateBatch, HybridRanker, unique_terms
+from .semantic_index import SemanticIndex, get_semantic_index
+from .context_assembler import ContextAssembler, ContextBudget, ContextReport
+from .retrieval_cache import (
+    CHANGE_COUNTERS_QUERY, RetrievalCache, bump_table_version, get_retrieval_cache, local_table_version,
+)
+from .write_behind import (
+    INSERT_CONVERSATION_QUERY,
+    ConversationRecord,
+    get_write_behind_queue,
+    libsql_conversation_sink,
+    sqlite_conversation_sink,
+)
+from .libsql_client import LibSQLClient, close_libsql_clients, get_libsql_client
+from .embedded_replica import EmbeddedReplica, get_embedded_replica, stop_embedded_replicas
+from .instrumentation import db_span, invoke_agent_span
+from .traffic_replay import traffic_session
+from .settings import settings
 
 logger = logging.getLogger(__name__)
 
 
+# Queries parametrizadas sobre os índices FTS5 (sql/schemas/context_fts_schema.sql).
+# Trazem um conjunto de candidatos que é reordenado pelo HybridRanker.
+DOCS_CONTEXT_QUERY = """
+    SELECT d.*
+    FROM docs_fts
+    JOIN docs d ON d.id = docs_fts.rowid
+    WHERE docs_fts MATCH ?
+    ORDER BY bm25(docs_fts)
+    LIMIT ?
+"""
+
+CONVERSATIONS_CONTEXT_QUERY = """
+    SELECT c.*
+    FROM conversations_fts
+    JOIN conversations c ON c.id = conversations_fts.rowid
+    WHERE conversations_fts MATCH ?
+    ORDER BY bm25(conversations_fts), c.timestamp DESC
+    LIMIT ?
+"""
+
+PRPS_CONTEXT_QUERY = """
+    SELECT p.*
+    FROM prps_fts
+    JOIN prps p ON p.id = prps_fts.rowid
+    WHERE prps_fts MATCH ?
+    ORDER BY bm25(prps_fts), p.created_at DESC
+    LIMIT ?
+"""
+
+# Seções de docs (sql/schemas/docs_sections_search_schema.sql, geradas por agents/chunking.py)
+SECTIONS_CONTEXT_QUERY = """
+    SELECT s.*, d.title AS doc_title, d.cluster_name, d.quality_score, d.updated_at
+    FROM docs_sections_fts
+    JOIN docs_sections s ON s.id = docs_sections_fts.rowid
+    JOIN docs d ON d.id = s.doc_id
+    WHERE docs_sections_fts MATCH ?
+    ORDER BY bm25(docs_sections_fts)
+    LIMIT ?
+"""
+
+NEIGHBOR_SECTIONS_QUERY = """
+    SELECT * FROM docs_sections
+    WHERE doc_id = ? AND section_order BETWEEN ? AND ?
+    ORDER BY section_order
+"""
+
+# Vizinhas (antes/depois) consideradas na expansão de cada seção encontrada
+SECTION_NEIGHBORS = 1
+
+# Tamanho máximo (palavras) de uma seção expandida com as vizinhas
+MAX_EXPANDED_SECTION_WORDS = 400
+
+# Termos por busca (evita queries FTS gigantes para mensagens longas)
+MAX_QUERY_TERMS = 8
+
+# Candidatos buscados por fonte para cada item que vai ao prompt
+CANDIDATE_POOL_FACTOR = 10
+
+# Tabelas lidas por cada fonte (suas versões invalidam o cache; seções fazem JOIN com docs)
+SOURCE_TABLES = {
+    "doc_sections": ("docs_sections", "docs"),
+    "documentation": ("docs",),
+    "conversation_history": ("conversations",),
+    "prps": ("prps",),
+}
+
+# Fontes de contexto: (tipo, query, relevância, campos de texto para o ranking)
+CONTEXT_SOURCES = [
+    ("doc_sections", SECTIONS_CONTEXT_QUERY, "high", ("section_title", "section_content")),
+    ("documentation", DOCS_CONTEXT_QUERY, "high", ("title", "summary", "content", "keywords")),
+    ("conversation_history", CONVERSATIONS_CONTEXT_QUERY, "medium", ("message", "response")),
+    ("prps", PRPS_CONTEXT_QUERY, "high", ("title", "description", "objective")),
+]
+
+# Fontes que dependem de schema opcional: sem a tabela, são desativadas (com um aviso)
+OPTIONAL_SOURCES = {"doc_sections"}
+
+
+def build_fts_query(message: str, max_terms: int = MAX_QUERY_TERMS) -> str:
+    """
+    Converte a mensagem do usuário em uma expressão FTS5 segura.
+    
+    Cada termo é uma palavra alfanumérica entre aspas, combinados com OR, então
+    aspas, apóstrofos e operadores FTS na mensagem não quebram a query.
+    """
+    return " OR ".join(f'"{term}"' for term in unique_terms(message, max_terms))
+
+
 class PRPAgentWithMCPTurso:
     """Agente PRP com integração MCP Turso para contexto inteligente."""
     
-    def __init__(self, database: str = "context-memory"):
+    def __init__(
+        self,
+        database: str = "context-memory",
+        database_path: Optional[str] = None,
+        semantic_index: Optional[SemanticIndex] = None,
+        context_budget: Optional[ContextBudget] = None,
+        cache_size: Optional[int] = None,
+        write_behind: Optional[bool] = None,
+        libsql: Optional[LibSQLClient] = None,
+        replica: Optional[EmbeddedReplica] = None,
+        session_id: str = "prp-agent-session"
+    ):
         self.database = database
-        self.mcp_available = self._check_mcp_availability()
+        # Caminho de um banco SQLite local (opcional) - usado no lugar do MCP
+        self.database_path = database_path
+        # Cliente HTTP do Turso/libSQL (real ou stand-in local)
+        if libsql is None and database_path is None and settings.turso_database_url:
+            libsql = get_libsql_client(settings.turso_database_url, settings.turso_auth_token)
+        self.libsql = libsql
+        # Réplica embarcada: leituras locais, escritas no primário (read-your-writes por sessão).
+        # Compartilhada no processo: o sync e o estado das sessões sobrevivem entre mensagens
+        if replica is None and libsql is not None and settings.turso_replica_path:
+            replica = get_embedded_replica(
+                libsql, settings.turso_replica_path, sync_interval=settings.turso_replica_sync_interval
+            )
+        self.replica = replica
+        self.session_id = session_id
+        self.mcp_available = (
+            database_path is not None or libsql is not None or self._check_mcp_availability()
+        )
+        self.ranker = HybridRanker()
+        # Índice semântico local (acha perguntas parafraseadas que o FTS perde)
+        if semantic_index is None and settings.semantic_index_dir and os.path.isdir(settings.semantic_index_dir):
+            semantic_index = get_semantic_index(settings.semantic_index_dir)
+        self.semantic_index = semantic_index
+        # Dedup + MMR + orçamento de tokens na montagem do prompt
+        self.assembler = ContextAssembler(context_budget)
+        self.last_context_report = ContextReport()
+        # Cache dos candidatos por (fonte, termos), invalidado por versão de tabela.
+        # Um por banco no processo: o agente é recriado a cada mensagem e o cache continua quente
+        if cache_size is None:
+            target = database_path or (f"libsql:{libsql.url}" if libsql is not None else f"mcp:{database}")
+            self.cache = get_retrieval_cache(target, settings.context_cache_size)
+        else:
+            self.cache = RetrievalCache(cache_size)
+        self.counters_refresh_interval = settings.context_cache_refresh_interval
+        self._unavailable_sources: set = set()
+        # Fila write-behind compartilhada por destino (banco local ou database MCP)
+        self.write_queue = None
+        if settings.write_behind_enabled if write_behind is None else write_behind:
+            if database_path:
+                self.write_queue = get_write_behind_queue(
+                    database_path, lambda: sqlite_conversation_sink(database_path)
+                )
+            elif libsql is not None:
+                self.write_queue = get_write_behind_queue(
+                    f"libsql:{libsql.url}", lambda: libsql_conversation_sink(libsql.url, libsql.auth_token, replica=self.replica)
+                )
+            elif self.mcp_available:
+                self.write_queue = get_write_behind_queue(f"mcp:{database}", lambda: _simulated_mcp_sink)
         
     def _check_mcp_availability(self) -> bool:
         """Verifica se MCP Turso está disponível."""
@@ -41,98 +206,268 @@ class PRPAgentWithMCPTurso:
             logger.warning("🚨 MCP Turso não disponível - funcionando sem contexto")
             return False
     
-    async def search_relevant_context(self, message: str, limit: int = 3) -> List[Dict[str, Any]]:
+    async def search_relevant_context(
+        self,
+        message: str,
+        limit: int = 3,
+        conversation: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
         """
         Busca contexto relevante no MCP Turso baseado na mensagem.
         
+        As três buscas (docs, conversas, PRPs) são parametrizadas, usam os
+        índices FTS5 e rodam concorrentemente. Os candidatos de cada fonte são
+        reordenados pelo ranking híbrido (BM25, recência, prioridade/qualidade
+        e sobreposição com a conversa). Se houver índice semântico, os vizinhos
+        mais próximos entram como uma fonte extra ("semantic_matches").
+        
         Args:
             message: Mensagem do usuário
             limit: Limite de resultados
+            conversation: Mensagens recentes da sessão (para sobreposição)
             
         Returns:
             Lista de contextos relevantes
         """
-        if not self.mcp_available:
+        fts_task = self._search_fts_context(message, limit, conversation) if self.mcp_available else None
+        semantic_task = (
+            asyncio.to_thread(self.semantic_index.search, message, limit)
+            if self.semantic_index is not None else None
+        )
+        
+        # FTS e busca semântica em paralelo
+        fts_result, semantic_result = await asyncio.gather(
+            fts_task or asyncio.sleep(0, result=[]),
+            semantic_task or asyncio.sleep(0, result=[]),
+            return_exceptions=True
+        )
+        
+        context = []
+        if isinstance(fts_result, Exception):
+            logger.error(f"Erro ao buscar contexto MCP: {fts_result}")
+        else:
+            context.extend(fts_result)
+        
+        if isinstance(semantic_result, Exception):
+            logger.error(f"Erro na busca semântica: {semantic_result}")
+        elif semantic_result:
+            context.append({
+                "type": "semantic_matches",
+                "data": [entry for entry, _ in semantic_result],
+                "scores": [round(score, 4) for _, score in semantic_result],
+                "relevance": "medium"
+            })
+        
+        return context
+    
+    async def _search_fts_context(
+        self,
+        message: str,
+        limit: int,
+        conversation: Optional[List[str]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca FTS5 concorrente nas fontes + ranking híbrido.
+        
+        Quando há seções de docs relevantes, elas substituem os docs inteiros
+        (cada seção vem expandida com as vizinhas), encolhendo o prompt.
+        """
+        fts_query = build_fts_query(message)
+        if not fts_query:
             return []
-            
-        try:
-            # 1. Buscar em documentação
-            docs_query = f"""
-            SELECT title, content, summary, cluster_name 
-            FROM docs 
-            WHERE content LIKE '%{message[:50]}%' 
-            OR summary LIKE '%{message[:50]}%'
-            OR keywords LIKE '%{message[:50]}%'
-            ORDER BY relevance_score DESC 
-            LIMIT {limit}
-            """
-            
-            # Simular chamada MCP (seria real no Cursor Agent)
-            docs_result = await self._execute_mcp_query(docs_query)
-            
-            # 2. Buscar conversas anteriores
-            conversations_query = f"""
-            SELECT message, response, context, timestamp
-            FROM conversations 
-            WHERE message LIKE '%{message[:50]}%'
-            OR response LIKE '%{message[:50]}%'
-            ORDER BY timestamp DESC
-            LIMIT {limit}
-            """
-            
-            conv_result = await self._execute_mcp_query(conversations_query)
-            
-            # 3. Buscar PRPs relacionados
-            prps_query = f"""
-            SELECT name, title, description, objective, status
-            FROM prps
-            WHERE description LIKE '%{message[:50]}%'
-            OR title LIKE '%{message[:50]}%'
-            ORDER BY created_at DESC
-            LIMIT {limit}
-            """
-            
-            prps_result = await self._execute_mcp_query(prps_query)
-            
-            # Combinar resultados
-            context = []
-            
-            if docs_result:
-                context.append({
-                    "type": "documentation",
-                    "data": docs_result,
-                    "relevance": "high"
-                })
-                
-            if conv_result:
-                context.append({
-                    "type": "conversation_history", 
-                    "data": conv_result,
-                    "relevance": "medium"
-                })
-                
-            if prps_result:
+        
+        sources = [source for source in CONTEXT_SOURCES if source[0] not in self._unavailable_sources]
+        pool_size = limit * CANDIDATE_POOL_FACTOR
+        versions = await self._table_versions() if self.cache.enabled else {}
+        results = await asyncio.gather(
+            *(self._fetch_candidates(ctx_type, query, text_fields, fts_query, pool_size, versions)
+              for ctx_type, query, _, text_fields in sources),
+            return_exceptions=True
+        )
+        
+        conversation_terms = unique_terms(" ".join(conversation or []), max_terms=32)
+        
+        # Combinar resultados
+        context = []
+        
+        for (ctx_type, _, relevance, _), result in zip(sources, results):
+            if isinstance(result, Exception):
+                if ctx_type in OPTIONAL_SOURCES and "no such table" in str(result):
+                    logger.warning(f"⚠️ Fonte {ctx_type} desativada (schema ausente): {result}")
+                    self._unavailable_sources.add(ctx_type)
+                else:
+                    logger.error(f"Erro ao buscar contexto MCP ({ctx_type}): {result}")
+                continue
+            if len(result):
+                ranked = self.ranker.rank(
+                    message,
+                    result,
+                    conversation_terms=conversation_terms,
+                    top_k=limit
+                )
+                data = [item for item, _ in ranked]
+                if ctx_type == "doc_sections":
+                    data = await self._expand_sections(data)
                 context.append({
-                    "type": "prps",
-                    "data": prps_result,
-                    "relevance": "high"
+                    "type": ctx_type,
+                    "data": data,
+                    "scores": [round(score, 4) for _, score in ranked][:len(data)],
+                    "relevance": relevance
                 })
+        
+        if any(ctx["type"] == "doc_sections" for ctx in context):
+            context = [ctx for ctx in context if ctx["type"] != "documentation"]
+        
+        return context
+    
+    async def _expand_sections(self, sections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Expande cada seção com as vizinhas (antes/depois) do mesmo doc.
+        
+        As vizinhas entram enquanto o total couber em MAX_EXPANDED_SECTION_WORDS;
+        seções já cobertas pela expansão de outra mais relevante são descartadas.
+        """
+        neighbors = await asyncio.gather(
+            *(self._execute_mcp_query(NEIGHBOR_SECTIONS_QUERY, [
+                section["doc_id"],
+                section["section_order"] - SECTION_NEIGHBORS,
+                section["section_order"] + SECTION_NEIGHBORS
+            ]) for section in sections),
+            return_exceptions=True
+        )
+        
+        expanded, covered = [], set()
+        for section, window in zip(sections, neighbors):
+            key = (section["doc_id"], section["section_order"])
+            if key in covered:
+                continue
+            if isinstance(window, Exception) or not window:
+                window = [section]
             
-            return context
+            by_order = {row["section_order"]: row for row in window}
+            chosen = [section]
+            words = section.get("word_count") or 0
+            for offset in range(1, SECTION_NEIGHBORS + 1):
+                for order in (section["section_order"] - offset, section["section_order"] + offset):
+                    row = by_order.get(order)
+                    if row is None or (section["doc_id"], order) in covered:
+                        continue
+                    if words + (row.get("word_count") or 0) > MAX_EXPANDED_SECTION_WORDS:
+                        continue
+                    chosen.append(row)
+                    words += row.get("word_count") or 0
+            chosen.sort(key=lambda row: row["section_order"])
+            covered.update((section["doc_id"], row["section_order"]) for row in chosen)
             
-        except Exception as e:
-            logger.error(f"Erro ao buscar contexto MCP: {e}")
-            return []
+            expanded.append({
+                **section,
+                "section_content": "\n\n".join(row["section_content"] for row in chosen),
+                "section_orders": [row["section_order"] for row in chosen],
+                "word_count": words
+            })
+        return expanded
+    
+    async def _fetch_candidates(
+        self,
+        ctx_type: str,
+        query: str,
+        text_fields: Tuple[str, ...],
+        fts_query: str,
+        pool_size: int,
+        versions: Dict[str, Any]
+    ) -> CandidateBatch:
+        """
+        Candidatos de uma fonte, do cache se a tabela não mudou.
+        
+        O cache guarda o CandidateBatch já tokenizado, então um hit pula tanto
+        o banco quanto a tokenização dos candidatos.
+        """
+        # Termos ordenados: a expressão é um OR, então a ordem não muda o resultado
+        key = (ctx_type, tuple(sorted(fts_query.split(" OR "))), pool_size)
+        version = tuple(versions.get(table) for table in SOURCE_TABLES[ctx_type])
+        cached = self.cache.get(key, version)
+        if cached is not None:
+            return cached
+        
+        rows = await self._execute_mcp_query(query, [fts_query, pool_size])
+        batch = CandidateBatch(rows, text_fields)
+        self.cache.put(key, version, batch)
+        return batch
     
-    async def _execute_mcp_query(self, query: str) -> List[Dict[str, Any]]:
-        """Executa query no MCP Turso (simulado aqui, real no Cursor)."""
+    async def _table_versions(self) -> Dict[str, Any]:
+        """
+        Versão atual de cada tabela: (contador local, contador do banco).
+        
+        O contador local muda na hora com escritas deste processo. O do banco
+        (triggers) é relido no máximo a cada `counters_refresh_interval`
+        segundos, então perguntas repetidas nesse intervalo não tocam o banco.
+        Os contadores lidos ficam no cache compartilhado (valem para as
+        próximas mensagens, cada uma com seu agente).
+        """
+        cache = self.cache
+        now = time.monotonic()
+        checked_at = cache.db_versions_checked_at
+        if checked_at is None or now - checked_at >= self.counters_refresh_interval:
+            try:
+                rows = await self._execute_mcp_query(CHANGE_COUNTERS_QUERY)
+                cache.db_versions = {row["table_name"]: row["version"] for row in rows}
+            except Exception as e:
+                # Sem o schema de contadores só as escritas deste processo invalidam o cache
+                if checked_at is None:
+                    logger.warning(f"⚠️ Contadores de mudança indisponíveis: {e}")
+                cache.db_versions = {}
+            cache.db_versions_checked_at = now
+        
+        db_versions = cache.db_versions
+        return {
+            table: (local_table_version(table), db_versions.get(table))
+            for table in {table for tables in SOURCE_TABLES.values() for table in tables}
+        }
+    
+    def _execute_local_query(self, query: str, params: List[Any]) -> List[Dict[str, Any]]:
+        """Executa query no banco SQLite local (chamado em thread)."""
+        conn = get_db_connection(self.database_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+    
+    async def _execute_mcp_query(self, query: str, params: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+        """Executa query no MCP Turso (simulado aqui, real no Cursor), com span "db"."""
+        local = self.database_path or self.replica is not None
+        with db_span(query, system="sqlite" if local else "libsql"):
+            return await self._run_mcp_query(query, params)
+    
+    async def _run_mcp_query(self, query: str, params: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+        if self.database_path:
+            return await asyncio.to_thread(self._execute_local_query, query, params or [])
+        
+        if self.replica is not None:
+            self.replica.ensure_periodic_sync()
+            return await self.replica.read(query, params, session_id=self.session_id)
+        
+        if self.libsql is not None:
+            return (await self.libsql.execute(query, params))["rows"]
         
         # NO CURSOR AGENT, isto seria:
         # from mcp_turso import execute_read_only_query
-        # return execute_read_only_query(query=query, database=self.database)
+        # return execute_read_only_query(query=query, params=params, database=self.database)
         
         # Para desenvolvimento, simular alguns resultados
-        if "docs" in query.lower():
+        if "docs_sections" in query.lower():
+            return [
+                {
+                    "doc_id": 1,
+                    "doc_title": "Guia de Uso PRP Agent",
+                    "section_title": "Primeiros passos",
+                    "section_content": "Crie um PRP descrevendo o objetivo e peça a análise ao agente...",
+                    "section_order": 1,
+                    "word_count": 11
+                }
+            ]
+        elif "docs" in query.lower():
             return [
                 {
                     "title": "Guia de Uso PRP Agent",
@@ -164,39 +499,61 @@ class PRPAgentWithMCPTurso:
         return []
     
     def format_context_for_prompt(self, context: List[Dict[str, Any]]) -> str:
-        """Formata contexto para incluir no prompt do agente."""
+        """
+        Formata contexto para incluir no prompt do agente.
+        
+        O ContextAssembler remove quase-duplicatas, escolhe itens diversos (MMR)
+        e respeita o orçamento de tokens por fonte; o relatório de tokens
+        economizados fica em `last_context_report`.
+        """
         
         if not context:
+            self.last_context_report = ContextReport()
+            return ""
+        
+        assembled, report = self.assembler.assemble(context)
+        self.last_context_report = report
+        logger.info(
+            f"✂️ Contexto: {report.tokens_before} → {report.tokens_after} tokens "
+            f"({report.tokens_saved} economizados, {report.duplicates_removed} duplicata(s))"
+        )
+        if not assembled:
             return ""
             
         context_text = "\n🧠 **CONTEXTO RELEVANTE ENCONTRADO NO TURSO:**\n"
         
-        for ctx in context:
+        for ctx, lines in assembled:
             ctx_type = ctx.get("type", "unknown")
-            ctx_data = ctx.get("data", [])
             relevance = ctx.get("relevance", "unknown")
             
             context_text += f"\n📋 **{ctx_type.upper()}** (Relevância: {relevance}):\n"
-            
-            for item in ctx_data[:2]:  # Máximo 2 itens por tipo
-                if ctx_type == "documentation":
-                    context_text += f"- 📚 {item.get('title', 'N/A')}: {item.get('summary', 'N/A')}\n"
-                elif ctx_type == "conversation_history":
-                    context_text += f"- 💬 Pergunta anterior: {item.get('message', 'N/A')[:100]}...\n"
-                elif ctx_type == "prps":
-                    context_text += f"- 🎯 PRP: {item.get('title', 'N/A')} - {item.get('description', 'N/A')[:100]}...\n"
+            context_text += "".join(f"{line}\n" for line in lines)
         
         context_text += "\n📝 **Use este contexto para fornecer uma resposta mais informada.**\n\n"
         
         return context_text
     
-    async def save_conversation_to_mcp(self, message: str, response: str, context: str = None) -> bool:
+    async def save_conversation_to_mcp(
+        self, message: str, response: str, context: str = None, session_id: Optional[str] = None
+    ) -> bool:
         """Salva conversa no MCP Turso."""
+        session_id = session_id or self.session_id
         
         if not self.mcp_available:
             return False
             
         try:
+            if self.libsql is not None:
+                record = ConversationRecord(
+                    session_id=session_id, message=message, response=response, context=context
+                )
+                if self.replica is not None:
+                    await self.replica.write(INSERT_CONVERSATION_QUERY, record.as_row(), session_id=session_id)
+                else:
+                    await self.libsql.execute(INSERT_CONVERSATION_QUERY, record.as_row())
+                bump_table_version("conversations")
+                return True
+            
             # NO CURSOR AGENT, isto seria:
             # from mcp_turso import add_conversation
             # result = add_conversation(
@@ -209,12 +566,28 @@ class PRPAgentWithMCPTurso:
             
             # Para desenvolvimento, simular sucesso
             logger.info(f"💾 [SIMULADO] Conversa salva no MCP Turso: {message[:50]}...")
+            bump_table_version("conversations")
             return True
             
         except Exception as e:
             logger.error(f"Erro ao salvar no MCP: {e}")
             return False
     
+    async def persist_conversation(
+        self,
+        message: str,
+        response: str,
+        context: str = None,
+        session_id: Optional[str] = None
+    ) -> bool:
+        """Enfileira a conversa na fila write-behind (ou salva direto, se desabilitada)."""
+        session_id = session_id or self.session_id
+        if self.write_queue is None:
+            return await self.save_conversation_to_mcp(message, response, context, session_id)
+        return self.write_queue.enqueue(ConversationRecord(
+            session_id=session_id, message=message, response=response, context=context
+        ))
+    
     async def chat_with_mcp_context(
         self, 
         message: str, 
@@ -227,12 +600,24 @@ class PRPAgentWithMCPTurso:
         ESTE É O MÉTODO CORRETO que deveria ser usado!
         """
         if deps is None:
-            deps = PRPAgentDependencies()
+            deps = PRPAgentDependencies(session_id=self.session_id)
+        # Read-your-writes da réplica é por sessão: a do usuário, não a padrão do agente
+        self.session_id = deps.session_id
         
+        # Um gen_ai.invoke_agent cobrindo busca de contexto, LLM, ferramentas e persistência
+        model = instrumented_model(use_test_model)
+        with invoke_agent_span(
+            "PRP Agent MCP", model.model_name, system=model.system,
+            messages=[{"role": "user", "content": message}]
+        ) as agent_span:
+            return await self._chat_with_mcp_context(message, deps, model, agent_span)
+    
+    async def _chat_with_mcp_context(self, message: str, deps: PRPAgentDependencies, model, agent_span) -> str:
         try:
             # 🔍 PASSO 1: Buscar contexto relevante no MCP Turso
             logger.info(f"🔍 Buscando contexto no MCP Turso para: {message[:50]}...")
-            context = await self.search_relevant_context(message)
+            recent = [c["message"] for c in deps.get_recent_conversations()]
+            context = await self.search_relevant_context(message, conversation=recent)
             
             # 📝 PASSO 2: Formatar contexto
             context_text = self.format_context_for_prompt(context)
@@ -241,34 +626,43 @@ class PRPAgentWithMCPTurso:
             enhanced_message = f"{context_text}\n**PERGUNTA DO USUÁRIO:**\n{message}"
             
             # 🧠 PASSO 4: Executar agente com contexto
-            if use_test_model:
-                test_model = get_test_model()
-                with prp_agent.override(model=test_model):
-                    result = await prp_agent.run(enhanced_message, deps=deps)
-            else:
+            with prp_agent.override(model=model):
                 result = await prp_agent.run(enhanced_message, deps=deps)
+            record_agent_run(agent_span, result)
             
             response = result.data
             
-            # 💾 PASSO 5: Salvar conversa no MCP Turso
-            await self.save_conversation_to_mcp(
+            # 💾 PASSO 5: Salvar conversa no MCP Turso (write-behind, não bloqueia a resposta)
+            await self.persist_conversation(
                 message=message, 
                 response=response,
-                context=f"mcp_context_items: {len(context)}"
+                context=f"mcp_context_items: {len(context)}",
+                session_id=deps.session_id
             )
             
             # 📊 PASSO 6: Adicionar informações sobre contexto usado
             if context:
-                context_info = f"\n\n🧠 **Contexto usado:** {len(context)} item(s) do Turso"
+                report = self.last_context_report
+                context_info = (
+                    f"\n\n🧠 **Contexto usado:** {report.selected} item(s) do Turso "
+                    f"(~{report.tokens_after} tokens, {report.tokens_saved} economizados)"
+                )
                 response += context_info
             
             return response
             
         except Exception as e:
             logger.error(f"Erro na conversa com MCP: {e}")
+            agent_span.set_status("internal_error")
             return f"❌ Erro interno do agente com MCP: {str(e)}"
 
 
+def _simulated_mcp_sink(batch: List[ConversationRecord]):
+    """Sink do MCP simulado (no Cursor Agent seria add_conversation por registro)."""
+    logger.info(f"💾 [SIMULADO] {len(batch)} conversa(s) salvas no MCP Turso em lote")
+    bump_table_version("conversations")
+
+
 # 🚀 FUNÇÕES PÚBLICAS - Como deveria ser usado
 async def chat_with_prp_agent_mcp(
     message: str, 
@@ -280,8 +674,14 @@ async def chat_with_prp_agent_mcp(
     
     ESTA deveria ser a função principal chamada pelo CLI!
     """
-    agent = PRPAgentWithMCPTurso()
-    return await agent.chat_with_mcp_context(message, deps, use_test_model)
+    if deps is None:
+        deps = PRPAgentDependencies()
+    agent = PRPAgentWithMCPTurso(session_id=deps.session_id)
+    with traffic_session("chat_with_prp_agent_mcp", message) as traffic:
+        response = await agent.chat_with_mcp_context(message, deps, use_test_model)
+        if traffic:
+            traffic.output = response
+    return response
 
 
 def chat_with_prp_agent_mcp_sync(
@@ -290,7 +690,16 @@ def chat_with_prp_agent_mcp_sync(
     use_test_model: bool = False
 ) -> str:
     """Versão síncrona da conversa com MCP."""
-    return asyncio.run(chat_with_prp_agent_mcp(message, deps, use_test_model))
+
+    async def run() -> str:
+        try:
+            return await chat_with_prp_agent_mcp(message, deps, use_test_model)
+        finally:
+            # O loop acaba aqui: o sync periódico da réplica e as conexões HTTP não sobrevivem a ele
+            await stop_embedded_replicas()
+            await close_libsql_clients()
+
+    return asyncio.run(run())
 
 
 # 🎯 EXEMPLO DE USO
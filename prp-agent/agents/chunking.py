@@ -0,0 +1,274 @@
+"""
+Chunking de documentos markdown em seções (`docs_sections`).
+
+Este módulo quebra `docs.content` por cabeçalhos (ignorando blocos de código),
+limita o tamanho de cada seção em palavras (dividindo por parágrafos) e grava
+o resultado em `docs_sections`, que é indexada por FTS5
+(sql/schemas/docs_sections_search_schema.sql). O hash do que gerou as seções
+de cada doc fica em `docs_sections_sources`: docs editados são rechunkados na
+próxima execução, os inalterados são pulados.
+
+Uso:
+    python -m agents.chunking --db ../context-memory.db --apply-schema
+"""
+
+import argparse
+import hashlib
+import math
+import re
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .retrieval_cache import bump_table_version
+
+SECTIONS_SCHEMA = Path(__file__).resolve().parents[2] / "sql" / "schemas" / "docs_sections_search_schema.sql"
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_LIST_RE = re.compile(r"^\s*([-*+]|\d+[.)])\s+")
+_WORD_RE = re.compile(r"\S+")
+
+# Palavras por seção (seções maiores são divididas por parágrafo)
+DEFAULT_MAX_WORDS = 300
+
+# Palavras por minuto para estimated_read_time
+WORDS_PER_MINUTE = 200
+
+INSERT_SECTION_QUERY = """
+    INSERT INTO docs_sections (
+        doc_id, section_title, section_content, section_order, section_level,
+        section_type, anchor, parent_section_id, word_count, estimated_read_time
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Mesma definição de docs_sections_search_schema.sql (bancos anteriores a ela)
+SECTION_SOURCES_DDL = """
+    CREATE TABLE IF NOT EXISTS docs_sections_sources (
+        doc_id INTEGER PRIMARY KEY,
+        content_hash TEXT NOT NULL,
+        chunked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+@dataclass
+class Section:
+    """Seção de um documento markdown."""
+
+    title: str
+    content: str
+    level: int
+    order: int
+    anchor: str
+    section_type: str = "content"
+    parent_order: Optional[int] = None
+
+    @property
+    def word_count(self) -> int:
+        return len(_WORD_RE.findall(self.content))
+
+    @property
+    def estimated_read_time(self) -> int:
+        return max(1, math.ceil(self.word_count / WORDS_PER_MINUTE))
+
+
+def slugify(title: str) -> str:
+    """Âncora no estilo GitHub: minúsculas, sem pontuação, espaços viram hífen."""
+    slug = re.sub(r"[^\w\s-]", "", title.lower()).strip()
+    return re.sub(r"[\s_]+", "-", slug)
+
+
+def _section_type(lines: List[str]) -> str:
+    """Classificar a seção pelo tipo predominante de linha."""
+    non_empty = [line for line in lines if line.strip()]
+    if not non_empty:
+        return "content"
+    in_fence, code = False, 0
+    for line in non_empty:
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+            code += 1
+        elif in_fence:
+            code += 1
+    half = len(non_empty) / 2
+    if code >= half:
+        return "code"
+    if sum(line.lstrip().startswith("|") for line in non_empty) >= half:
+        return "table"
+    if sum(bool(_LIST_RE.match(line)) for line in non_empty) >= half:
+        return "list"
+    return "content"
+
+
+def _paragraphs(lines: List[str]) -> List[List[str]]:
+    """Parágrafos separados por linha em branco (blocos de código ficam inteiros)."""
+    paragraphs, current, in_fence = [], [], False
+    for line in lines:
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        if not line.strip() and not in_fence:
+            if current:
+                paragraphs.append(current)
+                current = []
+            continue
+        current.append(line)
+    if current:
+        paragraphs.append(current)
+    return paragraphs
+
+
+def _split_by_size(lines: List[str], max_words: int) -> List[List[str]]:
+    """Dividir o corpo da seção em partes de até max_words (por parágrafo)."""
+    parts, current, words = [], [], 0
+    for paragraph in _paragraphs(lines):
+        paragraph_words = sum(len(_WORD_RE.findall(line)) for line in paragraph)
+        if paragraph_words > max_words:
+            # Parágrafo gigante: quebrar por palavras
+            if current:
+                parts.append(current)
+                current, words = [], 0
+            tokens = _WORD_RE.findall(" ".join(paragraph))
+            for start in range(0, len(tokens), max_words):
+                parts.append([" ".join(tokens[start:start + max_words])])
+            continue
+        if current and words + paragraph_words > max_words:
+            parts.append(current)
+            current, words = [], 0
+        current.extend(paragraph + [""])
+        words += paragraph_words
+    if current:
+        parts.append(current)
+    return parts
+
+
+def chunk_markdown(text: str, doc_title: str = "", max_words: int = DEFAULT_MAX_WORDS) -> List[Section]:
+    """
+    Quebrar markdown em seções por cabeçalho, com no máximo max_words cada.
+
+    Cabeçalhos sem corpo não viram seção, mas continuam como pais das
+    subseções (parent_order aponta para o ancestral emitido mais próximo).
+    """
+    blocks = []  # (nível, título, linhas)
+    level, title, lines, in_fence = 1, doc_title or "Introdução", [], False
+    for line in text.splitlines():
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        heading = None if in_fence else _HEADING_RE.match(line)
+        if heading:
+            blocks.append((level, title, lines))
+            level, title, lines = len(heading.group(1)), heading.group(2).strip(), []
+        else:
+            lines.append(line)
+    blocks.append((level, title, lines))
+
+    sections: List[Section] = []
+    stack: List[tuple] = []  # (nível, ordem da seção emitida ou None)
+    for level, title, lines in blocks:
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        parent_order = next((order for _, order in reversed(stack) if order is not None), None)
+
+        parts = _split_by_size(lines, max_words) if any(line.strip() for line in lines) else []
+        first_order = None
+        for i, part in enumerate(parts):
+            content = "\n".join(part).strip()
+            if not content:
+                continue
+            section = Section(
+                title=title if i == 0 else f"{title} (parte {i + 1})",
+                content=content,
+                level=level,
+                order=len(sections),
+                anchor=slugify(title),
+                section_type=_section_type(part),
+                parent_order=parent_order,
+            )
+            sections.append(section)
+            if first_order is None:
+                first_order = section.order
+        stack.append((level, first_order))
+
+    return sections
+
+
+def source_hash(title: str, content: str, max_words: int) -> str:
+    """Hash de tudo que determina as seções de um doc (título, conteúdo e tamanho máximo)."""
+    return hashlib.sha256(f"{max_words}\0{title}\0{content}".encode("utf-8")).hexdigest()
+
+
+def populate_sections(
+    conn: sqlite3.Connection,
+    doc_ids: Optional[Iterable[int]] = None,
+    rebuild: bool = False,
+    max_words: int = DEFAULT_MAX_WORDS,
+) -> Dict[str, int]:
+    """
+    (Re)gerar `docs_sections` a partir de `docs.content`.
+
+    Sem `doc_ids`, processa os docs sem seções ou cujo conteúdo mudou desde o
+    último chunking (hash em `docs_sections_sources`); com rebuild=True, todos.
+    Cada doc é substituído em uma única transação.
+    """
+    conn.execute(SECTION_SOURCES_DDL)
+    query = ("SELECT d.id, d.title, d.content, s.content_hash FROM docs d "
+             "LEFT JOIN docs_sections_sources s ON s.doc_id = d.id")
+    params: List = []
+    if doc_ids is not None:
+        ids = list(doc_ids)
+        query += f" WHERE d.id IN ({','.join('?' * len(ids))})"
+        params = ids
+    forced = rebuild or doc_ids is not None
+
+    stats = {"docs": 0, "sections": 0, "unchanged": 0}
+    for doc_id, title, content, stored_hash in conn.execute(query, params).fetchall():
+        content_hash = source_hash(title or "", content or "", max_words)
+        if not forced and content_hash == stored_hash:
+            stats["unchanged"] += 1
+            continue
+        sections = chunk_markdown(content or "", title or "", max_words)
+        with conn:
+            conn.execute("DELETE FROM docs_sections WHERE doc_id = ?", (doc_id,))
+            ids_by_order: Dict[int, int] = {}
+            for section in sections:
+                cursor = conn.execute(INSERT_SECTION_QUERY, (
+                    doc_id, section.title, section.content, section.order, section.level,
+                    section.section_type, section.anchor, ids_by_order.get(section.parent_order),
+                    section.word_count, section.estimated_read_time,
+                ))
+                ids_by_order[section.order] = cursor.lastrowid
+            conn.execute(
+                "INSERT OR REPLACE INTO docs_sections_sources (doc_id, content_hash) VALUES (?, ?)",
+                (doc_id, content_hash),
+            )
+        stats["docs"] += 1
+        stats["sections"] += len(sections)
+
+    if stats["docs"]:
+        bump_table_version("docs_sections")
+    return stats
+
+
+def main():
+    """CLI para gerar as seções dos documentos."""
+    parser = argparse.ArgumentParser(description="Chunking de docs em docs_sections")
+    parser.add_argument("--db", required=True, help="Banco SQLite")
+    parser.add_argument("--apply-schema", action="store_true", help="Criar tabela/índices de seções antes")
+    parser.add_argument("--rebuild", action="store_true", help="Regerar as seções de todos os docs")
+    parser.add_argument("--max-words", type=int, default=DEFAULT_MAX_WORDS)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.apply_schema:
+            conn.executescript(SECTIONS_SCHEMA.read_text(encoding="utf-8"))
+        stats = populate_sections(conn, rebuild=args.rebuild, max_words=args.max_words)
+    finally:
+        conn.close()
+    print(f"✅ {stats['sections']} seção(ões) geradas para {stats['docs']} doc(s) "
+          f"({stats['unchanged']} inalterado(s))")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Montagem do contexto do prompt com orçamento de tokens.
+
+Este módulo recebe os contextos retornados pela busca (docs, conversas, PRPs,
+matches semânticos) e:
+1. Remove quase-duplicatas (shingles de palavras hasheados + Jaccard)
+2. Seleciona itens com diversidade (Maximal Marginal Relevance)
+3. Trunca cada fonte ao seu orçamento de tokens
+4. Reporta quantos tokens foram economizados
+"""
+
+import math
+import re
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+_WORD_RE = re.compile(r"\w+")
+
+# Tamanho mínimo (tokens) para valer a pena incluir um item truncado
+MIN_TRUNCATED_TOKENS = 16
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa de tokens (~4 caracteres por token, como nos tokenizadores BPE)."""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def shingles(text: str, size: int = 3) -> FrozenSet[int]:
+    """Conjunto de hashes dos shingles de `size` palavras do texto."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return frozenset([zlib.crc32(" ".join(words).encode("utf-8"))]) if words else frozenset()
+    return frozenset(
+        zlib.crc32(" ".join(words[i:i + size]).encode("utf-8"))
+        for i in range(len(words) - size + 1)
+    )
+
+
+def jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Truncar texto ao orçamento, cortando na última palavra inteira."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max(max_tokens * 4 - 1, 0)]
+    if " " in cut:
+        cut = cut[:cut.rindex(" ")]
+    return cut.rstrip() + "…"
+
+
+def render_item(ctx_type: str, item: Dict[str, Any]) -> str:
+    """Linha do prompt para um item de contexto (sem truncamento)."""
+    if ctx_type == "doc_sections":
+        return f"- 📑 {item.get('doc_title', 'N/A')} › {item.get('section_title', 'N/A')}: {item.get('section_content', '')}"
+    if ctx_type == "documentation":
+        return f"- 📚 {item.get('title', 'N/A')}: {item.get('summary') or item.get('content') or 'N/A'}"
+    if ctx_type == "conversation_history":
+        return f"- 💬 Pergunta anterior: {item.get('message', 'N/A')} → {item.get('response') or ''}".rstrip(" →")
+    if ctx_type == "prps":
+        return f"- 🎯 PRP: {item.get('title', 'N/A')} - {item.get('description') or 'N/A'}"
+    if ctx_type == "semantic_matches":
+        return f"- 🧭 {item.get('title') or 'N/A'} ({item.get('source')}): {item.get('snippet', '')}"
+    return f"- {item}"
+
+
+@dataclass
+class ContextBudget:
+    """Orçamento de tokens e parâmetros de seleção do contexto."""
+
+    total_tokens: int = 1200
+    per_source: Dict[str, int] = field(default_factory=lambda: {
+        "doc_sections": 500,
+        "documentation": 500,
+        "prps": 300,
+        "conversation_history": 200,
+        "semantic_matches": 200,
+    })
+    default_source_tokens: int = 200
+    max_items_per_source: int = 3
+
+    # Relevância x diversidade no MMR (1.0 = só relevância)
+    mmr_lambda: float = 0.7
+
+    # Jaccard a partir do qual dois itens são considerados duplicados
+    duplicate_threshold: float = 0.8
+
+
+@dataclass
+class ContextReport:
+    """Resumo da montagem do contexto de uma requisição."""
+
+    tokens_before: int = 0
+    tokens_after: int = 0
+    candidates: int = 0
+    selected: int = 0
+    duplicates_removed: int = 0
+    truncated: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": self.tokens_saved,
+            "candidates": self.candidates,
+            "selected": self.selected,
+            "duplicates_removed": self.duplicates_removed,
+            "truncated": self.truncated,
+        }
+
+
+@dataclass
+class _Candidate:
+    text: str
+    relevance: float
+    shingles: FrozenSet[int]
+
+
+class ContextAssembler:
+    """Deduplica, diversifica (MMR) e encaixa o contexto no orçamento de tokens."""
+
+    def __init__(self, budget: Optional[ContextBudget] = None,
+                 renderer: Callable[[str, Dict[str, Any]], str] = render_item):
+        self.budget = budget or ContextBudget()
+        self.renderer = renderer
+
+    def _candidates(self, ctx: Dict[str, Any]) -> List[_Candidate]:
+        """Renderizar os itens de uma fonte com relevância normalizada em [0, 1]."""
+        data = ctx.get("data", [])
+        scores = ctx.get("scores") or [1.0 / (1 + i) for i in range(len(data))]
+        top = max(scores, default=0.0)
+        candidates = []
+        for item, score in zip(data, scores):
+            text = self.renderer(ctx.get("type", "unknown"), item)
+            relevance = score / top if top > 0 else 0.0
+            candidates.append(_Candidate(text, relevance, shingles(text)))
+        return candidates
+
+    def _mmr(self, candidates: List[_Candidate], k: int) -> List[_Candidate]:
+        """Seleção gulosa por Maximal Marginal Relevance."""
+        lam = self.budget.mmr_lambda
+        selected: List[_Candidate] = []
+        remaining = list(candidates)
+        while remaining and len(selected) < k:
+            best = max(
+                remaining,
+                key=lambda c: lam * c.relevance - (1 - lam) * max(
+                    (jaccard(c.shingles, s.shingles) for s in selected), default=0.0
+                ),
+            )
+            selected.append(best)
+            remaining.remove(best)
+        return selected
+
+    def assemble(self, context: List[Dict[str, Any]]) -> Tuple[List[Tuple[Dict[str, Any], List[str]]], ContextReport]:
+        """
+        Montar o contexto final.
+
+        Returns:
+            Lista de (contexto da fonte, linhas selecionadas) e o relatório
+        """
+        budget = self.budget
+        report = ContextReport()
+        kept: List[_Candidate] = []  # já aceitos, de qualquer fonte (dedup global)
+        remaining_total = budget.total_tokens
+        assembled = []
+
+        for ctx in context:
+            candidates = self._candidates(ctx)
+            report.candidates += len(candidates)
+            report.tokens_before += sum(estimate_tokens(c.text) for c in candidates)
+
+            unique = []
+            for candidate in candidates:
+                if any(jaccard(candidate.shingles, k.shingles) >= budget.duplicate_threshold
+                       for k in kept + unique):
+                    report.duplicates_removed += 1
+                else:
+                    unique.append(candidate)
+
+            source_budget = min(
+                budget.per_source.get(ctx.get("type"), budget.default_source_tokens),
+                remaining_total
+            )
+            lines = []
+            for candidate in self._mmr(unique, budget.max_items_per_source):
+                tokens = estimate_tokens(candidate.text)
+                if tokens <= source_budget:
+                    text = candidate.text
+                elif source_budget >= MIN_TRUNCATED_TOKENS:
+                    text = truncate_to_tokens(candidate.text, source_budget)
+                    report.truncated += 1
+                else:
+                    break
+                source_budget -= estimate_tokens(text)
+                remaining_total -= estimate_tokens(text)
+                report.tokens_after += estimate_tokens(text)
+                lines.append(text)
+                kept.append(candidate)
+
+            report.selected += len(lines)
+            if lines:
+                assembled.append((ctx, lines))
+
+        return assembled, report
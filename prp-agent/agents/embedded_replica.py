@@ -0,0 +1,473 @@
+"""
+Réplica embarcada (SQLite local) do banco `context-memory`.
+
+Leituras (busca de contexto, detalhes de PRP) vão para um arquivo SQLite
+local; escritas vão para o primário (Turso/libSQL via HTTP). A réplica é
+mantida em dia pelo change log do primário (sql/schemas/replica_changelog_schema.sql):
+1. `bootstrap` copia schema (tabelas, índices, FTS, triggers) e dados
+2. `sync` puxa, em um único pipeline, as linhas alteradas desde o último `seq`
+   aplicado e as reaplica localmente (os triggers locais mantêm o FTS em dia)
+3. Sync periódico (`start`) e/ou logo após cada escrita (`sync_on_write`)
+
+Uma réplica por (primário, arquivo) no processo (`get_embedded_replica`): o
+estado de sync e o read-your-writes das sessões sobrevivem entre mensagens, e
+`stop_embedded_replicas` encerra os syncs periódicos no shutdown.
+
+Read-your-writes por sessão: cada escrita devolve o `seq` do primário naquele
+momento; leituras da mesma sessão esperam a réplica alcançar esse `seq` (ou
+caem no primário, se o sync falhar).
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .libsql_client import LibSQLClient, LibSQLError
+from .metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# Tabelas lidas pelo agente e pela integração MCP (precisam de triggers no change log)
+REPLICATED_TABLES = ("docs", "docs_sections", "conversations", "prps", "prp_tasks", "prp_llm_analysis")
+
+# Tabelas copiadas só no bootstrap (os triggers locais as mantêm depois)
+SNAPSHOT_TABLES = ("table_change_counters",)
+
+# Acima disso é mais barato recopiar tudo do que aplicar o change log
+MAX_CHANGES_PER_SYNC = 50000
+
+_FTS_SHADOW_SUFFIXES = ("_data", "_idx", "_content", "_docsize", "_config")
+
+SCHEMA_QUERY = """
+    SELECT type, name, tbl_name, sql FROM sqlite_master
+    WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+    ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END, rowid
+"""
+
+CHANGELOG_BOUNDS_QUERY = "SELECT coalesce(min(seq), 0) AS min_seq, coalesce(max(seq), 0) AS max_seq FROM replica_changelog"
+
+SESSION_SEQ_QUERY = "SELECT coalesce(max(seq), 0) AS seq FROM replica_changelog"
+
+CHANGED_ROWS_QUERY = "SELECT DISTINCT row_id FROM replica_changelog WHERE seq > ? AND table_name = ?"
+
+REPLICA_STATE_DDL = "CREATE TABLE IF NOT EXISTS _replica_state (key TEXT PRIMARY KEY, value TEXT)"
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class EmbeddedReplica:
+    """Réplica local de leitura com sync incremental por change log."""
+
+    def __init__(
+        self,
+        primary: LibSQLClient,
+        replica_path: str,
+        tables: Sequence[str] = REPLICATED_TABLES,
+        sync_interval: float = 1.0,
+        sync_on_write: bool = True,
+    ):
+        self.primary = primary
+        self.replica_path = replica_path
+        self.tables = tuple(tables)
+        self.sync_interval = sync_interval
+        self.sync_on_write = sync_on_write
+
+        self._sync_locks: Dict[int, asyncio.Lock] = {}
+        self._state_lock = threading.Lock()
+        self._session_seq: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._active_tables: Tuple[str, ...] = ()
+
+        self.applied_seq = 0
+        self.primary_seq = 0
+        self.bootstrapped = False
+        self.last_sync_at: Optional[float] = None
+
+        self.sync_latency = LatencyHistogram()
+        self.syncs = 0
+        self.failed_syncs = 0
+        self.full_syncs = 0
+        self.rows_applied = 0
+        self.reads_local = 0
+        self.reads_primary = 0
+        self.ryw_waits = 0
+
+        self._load_state()
+
+    # ------------------------------------------------------------------
+    # Estado local
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.replica_path, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _load_state(self):
+        """Retomar de onde a réplica parou (o arquivo sobrevive a restarts)."""
+        if not os.path.exists(self.replica_path):
+            return
+        conn = self._connect()
+        try:
+            conn.execute(REPLICA_STATE_DDL)
+            state = {row["key"]: row["value"] for row in conn.execute("SELECT key, value FROM _replica_state")}
+        finally:
+            conn.close()
+        if "applied_seq" in state:
+            self.applied_seq = self.primary_seq = int(state["applied_seq"])
+            self._active_tables = tuple(filter(None, state.get("tables", "").split(",")))
+            self.bootstrapped = True
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+
+    def _sync_lock(self) -> asyncio.Lock:
+        """Um lock por event loop (o agente roda em loops diferentes via asyncio.run)."""
+        loop_id = id(asyncio.get_running_loop())
+        with self._state_lock:
+            lock = self._sync_locks.get(loop_id)
+            if lock is None:
+                lock = asyncio.Lock()
+                self._sync_locks = {loop_id: lock}  # locks de loops antigos já não servem
+            return lock
+
+    async def bootstrap(self):
+        """Cópia completa do primário (uma ida para o schema, outra para os dados)."""
+        async with self._sync_lock():
+            await self._full_sync()
+
+    async def _full_sync(self) -> int:
+        start = time.perf_counter()
+        (schema,) = await self.primary.batch([{"query": SCHEMA_QUERY}], transactional=False)
+        objects = schema["rows"]
+        existing = {row["name"] for row in objects if row["type"] == "table"}
+        tables = tuple(t for t in self.tables if t in existing)
+        snapshots = tuple(t for t in SNAPSHOT_TABLES if t in existing)
+
+        # Snapshot consistente: bounds e tabelas lidos na mesma transação de leitura
+        results = await self.primary.batch(
+            [{"query": CHANGELOG_BOUNDS_QUERY}]
+            + [{"query": f"SELECT rowid AS _replica_rowid, * FROM {_quote(t)}"} for t in tables + snapshots],
+            read_only=True,
+        )
+        max_seq = results[0]["rows"][0]["max_seq"]
+
+        rows_by_table = dict(zip(tables + snapshots, (r["rows"] for r in results[1:])))
+        await asyncio.to_thread(self._apply_full, objects, rows_by_table, tables, max_seq)
+
+        self._active_tables = tables
+        self.applied_seq = max_seq
+        self.primary_seq = max(self.primary_seq, max_seq)
+        self.bootstrapped = True
+        copied = sum(len(rows) for rows in rows_by_table.values())
+        self.rows_applied += copied
+        self.full_syncs += 1
+        self._record_sync(start)
+        logger.info(f"🛰️ Réplica embarcada copiada: {len(tables)} tabela(s), {copied} linha(s), seq {max_seq}")
+        return copied
+
+    def _apply_full(self, objects: List[Dict[str, Any]], rows_by_table: Dict[str, List[Dict[str, Any]]],
+                    tables: Tuple[str, ...], max_seq: int):
+        virtual = {o["name"] for o in objects if o["sql"].upper().startswith("CREATE VIRTUAL TABLE")}
+        conn = self._connect()
+        try:
+            local = {row["name"] for row in conn.execute("SELECT name FROM sqlite_master")}
+            conn.execute("BEGIN IMMEDIATE")
+            for obj in objects:
+                name = obj["name"]
+                if name in local or name.startswith("trigger_replica_changelog_"):
+                    continue
+                if any(name == v + suffix for v in virtual for suffix in _FTS_SHADOW_SUFFIXES):
+                    continue  # criadas pela própria tabela virtual
+                conn.execute(obj["sql"])
+            conn.execute(REPLICA_STATE_DDL)
+            for table, rows in rows_by_table.items():
+                # DELETE + INSERT (e não REPLACE) para os triggers de FTS rodarem
+                conn.execute(f"DELETE FROM {_quote(table)}")
+                self._insert_rows(conn, table, rows)
+            self._save_state(conn, max_seq, tables)
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _insert_rows(conn: sqlite3.Connection, table: str, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        columns = [c for c in rows[0] if c != "_replica_rowid"]
+        query = (f"INSERT INTO {_quote(table)} (rowid, {', '.join(_quote(c) for c in columns)}) "
+                 f"VALUES (?, {', '.join('?' * len(columns))})")
+        conn.executemany(query, [[row["_replica_rowid"]] + [row[c] for c in columns] for row in rows])
+
+    @staticmethod
+    def _save_state(conn: sqlite3.Connection, applied_seq: int, tables: Tuple[str, ...]):
+        conn.executemany(
+            "INSERT OR REPLACE INTO _replica_state (key, value) VALUES (?, ?)",
+            [("applied_seq", str(applied_seq)), ("tables", ",".join(tables))],
+        )
+
+    async def sync(self) -> int:
+        """
+        Aplicar as mudanças do primário desde o último seq (uma ida ao servidor).
+
+        Returns:
+            Número de linhas reaplicadas (inseridas/atualizadas/removidas)
+        """
+        async with self._sync_lock():
+            try:
+                if not self.bootstrapped:
+                    return await self._full_sync()
+                return await self._incremental_sync()
+            except (LibSQLError, sqlite3.Error, OSError) as e:
+                self.failed_syncs += 1
+                logger.warning(f"⚠️ Sync da réplica falhou: {e}")
+                raise
+
+    async def _incremental_sync(self) -> int:
+        start = time.perf_counter()
+        since = self.applied_seq
+        statements = [{"query": CHANGELOG_BOUNDS_QUERY}]
+        for table in self._active_tables:
+            statements.append({"query": CHANGED_ROWS_QUERY, "params": [since, table]})
+            statements.append({
+                "query": f"SELECT rowid AS _replica_rowid, * FROM {_quote(table)} WHERE rowid IN ({CHANGED_ROWS_QUERY})",
+                "params": [since, table],
+            })
+        results = await self.primary.batch(statements, read_only=True)
+
+        bounds = results[0]["rows"][0]
+        min_seq, max_seq = bounds["min_seq"], bounds["max_seq"]
+        if max_seq < since or (min_seq > since + 1) or max_seq - since > MAX_CHANGES_PER_SYNC:
+            # Change log podado/recriado ou réplica muito atrasada: recopiar
+            logger.info(f"🔁 Réplica fora do change log (seq {since}, primário {min_seq}..{max_seq}): sync completo")
+            return await self._full_sync()
+
+        changes = []
+        for i, table in enumerate(self._active_tables):
+            changed_ids = [row["row_id"] for row in results[1 + 2 * i]["rows"]]
+            if changed_ids:
+                changes.append((table, changed_ids, results[2 + 2 * i]["rows"]))
+
+        applied = 0
+        if changes or max_seq != since:
+            applied = await asyncio.to_thread(self._apply_changes, changes, max_seq)
+        self.applied_seq = max_seq
+        self.primary_seq = max(self.primary_seq, max_seq)
+        self.rows_applied += applied
+        self._record_sync(start)
+        return applied
+
+    def _apply_changes(self, changes: List[Tuple[str, List[int], List[Dict[str, Any]]]], max_seq: int) -> int:
+        conn = self._connect()
+        applied = 0
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for table, changed_ids, rows in changes:
+                for start in range(0, len(changed_ids), 500):
+                    chunk = changed_ids[start:start + 500]
+                    conn.execute(
+                        f"DELETE FROM {_quote(table)} WHERE rowid IN ({', '.join('?' * len(chunk))})", chunk
+                    )
+                self._insert_rows(conn, table, rows)
+                applied += len(changed_ids)
+            self._save_state(conn, max_seq, self._active_tables)
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return applied
+
+    def _record_sync(self, start: float):
+        self.syncs += 1
+        self.last_sync_at = time.time()
+        self.sync_latency.observe((time.perf_counter() - start) * 1000)
+
+    async def start(self) -> "EmbeddedReplica":
+        """Bootstrap (se preciso) e sync periódico em background no loop atual."""
+        if not self.bootstrapped:
+            await self.bootstrap()
+        self.ensure_periodic_sync()
+        return self
+
+    def ensure_periodic_sync(self):
+        """(Re)criar a task de sync periódico no loop atual, se não estiver rodando."""
+        if self.sync_interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._periodic_sync())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is None or task.done():
+            return
+        if task.get_loop() is not asyncio.get_running_loop():
+            # Task de outro loop: só dá para pedir o cancelamento
+            task.get_loop().call_soon_threadsafe(task.cancel)
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _periodic_sync(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except (LibSQLError, sqlite3.Error, OSError):
+                pass  # já contado em failed_syncs; tenta de novo no próximo intervalo
+
+    # ------------------------------------------------------------------
+    # Leituras e escritas
+    # ------------------------------------------------------------------
+
+    def _read_local(self, query: str, params: Sequence[Any]) -> List[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(query, list(params))]
+        finally:
+            conn.close()
+
+    async def read(self, query: str, params: Optional[Sequence[Any]] = None,
+                   session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Ler da réplica local.
+
+        Se a sessão escreveu algo que a réplica ainda não aplicou, sincroniza
+        antes; se não der, lê do primário (nunca devolve dado mais velho que a
+        última escrita da própria sessão).
+        """
+        with self._state_lock:
+            required = self._session_seq.get(session_id, 0) if session_id else 0
+        if not self.bootstrapped or self.applied_seq < required:
+            if self.bootstrapped:
+                self.ryw_waits += 1
+            try:
+                await self.sync()
+            except (LibSQLError, sqlite3.Error, OSError):
+                pass
+
+        if not self.bootstrapped or self.applied_seq < required:
+            self.reads_primary += 1
+            return (await self.primary.execute(query, params))["rows"]
+
+        self.reads_local += 1
+        return await asyncio.to_thread(self._read_local, query, params or [])
+
+    async def write_batch(self, statements: List[Dict[str, Any]],
+                          session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Escrever no primário (uma transação) e registrar o seq para read-your-writes."""
+        results = await self.primary.batch(statements + [{"query": SESSION_SEQ_QUERY}])
+        self.record_session_seq([session_id] if session_id else [], results[-1]["rows"][0]["seq"])
+        if self.sync_on_write and self.bootstrapped:
+            try:
+                await self.sync()
+            except (LibSQLError, sqlite3.Error, OSError):
+                pass  # a leitura da sessão cai no primário até o próximo sync
+        return results[:-1]
+
+    def record_session_seq(self, session_ids: Sequence[str], seq: int):
+        """
+        Registrar escritas feitas fora da réplica (ex.: fila write-behind):
+        leituras dessas sessões passam a esperar a réplica chegar a `seq`.
+        """
+        self.primary_seq = max(self.primary_seq, seq)
+        with self._state_lock:
+            for session_id in session_ids:
+                self._session_seq[session_id] = max(self._session_seq.get(session_id, 0), seq)
+
+    async def write(self, query: str, params: Optional[Sequence[Any]] = None,
+                    session_id: Optional[str] = None) -> Dict[str, Any]:
+        (result,) = await self.write_batch([{"query": query, "params": list(params or [])}], session_id)
+        return result
+
+    def tool_caller(self, session_id: Optional[str] = None):
+        """
+        Adaptador com a assinatura de `call_mcp_turso_tool`: leituras na réplica,
+        escritas no primário (com read-your-writes para `session_id`).
+        """
+
+        async def call(tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+            self.ensure_periodic_sync()
+            try:
+                if tool_name == "execute_read_only_query":
+                    rows = await self.read(params["query"], params.get("params"), session_id)
+                    return {"success": True, "rows": rows, "columns": list(rows[0]) if rows else []}
+                if tool_name in ("execute_query", "execute_batch"):
+                    statements = params["statements"] if tool_name == "execute_batch" else [params]
+                    results = [
+                        {
+                            "rows": r["rows"],
+                            "columns": r["columns"],
+                            "lastInsertId": r["last_insert_rowid"],
+                            "rowsAffected": r["affected_row_count"],
+                        }
+                        for r in await self.write_batch(statements, session_id)
+                    ]
+                    if tool_name == "execute_batch":
+                        return {"success": True, "results": results}
+                    return {"success": True, **results[0]}
+            except LibSQLError as e:
+                return {"success": False, "error": str(e), "failed_statement": e.step}
+            return {"success": False, "error": "Ferramenta não implementada"}
+
+        return call
+
+    # ------------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        """Lag da réplica (em mudanças e em segundos desde o último sync) e contadores."""
+        staleness = time.time() - self.last_sync_at if self.last_sync_at else None
+        return {
+            "bootstrapped": self.bootstrapped,
+            "applied_seq": self.applied_seq,
+            "primary_seq": self.primary_seq,
+            "lag_changes": max(self.primary_seq - self.applied_seq, 0),
+            "staleness_seconds": round(staleness, 3) if staleness is not None else None,
+            "syncs": self.syncs,
+            "failed_syncs": self.failed_syncs,
+            "full_syncs": self.full_syncs,
+            "rows_applied": self.rows_applied,
+            "reads_local": self.reads_local,
+            "reads_primary": self.reads_primary,
+            "ryw_waits": self.ryw_waits,
+            "sync_latency": self.sync_latency.to_dict(),
+        }
+
+
+_replicas: Dict[Tuple[str, str], EmbeddedReplica] = {}
+_replicas_lock = threading.Lock()
+
+
+def get_embedded_replica(primary: LibSQLClient, replica_path: str, sync_interval: float = 1.0) -> EmbeddedReplica:
+    """Réplica compartilhada do processo para (URL do primário, arquivo local)."""
+    key = (primary.url, os.path.abspath(replica_path))
+    with _replicas_lock:
+        replica = _replicas.get(key)
+        if replica is None:
+            replica = EmbeddedReplica(primary, replica_path, sync_interval=sync_interval)
+            _replicas[key] = replica
+        return replica
+
+
+async def stop_embedded_replicas():
+    """Parar o sync periódico de todas as réplicas compartilhadas (shutdown)."""
+    with _replicas_lock:
+        replicas = list(_replicas.values())
+    for replica in replicas:
+        await replica.stop()
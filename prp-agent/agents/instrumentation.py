@@ -0,0 +1,323 @@
+"""
+Instrumentação gen_ai compartilhada (padrões Sentry AI Agents).
+
+Um só lugar para os spans que antes eram copiados em cada app:
+
+- `invoke_agent_span`: `gen_ai.invoke_agent` (abre uma transação se não houver)
+- `chat_span`: `gen_ai.chat`
+- `execute_tool_span` / `@traced_tool`: `gen_ai.execute_tool`
+- `db_span`: `db` (consultas ao context-memory)
+- `GenAIInstrumentedModel`: modelo PydanticAI que abre um `gen_ai.chat` por
+  requisição ao LLM
+
+Ferramentas, consultas e tokens também alimentam as métricas de
+agents/openmetrics.py, sempre (mesmo sem trace amostrado).
+
+Custo baixo quando não há o que gravar: desligado (`GEN_AI_INSTRUMENTATION=false`
+ou `configure(False)`), ou sem span pai amostrado, os context managers entregam
+um span no-op e os decorators chamam a função direto. Os spans filhos rodam em
+um scope Sentry próprio, então chamadas concorrentes (ferramentas em paralelo,
+consultas com gather) continuam filhas do span certo.
+"""
+
+import functools
+import inspect
+import os
+import re
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import sentry_sdk
+from pydantic_ai.messages import ModelMessagesTypeAdapter, ModelResponse
+from pydantic_ai.models.wrapper import WrapperModel
+
+from .openmetrics import DB_QUERY_SECONDS, record_tokens, record_tool
+from .sentry_sampling import set_payload
+from .traffic_replay import current_session
+
+_enabled = os.getenv("GEN_AI_INSTRUMENTATION", "true").lower() not in ("0", "false", "no")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+MAX_DB_SPAN_NAME = 200
+
+
+def configure(enabled: bool):
+    """Ligar/desligar a instrumentação (desligada = no-op)."""
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+class _NoOpSpan:
+    """Span que ignora tudo (instrumentação desligada ou trace não amostrado)."""
+
+    sampled = False
+
+    def set_data(self, key: str, value: Any):
+        pass
+
+    def set_status(self, status: str):
+        pass
+
+
+NOOP_SPAN = _NoOpSpan()
+
+
+def _recording_parent():
+    """Span atual, se ele for enviado ao Sentry; senão None."""
+    span = sentry_sdk.get_current_span()
+    return span if span is not None and span.sampled else None
+
+
+@contextmanager
+def _child_span(op: str, name: str) -> Iterator[Any]:
+    if not _enabled or _recording_parent() is None:
+        yield NOOP_SPAN
+        return
+    # Scope próprio: tasks concorrentes compartilham o scope do request
+    with sentry_sdk.new_scope(), sentry_sdk.start_span(op=op, name=name) as span:
+        yield span
+
+
+def _set_request_data(span, system: str, model: str, operation: str,
+                      temperature: Optional[float], max_tokens: Optional[int]):
+    # Common Span Attributes - REQUIRED
+    span.set_data("gen_ai.system", system)
+    span.set_data("gen_ai.request.model", model)
+    span.set_data("gen_ai.operation.name", operation)
+    if temperature is not None:
+        span.set_data("gen_ai.request.temperature", temperature)
+    if max_tokens is not None:
+        span.set_data("gen_ai.request.max_tokens", max_tokens)
+
+
+@contextmanager
+def invoke_agent_span(
+    agent_name: str,
+    model: str,
+    system: str = "openai",
+    messages: Any = None,
+    available_tools: Optional[List[Dict[str, Any]]] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+) -> Iterator[Any]:
+    """
+    INVOKE AGENT SPAN - op "gen_ai.invoke_agent", nome "invoke_agent {agent_name}".
+
+    Fora de uma transação (CLI, scripts) abre a própria transação, se o
+    Sentry estiver inicializado.
+    """
+    if not _enabled:
+        yield NOOP_SPAN
+        return
+
+    parent = sentry_sdk.get_current_span()
+    name = f"invoke_agent {agent_name}"
+    if parent is None and sentry_sdk.get_client().is_active():
+        manager = sentry_sdk.start_transaction(op="gen_ai.invoke_agent", name=name)
+    elif parent is not None and parent.sampled:
+        manager = sentry_sdk.start_span(op="gen_ai.invoke_agent", name=name)
+    else:
+        yield NOOP_SPAN
+        return
+
+    with manager as span:
+        _set_request_data(span, system, model, "invoke_agent", temperature, max_tokens)
+        span.set_data("gen_ai.agent.name", agent_name)
+        if available_tools is not None:
+            set_payload(span, "gen_ai.request.available_tools", available_tools)
+        if messages is not None:
+            set_payload(span, "gen_ai.request.messages", messages)
+        yield span
+
+
+@contextmanager
+def chat_span(
+    model: str,
+    system: str = "openai",
+    messages: Any = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    operation: str = "chat",
+) -> Iterator[Any]:
+    """AI CLIENT SPAN - op "gen_ai.{operation}", nome "{operation} {model}"."""
+    with _child_span(f"gen_ai.{operation}", f"{operation} {model}") as span:
+        if span is not NOOP_SPAN:
+            _set_request_data(span, system, model, operation, temperature, max_tokens)
+            if messages is not None:
+                set_payload(span, "gen_ai.request.messages", messages)
+        yield span
+
+
+@contextmanager
+def execute_tool_span(
+    tool_name: str,
+    description: Optional[str] = None,
+    model: Optional[str] = None,
+    system: Optional[str] = None,
+    tool_input: Any = None,
+    tool_type: str = "function",
+) -> Iterator[Any]:
+    """
+    EXECUTE TOOL SPAN - op "gen_ai.execute_tool", nome "execute_tool {tool_name}".
+
+    Conta a chamada em prp_tool_calls_total (erro: exceção ou span com
+    status internal_error).
+    """
+    start = time.perf_counter()
+    error = True
+    try:
+        with _child_span("gen_ai.execute_tool", f"execute_tool {tool_name}") as span:
+            if span is not NOOP_SPAN:
+                if system is not None:
+                    span.set_data("gen_ai.system", system)
+                if model is not None:
+                    span.set_data("gen_ai.request.model", model)
+                span.set_data("gen_ai.tool.name", tool_name)
+                span.set_data("gen_ai.tool.type", tool_type)
+                if description:
+                    span.set_data("gen_ai.tool.description", description)
+                if tool_input is not None:
+                    set_payload(span, "gen_ai.tool.input", tool_input)
+            yield span
+            error = getattr(span, "status", None) == "internal_error"
+    finally:
+        record_tool(tool_name, time.perf_counter() - start, error)
+
+
+@contextmanager
+def db_span(statement: str, system: str = "sqlite") -> Iterator[Any]:
+    """Span "db" de uma consulta; o nome é o SQL (espaços colapsados)."""
+    start = time.perf_counter()
+    try:
+        if not _enabled or _recording_parent() is None:
+            yield NOOP_SPAN
+            return
+        name = _WHITESPACE_RE.sub(" ", statement).strip()[:MAX_DB_SPAN_NAME]
+        with _child_span("db", name) as span:
+            span.set_data("db.system", system)
+            yield span
+    finally:
+        DB_QUERY_SECONDS.labels(system).observe(time.perf_counter() - start)
+
+
+def record_usage(span, input_tokens: Optional[int], output_tokens: Optional[int],
+                 total_tokens: Optional[int] = None, model: Optional[str] = None):
+    """
+    Token usage (gen_ai.usage.*). Com `model`, soma também em
+    prp_llm_tokens_total (passe só no nível da chamada ao LLM, para não contar duas vezes).
+    """
+    if model is not None:
+        record_tokens(model, input_tokens, output_tokens)
+    if span is NOOP_SPAN:
+        return
+    if input_tokens is not None:
+        span.set_data("gen_ai.usage.input_tokens", input_tokens)
+    if output_tokens is not None:
+        span.set_data("gen_ai.usage.output_tokens", output_tokens)
+    if total_tokens is None and input_tokens is not None and output_tokens is not None:
+        total_tokens = input_tokens + output_tokens
+    if total_tokens is not None:
+        span.set_data("gen_ai.usage.total_tokens", total_tokens)
+
+
+def record_response(span, text: Any = None, tool_calls: Optional[List[Dict[str, Any]]] = None):
+    """Response data (gen_ai.response.*)."""
+    if span is NOOP_SPAN:
+        return
+    if text is not None:
+        set_payload(span, "gen_ai.response.text", text if isinstance(text, list) else [text])
+    if tool_calls:
+        set_payload(span, "gen_ai.response.tool_calls", tool_calls)
+
+
+def _is_error_result(result: Any) -> bool:
+    return isinstance(result, str) and result.startswith("❌")
+
+
+def traced_tool(func: Optional[Callable] = None, *, name: Optional[str] = None,
+                description: Optional[str] = None):
+    """
+    Decorator de ferramenta async: cada chamada vira um `gen_ai.execute_tool`.
+
+    Mantém assinatura e docstring (o PydanticAI gera o schema da ferramenta a
+    partir delas). O argumento `ctx` não entra no input do span; retornos
+    "❌ ..." (convenção de erro das ferramentas) marcam o span com erro.
+    Com uma sessão de agents/traffic_replay.py ativa, a chamada também é gravada.
+    """
+
+    def decorate(func: Callable) -> Callable:
+        tool_name = name or func.__name__
+        tool_description = description or (inspect.getdoc(func) or "").split("\n")[0]
+        signature = inspect.signature(func)
+
+        def tool_arguments(args, kwargs) -> Dict[str, Any]:
+            arguments = signature.bind_partial(*args, **kwargs).arguments
+            return {key: value for key, value in arguments.items() if key != "ctx"}
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            traffic = current_session()
+            if traffic is None:
+                return await traced(*args, **kwargs)
+            offset = traffic.offset()
+            start = time.perf_counter()
+            result = None
+            try:
+                result = await traced(*args, **kwargs)
+                return result
+            finally:
+                traffic.tool_step(tool_name, offset, time.perf_counter() - start,
+                                  tool_arguments(args, kwargs), result, result is None or _is_error_result(result))
+
+        async def traced(*args, **kwargs):
+            if not _enabled or _recording_parent() is None:
+                start = time.perf_counter()
+                error = True
+                try:
+                    result = await func(*args, **kwargs)
+                    error = _is_error_result(result)
+                    return result
+                finally:
+                    record_tool(tool_name, time.perf_counter() - start, error)
+
+            tool_input = tool_arguments(args, kwargs)
+            with execute_tool_span(tool_name, description=tool_description, tool_input=tool_input) as span:
+                result = await func(*args, **kwargs)
+                set_payload(span, "gen_ai.tool.output", result)
+                if _is_error_result(result):
+                    span.set_status("internal_error")
+                return result
+
+        return wrapper
+
+    return decorate(func) if func is not None else decorate
+
+
+class GenAIInstrumentedModel(WrapperModel):
+    """Modelo PydanticAI com um span `gen_ai.chat` por requisição ao LLM."""
+
+    async def request(self, messages, model_settings, model_request_parameters) -> ModelResponse:
+        settings = model_settings or {}
+        with chat_span(
+            self.model_name,
+            system=self.system,
+            messages=lambda: ModelMessagesTypeAdapter.dump_python(messages, mode="json"),
+            temperature=settings.get("temperature"),
+            max_tokens=settings.get("max_tokens"),
+        ) as span:
+            response = await self.wrapped.request(messages, model_settings, model_request_parameters)
+            usage = response.usage
+            record_usage(span, usage.request_tokens, usage.response_tokens, usage.total_tokens,
+                         model=self.model_name)
+            tool_calls = [
+                {"name": part.tool_name, "type": "function_call", "arguments": part.args_as_json_str()}
+                for part in response.parts if part.part_kind == "tool-call"
+            ]
+            texts = [part.content for part in response.parts if part.part_kind == "text"]
+            record_response(span, texts or None, tool_calls)
+            return response
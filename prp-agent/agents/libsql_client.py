@@ -0,0 +1,292 @@
+"""
+Cliente HTTP do libSQL/Turso (protocolo Hrana sobre HTTP, `/v2/pipeline`).
+
+Cada chamada de `pipeline` é uma única requisição HTTP (uma ida ao servidor),
+com qualquer número de `execute`/`batch` dentro. `batch` monta os passos
+condicionais (BEGIN → statements → COMMIT, ROLLBACK se algo falhar), então um
+lote transacional também custa uma só ida.
+
+O mesmo cliente fala com o Turso real (`libsql://...` + token) e com o
+stand-in local `agents.libsql_standin`, usado nos testes e benchmarks.
+
+Um cliente por (URL, token) no processo (`get_libsql_client`); o
+`httpx.AsyncClient` interno é recriado a cada event loop e o anterior é
+fechado. `close_libsql_clients` fecha os do loop atual no shutdown.
+"""
+
+import asyncio
+import base64
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_PATH = "/v2/pipeline"
+
+
+class LibSQLError(Exception):
+    """Erro devolvido pelo servidor libSQL para um statement ou passo de lote."""
+
+    def __init__(self, message: str, code: Optional[str] = None, step: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+        self.step = step
+
+
+def encode_value(value: Any) -> Dict[str, Any]:
+    """Valor Python → valor Hrana (inteiros vão como texto, para não perder precisão)."""
+    if value is None:
+        return {"type": "null"}
+    if isinstance(value, bool):
+        return {"type": "integer", "value": str(int(value))}
+    if isinstance(value, int):
+        return {"type": "integer", "value": str(value)}
+    if isinstance(value, float):
+        return {"type": "float", "value": value}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"type": "blob", "base64": base64.b64encode(bytes(value)).decode("ascii")}
+    return {"type": "text", "value": str(value)}
+
+
+def decode_value(value: Dict[str, Any]) -> Any:
+    """Valor Hrana → valor Python."""
+    kind = value.get("type")
+    if kind == "null":
+        return None
+    if kind == "integer":
+        return int(value["value"])
+    if kind == "float":
+        return float(value["value"])
+    if kind == "blob":
+        return base64.b64decode(value["base64"])
+    return value.get("value")
+
+
+def statement(sql: str, args: Optional[Sequence[Any]] = None) -> Dict[str, Any]:
+    """Statement Hrana com argumentos posicionais."""
+    return {"sql": sql, "args": [encode_value(a) for a in (args or [])], "want_rows": True}
+
+
+def decode_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """StmtResult Hrana → colunas, linhas como dicts, linhas afetadas e último id."""
+    columns = [col.get("name") for col in result.get("cols", [])]
+    rows = [
+        {name: decode_value(cell) for name, cell in zip(columns, row)}
+        for row in result.get("rows", [])
+    ]
+    last_insert_rowid = result.get("last_insert_rowid")
+    return {
+        "columns": columns,
+        "rows": rows,
+        "affected_row_count": result.get("affected_row_count", 0),
+        "last_insert_rowid": int(last_insert_rowid) if last_insert_rowid is not None else None,
+    }
+
+
+def transactional_steps(statements: List[Dict[str, Any]], read_only: bool = False) -> List[Dict[str, Any]]:
+    """
+    Passos de um lote atômico: BEGIN, statements encadeados por condição `ok`,
+    COMMIT e um ROLLBACK que só roda se o COMMIT não tiver rodado com sucesso.
+
+    Escritas abrem com BEGIN IMMEDIATE (lock de escrita já no início); leituras
+    (`read_only`) com BEGIN DEFERRED: um snapshot consistente sem o lock de escrita.
+    """
+    steps = [{"stmt": {"sql": "BEGIN DEFERRED" if read_only else "BEGIN IMMEDIATE"}}]
+    for stmt in statements:
+        steps.append({"stmt": stmt, "condition": {"type": "ok", "step": len(steps) - 1}})
+    commit_step = len(steps)
+    steps.append({"stmt": {"sql": "COMMIT"}, "condition": {"type": "ok", "step": commit_step - 1}})
+    steps.append({
+        "stmt": {"sql": "ROLLBACK"},
+        "condition": {"type": "not", "cond": {"type": "ok", "step": commit_step}},
+    })
+    return steps
+
+
+class LibSQLClient:
+    """Cliente assíncrono do pipeline HTTP do libSQL."""
+
+    def __init__(
+        self,
+        url: str,
+        auth_token: str = "",
+        timeout: float = 10.0,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
+        # libsql:// é o esquema das URLs do Turso; via HTTP é sempre https
+        if url.startswith("libsql://"):
+            url = "https://" + url[len("libsql://"):]
+        self.url = url.rstrip("/")
+        self.auth_token = auth_token
+        self.timeout = timeout
+        self._http = http_client
+        self._owns_http = http_client is None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.round_trips = 0
+
+    def _client(self) -> httpx.AsyncClient:
+        """Cliente HTTP do event loop atual (as conexões do httpx ficam presas ao loop)."""
+        if not self._owns_http:
+            return self._http
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._loop is not loop:
+            self._release_stale_client()
+            headers = {"Authorization": f"Bearer {self.auth_token}"} if self.auth_token else {}
+            self._http = httpx.AsyncClient(timeout=self.timeout, headers=headers)
+            self._loop = loop
+        return self._http
+
+    def _release_stale_client(self):
+        """Fechar o cliente HTTP de outro event loop (só dá para fechá-lo no próprio loop)."""
+        stale, loop = self._http, self._loop
+        self._http = self._loop = None
+        if stale is None or stale.is_closed:
+            return
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(stale.aclose(), loop)
+        else:
+            # Loop já encerrado: os transports morreram com ele (feche antes, com close_libsql_clients)
+            logger.debug(f"Cliente HTTP do libSQL descartado sem aclose (loop encerrado): {self.url}")
+
+    async def pipeline(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Enviar uma lista de requisições Hrana em uma única ida ao servidor."""
+        self.round_trips += 1
+        response = await self._client().post(
+            self.url + PIPELINE_PATH,
+            json={"baton": None, "requests": requests + [{"type": "close"}]},
+        )
+        if response.status_code != 200:
+            raise LibSQLError(f"HTTP {response.status_code}: {response.text[:200]}")
+        return response.json()["results"][:-1]
+
+    async def execute(self, sql: str, args: Optional[Sequence[Any]] = None) -> Dict[str, Any]:
+        """Executar um statement (uma ida ao servidor)."""
+        (result,) = await self.pipeline([{"type": "execute", "stmt": statement(sql, args)}])
+        if result["type"] == "error":
+            error = result["error"]
+            raise LibSQLError(error.get("message", ""), error.get("code"))
+        return decode_result(result["response"]["result"])
+
+    async def batch(
+        self,
+        statements: List[Dict[str, Any]],
+        transactional: bool = True,
+        read_only: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Executar vários statements em uma ida ao servidor.
+
+        Args:
+            statements: {"query": sql, "params": [...]} (mesmo formato das ferramentas MCP)
+            transactional: envolver em BEGIN/COMMIT (tudo ou nada)
+            read_only: lote só de leituras (BEGIN DEFERRED, sem o lock de escrita)
+
+        Returns:
+            Resultado decodificado de cada statement, na ordem
+
+        Raises:
+            LibSQLError: com `step` = índice do statement que falhou
+        """
+        stmts = [statement(s["query"], s.get("params")) for s in statements]
+        if transactional:
+            steps, offset = transactional_steps(stmts, read_only), 1
+        else:
+            steps, offset = [{"stmt": stmt} for stmt in stmts], 0
+
+        (result,) = await self.pipeline([{"type": "batch", "batch": {"steps": steps}}])
+        if result["type"] == "error":
+            error = result["error"]
+            raise LibSQLError(error.get("message", ""), error.get("code"))
+
+        batch_result = result["response"]["result"]
+        step_results = batch_result["step_results"]
+        for index, error in enumerate(batch_result["step_errors"][offset:offset + len(stmts)]):
+            if error is not None:
+                raise LibSQLError(error.get("message", ""), error.get("code"), step=index)
+        if transactional and step_results[len(stmts) + 1] is None:
+            raise LibSQLError("COMMIT não executado", step=len(stmts))
+        return [decode_result(r) for r in step_results[offset:offset + len(stmts)]]
+
+    async def close(self):
+        if not self._owns_http or self._http is None:
+            return
+        if self._loop is not asyncio.get_running_loop():
+            self._release_stale_client()
+            return
+        http, self._http, self._loop = self._http, None, None
+        await http.aclose()
+
+    async def __aenter__(self) -> "LibSQLClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+_clients: Dict[Tuple[str, str], LibSQLClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_libsql_client(url: str, auth_token: str = "") -> LibSQLClient:
+    """Cliente compartilhado do processo para (URL, token): um pool de conexões por primário."""
+    key = (url, auth_token)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = LibSQLClient(url, auth_token)
+            _clients[key] = client
+        return client
+
+
+async def close_libsql_clients():
+    """Fechar as conexões HTTP dos clientes compartilhados (shutdown do event loop)."""
+    with _clients_lock:
+        clients = list(_clients.values())
+    for client in clients:
+        await client.close()
+
+
+def mcp_tool_caller(client: LibSQLClient):
+    """
+    Adaptador com a assinatura de `call_mcp_turso_tool` (real_mcp_integration.py):
+    as ferramentas MCP viram requisições ao pipeline HTTP do libSQL.
+    """
+
+    async def call(tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            if tool_name in ("execute_query", "execute_read_only_query"):
+                result = await client.execute(params["query"], params.get("params"))
+                return {
+                    "success": True,
+                    "rows": result["rows"],
+                    "columns": result["columns"],
+                    "lastInsertId": result["last_insert_rowid"],
+                    "rowsAffected": result["affected_row_count"],
+                }
+            if tool_name == "execute_batch":
+                results = await client.batch(
+                    params["statements"], transactional=params.get("transaction", "write") is not None
+                )
+                return {
+                    "success": True,
+                    "results": [
+                        {
+                            "rows": r["rows"],
+                            "columns": r["columns"],
+                            "lastInsertId": r["last_insert_rowid"],
+                            "rowsAffected": r["affected_row_count"],
+                        }
+                        for r in results
+                    ],
+                }
+        except LibSQLError as e:
+            return {"success": False, "error": str(e), "failed_statement": e.step}
+        except httpx.HTTPError as e:
+            logger.error(f"❌ libSQL indisponível: {e}")
+            return {"success": False, "error": str(e)}
+        return {"success": False, "error": "Ferramenta não implementada"}
+
+    return call
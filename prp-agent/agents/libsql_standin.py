@@ -0,0 +1,225 @@
+"""
+Stand-in local do servidor libSQL/Turso (subconjunto do Hrana sobre HTTP).
+
+Implementa o que o agente usa de `POST /v2/pipeline` — requisições `execute`,
+`batch` (com condições ok/error/not/and/or/is_autocommit) e `close` — sobre um
+arquivo SQLite, com latência injetada por requisição para simular o RTT até o
+Turso. Só usa a stdlib, então roda em testes e benchmarks sem rede.
+
+Limitações conhecidas: não há streams entre requisições (o `baton` volta
+sempre nulo e transação aberta no fim de um pipeline é desfeita), nem
+`sequence`, `describe` ou `store_sql`.
+
+Uso:
+    python -m agents.libsql_standin --db ../context-memory.db --port 8080 --latency-ms 20
+"""
+
+import argparse
+import json
+import socket
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from .libsql_client import PIPELINE_PATH, decode_value, encode_value
+
+
+def _stmt_args(stmt: Dict[str, Any]):
+    named = stmt.get("named_args") or []
+    if named:
+        return {arg["name"].lstrip(":@$"): decode_value(arg["value"]) for arg in named}
+    return [decode_value(arg) for arg in stmt.get("args") or []]
+
+
+def _error(e: Exception) -> Dict[str, Any]:
+    return {"message": str(e), "code": getattr(e, "sqlite_errorname", None) or "SQLITE_ERROR"}
+
+
+class LibSQLStandIn:
+    """Servidor HTTP do pipeline libSQL sobre um banco SQLite local."""
+
+    def __init__(
+        self,
+        db_path: str,
+        latency_ms: float = 0.0,
+        auth_token: str = "",
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.db_path = db_path
+        self.latency_ms = latency_ms
+        self.auth_token = auth_token
+        # Uma conexão serializada, como o primário single-writer do libSQL
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+        self.requests = 0
+        self.statements = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "LibSQLStandIn":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, name="libsql-standin", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._conn.close()
+
+    def __enter__(self) -> "LibSQLStandIn":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # ------------------------------------------------------------------
+    # Protocolo
+    # ------------------------------------------------------------------
+
+    def _execute(self, stmt: Dict[str, Any]) -> Dict[str, Any]:
+        self.statements += 1
+        cursor = self._conn.execute(stmt["sql"], _stmt_args(stmt))
+        rows = cursor.fetchall() if stmt.get("want_rows", True) else []
+        return {
+            "cols": [{"name": c[0], "decltype": None} for c in cursor.description or []],
+            "rows": [[encode_value(v) for v in row] for row in rows],
+            "affected_row_count": max(cursor.rowcount, 0),
+            "last_insert_rowid": str(cursor.lastrowid) if cursor.lastrowid is not None else None,
+        }
+
+    def _condition(self, cond: Optional[Dict[str, Any]], results: List, errors: List) -> bool:
+        if cond is None:
+            return True
+        kind = cond["type"]
+        if kind == "ok":
+            return results[cond["step"]] is not None
+        if kind == "error":
+            return errors[cond["step"]] is not None
+        if kind == "not":
+            return not self._condition(cond["cond"], results, errors)
+        if kind == "and":
+            return all(self._condition(c, results, errors) for c in cond["conds"])
+        if kind == "or":
+            return any(self._condition(c, results, errors) for c in cond["conds"])
+        if kind == "is_autocommit":
+            return not self._conn.in_transaction
+        raise ValueError(f"Condição não suportada: {kind}")
+
+    def _batch(self, steps: List[Dict[str, Any]]) -> Dict[str, Any]:
+        results: List[Optional[Dict[str, Any]]] = []
+        errors: List[Optional[Dict[str, Any]]] = []
+        for step in steps:
+            result = error = None
+            if self._condition(step.get("condition"), results, errors):
+                try:
+                    result = self._execute(step["stmt"])
+                except sqlite3.Error as e:
+                    error = _error(e)
+            results.append(result)
+            errors.append(error)
+        return {"step_results": results, "step_errors": errors}
+
+    def handle_pipeline(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Executar as requisições de um pipeline (serializadas na conexão)."""
+        results = []
+        with self._lock:
+            for request in body.get("requests", []):
+                kind = request.get("type")
+                try:
+                    if kind == "execute":
+                        response = {"type": "execute", "result": self._execute(request["stmt"])}
+                    elif kind == "batch":
+                        response = {"type": "batch", "result": self._batch(request["batch"]["steps"])}
+                    elif kind == "close":
+                        response = {"type": "close"}
+                    else:
+                        raise ValueError(f"Requisição não suportada: {kind}")
+                    results.append({"type": "ok", "response": response})
+                except (sqlite3.Error, ValueError, KeyError) as e:
+                    results.append({"type": "error", "error": _error(e)})
+            # Sem streams: nada de transação pendurada entre requisições
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+        return {"baton": None, "base_url": None, "results": results}
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive como o Turso; sem Nagle para não somar ~40ms de ACK atrasado
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def _send(self, status: int, payload: Any):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path in ("/health", "/v2"):
+                    self._send(200, {"status": "ok"})
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def do_POST(self):
+                if self.path != PIPELINE_PATH:
+                    self._send(404, {"error": "not found"})
+                    return
+                if standin.auth_token and self.headers.get("Authorization") != f"Bearer {standin.auth_token}":
+                    self._send(401, {"error": "Unauthorized"})
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                standin.requests += 1
+                if standin.latency_ms:
+                    time.sleep(standin.latency_ms / 1000)
+                self._send(200, standin.handle_pipeline(body))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    """CLI para subir o stand-in."""
+    parser = argparse.ArgumentParser(description="Stand-in local do libSQL/Turso (HTTP pipeline)")
+    parser.add_argument("--db", required=True, help="Banco SQLite")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latência injetada por requisição")
+    parser.add_argument("--auth-token", default="", help="Exigir Authorization: Bearer <token>")
+    args = parser.parse_args()
+
+    standin = LibSQLStandIn(args.db, args.latency_ms, args.auth_token, args.host, args.port).start()
+    print(f"🛰️ Stand-in libSQL em {standin.url} (banco {args.db}, latência {args.latency_ms}ms)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        standin.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Métricas de execução das ferramentas do agente PRP.
+
+Este módulo coleta, por ferramenta MCP, contagem de chamadas e erros, histograma
+de latência (p50/p95/p99), bytes retornados e a divisão entre tempo de banco e
+tempo de LLM. Quando desabilitado, o rastreamento vira um no-op.
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from .instrumentation import db_span
+
+logger = logging.getLogger(__name__)
+
+# Limites superiores dos buckets de latência (ms)
+LATENCY_BUCKETS_MS: Tuple[float, ...] = (
+    1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000
+)
+
+# Acumulador de fases (db/llm) da chamada de ferramenta corrente
+_current_phases: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "prp_tool_phases", default=None
+)
+
+
+def record_phase(phase: str, seconds: float):
+    """Somar tempo gasto em uma fase (ex: "db") à chamada de ferramenta corrente."""
+    phases = _current_phases.get()
+    if phases is not None:
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+class LatencyHistogram:
+    """Histograma de latência com buckets fixos e percentis aproximados."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # último bucket = +Inf
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        """Registrar uma observação."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q: float) -> float:
+        """Estimar o percentil q (0-100) por interpolação linear dentro do bucket."""
+        if not self.count:
+            return 0.0
+
+        rank = q / 100 * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if not bucket_count:
+                continue
+            if cumulative + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                fraction = (rank - cumulative) / bucket_count
+                estimate = lower + (upper - lower) * fraction
+                return min(max(estimate, self.min), self.max)
+            cumulative += bucket_count
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.mean, 3),
+            "min_ms": round(self.min or 0.0, 3),
+            "max_ms": round(self.max or 0.0, 3),
+            "p50_ms": round(self.percentile(50), 3),
+            "p95_ms": round(self.percentile(95), 3),
+            "p99_ms": round(self.percentile(99), 3),
+            "buckets": {
+                **{str(b): c for b, c in zip(self.buckets, self.counts)},
+                "+Inf": self.counts[-1],
+            },
+        }
+
+
+class ToolMetrics:
+    """Métricas agregadas de uma ferramenta."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.bytes_returned = 0
+        self.db_time_ms = 0.0
+        self.llm_time_ms = 0.0
+        self.latency = LatencyHistogram()
+        self._lock = threading.Lock()
+
+    def record(self, elapsed_ms: float, error: bool, bytes_returned: int,
+               db_ms: float, llm_ms: float):
+        with self._lock:
+            self.calls += 1
+            self.errors += int(error)
+            self.bytes_returned += bytes_returned
+            self.db_time_ms += db_ms
+            self.llm_time_ms += llm_ms
+            self.latency.observe(elapsed_ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "error_rate": round(self.errors / self.calls, 4) if self.calls else 0.0,
+                "bytes_returned": self.bytes_returned,
+                "avg_bytes": round(self.bytes_returned / self.calls, 1) if self.calls else 0.0,
+                "db_time_ms": round(self.db_time_ms, 3),
+                "llm_time_ms": round(self.llm_time_ms, 3),
+                "latency": self.latency.to_dict(),
+            }
+
+
+class _ToolCall:
+    """Chamada em andamento; use `bytes_returned` e `mark_error()` antes de sair."""
+
+    __slots__ = ("_collector", "_tool_name", "_llm_bound", "_start", "_phases", "_token",
+                 "bytes_returned", "error")
+
+    def __init__(self, collector: "ToolMetricsCollector", tool_name: str, llm_bound: bool):
+        self._collector = collector
+        self._tool_name = tool_name
+        self._llm_bound = llm_bound
+        self.bytes_returned = 0
+        self.error = False
+
+    def mark_error(self):
+        self.error = True
+
+    def __enter__(self):
+        self._phases = {}
+        self._token = _current_phases.set(self._phases)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed_ms = (time.perf_counter() - self._start) * 1000
+        _current_phases.reset(self._token)
+
+        db_ms = self._phases.get("db", 0.0) * 1000
+        if "llm" in self._phases:
+            llm_ms = self._phases["llm"] * 1000
+        elif self._llm_bound:
+            # Ferramentas conversacionais: o que não foi banco é tempo de LLM
+            llm_ms = max(elapsed_ms - db_ms, 0.0)
+        else:
+            llm_ms = 0.0
+
+        self._collector._tool(self._tool_name).record(
+            elapsed_ms, self.error or exc_type is not None, self.bytes_returned, db_ms, llm_ms
+        )
+        return False
+
+
+class _NullToolCall:
+    """
+    Chamada no-op usada quando as métricas estão desabilitadas.
+
+    Uma instância só, compartilhada por chamadas concorrentes: não guarda
+    estado (`bytes_returned` aceita escrita e descarta; leitura dá os padrões).
+    """
+
+    __slots__ = ()
+
+    @property
+    def bytes_returned(self) -> int:
+        return 0
+
+    @bytes_returned.setter
+    def bytes_returned(self, value: int):
+        pass
+
+    @property
+    def error(self) -> bool:
+        return False
+
+    def mark_error(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_CALL = _NullToolCall()
+
+
+class ToolMetricsCollector:
+    """Coletor de métricas por ferramenta MCP."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.started_at = datetime.now().isoformat()
+        self._tools: Dict[str, ToolMetrics] = {}
+        self._lock = threading.Lock()
+
+    def _tool(self, name: str) -> ToolMetrics:
+        metrics = self._tools.get(name)
+        if metrics is None:
+            with self._lock:
+                metrics = self._tools.setdefault(name, ToolMetrics(name))
+        return metrics
+
+    def track(self, tool_name: str, llm_bound: bool = False):
+        """
+        Rastrear uma chamada de ferramenta.
+
+        Args:
+            tool_name: Nome da ferramenta MCP
+            llm_bound: Se o tempo fora do banco deve ser contabilizado como LLM
+
+        Returns:
+            Context manager com `bytes_returned` e `mark_error()`
+        """
+        if not self.enabled:
+            return _NULL_CALL
+        return _ToolCall(self, tool_name, llm_bound)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Obter snapshot serializável das métricas."""
+        with self._lock:
+            tools = dict(self._tools)
+        return {
+            "enabled": self.enabled,
+            "started_at": self.started_at,
+            "generated_at": datetime.now().isoformat(),
+            "tools": {name: metrics.to_dict() for name, metrics in sorted(tools.items())},
+        }
+
+    def reset(self):
+        """Limpar todas as métricas."""
+        with self._lock:
+            self._tools.clear()
+            self.started_at = datetime.now().isoformat()
+
+    def format_report(self) -> str:
+        """Formatar métricas como texto para a ferramenta `prp_metrics`."""
+        if not self.enabled:
+            return "📊 Métricas desabilitadas (MCP_METRICS_ENABLED=false)."
+
+        snapshot = self.snapshot()
+        if not snapshot["tools"]:
+            return "📊 Nenhuma chamada de ferramenta registrada ainda."
+
+        response = f"📊 **Métricas das ferramentas MCP** (desde {snapshot['started_at']})\n\n"
+        for name, data in snapshot["tools"].items():
+            latency = data["latency"]
+            response += f"**{name}**\n"
+            response += f"Chamadas: {data['calls']}, Erros: {data['errors']} ({data['error_rate']:.1%})\n"
+            response += (
+                f"Latência: p50 {latency['p50_ms']:.1f}ms, p95 {latency['p95_ms']:.1f}ms, "
+                f"p99 {latency['p99_ms']:.1f}ms, máx {latency['max_ms']:.1f}ms\n"
+            )
+            response += f"Bytes retornados: {data['bytes_returned']} (média {data['avg_bytes']:.0f})\n"
+            response += f"Tempo DB: {data['db_time_ms']:.1f}ms, Tempo LLM: {data['llm_time_ms']:.1f}ms\n\n"
+        return response
+
+    def dump(self, path: str):
+        """Gravar snapshot em arquivo JSON (escrita atômica)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    async def periodic_dump(self, path: str, interval: float):
+        """Gravar o snapshot periodicamente até a task ser cancelada."""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    self.dump(path)
+                except OSError as e:
+                    logger.error(f"Erro ao gravar métricas em {path}: {e}")
+        finally:
+            try:
+                self.dump(path)
+            except OSError as e:
+                logger.error(f"Erro ao gravar métricas em {path}: {e}")
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor SQLite que contabiliza o tempo gasto como fase "db" (e abre um span "db")."""
+
+    def execute(self, sql, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with db_span(sql):
+                return super().execute(sql, *args, **kwargs)
+        finally:
+            record_phase("db", time.perf_counter() - start)
+
+    def executemany(self, sql, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with db_span(sql):
+                return super().executemany(sql, *args, **kwargs)
+        finally:
+            record_phase("db", time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            record_phase("db", time.perf_counter() - start)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            record_phase("db", time.perf_counter() - start)
+
+
+class TimedConnection(sqlite3.Connection):
+    """Conexão SQLite cujos cursores e commits contabilizam tempo de banco."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            record_phase("db", time.perf_counter() - start)
@@ -0,0 +1,295 @@
+"""
+Backends de modelo plugáveis para os apps de monitoramento.
+
+Os apps simulavam o LLM com `asyncio.sleep` e `random`, então os benchmarks
+mediam sorteios. Agora o mesmo endpoint pede a execução a um backend e só
+"toca" o resultado (planejamento, ferramentas, texto) com os spans e a
+telemetria de sempre (main_ai_monitoring.py e main_ai_agents_custom.py; os
+apps main_sentry_official.py e main_official_standards.py continuam só simulação):
+
+- `simulated`: simulador paramétrico (latências, tokens/s, faixas de tokens e
+  ferramentas); com MODEL_SIM_SEED as execuções são repetíveis
+- `replay`: respostas e latências gravadas em JSONL (MODEL_REPLAY_PATH);
+  MODEL_REPLAY_TIME_SCALE=1 no ritmo original, 0 sem esperas
+- `prp_agent`: o agente PydanticAI real (agents/agent.py); com
+  PRP_AGENT_TEST_MODEL=true usa o TestModel (sem tokens pagos)
+
+MODEL_RECORD_PATH grava cada execução de qualquer backend no formato do
+replay, para planejar capacidade offline a partir de tráfego real.
+
+Formato JSONL (uma execução por linha):
+    {"prompt": "...", "model": "gpt-4", "text": "...", "input_tokens": 120,
+     "output_tokens": 340, "planning_s": 0.21, "response_s": 0.3,
+     "tools": [{"name": "prp_parser", "tokens": 40, "latency_s": 0.1}]}
+
+Uso:
+    backend = backend_from_env(default=lambda seed: SimulatedBackend(params, seed=seed))
+    run = await backend.run(prompt, model)
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field, replace
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+
+@dataclass
+class ToolRun:
+    """Uma chamada de ferramenta decidida pelo modelo."""
+
+    name: str
+    tokens: int = 0
+    latency_s: float = 0.0
+
+
+@dataclass
+class ModelRun:
+    """
+    Resultado de um backend.
+
+    `planning_s`, `response_s` e `ToolRun.latency_s` são o tempo que o app
+    ainda deve esperar; backends reais devolvem 0 (o tempo já passou).
+    """
+
+    text: str
+    input_tokens: int
+    output_tokens: int
+    tools: List[ToolRun] = field(default_factory=list)
+    planning_s: float = 0.0
+    response_s: float = 0.0
+    backend: str = ""
+    # True se o backend já executou as ferramentas (agente real): o app só as reporta
+    tools_executed: bool = False
+    # Modelo que de fato respondeu (o agente real usa o dele); vazio = o pedido ao backend
+    model: str = ""
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens + sum(tool.tokens for tool in self.tools)
+
+    def to_record(self, prompt: str, model: str) -> Dict:
+        record = asdict(self)
+        record.pop("backend")
+        record.pop("tools_executed")
+        record.pop("model")
+        return {"prompt": prompt, "model": model, **record}
+
+    @classmethod
+    def from_record(cls, record: Dict, backend: str = "replay") -> "ModelRun":
+        return cls(
+            text=record["text"],
+            input_tokens=record.get("input_tokens", 0),
+            output_tokens=record.get("output_tokens", 0),
+            tools=[ToolRun(**tool) for tool in record.get("tools", [])],
+            planning_s=record.get("planning_s", 0.0),
+            response_s=record.get("response_s", 0.0),
+            backend=backend,
+        )
+
+
+class ModelBackend(ABC):
+    """Interface dos backends: `await run(prompt, model) -> ModelRun`."""
+
+    name = "base"
+
+    @abstractmethod
+    async def run(self, prompt: str, model: str) -> ModelRun:
+        """Executar o prompt no modelo pedido."""
+
+
+@dataclass
+class SimulationParams:
+    """Parâmetros do simulador (faixas são sorteadas uniformemente)."""
+
+    planning_s: float = 0.25
+    response_s: float = 0.25
+    # Se definido, o texto leva output_tokens / tokens_per_second (em vez de response_s)
+    tokens_per_second: Optional[float] = None
+    tool_latency_s: Tuple[float, float] = (0.1, 0.1)
+    tools_per_run: Tuple[int, int] = (2, 4)
+    tool_tokens: Tuple[int, int] = (20, 150)
+    output_tokens: Tuple[int, int] = (200, 500)
+    # ~4 caracteres por token de entrada
+    chars_per_input_token: float = 4.0
+    available_tools: Tuple[str, ...] = (
+        "text_analyzer", "code_generator", "prp_parser", "context_builder", "output_formatter",
+    )
+
+
+class SimulatedBackend(ModelBackend):
+    """
+    Simulador paramétrico.
+
+    `params` pode ser uma função, resolvida a cada execução (os apps derivam
+    os parâmetros das constantes de latência do módulo).
+    """
+
+    name = "simulated"
+
+    def __init__(self, params: Union[SimulationParams, Callable[[], SimulationParams]] = SimulationParams(),
+                 seed: Optional[int] = None,
+                 text: Optional[Callable[[str, List[ToolRun]], str]] = None):
+        self._params = params
+        # Sem seed, o módulo `random` (como a simulação antiga)
+        self._rng = random.Random(seed) if seed is not None else random
+        self._text = text or (lambda prompt, tools: f"Resposta simulada para '{prompt[:100]}...' "
+                                                    f"usando {len(tools)} ferramentas")
+
+    @property
+    def params(self) -> SimulationParams:
+        return self._params() if callable(self._params) else self._params
+
+    async def run(self, prompt: str, model: str) -> ModelRun:
+        params = self.params
+        rng = self._rng
+        count = min(rng.randint(*params.tools_per_run), len(params.available_tools))
+        tools = [
+            ToolRun(name, rng.randint(*params.tool_tokens), rng.uniform(*params.tool_latency_s))
+            for name in rng.sample(list(params.available_tools), count)
+        ]
+        output_tokens = rng.randint(*params.output_tokens)
+        response_s = (output_tokens / params.tokens_per_second if params.tokens_per_second
+                      else params.response_s)
+        return ModelRun(
+            text=self._text(prompt, tools),
+            input_tokens=max(1, round(len(prompt) / params.chars_per_input_token)),
+            output_tokens=output_tokens,
+            tools=tools,
+            planning_s=params.planning_s,
+            response_s=response_s,
+            backend=self.name,
+        )
+
+
+class ReplayBackend(ModelBackend):
+    """
+    Execuções gravadas em JSONL, com as latências gravadas.
+
+    O mesmo (prompt, modelo) recebe suas gravações em ordem; prompts sem
+    gravação recebem as gravações na ordem do arquivo (determinístico).
+    `time_scale` multiplica as latências (1 = ritmo original, 0 = sem esperas).
+    """
+
+    name = "replay"
+
+    def __init__(self, path: str, time_scale: float = 1.0):
+        self.path = path
+        self.time_scale = time_scale
+        with open(path, encoding="utf-8") as f:
+            self.records = [json.loads(line) for line in f if line.strip()]
+        if not self.records:
+            raise ValueError(f"Nenhuma execução gravada em {path}")
+        self._by_key: Dict[Tuple[str, str], List[Dict]] = {}
+        for record in self.records:
+            self._by_key.setdefault((record["prompt"], record.get("model", "")), []).append(record)
+        self._cursors: Dict[Optional[Tuple[str, str]], int] = {}
+        self._lock = threading.Lock()
+
+    def _next(self, prompt: str, model: str) -> Dict:
+        key: Optional[Tuple[str, str]] = (prompt, model)
+        records = self._by_key.get(key)
+        if records is None:
+            key, records = None, self.records
+        with self._lock:
+            index = self._cursors.get(key, 0)
+            self._cursors[key] = index + 1
+        return records[index % len(records)]
+
+    async def run(self, prompt: str, model: str) -> ModelRun:
+        run = ModelRun.from_record(self._next(prompt, model), backend=self.name)
+        scale = self.time_scale
+        return replace(
+            run,
+            planning_s=run.planning_s * scale,
+            response_s=run.response_s * scale,
+            tools=[replace(tool, latency_s=tool.latency_s * scale) for tool in run.tools],
+        )
+
+
+class PrpAgentBackend(ModelBackend):
+    """O agente PydanticAI real (ou com TestModel), com spans gen_ai.chat por requisição."""
+
+    name = "prp_agent"
+
+    def __init__(self, use_test_model: bool = False):
+        self.use_test_model = use_test_model
+
+    async def run(self, prompt: str, model: str) -> ModelRun:
+        # Import tardio: os apps simulados não carregam o agente
+        from pydantic_ai.messages import ToolCallPart
+
+        from .agent import instrumented_model, prp_agent
+        from .dependencies import PRPAgentDependencies
+
+        # O agente roda com o modelo configurado nele, não com `model`: a
+        # execução informa qual foi, e os apps reportam esse
+        agent_model = instrumented_model(self.use_test_model)
+        with prp_agent.override(model=agent_model):
+            result = await prp_agent.run(prompt, deps=PRPAgentDependencies())
+        usage = result.usage()
+        tools = [
+            ToolRun(part.tool_name)
+            for message in result.all_messages()
+            for part in message.parts
+            if isinstance(part, ToolCallPart)
+        ]
+        return ModelRun(
+            text=str(result.output),
+            input_tokens=usage.request_tokens or 0,
+            output_tokens=usage.response_tokens or 0,
+            tools=tools,
+            backend=self.name,
+            tools_executed=True,
+            model=agent_model.model_name,
+        )
+
+
+class RecordingBackend(ModelBackend):
+    """Grava cada execução de outro backend em JSONL (formato do ReplayBackend)."""
+
+    def __init__(self, inner: ModelBackend, path: str):
+        self.inner = inner
+        self.path = path
+        self.name = inner.name
+        self._lock = threading.Lock()
+
+    async def run(self, prompt: str, model: str) -> ModelRun:
+        start = time.perf_counter()
+        run = await self.inner.run(prompt, model)
+        record = run.to_record(prompt, model)
+        if self.inner.name == "prp_agent":
+            # Backend real: a latência observada vira a do texto no replay
+            record["response_s"] = round(time.perf_counter() - start, 4)
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        return run
+
+
+def backend_from_env(default: Callable[[Optional[int]], ModelBackend]) -> ModelBackend:
+    """
+    Backend configurado por MODEL_BACKEND (simulated, replay, prp_agent).
+
+    `default(seed)` constrói o simulador do app (parâmetros dele), com a
+    seed de MODEL_SIM_SEED (None = sorteio livre).
+    """
+    name = os.getenv("MODEL_BACKEND", "simulated").lower()
+    if name == "replay":
+        path = os.getenv("MODEL_REPLAY_PATH")
+        if not path:
+            raise ValueError("MODEL_BACKEND=replay exige MODEL_REPLAY_PATH")
+        backend: ModelBackend = ReplayBackend(path, float(os.getenv("MODEL_REPLAY_TIME_SCALE", "1")))
+    elif name == "prp_agent":
+        backend = PrpAgentBackend(os.getenv("PRP_AGENT_TEST_MODEL", "false").lower() in ("1", "true", "yes"))
+    elif name == "simulated":
+        seed = os.getenv("MODEL_SIM_SEED")
+        backend = default(int(seed) if seed else None)
+    else:
+        raise ValueError(f"MODEL_BACKEND desconhecido: {name}")
+
+    record_path = os.getenv("MODEL_RECORD_PATH")
+    return RecordingBackend(backend, record_path) if record_path else backend
@@ -0,0 +1,314 @@
+"""
+Registro de métricas em processo, exposto em `/metrics` no formato OpenMetrics.
+
+Os apps só mandavam `capture_message` ao Sentry a cada conclusão (caro e sem
+agregação). Aqui ficam contadores e histogramas baratos o bastante para o
+caminho quente:
+
+- cada série guarda um acumulador por thread (`threading.local`), então o
+  incremento não pega lock nem disputa com outras threads; a leitura
+  (exposição) soma os acumuladores
+- `labels(...)` devolve a série (guarde-a para o custo mínimo); séries novas
+  são criadas uma vez, sob lock
+
+Métricas padrão (alimentadas por agents/instrumentation.py, pelo
+RetrievalCache e pelo `MetricsMiddleware`):
+
+- prp_http_request_duration_seconds{route,method,status}
+- prp_llm_tokens_total{model,type}
+- prp_tool_calls_total{tool,status} / prp_tool_duration_seconds{tool}
+- prp_db_query_duration_seconds{system}
+- prp_cache_requests_total{cache,result} (taxa de acerto:
+  `rate(...{result="hit"}) / rate(...)` no Prometheus)
+
+Uso:
+    app = FastAPI()
+    install_metrics(app)  # middleware de latência + GET /metrics
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Limites superiores dos buckets de latência (segundos)
+DEFAULT_BUCKETS_SECONDS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _CounterValue:
+    """Série de um contador: um acumulador por thread, somados na leitura."""
+
+    __slots__ = ("_local", "_shards")
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+
+    def inc(self, amount: float = 1.0):
+        try:
+            self._local.shard[0] += amount
+        except AttributeError:
+            shard = self._local.shard = [0.0]
+            self._shards.append(shard)  # list.append é atômico no CPython
+            shard[0] += amount
+
+    def get(self) -> float:
+        return sum(shard[0] for shard in list(self._shards))
+
+    def reset(self):
+        for shard in list(self._shards):
+            shard[0] = 0.0
+
+
+class _HistogramValue:
+    """Série de um histograma: contagem por bucket + soma, por thread."""
+
+    __slots__ = ("_buckets", "_local", "_shards")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+
+    def observe(self, value: float):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            # [contagem por bucket..., contagem +Inf, soma]
+            shard = self._local.shard = [0] * (len(self._buckets) + 1) + [0.0]
+            self._shards.append(shard)
+        shard[bisect_left(self._buckets, value)] += 1
+        shard[-1] += value
+
+    def get(self) -> Tuple[List[int], float]:
+        """(contagens cumulativas por bucket, incluindo +Inf; soma)."""
+        totals = [0] * (len(self._buckets) + 2)
+        for shard in list(self._shards):
+            for i, value in enumerate(shard):
+                totals[i] += value
+        cumulative, running = [], 0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-1]
+
+    def reset(self):
+        for shard in list(self._shards):
+            shard[:-1] = [0] * (len(shard) - 1)
+            shard[-1] = 0.0
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional["MetricsRegistry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Série dos valores de label (na ordem de `labelnames`)."""
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: esperados labels {self.labelnames}, recebidos {values}")
+            key = tuple(str(value) for value in values)
+            series = self._series.get(key)
+            if series is None:
+                with self._lock:
+                    series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def clear(self):
+        """Zerar as séries (continuam registradas: quem guardou a série segue válido)."""
+        for _, series in self._items():
+            series.reset()
+
+    def _items(self):
+        with self._lock:
+            return list(self._series.items())
+
+    def expose(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Contador monotônico; exposto como `<name>_total`."""
+
+    type_name = "counter"
+
+    def _new_series(self) -> _CounterValue:
+        return _CounterValue()
+
+    def inc(self, amount: float = 1.0):
+        """Incrementar a série sem labels."""
+        self.labels().inc(amount)
+
+    def expose(self) -> List[str]:
+        return [
+            f"{self.name}_total{_format_labels(self.labelnames, values)} {_format_value(series.get())}"
+            for values, series in self._items()
+        ]
+
+
+class Histogram(_Metric):
+    """Histograma com buckets fixos (`le` inclusivo, como no Prometheus)."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS_SECONDS,
+                 registry: Optional["MetricsRegistry"] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_series(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        """Registrar na série sem labels."""
+        self.labels().observe(value)
+
+    def expose(self) -> List[str]:
+        lines = []
+        for values, series in self._items():
+            cumulative, total = series.get()
+            for bound, count in zip(self.buckets + (math.inf,), cumulative):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {count}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_count{labels} {cumulative[-1]}")
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas de um processo."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrica já registrada: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def clear(self):
+        """Zerar todas as séries (testes)."""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+    def expose(self) -> str:
+        """Texto OpenMetrics de todas as métricas, terminado em `# EOF`."""
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        for metric in metrics:
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.extend(metric.expose())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "prp_http_request_duration_seconds", "Latência das requisições HTTP por rota.",
+    ("route", "method", "status"),
+)
+LLM_TOKENS = Counter("prp_llm_tokens", "Tokens consumidos por modelo.", ("model", "type"))
+TOOL_CALLS = Counter("prp_tool_calls", "Chamadas de ferramentas do agente.", ("tool", "status"))
+TOOL_SECONDS = Histogram("prp_tool_duration_seconds", "Duração das chamadas de ferramentas.", ("tool",))
+DB_QUERY_SECONDS = Histogram("prp_db_query_duration_seconds", "Latência das consultas ao banco.", ("system",))
+CACHE_REQUESTS = Counter("prp_cache_requests", "Consultas aos caches (hit/miss).", ("cache", "result"))
+
+
+def record_tokens(model: str, input_tokens: Optional[int], output_tokens: Optional[int]):
+    """Somar os tokens de uma chamada ao LLM."""
+    if input_tokens:
+        LLM_TOKENS.labels(model, "input").inc(input_tokens)
+    if output_tokens:
+        LLM_TOKENS.labels(model, "output").inc(output_tokens)
+
+
+def record_tool(tool_name: str, seconds: float, error: bool = False):
+    """Contar uma chamada de ferramenta e sua duração."""
+    TOOL_CALLS.labels(tool_name, "error" if error else "ok").inc()
+    TOOL_SECONDS.labels(tool_name).observe(seconds)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latência de cada requisição HTTP pelo template da rota."""
+
+    def __init__(self, app, histogram: Histogram = HTTP_REQUEST_SECONDS):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Template da rota ("/prp/{id}"), não o path, para não explodir a cardinalidade
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            self.histogram.labels(route, scope["method"], str(status[0])).observe(time.perf_counter() - start)
+
+
+def install_metrics(app, registry: Optional[MetricsRegistry] = None):
+    """Adicionar o `MetricsMiddleware` e a rota `GET /metrics` a um app FastAPI."""
+    from fastapi import Response
+
+    registry = REGISTRY if registry is None else registry
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(registry.expose(), media_type=CONTENT_TYPE)
+
+    return app
@@ -0,0 +1,230 @@
+"""
+Ranking híbrido de contexto para o agente PRP.
+
+Este módulo combina score lexical BM25, decaimento por recência,
+`cluster_priority`/`quality_score` dos docs clusterizados e sobreposição com a
+conversa atual. A pontuação é vetorizada em NumPy sobre lotes de candidatos.
+"""
+
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Palavras muito comuns que só aumentam o número de matches
+STOPWORDS = {
+    "que", "como", "para", "com", "uma", "umas", "uns", "dos", "das", "nos", "nas",
+    "por", "qual", "quais", "onde", "isso", "este", "esta", "esse", "essa", "sobre",
+    "the", "and", "for", "with", "what", "how",
+}
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Campos de timestamp usados para recência, em ordem de preferência
+TIMESTAMP_FIELDS = ("updated_at", "timestamp", "created_at")
+
+
+def tokenize(text: str) -> List[str]:
+    """Quebrar texto em termos normalizados (minúsculos, >= 3 letras, sem stopwords)."""
+    return [
+        term for term in _TOKEN_RE.findall(text.lower())
+        if len(term) >= 3 and term not in STOPWORDS
+    ]
+
+
+def unique_terms(text: str, max_terms: Optional[int] = None) -> List[str]:
+    """Termos únicos na ordem em que aparecem."""
+    terms = list(dict.fromkeys(tokenize(text)))
+    return terms[:max_terms] if max_terms else terms
+
+
+def _parse_timestamp(value: Any) -> float:
+    """Converter timestamp (ISO/SQLite ou epoch) em segundos; NaN se ausente."""
+    if value is None or value == "":
+        return np.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return np.nan
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+@dataclass
+class RankingWeights:
+    """Pesos e parâmetros do ranking híbrido."""
+
+    bm25: float = 1.0
+    recency: float = 0.3
+    cluster_priority: float = 0.2
+    quality: float = 0.2
+    conversation: float = 0.3
+
+    # Parâmetros BM25
+    k1: float = 1.2
+    b: float = 0.75
+
+    # Meia-vida do decaimento por recência (dias)
+    recency_half_life_days: float = 30.0
+
+
+class CandidateBatch:
+    """
+    Lote de candidatos pré-processado em arrays.
+
+    A tokenização acontece uma vez na construção; os termos ficam em listas
+    invertidas (posting lists) para que a pontuação de uma query custe
+    O(ocorrências dos termos da query), e não O(tamanho do lote).
+    """
+
+    def __init__(self, items: Iterable[Dict[str, Any]], text_fields: Sequence[str]):
+        self.items = list(items)
+        n = len(self.items)
+
+        self.doc_len = np.zeros(n, dtype=np.float32)
+        self.timestamps = np.full(n, np.nan)
+        self.cluster_priority = np.full(n, np.nan)
+        self.quality_score = np.full(n, np.nan)
+
+        vocab: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        counts: List[int] = []
+
+        for i, item in enumerate(self.items):
+            tokens = tokenize(" ".join(str(item.get(field) or "") for field in text_fields))
+            self.doc_len[i] = len(tokens)
+            for term, count in Counter(tokens).items():
+                rows.append(i)
+                cols.append(vocab.setdefault(term, len(vocab)))
+                counts.append(count)
+
+            for field in TIMESTAMP_FIELDS:
+                if item.get(field):
+                    self.timestamps[i] = _parse_timestamp(item[field])
+                    break
+            self.cluster_priority[i] = _as_float(item.get("cluster_priority"))
+            self.quality_score[i] = _as_float(item.get("quality_score"))
+
+        # Posting lists: ocorrências ordenadas por termo, fatiadas por offsets
+        term_ids = np.asarray(cols, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        self._post_rows = np.asarray(rows, dtype=np.int64)[order]
+        self._post_counts = np.asarray(counts, dtype=np.float32)[order]
+        self._post_offsets = np.searchsorted(term_ids[order], np.arange(len(vocab) + 1))
+        self.vocab = vocab
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def term_frequencies(self, terms: Sequence[str]) -> np.ndarray:
+        """Matriz (candidatos x termos) de frequências dos termos informados."""
+        tf = np.zeros((len(self.items), len(terms)), dtype=np.float32)
+        for j, term in enumerate(terms):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self._post_offsets[term_id], self._post_offsets[term_id + 1]
+            tf[self._post_rows[start:end], j] = self._post_counts[start:end]
+        return tf
+
+
+class HybridRanker:
+    """Ranker híbrido: BM25 + recência + prioridade/qualidade + sobreposição com a conversa."""
+
+    def __init__(self, weights: Optional[RankingWeights] = None):
+        self.weights = weights or RankingWeights()
+
+    def bm25(self, terms: Sequence[str], batch: CandidateBatch) -> np.ndarray:
+        """Score BM25 de cada candidato, com IDF calculado sobre o lote."""
+        if not terms or not len(batch):
+            return np.zeros(len(batch), dtype=np.float32)
+
+        w = self.weights
+        tf = batch.term_frequencies(terms)
+        n = len(batch)
+        df = np.count_nonzero(tf, axis=0)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+
+        avgdl = float(batch.doc_len.mean()) or 1.0
+        norm = w.k1 * (1 - w.b + w.b * batch.doc_len / avgdl)
+        return ((tf * (w.k1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+    def score(
+        self,
+        query: str,
+        batch: CandidateBatch,
+        conversation_terms: Sequence[str] = (),
+        now: Optional[float] = None,
+    ) -> np.ndarray:
+        """
+        Score híbrido de todos os candidatos do lote.
+
+        Cada componente é normalizado para [0, 1]; sinais ausentes (sem
+        timestamp, sem cluster_priority...) recebem o valor neutro 0.5.
+        """
+        w = self.weights
+        now = time.time() if now is None else now
+
+        bm25 = self.bm25(unique_terms(query), batch)
+        top = bm25.max() if len(bm25) else 0.0
+        lexical = bm25 / top if top > 0 else bm25
+
+        age_days = np.clip((now - batch.timestamps) / 86400.0, 0.0, None)
+        recency = np.where(np.isnan(age_days), 0.5, 0.5 ** (age_days / w.recency_half_life_days))
+
+        # cluster_priority: 1 = alta, 10 = baixa
+        priority = np.where(
+            np.isnan(batch.cluster_priority), 0.5,
+            (10.0 - np.clip(batch.cluster_priority, 1.0, 10.0)) / 9.0
+        )
+        quality = np.where(
+            np.isnan(batch.quality_score), 0.5,
+            np.clip(batch.quality_score, 0.0, 10.0) / 10.0
+        )
+
+        if conversation_terms:
+            overlap = np.count_nonzero(batch.term_frequencies(conversation_terms), axis=1)
+            overlap = overlap / len(conversation_terms)
+        else:
+            overlap = np.zeros(len(batch))
+
+        return (
+            w.bm25 * lexical
+            + w.recency * recency
+            + w.cluster_priority * priority
+            + w.quality * quality
+            + w.conversation * overlap
+        )
+
+    def rank(
+        self,
+        query: str,
+        batch: CandidateBatch,
+        conversation_terms: Sequence[str] = (),
+        top_k: Optional[int] = None,
+        now: Optional[float] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """Ordenar candidatos pelo score híbrido, retornando (item, score)."""
+        if not len(batch):
+            return []
+
+        scores = self.score(query, batch, conversation_terms, now)
+        if top_k is not None and top_k < len(scores):
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            order = best[np.argsort(-scores[best], kind="stable")]
+        else:
+            order = np.argsort(-scores, kind="stable")
+
+        return [(batch.items[i], float(scores[i])) for i in order]
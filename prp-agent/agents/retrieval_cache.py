@@ -0,0 +1,129 @@
+"""
+Cache da busca de contexto do agente PRP.
+
+Este módulo guarda os candidatos retornados pelo banco para cada
+(fonte, termos normalizados) e invalida as entradas quando a tabela de origem
+muda. A versão de uma tabela combina:
+1. Um contador em memória, incrementado pelos caminhos de escrita deste processo
+   (`bump_table_version`) - invalidação imediata
+2. O contador mantido por triggers em `table_change_counters`
+   (sql/schemas/context_cache_schema.sql) - enxerga escritas de outros processos
+
+O agente cria uma instância por mensagem; `get_retrieval_cache` entrega um
+cache por banco, compartilhado no processo, para as mensagens seguintes
+acertarem o cache. Os contadores lidos do banco (e quando foram lidos) ficam
+no cache também: uma mensagem nova não relê `table_change_counters` antes do
+intervalo de atualização.
+"""
+
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from .openmetrics import CACHE_REQUESTS
+
+# Contadores lidos do banco (mantidos por triggers)
+CHANGE_COUNTERS_QUERY = "SELECT table_name, version FROM table_change_counters"
+
+_local_versions: Dict[str, int] = defaultdict(int)
+_local_lock = threading.Lock()
+
+
+def bump_table_version(*tables: str):
+    """Registrar escrita em tabelas (invalida o cache deste processo na hora)."""
+    with _local_lock:
+        for table in tables:
+            _local_versions[table] += 1
+
+
+def local_table_version(table: str) -> int:
+    return _local_versions.get(table, 0)
+
+
+class RetrievalCache:
+    """Cache LRU de resultados de busca, validado por versão de tabela."""
+
+    def __init__(self, max_entries: int = 256, name: str = "retrieval"):
+        self.max_entries = max_entries
+        self.name = name
+        # Séries de prp_cache_requests_total deste cache
+        self._hit_counter = CACHE_REQUESTS.labels(name, "hit")
+        self._miss_counter = CACHE_REQUESTS.labels(name, "miss")
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        # Último `table_change_counters` lido e quando (time.monotonic); None = nunca
+        self.db_versions: Dict[str, int] = {}
+        self.db_versions_checked_at: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, version: Any) -> Optional[Any]:
+        """Valor em cache, ou None se ausente ou se a tabela mudou desde então."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                self._miss_counter.inc()
+                return None
+            cached_version, value = entry
+            if cached_version != version:
+                del self._entries[key]
+                self.invalidations += 1
+                self.misses += 1
+                self._miss_counter.inc()
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._hit_counter.inc()
+            return value
+
+    def put(self, key: Hashable, version: Any, value: Any):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+
+_caches: Dict[str, RetrievalCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_retrieval_cache(key: str, max_entries: int) -> RetrievalCache:
+    """Cache compartilhado do processo para um banco (local, libSQL ou database MCP)."""
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = RetrievalCache(max_entries)
+            _caches[key] = cache
+        return cache
@@ -0,0 +1,537 @@
+"""
+Índice semântico local para busca de contexto do agente PRP.
+
+Este módulo gera embeddings sem rede (TF-IDF de n-gramas hasheados + SVD
+randomizado), guarda os vetores em uma matriz float32 memory-mapped e oferece
+busca aproximada de vizinhos (LSH por hiperplanos aleatórios) sobre `docs`,
+`docs_sections`, `prps` e `turso_agent_knowledge`. Atualizações são
+incrementais por `file_hash`.
+
+Um índice por diretório no processo (`get_semantic_index`): o agente é
+recriado a cada mensagem e busca via `asyncio.to_thread`, então as estruturas
+montadas sob demanda (tabelas LSH, máscaras por fonte) ficam atrás de um lock.
+
+Uso:
+    python -m agents.semantic_index --db ../context-memory.db --index-dir .semantic_index
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+")
+
+# Texto máximo por linha usado no embedding (início do documento)
+MAX_EMBED_CHARS = 4000
+
+# Até este tamanho a busca é exata; acima, usa LSH + reordenação exata
+BRUTE_FORCE_LIMIT = 5000
+
+# Tabelas indexadas: (fonte, query, campo de título, campos de texto)
+INDEX_SOURCES = [
+    ("docs", "SELECT * FROM docs", "title", ("title", "summary", "keywords", "content")),
+    ("docs_sections", "SELECT * FROM docs_sections", "section_title", ("section_title", "section_content")),
+    ("prps", "SELECT * FROM prps", "title", ("title", "description", "objective")),
+    ("turso_agent_knowledge", "SELECT * FROM turso_agent_knowledge", "topic", ("topic", "tags", "content")),
+    # Base de conhecimento do MCP Turso nos bancos atuais (sql/data/*.db)
+    ("knowledge_base", "SELECT * FROM knowledge_base", "topic", ("topic", "tags", "content")),
+]
+
+
+@dataclass
+class IndexedText:
+    """Texto de uma linha do banco a ser indexado."""
+
+    source: str
+    row_id: Any
+    text: str
+    title: str = ""
+    file_hash: str = ""
+
+    def __post_init__(self):
+        if not self.file_hash:
+            self.file_hash = hashlib.sha256(self.text.encode("utf-8")).hexdigest()
+
+    @property
+    def key(self) -> str:
+        return f"{self.source}:{self.row_id}"
+
+
+@lru_cache(maxsize=200_000)
+def _word_features(word: str, n_features: int) -> Tuple[int, ...]:
+    """Features hasheadas de uma palavra (a palavra inteira + n-gramas de 3 a 5)."""
+    mask = n_features - 1
+    padded = f"<{word}>"
+    grams = [padded[i:i + n] for n in (3, 4, 5) for i in range(len(padded) - n + 1)]
+    return tuple(zlib.crc32(gram.encode("utf-8")) & mask for gram in ["w:" + word] + grams)
+
+
+def hashed_features(text: str, n_features: int) -> Counter:
+    """Contagem de features hasheadas: palavras + n-gramas de caracteres (3 a 5)."""
+    features: Counter = Counter()
+    for word, count in Counter(_WORD_RE.findall(text[:MAX_EMBED_CHARS].lower())).items():
+        for feature in _word_features(word, n_features):
+            features[feature] += count
+    return features
+
+
+def _segment_products(offsets: np.ndarray, positions: np.ndarray, weights: np.ndarray,
+                      dense: np.ndarray) -> np.ndarray:
+    """
+    Produto esparso x denso por segmentos contíguos.
+
+    A linha i da saída é `weights[s:e] @ dense[positions[s:e]]`, com
+    s, e = offsets[i], offsets[i + 1]: um gemv pequeno por segmento, sem
+    materializar a matriz (não-zeros x m) inteira.
+    """
+    out = np.zeros((len(offsets) - 1, dense.shape[1]), dtype=np.float32)
+    for i in np.flatnonzero(np.diff(offsets)):
+        start, end = offsets[i], offsets[i + 1]
+        out[i] = weights[start:end] @ dense[positions[start:end]]
+    return out
+
+
+class _SparseRows:
+    """Matriz esparsa CSR mínima (linhas = textos, colunas = features hasheadas)."""
+
+    def __init__(self, rows: Sequence[Counter], n_features: int):
+        self.n_features = n_features
+        lengths = [len(row) for row in rows]
+        self.indptr = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        self.indices = np.fromiter((k for row in rows for k in row), dtype=np.int64, count=self.indptr[-1])
+        self.data = np.fromiter((v for row in rows for v in row.values()), dtype=np.float32, count=self.indptr[-1])
+        self.row_of_nnz = np.repeat(np.arange(len(rows)), lengths)
+        self._columns: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.indptr) - 1
+
+    def apply_tfidf(self, idf: np.ndarray):
+        """TF sublinear * IDF, com normalização L2 por linha."""
+        self.data = (1.0 + np.log(self.data)) * idf[self.indices]
+        norms = np.sqrt(np.bincount(self.row_of_nnz, weights=self.data ** 2, minlength=self.n_rows))
+        norms[norms == 0] = 1.0
+        self.data = (self.data / norms[self.row_of_nnz]).astype(np.float32)
+
+    def dot(self, dense: np.ndarray) -> np.ndarray:
+        """(linhas x features) @ (features x m)."""
+        return _segment_products(self.indptr, self.indices, self.data, dense)
+
+    def t_dot(self, dense: np.ndarray) -> np.ndarray:
+        """(features x linhas) @ (linhas x m), via ordenação por coluna (CSC)."""
+        if self._columns is None:
+            order = np.argsort(self.indices, kind="stable")
+            offsets = np.searchsorted(self.indices[order], np.arange(self.n_features + 1))
+            self._columns = (offsets, self.row_of_nnz[order], order)
+        offsets, rows, order = self._columns
+        return _segment_products(offsets, rows, self.data[order], dense)
+
+
+class SemanticIndex:
+    """Índice semântico persistido em disco (memmap float32 + metadados JSON)."""
+
+    def __init__(self, index_dir: str, dim: int = 128, n_features: int = 2 ** 15,
+                 lsh_tables: int = 8, lsh_bits: int = 10, seed: int = 42):
+        if n_features & (n_features - 1):
+            raise ValueError("n_features deve ser potência de 2")
+
+        self.index_dir = index_dir
+        self.dim = dim
+        self.n_features = n_features
+        self.lsh_tables = lsh_tables
+        self.lsh_bits = lsh_bits
+        self.seed = seed
+
+        self.idf: Optional[np.ndarray] = None
+        self.projection: Optional[np.ndarray] = None
+        self.entries: List[Dict[str, Any]] = []  # slot -> metadados
+        self.slots: Dict[str, int] = {}  # chave -> slot
+        self.capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._buckets: Optional[List[Dict[int, List[int]]]] = None
+        self._allowed: Optional[Dict[Optional[frozenset], np.ndarray]] = None
+        self._planes: Optional[np.ndarray] = None
+        # Protege as estruturas montadas sob demanda e as escritas (fit/update)
+        self._lock = threading.RLock()
+
+        if os.path.exists(self._meta_path):
+            self.load()
+
+    # ------------------------------------------------------------------
+    # Persistência
+    # ------------------------------------------------------------------
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.index_dir, "meta.json")
+
+    @property
+    def _model_path(self) -> str:
+        return os.path.join(self.index_dir, "model.npz")
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.index_dir, "vectors.f32")
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.projection is not None
+
+    def __len__(self) -> int:
+        return sum(1 for entry in self.entries if not entry.get("deleted"))
+
+    def load(self):
+        """Carregar modelo, metadados e vetores (memmap) do disco."""
+        with open(self._meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        model = np.load(self._model_path)
+
+        self.dim = meta["dim"]
+        self.n_features = meta["n_features"]
+        self.lsh_tables = meta["lsh_tables"]
+        self.lsh_bits = meta["lsh_bits"]
+        self.seed = meta["seed"]
+        self.capacity = meta["capacity"]
+        self.entries = meta["entries"]
+        self.slots = {f"{e['source']}:{e['row_id']}": i for i, e in enumerate(self.entries)}
+        self.idf = model["idf"]
+        self.projection = model["projection"]
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                  shape=(self.capacity, self.dim))
+        self._buckets = self._allowed = None
+
+    def _save_meta(self):
+        meta = {
+            "dim": self.dim,
+            "n_features": self.n_features,
+            "lsh_tables": self.lsh_tables,
+            "lsh_bits": self.lsh_bits,
+            "seed": self.seed,
+            "capacity": self.capacity,
+            "entries": self.entries,
+        }
+        tmp_path = f"{self._meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self._meta_path)
+        if self._vectors is not None:
+            self._vectors.flush()
+
+    def _ensure_capacity(self, needed: int):
+        """Crescer a matriz memory-mapped (dobrando) quando necessário."""
+        if needed <= self.capacity and self._vectors is not None:
+            return
+        new_capacity = max(needed, self.capacity * 2, 64)
+        old = self._vectors
+        tmp_path = f"{self._vectors_path}.tmp"
+        vectors = np.memmap(tmp_path, dtype=np.float32, mode="w+", shape=(new_capacity, self.dim))
+        if old is not None:
+            vectors[:len(self.entries)] = old[:len(self.entries)]
+            del old
+        vectors.flush()
+        del vectors
+        os.replace(tmp_path, self._vectors_path)
+        self.capacity = new_capacity
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                  shape=(self.capacity, self.dim))
+
+    # ------------------------------------------------------------------
+    # Embeddings
+    # ------------------------------------------------------------------
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embeddings normalizados (float32) para textos, com o modelo atual."""
+        if not self.is_fitted:
+            raise RuntimeError("Índice semântico ainda não foi treinado (use fit)")
+        rows = _SparseRows([hashed_features(text, self.n_features) for text in texts], self.n_features)
+        rows.apply_tfidf(self.idf)
+        return self._project(rows)
+
+    def _project(self, rows: _SparseRows) -> np.ndarray:
+        """Projetar linhas TF-IDF no espaço SVD e normalizar."""
+        vectors = rows.dot(self.projection)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+
+    def fit(self, documents: Sequence[IndexedText]):
+        """
+        Treinar IDF + projeção SVD no corpus e (re)escrever todos os vetores.
+
+        A SVD é randomizada (range finder + iterações de potência), calculada
+        direto sobre a matriz esparsa, sem densificar o TF-IDF.
+        """
+        with self._lock:
+            self._fit(documents)
+
+    def _fit(self, documents: Sequence[IndexedText]):
+        documents = list(documents)
+        if not documents:
+            raise ValueError("Corpus vazio")
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        counts = [hashed_features(doc.text, self.n_features) for doc in documents]
+        rows = _SparseRows(counts, self.n_features)
+        df = np.bincount(rows.indices, minlength=self.n_features)
+        self.idf = (np.log((1 + rows.n_rows) / (1 + df)) + 1).astype(np.float32)
+        rows.apply_tfidf(self.idf)
+
+        rank = min(self.dim, rows.n_rows)
+        rng = np.random.default_rng(self.seed)
+        omega = rng.standard_normal((self.n_features, rank + 10)).astype(np.float32)
+        basis, _ = np.linalg.qr(rows.dot(omega))
+        for _ in range(2):  # iterações de potência
+            basis, _ = np.linalg.qr(rows.dot(rows.t_dot(basis)))
+        _, _, vt = np.linalg.svd(rows.t_dot(basis).T, full_matrices=False)
+        self.dim = rank
+        self.projection = np.ascontiguousarray(vt[:rank].T, dtype=np.float32)
+
+        self.entries, self.slots = [], {}
+        self.capacity = 0
+        self._vectors = None
+        self._planes = None
+        self._ensure_capacity(len(documents))
+        self._write(documents, self._project(rows))
+        np.savez(self._model_path, idf=self.idf, projection=self.projection)
+        self._save_meta()
+        logger.info(f"🧭 Índice semântico treinado: {len(documents)} textos, dim={self.dim}")
+
+    def _write(self, documents: Sequence[IndexedText], vectors: Optional[np.ndarray] = None):
+        """Gravar (ou sobrescrever) os vetores dos documentos em seus slots."""
+        if vectors is None:
+            vectors = self.embed([doc.text for doc in documents])
+        for doc, vector in zip(documents, vectors):
+            entry = {
+                "source": doc.source,
+                "row_id": doc.row_id,
+                "title": doc.title,
+                "snippet": doc.text[:200],
+                "file_hash": doc.file_hash,
+            }
+            slot = self.slots.get(doc.key)
+            if slot is None:
+                slot = len(self.entries)
+                self.entries.append(entry)
+                self.slots[doc.key] = slot
+            else:
+                self.entries[slot] = entry
+            self._vectors[slot] = vector
+        self._buckets = self._allowed = None
+
+    def update(self, documents: Sequence[IndexedText], sources: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        Atualização incremental por `file_hash`.
+
+        Linhas com hash inalterado são ignoradas; novas ou alteradas são
+        (re)embutidas. Se `sources` for informado, linhas dessas fontes que não
+        vieram em `documents` são marcadas como removidas.
+        """
+        with self._lock:
+            return self._update(documents, sources)
+
+    def _update(self, documents: Sequence[IndexedText], sources: Optional[Iterable[str]]) -> Dict[str, int]:
+        if not self.is_fitted:
+            self._fit(documents)
+            return {"added": len(documents), "updated": 0, "unchanged": 0, "removed": 0}
+
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        changed = []
+        seen = set()
+        for doc in documents:
+            seen.add(doc.key)
+            slot = self.slots.get(doc.key)
+            if slot is None:
+                stats["added"] += 1
+                changed.append(doc)
+            elif self.entries[slot]["file_hash"] != doc.file_hash or self.entries[slot].get("deleted"):
+                stats["updated"] += 1
+                changed.append(doc)
+            else:
+                stats["unchanged"] += 1
+
+        if sources is not None:
+            sources = set(sources)
+            for key, slot in self.slots.items():
+                entry = self.entries[slot]
+                if entry["source"] in sources and key not in seen and not entry.get("deleted"):
+                    entry["deleted"] = True
+                    stats["removed"] += 1
+            self._buckets = self._allowed = None
+
+        if changed:
+            self._ensure_capacity(len(self.entries) + stats["added"])
+            self._write(changed)
+        if changed or stats["removed"]:
+            self._save_meta()
+        return stats
+
+    # ------------------------------------------------------------------
+    # Busca
+    # ------------------------------------------------------------------
+
+    def _build_buckets(self):
+        """Montar as tabelas LSH (hiperplanos aleatórios) para os vetores ativos (com o lock)."""
+        rng = np.random.default_rng(self.seed + 1)
+        planes_per_table = rng.standard_normal((self.lsh_tables, self.lsh_bits, self.dim)).astype(np.float32)
+        powers = 1 << np.arange(self.lsh_bits)
+        active = np.array([i for i, e in enumerate(self.entries) if not e.get("deleted")], dtype=np.int64)
+        vectors = np.asarray(self._vectors[:len(self.entries)])
+
+        buckets = []
+        for planes in planes_per_table:
+            signatures = ((vectors[active] @ planes.T) > 0) @ powers
+            table = defaultdict(list)
+            for slot, signature in zip(active, signatures):
+                table[int(signature)].append(int(slot))
+            buckets.append(table)
+        # Publicadas só prontas: outra thread nunca vê tabelas pela metade
+        self._planes, self._buckets = planes_per_table, buckets
+
+    def _lsh_candidates(self, query: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if self._buckets is None:
+                self._build_buckets()
+            planes_per_table, buckets = self._planes, self._buckets
+        powers = 1 << np.arange(self.lsh_bits)
+        candidates = set()
+        for planes, table in zip(planes_per_table, buckets):
+            signature = int(((planes @ query) > 0) @ powers)
+            candidates.update(table.get(signature, ()))
+        return np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+
+    def _allowed_slots(self, sources: Optional[frozenset]) -> np.ndarray:
+        """Máscara (por slot) de entradas ativas das fontes pedidas, em cache."""
+        with self._lock:
+            if self._allowed is None:
+                self._allowed = {}
+            if sources not in self._allowed:
+                self._allowed[sources] = np.array([
+                    not entry.get("deleted") and (sources is None or entry["source"] in sources)
+                    for entry in self.entries
+                ], dtype=bool)
+            return self._allowed[sources]
+
+    def search(self, query: str, k: int = 5, sources: Optional[Iterable[str]] = None,
+               exact: Optional[bool] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Buscar os k textos mais próximos da query (similaridade cosseno).
+
+        Args:
+            query: Texto da busca
+            k: Número de resultados
+            sources: Restringir a estas fontes (ex: {"docs", "prps"})
+            exact: Forçar busca exata (True) ou LSH (False); None = automático
+        """
+        if not self.is_fitted or not self.entries:
+            return []
+
+        q = self.embed([query])[0]
+        n = len(self.entries)
+        use_exact = exact if exact is not None else n <= BRUTE_FORCE_LIMIT
+
+        candidates = np.arange(n) if use_exact else self._lsh_candidates(q)
+        sources = frozenset(sources) if sources else None
+        candidates = candidates[self._allowed_slots(sources)[candidates]]
+        if not use_exact and len(candidates) < k:
+            return self.search(query, k, sources, exact=True)
+        if not len(candidates):
+            return []
+
+        scores = np.asarray(self._vectors[candidates]) @ q
+        if k < len(scores):
+            best = np.argpartition(-scores, k - 1)[:k]
+            top = best[np.argsort(-scores[best], kind="stable")]
+        else:
+            top = np.argsort(-scores, kind="stable")
+        return [(self.entries[candidates[i]], float(scores[i])) for i in top]
+
+
+_indexes: Dict[str, SemanticIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_semantic_index(index_dir: str) -> SemanticIndex:
+    """Índice compartilhado do processo para um diretório (carregado do disco uma vez)."""
+    key = os.path.abspath(index_dir)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = SemanticIndex(index_dir)
+            _indexes[key] = index
+        return index
+
+
+def load_documents(db_path: str) -> Tuple[List[IndexedText], List[str]]:
+    """Ler as tabelas indexáveis do banco SQLite (tabelas ausentes são ignoradas)."""
+    documents, sources = [], []
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        for source, query, title_field, text_fields in INDEX_SOURCES:
+            try:
+                rows = conn.execute(query).fetchall()
+            except sqlite3.OperationalError:
+                continue
+            sources.append(source)
+            for row in rows:
+                row = dict(row)
+                text = " ".join(str(row.get(field) or "") for field in text_fields).strip()
+                if not text:
+                    continue
+                documents.append(IndexedText(
+                    source=source,
+                    row_id=row["id"],
+                    text=text,
+                    title=str(row.get(title_field) or ""),
+                    file_hash=row.get("file_hash") or "",
+                ))
+    finally:
+        conn.close()
+    return documents, sources
+
+
+def sync_from_database(index: SemanticIndex, db_path: str, refit: bool = False) -> Dict[str, int]:
+    """Sincronizar o índice com o banco (treina na primeira vez ou com refit=True)."""
+    documents, sources = load_documents(db_path)
+    if refit or not index.is_fitted:
+        index.fit(documents)
+        return {"added": len(documents), "updated": 0, "unchanged": 0, "removed": 0}
+    return index.update(documents, sources=sources)
+
+
+def main():
+    """CLI para construir/atualizar o índice semântico."""
+    parser = argparse.ArgumentParser(description="Índice semântico local do agente PRP")
+    parser.add_argument("--db", required=True, help="Banco SQLite (context-memory)")
+    parser.add_argument("--index-dir", default=".semantic_index", help="Diretório do índice")
+    parser.add_argument("--refit", action="store_true", help="Retreinar o modelo do zero")
+    parser.add_argument("--query", help="Executar uma busca após sincronizar")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    index = SemanticIndex(args.index_dir)
+    stats = sync_from_database(index, args.db, refit=args.refit)
+    print(f"✅ Índice sincronizado: {stats} ({len(index)} textos ativos)")
+
+    if args.query:
+        for entry, score in index.search(args.query):
+            print(f"  {score:.3f}  [{entry['source']}] {entry['title']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Amostragem adaptativa de traces e corte de payloads gen_ai para o Sentry.
+
+Os apps FastAPI mandavam 100% dos traces, cada span com `json.dumps` completo
+das mensagens e respostas. Aqui:
+
+- `AdaptiveSampler.traces_sampler`: taxa por endpoint (health/status quase
+  nada, agentes a taxa base), respeitando a decisão do trace pai. Com
+  `target_per_second`, a taxa cai sozinha quando o volume passa do alvo.
+- `AdaptiveSampler.before_send_transaction`: decisão final (tail) — dos
+  traces gravados, os lentos ou com erro são sempre mantidos; os demais ficam
+  com a taxa do endpoint. Os endpoints de agente são gravados na cabeça com
+  `record_rate` (padrão DEFAULT_RECORD_RATE = 0.25): só 1/4 das requisições
+  pagam spans e payloads, e em troca ~75% dos traces lentos/com erro dessas
+  rotas não são vistos (os erros continuam indo como eventos de erro).
+  SENTRY_TRACES_RECORD_RATE=1.0 volta a ver todos, sem economia de CPU.
+- `set_payload`: só serializa o payload se o span for enviado, e troca
+  payloads grandes por prévia + tamanho + sha256.
+
+Uso:
+    sentry_sdk.init(dsn=..., **sampling_options())
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+# Taxa por prefixo de rota (o prefixo mais longo vence); o resto usa a taxa base
+DEFAULT_ENDPOINT_RATES: Dict[str, float] = {
+    "/health": 0.0,
+    "/healthz": 0.0,
+    "/readyz": 0.0,
+    "/metrics": 0.0,
+    "/sentry-debug": 1.0,
+    "/ai-agent/benchmark": 0.01,
+}
+
+# Rotas sem decisão tail (a taxa da cabeça é a final)
+HEAD_ONLY_PREFIXES = ("/health", "/healthz", "/readyz", "/metrics")
+
+DEFAULT_SLOW_MS = 2000.0
+# Fração gravada na cabeça: 1 - DEFAULT_RECORD_RATE dos lentos/com erro ficam de fora
+DEFAULT_RECORD_RATE = 0.25
+DEFAULT_MAX_PAYLOAD_CHARS = 2000
+PAYLOAD_PREVIEW_CHARS = 200
+_max_payload_chars = int(os.getenv("SENTRY_MAX_PAYLOAD_CHARS", DEFAULT_MAX_PAYLOAD_CHARS))
+
+# Chaves de span com payloads potencialmente grandes
+PAYLOAD_KEYS = (
+    "gen_ai.request.messages",
+    "gen_ai.response.text",
+    "gen_ai.response.tool_calls",
+    "gen_ai.tool.input",
+    "gen_ai.tool.output",
+)
+
+
+def trim_payload(value: Any, max_chars: int = DEFAULT_MAX_PAYLOAD_CHARS) -> str:
+    """
+    Serializar o payload; acima de `max_chars`, devolver só uma prévia,
+    o tamanho original e o sha256 (para correlacionar payloads iguais).
+    """
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    if len(text) <= max_chars:
+        return text
+    return json.dumps({
+        "truncated": True,
+        "length": len(text),
+        "sha256": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        "preview": text[:min(PAYLOAD_PREVIEW_CHARS, max_chars)],
+    }, ensure_ascii=False)
+
+
+def set_payload(span, key: str, value: Any, max_chars: Optional[int] = None):
+    """
+    `span.set_data` para payloads gen_ai: não serializa nada se o span não
+    vai ser enviado, e corta payloads grandes. `value` pode ser uma função
+    (chamada só se o span for enviado).
+    """
+    if getattr(span, "sampled", None) is not True:
+        return
+    if callable(value):
+        value = value()
+    span.set_data(key, trim_payload(value, max_chars or _max_payload_chars))
+
+
+def _duration_ms(event: Dict[str, Any]) -> Optional[float]:
+    try:
+        start = event["start_timestamp"]
+        end = event["timestamp"]
+    except KeyError:
+        return None
+    if isinstance(start, str):
+        start, end = datetime.fromisoformat(start), datetime.fromisoformat(end)
+    if isinstance(start, datetime):
+        return (end - start).total_seconds() * 1000
+    return (end - start) * 1000
+
+
+def _trace_fraction(trace_id: Optional[str]) -> float:
+    """Fração em [0, 1) estável por trace (a mesma decisão em todo o trace)."""
+    if not trace_id:
+        return 0.0
+    return int(trace_id[:8], 16) / 0x100000000
+
+
+class AdaptiveSampler:
+    """Sampler por endpoint com decisão tail para traces lentos ou com erro."""
+
+    def __init__(
+        self,
+        base_rate: float = 0.1,
+        endpoint_rates: Optional[Dict[str, float]] = None,
+        slow_ms: float = DEFAULT_SLOW_MS,
+        record_rate: float = DEFAULT_RECORD_RATE,
+        target_per_second: Optional[float] = None,
+        window_seconds: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            base_rate: fração de traces normais mantidos nas rotas sem regra
+            endpoint_rates: taxa por prefixo de rota (padrão: DEFAULT_ENDPOINT_RATES)
+            slow_ms: acima disso o trace é sempre mantido
+            record_rate: fração gravada na cabeça das rotas com decisão tail
+                (1.0 = todo trace lento/com erro é visto; 0.25 = 1/4 deles,
+                com spans e payloads só em 1/4 das requisições)
+            target_per_second: volume alvo de traces enviados; None = sem ajuste
+            window_seconds: janela de medição do volume para o ajuste
+        """
+        self.base_rate = base_rate
+        self.endpoint_rates = dict(DEFAULT_ENDPOINT_RATES if endpoint_rates is None else endpoint_rates)
+        self._prefixes = sorted(self.endpoint_rates, key=len, reverse=True)
+        self.slow_ms = slow_ms
+        self.record_rate = record_rate
+        self.target_per_second = target_per_second
+        self.window_seconds = window_seconds
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._window_start = clock()
+        self._window_count = 0
+        self.observed_per_second = 0.0
+
+        self.counters = {
+            "seen": 0, "recorded": 0, "kept_error": 0, "kept_slow": 0,
+            "kept_sampled": 0, "dropped": 0,
+        }
+
+    def rate_for(self, path: str) -> float:
+        """Taxa final de traces normais da rota (já com o ajuste de volume)."""
+        rate = self.base_rate
+        for prefix in self._prefixes:
+            if path.startswith(prefix):
+                rate = self.endpoint_rates[prefix]
+                break
+        if self.target_per_second and self.observed_per_second > self.target_per_second:
+            rate *= self.target_per_second / self.observed_per_second
+        return rate
+
+    def _observe_arrival(self):
+        with self._lock:
+            self._window_count += 1
+            now = self._clock()
+            elapsed = now - self._window_start
+            if elapsed >= self.window_seconds:
+                self.observed_per_second = self._window_count / elapsed
+                self._window_start, self._window_count = now, 0
+
+    @staticmethod
+    def _path(sampling_context: Dict[str, Any]) -> str:
+        scope = sampling_context.get("asgi_scope") or {}
+        if scope.get("path"):
+            return scope["path"]
+        return (sampling_context.get("transaction_context") or {}).get("name") or ""
+
+    def traces_sampler(self, sampling_context: Dict[str, Any]) -> float:
+        """Decisão na cabeça (passar como `traces_sampler` do sentry_sdk.init)."""
+        parent_sampled = sampling_context.get("parent_sampled")
+        if parent_sampled is not None:
+            return 1.0 if parent_sampled else 0.0
+
+        self._observe_arrival()
+        self.counters["seen"] += 1
+        path = self._path(sampling_context)
+        rate = self.rate_for(path)
+        if path.startswith(HEAD_ONLY_PREFIXES):
+            return rate
+        # Gravar mais que a taxa final para poder manter os lentos/com erro
+        return max(rate, self.record_rate)
+
+    def before_send_transaction(self, event: Dict[str, Any], hint: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Decisão tail (passar como `before_send_transaction`)."""
+        self.counters["recorded"] += 1
+        trace = (event.get("contexts") or {}).get("trace") or {}
+
+        if trace.get("parent_span_id"):
+            # Trace continuado: a decisão já veio do serviço de origem
+            self.counters["kept_sampled"] += 1
+            return self._trim_spans(event)
+
+        if trace.get("status") not in (None, "ok"):
+            self.counters["kept_error"] += 1
+            return self._trim_spans(event)
+
+        duration = _duration_ms(event)
+        if duration is not None and duration >= self.slow_ms:
+            self.counters["kept_slow"] += 1
+            return self._trim_spans(event)
+
+        path = event.get("request", {}).get("url", "") or event.get("transaction") or ""
+        if "://" in path:
+            path = "/" + path.split("://", 1)[1].partition("/")[2]
+        rate = self.rate_for(path)
+        recorded = rate if path.startswith(HEAD_ONLY_PREFIXES) else max(rate, self.record_rate)
+        keep_fraction = rate / recorded if recorded else 0.0
+        if _trace_fraction(trace.get("trace_id")) < keep_fraction:
+            self.counters["kept_sampled"] += 1
+            return self._trim_spans(event)
+
+        self.counters["dropped"] += 1
+        return None
+
+    @staticmethod
+    def _trim_spans(event: Dict[str, Any]) -> Dict[str, Any]:
+        """Rede de segurança: cortar payloads grandes que vieram sem set_payload."""
+        for span in event.get("spans") or []:
+            data = span.get("data")
+            if not data:
+                continue
+            for key in PAYLOAD_KEYS:
+                value = data.get(key)
+                if isinstance(value, str) and len(value) > _max_payload_chars:
+                    data[key] = trim_payload(value, _max_payload_chars)
+        return event
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "observed_per_second": round(self.observed_per_second, 2)}
+
+
+def sampling_options(sampler: Optional[AdaptiveSampler] = None) -> Dict[str, Any]:
+    """
+    Opções do sentry_sdk.init com o sampler configurado pelo ambiente:
+
+    SENTRY_TRACES_SAMPLE_RATE (taxa base, 0.1), SENTRY_SLOW_REQUEST_MS (2000),
+    SENTRY_TRACES_RECORD_RATE (0.25), SENTRY_TARGET_TRACES_PER_SECOND (sem alvo).
+    """
+    if sampler is None:
+        target = os.getenv("SENTRY_TARGET_TRACES_PER_SECOND")
+        sampler = AdaptiveSampler(
+            base_rate=float(os.getenv("SENTRY_TRACES_SAMPLE_RATE", "0.1")),
+            slow_ms=float(os.getenv("SENTRY_SLOW_REQUEST_MS", DEFAULT_SLOW_MS)),
+            record_rate=float(os.getenv("SENTRY_TRACES_RECORD_RATE", DEFAULT_RECORD_RATE)),
+            target_per_second=float(target) if target else None,
+        )
+    return {
+        "traces_sampler": sampler.traces_sampler,
+        "before_send_transaction": sampler.before_send_transaction,
+    }
@@ -0,0 +1,296 @@
+"""
+Sink local de envelopes Sentry (volume e custo da instrumentação sem rede).
+
+O CI não alcança `ingest.us.sentry.io`, então não sabíamos quantos eventos e
+spans cada endpoint gera nem quantos bytes isso custa. Aqui os envelopes são
+gravados em SQLite (sql/schemas/sentry_sink_schema.sql) e resumidos por
+endpoint: eventos/s, bytes/evento e spans por transação.
+
+Duas formas de receber:
+
+- `SinkTransport`: transport in-process (`sentry_sdk.init(transport=SinkTransport(store))`)
+- `LocalSentrySink`: servidor HTTP que aceita `POST /api/<projeto>/envelope/`
+  de um SDK real (`SENTRY_DSN=sink.dsn`), com gzip/br como o HttpTransport
+
+Uso:
+    python -m agents.sentry_sink --db sentry_sink.db --port 9000
+    SENTRY_DSN=http://public@127.0.0.1:9000/1 uvicorn main_ai_monitoring:app
+    python -m agents.sentry_sink --db sentry_sink.db --report
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from sentry_sdk.envelope import Envelope
+from sentry_sdk.transport import Transport
+
+from .sentry_sampling import _duration_ms
+
+SCHEMA_FILE = Path(__file__).resolve().parent.parent.parent / "sql" / "schemas" / "sentry_sink_schema.sql"
+DEFAULT_DB_PATH = "sentry_sink.db"
+
+ENVELOPE_PATH_RE = re.compile(r"^/api/(?P<project>[^/]+)/envelope/?$")
+
+# Itens com payload de evento (os demais só contam bytes)
+EVENT_ITEM_TYPES = ("event", "transaction")
+
+
+def _endpoint(event: Dict[str, Any]) -> Optional[str]:
+    """Rota do evento: nome da transação ou, sem ela, o path da URL do request."""
+    if event.get("transaction"):
+        return event["transaction"]
+    url = (event.get("request") or {}).get("url") or ""
+    if "://" in url:
+        return "/" + url.split("://", 1)[1].partition("/")[2].partition("?")[0]
+    return None
+
+
+class EnvelopeStore:
+    """Envelopes e itens recebidos, em SQLite."""
+
+    def __init__(self, db_path: Optional[str] = None, clock: Callable[[], float] = time.time):
+        self.db_path = db_path or os.getenv("SENTRY_SINK_DB_PATH", DEFAULT_DB_PATH)
+        self._clock = clock
+        # Uma conexão compartilhada (o servidor HTTP grava de várias threads)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA_FILE.read_text(encoding="utf-8"))
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._conn.close()
+
+    def add(self, envelope: Envelope, wire_bytes: Optional[int] = None) -> int:
+        """Gravar o envelope (e seus itens) e devolver o id."""
+        raw = envelope.serialize()
+        now = self._clock()
+        rows = []
+        for item in envelope.items:
+            payload = item.payload.get_bytes()
+            endpoint = level = event_id = duration = None
+            span_count = 0
+            if item.type in EVENT_ITEM_TYPES:
+                event = item.payload.json if item.payload.json is not None else json.loads(payload)
+                endpoint = _endpoint(event)
+                level = event.get("level")
+                event_id = event.get("event_id")
+                if item.type == "transaction":
+                    span_count = len(event.get("spans") or [])
+                    duration = _duration_ms(event)
+            rows.append((now, item.type, endpoint, level, event_id, len(payload), span_count, duration))
+
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO sentry_envelopes (received_at, bytes, wire_bytes, item_count) VALUES (?, ?, ?, ?)",
+                (now, len(raw), wire_bytes if wire_bytes is not None else len(raw), len(rows)),
+            )
+            envelope_id = cursor.lastrowid
+            self._conn.executemany(
+                """INSERT INTO sentry_items
+                   (envelope_id, received_at, item_type, endpoint, level, event_id, bytes, span_count, duration_ms)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                [(envelope_id, *row) for row in rows],
+            )
+        return envelope_id
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sentry_items")
+            self._conn.execute("DELETE FROM sentry_envelopes")
+
+    def report(self, duration_s: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Resumo por endpoint e tipo de item.
+
+        `duration_s` é a janela da taxa de eventos/s; sem ela, usa o intervalo
+        entre o primeiro e o último recebimento.
+        """
+        with self._lock:
+            window = self._conn.execute(
+                "SELECT MIN(received_at) AS first, MAX(received_at) AS last, COUNT(*) AS items, "
+                "COALESCE(SUM(bytes), 0) AS bytes FROM sentry_items"
+            ).fetchone()
+            envelopes = self._conn.execute(
+                "SELECT COUNT(*) AS n, COALESCE(SUM(bytes), 0) AS bytes, "
+                "COALESCE(SUM(wire_bytes), 0) AS wire_bytes FROM sentry_envelopes"
+            ).fetchone()
+            rows = self._conn.execute(
+                """SELECT COALESCE(endpoint, '(sem endpoint)') AS endpoint, item_type,
+                          COUNT(*) AS events, SUM(bytes) AS bytes, AVG(bytes) AS bytes_per_event,
+                          AVG(span_count) AS spans_avg, MAX(span_count) AS spans_max,
+                          AVG(duration_ms) AS duration_ms_avg
+                   FROM sentry_items GROUP BY 1, 2 ORDER BY 1, 2"""
+            ).fetchall()
+
+        if duration_s is None and window["items"]:
+            duration_s = window["last"] - window["first"]
+        rate_window = duration_s if duration_s and duration_s > 0 else None
+
+        endpoints: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            endpoints.setdefault(row["endpoint"], {})[row["item_type"]] = {
+                "events": row["events"],
+                "events_per_sec": round(row["events"] / rate_window, 2) if rate_window else None,
+                "bytes": row["bytes"],
+                "bytes_per_event": round(row["bytes_per_event"], 1),
+                "spans_avg": round(row["spans_avg"], 2),
+                "spans_max": row["spans_max"],
+                "duration_ms_avg": round(row["duration_ms_avg"], 2) if row["duration_ms_avg"] is not None else None,
+            }
+        return {
+            "duration_s": round(duration_s, 3) if duration_s is not None else None,
+            "envelopes": envelopes["n"],
+            "items": window["items"],
+            "bytes": envelopes["bytes"],
+            "wire_bytes": envelopes["wire_bytes"],
+            "events_per_sec": round(window["items"] / rate_window, 2) if rate_window else None,
+            "endpoints": endpoints,
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Relatório legível do `EnvelopeStore.report()`."""
+    lines = [
+        f"📦 Sentry sink: {report['envelopes']} envelopes, {report['items']} itens, "
+        f"{report['bytes']} bytes ({report['wire_bytes']} na rede)"
+        + (f", {report['events_per_sec']} eventos/s" if report["events_per_sec"] is not None else "")
+    ]
+    for endpoint, types in report["endpoints"].items():
+        lines.append(f"   {endpoint}")
+        for item_type, stats in types.items():
+            spans = f" | spans {stats['spans_avg']} (máx {stats['spans_max']})" if item_type == "transaction" else ""
+            rate = f" | {stats['events_per_sec']}/s" if stats["events_per_sec"] is not None else ""
+            lines.append(
+                f"      {item_type:<12} {stats['events']:>6} eventos | "
+                f"{stats['bytes_per_event']:>9.1f} bytes/evento{rate}{spans}"
+            )
+    return "\n".join(lines)
+
+
+class SinkTransport(Transport):
+    """Transport in-process que grava cada envelope no `EnvelopeStore`."""
+
+    def __init__(self, store: EnvelopeStore, options=None):
+        super().__init__(options)
+        self.store = store
+
+    def capture_envelope(self, envelope: Envelope):
+        self.store.add(envelope)
+
+
+class LocalSentrySink:
+    """Servidor HTTP local no lugar do ingest do Sentry (só envelopes)."""
+
+    def __init__(self, store: EnvelopeStore, host: str = "127.0.0.1", port: int = 0):
+        self.store = store
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+        self.requests = 0
+
+    @property
+    def dsn(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://public@{host}:{port}/1"
+
+    def start(self) -> "LocalSentrySink":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, name="sentry-sink", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "LocalSentrySink":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @staticmethod
+    def _decode(body: bytes, encoding: str) -> bytes:
+        if encoding == "gzip":
+            return gzip.decompress(body)
+        if encoding == "br":
+            import brotli  # opcional, como no sentry_sdk
+            return brotli.decompress(body)
+        return body
+
+    def _handler_class(self):
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status: int, payload: Any):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                if not ENVELOPE_PATH_RE.match(self.path.partition("?")[0]):
+                    self._send(404, {"detail": "not found"})
+                    return
+                try:
+                    raw = sink._decode(body, (self.headers.get("Content-Encoding") or "").lower())
+                    envelope = Envelope.deserialize(raw)
+                except (OSError, ValueError, ImportError) as e:
+                    self._send(400, {"detail": f"envelope inválido: {e}"})
+                    return
+                sink.requests += 1
+                envelope_id = sink.store.add(envelope, wire_bytes=len(body))
+                self._send(200, {"id": str(envelope_id)})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    """CLI: subir o sink ou imprimir o relatório de um banco já gravado."""
+    parser = argparse.ArgumentParser(description="Sink local de envelopes Sentry")
+    parser.add_argument("--db", default=None, help=f"Banco SQLite (padrão: $SENTRY_SINK_DB_PATH ou {DEFAULT_DB_PATH})")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--report", action="store_true", help="Só imprimir o relatório e sair")
+    parser.add_argument("--json", action="store_true", help="Relatório em JSON")
+    args = parser.parse_args()
+
+    store = EnvelopeStore(args.db)
+    if args.report:
+        report = store.report()
+        print(json.dumps(report, indent=2, ensure_ascii=False) if args.json else format_report(report))
+        return
+
+    sink = LocalSentrySink(store, args.host, args.port).start()
+    print(f"📥 Sentry sink em {sink.dsn} (banco {store.db_path})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        sink.stop()
+        print(format_report(store.report()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Modo de produção dos apps FastAPI: liveness, readiness e sessões compartilhadas.
+
+O serve.py sobe vários workers uvicorn atrás do mesmo socket; cada app chama
+`install_serving(app, nome)` e ganha:
+
+- GET /healthz: liveness (o processo responde); traz o pid do worker
+- GET /readyz: readiness; 503 até o startup terminar, se o estado
+  compartilhado (agents/session_store.py) não responde, ou durante o
+  desligamento gracioso (reload com SIGHUP ou SIGTERM): com `DrainingServer`
+  o worker vira "draining" já no sinal, antes de o uvicorn fechar o socket
+- GET /ai-agent/sessions e /ai-agent/sessions/{session_id}: sessões do
+  store compartilhado, respondidas por qualquer worker
+
+LATENCY_SCALE (env SIMULATED_LATENCY_SCALE, padrão 1) multiplica as latências
+simuladas dos apps; o teste de carga usa 0 para medir só CPU.
+
+Uso:
+    app = FastAPI()
+    install_serving(app, "ai-agent-monitoring")
+"""
+
+import os
+import sqlite3
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import uvicorn
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from .session_store import SESSIONS, SessionStore
+
+LATENCY_SCALE = float(os.getenv("SIMULATED_LATENCY_SCALE", "1"))
+
+# Apps deste processo a marcar como "draining" quando o worker recebe o sinal de término
+_drain_hooks: List[Callable[[], None]] = []
+
+
+def begin_draining():
+    """Marcar todos os apps deste processo como saindo (/readyz passa a 503)."""
+    for hook in list(_drain_hooks):
+        hook()
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn.Server que marca o worker como draining no SIGTERM/SIGINT, não só no shutdown."""
+
+    def handle_exit(self, sig, frame):
+        if not self.should_exit:
+            begin_draining()
+        super().handle_exit(sig, frame)
+
+
+def install_serving(app, name: str, store: Optional[SessionStore] = None):
+    """Adicionar /healthz, /readyz e as rotas de sessões a um app FastAPI."""
+    store = SESSIONS if store is None else store
+    state: Dict[str, Any] = {"phase": "starting", "started_at": time.time()}
+
+    async def on_startup():
+        state["phase"] = "ready"
+        # O supervisor do serve.py espera esta linha antes de parar o worker antigo
+        store.set_worker_phase(name, "ready")
+
+    def drain():
+        if state["phase"] == "draining":
+            return
+        state["phase"] = "draining"
+        try:
+            store.set_worker_phase(name, "draining")
+        except sqlite3.Error:
+            pass  # roda no handler do sinal: o estado local já responde 503
+
+    async def on_shutdown():
+        # Sem DrainingServer (uvicorn direto), a marcação só chega aqui
+        drain()
+
+    _drain_hooks.append(drain)
+    app.add_event_handler("startup", on_startup)
+    app.add_event_handler("shutdown", on_shutdown)
+
+    @app.get("/healthz", include_in_schema=False)
+    async def healthz():
+        return {"status": "ok", "pid": os.getpid(), "uptime_s": round(time.time() - state["started_at"], 1)}
+
+    @app.get("/readyz", include_in_schema=False)
+    async def readyz():
+        status = state["phase"]
+        if status == "ready" and not store.ping():
+            status = "state_unavailable"
+        body = {"status": status, "pid": os.getpid()}
+        return JSONResponse(body, status_code=200 if status == "ready" else 503)
+
+    @app.get("/ai-agent/sessions")
+    async def list_sessions():
+        """Sessões por status deste app (todos os workers)"""
+        return {"app": name, "sessions": store.counts(name)}
+
+    @app.get("/ai-agent/sessions/{session_id}")
+    async def get_session(session_id: str):
+        """Uma sessão do store compartilhado, atendida por qualquer worker"""
+        session = store.get(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Sessão não encontrada")
+        return session
+
+    return app
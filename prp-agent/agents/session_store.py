@@ -0,0 +1,173 @@
+"""
+Estado das sessões dos agentes compartilhado entre processos (SQLite em WAL).
+
+Com um só processo uvicorn, o que um app sabia sobre as sessões ficava na
+memória dele. No modo de produção (serve.py, vários workers) cada requisição
+pode cair em um processo diferente, então as sessões vão para um SQLite
+(sql/schemas/agent_sessions_schema.sql) em modo WAL: leitores não bloqueiam o
+escritor e todos os workers enxergam as mesmas linhas.
+
+- Uma conexão por thread, aberta no primeiro uso (nada é herdado entre processos)
+- synchronous=NORMAL: com WAL, só o último commit pode se perder em queda de energia
+- busy_timeout para escritas concorrentes de vários workers: nos handlers
+  async use `start_async`/`complete_async`/`fail_async`, que rodam a escrita
+  em uma thread (`asyncio.to_thread`) em vez de travar o event loop
+- Retenção: sessões encerradas há mais de `retention_seconds`
+  (AGENT_SESSIONS_RETENTION_SECONDS, padrão 24 h) são apagadas, no máximo uma
+  vez por `prune_interval`, junto com as conclusões
+
+Uso:
+    await SESSIONS.start_async(session_id, "ai-agent-monitoring", agent, model, user_id)
+    await SESSIONS.complete_async(session_id, total_tokens, tools_count, processing_time)
+    SESSIONS.get(session_id)
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+SCHEMA_FILE = Path(__file__).resolve().parent.parent.parent / "sql" / "schemas" / "agent_sessions_schema.sql"
+DEFAULT_DB_PATH = "agent_state.db"
+
+BUSY_TIMEOUT_MS = 5000
+
+DEFAULT_RETENTION_SECONDS = 24 * 3600
+PRUNE_INTERVAL_SECONDS = 60.0
+
+
+class SessionStore:
+    """Sessões dos agentes em SQLite compartilhado (WAL)."""
+
+    def __init__(self, db_path: Optional[str] = None, clock: Callable[[], float] = time.time,
+                 retention_seconds: Optional[float] = None, prune_interval: float = PRUNE_INTERVAL_SECONDS):
+        self._db_path = db_path
+        self._clock = clock
+        self._local = threading.local()
+        if retention_seconds is None:
+            retention_seconds = float(os.getenv("AGENT_SESSIONS_RETENTION_SECONDS", DEFAULT_RETENTION_SECONDS))
+        self.retention_seconds = retention_seconds  # 0 desliga a retenção
+        self.prune_interval = prune_interval
+        self._last_prune_at: Optional[float] = None
+
+    @property
+    def db_path(self) -> str:
+        # Resolvido no uso: serve.py define AGENT_STATE_DB_PATH antes de subir os workers
+        return self._db_path or os.getenv("AGENT_STATE_DB_PATH", DEFAULT_DB_PATH)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "path", None) != self.db_path:
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.executescript(SCHEMA_FILE.read_text(encoding="utf-8"))
+            self._local.conn = conn
+            self._local.path = self.db_path
+        return conn
+
+    def close(self):
+        """Fechar a conexão da thread atual."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def start(self, session_id: str, app: str, agent: str, model: str, user_id: Optional[str] = None):
+        self._connection().execute(
+            """INSERT OR REPLACE INTO agent_sessions
+               (session_id, app, agent, model, user_id, status, worker_pid, started_at)
+               VALUES (?, ?, ?, ?, ?, 'processing', ?, ?)""",
+            (session_id, app, agent, model, user_id, os.getpid(), self._clock()),
+        )
+
+    def complete(self, session_id: str, total_tokens: int, tools_count: int, processing_time: float):
+        self._connection().execute(
+            """UPDATE agent_sessions
+               SET status = 'completed', total_tokens = ?, tools_count = ?, processing_time = ?, finished_at = ?
+               WHERE session_id = ?""",
+            (total_tokens, tools_count, processing_time, self._clock(), session_id),
+        )
+        self._maybe_prune()
+
+    def fail(self, session_id: str, error: str):
+        self._connection().execute(
+            "UPDATE agent_sessions SET status = 'failed', error = ?, finished_at = ? WHERE session_id = ?",
+            (error, self._clock(), session_id),
+        )
+        self._maybe_prune()
+
+    async def start_async(self, session_id: str, app: str, agent: str, model: str, user_id: Optional[str] = None):
+        await asyncio.to_thread(self.start, session_id, app, agent, model, user_id)
+
+    async def complete_async(self, session_id: str, total_tokens: int, tools_count: int, processing_time: float):
+        await asyncio.to_thread(self.complete, session_id, total_tokens, tools_count, processing_time)
+
+    async def fail_async(self, session_id: str, error: str):
+        await asyncio.to_thread(self.fail, session_id, error)
+
+    def prune(self, older_than: float) -> int:
+        """Apagar sessões encerradas (completed/failed) antes de `older_than` (epoch)."""
+        return self._connection().execute(
+            "DELETE FROM agent_sessions WHERE finished_at IS NOT NULL AND finished_at < ?", (older_than,)
+        ).rowcount
+
+    def _maybe_prune(self):
+        if self.retention_seconds <= 0:
+            return
+        now = self._clock()
+        if self._last_prune_at is not None and now - self._last_prune_at < self.prune_interval:
+            return
+        self._last_prune_at = now
+        self.prune(now - self.retention_seconds)
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT * FROM agent_sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def counts(self, app: Optional[str] = None) -> Dict[str, int]:
+        """Sessões por status (de um app ou de todos)."""
+        query = "SELECT status, COUNT(*) AS n FROM agent_sessions"
+        params: tuple = ()
+        if app:
+            query += " WHERE app = ?"
+            params = (app,)
+        rows = self._connection().execute(query + " GROUP BY status", params).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def set_worker_phase(self, app: str, phase: str):
+        """Registrar a fase deste processo (ready/draining) para o supervisor do serve.py."""
+        self._connection().execute(
+            "INSERT OR REPLACE INTO agent_workers (pid, app, phase, updated_at) VALUES (?, ?, ?, ?)",
+            (os.getpid(), app, phase, self._clock()),
+        )
+
+    def worker_phase(self, pid: int, since: float = 0.0) -> Optional[str]:
+        """Fase do processo `pid` registrada a partir de `since` (pids reaproveitados não contam)."""
+        row = self._connection().execute(
+            "SELECT phase FROM agent_workers WHERE pid = ? AND updated_at >= ?", (pid, since)
+        ).fetchone()
+        return row["phase"] if row else None
+
+    def forget_worker(self, pid: int):
+        """Apagar a linha de um worker que saiu."""
+        self._connection().execute("DELETE FROM agent_workers WHERE pid = ?", (pid,))
+
+    def ping(self) -> bool:
+        """True se o banco compartilhado responde (usado no /readyz)."""
+        try:
+            self._connection().execute("SELECT 1 FROM agent_sessions LIMIT 1").fetchall()
+            return True
+        except sqlite3.Error:
+            return False
+
+
+# Store global dos apps (o caminho vem de AGENT_STATE_DB_PATH)
+SESSIONS = SessionStore()
@@ -21,6 +21,12 @@ class Settings(BaseSettings):
     
     # Database Configuration
     database_path: str = Field(default="../context-memory.db", description="Caminho para o banco de dados")
+
+    # Turso Configuration (HTTP pipeline do libSQL; vazio = MCP simulado)
+    turso_database_url: str = Field(default="", description="URL do banco Turso/libSQL (libsql://... ou http://host:porta)")
+    turso_auth_token: str = Field(default="", description="Token de autenticação do Turso")
+    turso_replica_path: str = Field(default="", description="Arquivo SQLite da réplica embarcada de leitura (vazio = ler do primário)")
+    turso_replica_sync_interval: float = Field(default=1.0, description="Intervalo (s) do sync periódico da réplica (0 = só sob demanda)")
     
     # Agent Configuration
     max_tokens_per_analysis: int = Field(default=4000, description="Máximo de tokens por análise")
@@ -38,6 +44,24 @@ class Settings(BaseSettings):
     sentry_org: str = Field(default="", description="Sentry Organization")
     sentry_api_url: str = Field(default="", description="Sentry API URL")
     
+    # MCP Metrics Configuration
+    mcp_metrics_enabled: bool = Field(default=True, description="Coletar métricas por ferramenta MCP")
+    mcp_metrics_dump_path: str = Field(default="", description="Arquivo JSON para dump periódico das métricas (vazio = desabilitado)")
+    mcp_metrics_dump_interval: int = Field(default=60, description="Intervalo do dump de métricas em segundos")
+    
+    # Semantic Index Configuration
+    semantic_index_dir: str = Field(default="", description="Diretório do índice semântico local (vazio = desabilitado)")
+
+    # Context Cache Configuration
+    context_cache_size: int = Field(default=256, description="Entradas no cache de busca de contexto (0 = desabilitado)")
+    context_cache_refresh_interval: float = Field(default=1.0, description="Intervalo mínimo (s) entre leituras dos contadores de mudança do banco")
+
+    # Write-behind Configuration
+    write_behind_enabled: bool = Field(default=True, description="Salvar conversas em segundo plano (sem bloquear a resposta)")
+    write_behind_flush_interval: float = Field(default=0.5, description="Intervalo (s) para agrupar conversas em um lote")
+    write_behind_max_batch: int = Field(default=100, description="Máximo de conversas por transação")
+    write_behind_spill_dir: str = Field(default=".write_behind", description="Diretório do spill em disco (vazio = desabilitado)")
+
     # Logging Configuration
     log_level: str = Field(default="INFO", description="Nível de logging")
     log_file: str = Field(default="prp_agent.log", description="Arquivo de log")
@@ -0,0 +1,128 @@
+"""
+Coalescência de requisições idênticas concorrentes (single-flight).
+
+Em demos e replays do CI chegam rajadas do mesmo prompt ao mesmo tempo, e cada
+uma rodava o pipeline inteiro (modelo + ferramentas). Com `SingleFlight.run`,
+a primeira requisição de uma chave (líder) executa; as que chegam enquanto ela
+está em andamento (seguidoras) aguardam o mesmo resultado. Nada é guardado
+depois que a execução termina: não é cache.
+
+- Exceções do líder chegam a todos os que aguardam; `on_error` (ex.: envio ao
+  Sentry) roda uma vez só, na execução, e não em cada requisição que aguardava
+- Uma seguidora cancelada (cliente desconectou) não cancela as outras; se
+  todas desistirem, a execução é cancelada
+- Métrica prp_coalesced_requests_total{flight,role} (leader, follower, bypass)
+- Opt-out por requisição com o header `X-No-Coalesce: 1`, ou global com
+  REQUEST_COALESCING=false
+
+Uso:
+    flight = SingleFlight("official-standards")
+    result, shared = await flight.run((prompt, model, temperature, agent, user_id), lambda: invoke(...),
+                                      on_error=sentry_sdk.capture_exception)
+
+A chave deve incluir tudo o que muda a resposta de cada requisição (inclusive
+o usuário, que vai para a sessão e os metadados): seguidoras recebem o
+resultado do líder como está.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+from .openmetrics import Counter
+
+OPT_OUT_HEADER = "X-No-Coalesce"
+COALESCED_HEADER = "X-Coalesced"
+
+_enabled = os.getenv("REQUEST_COALESCING", "true").lower() not in ("0", "false", "no")
+
+COALESCED_REQUESTS = Counter(
+    "prp_coalesced_requests", "Requisições por papel na coalescência (leader/follower/bypass).",
+    ("flight", "role"),
+)
+
+
+def configure(enabled: bool):
+    """Ligar/desligar a coalescência (desligada = toda requisição executa)."""
+    global _enabled
+    _enabled = enabled
+
+
+def wants_coalescing(headers: Mapping[str, str]) -> bool:
+    """False se a requisição pediu para não ser coalescida (`X-No-Coalesce`)."""
+    return (headers.get(OPT_OUT_HEADER) or "").strip().lower() not in ("1", "true", "yes")
+
+
+def _reporting(fn: Callable[[], Awaitable[Any]],
+               on_error: Callable[[Exception], Any]) -> Callable[[], Awaitable[Any]]:
+    async def call():
+        try:
+            return await fn()
+        except Exception as e:
+            on_error(e)
+            raise
+    return call
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Execuções em andamento por chave; chamadas iguais concorrentes compartilham uma."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._leaders = COALESCED_REQUESTS.labels(name, "leader")
+        self._followers = COALESCED_REQUESTS.labels(name, "follower")
+        self._bypassed = COALESCED_REQUESTS.labels(name, "bypass")
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def _forget(self, key: Hashable, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]],
+                  coalesce: bool = True,
+                  on_error: Optional[Callable[[Exception], Any]] = None) -> Tuple[Any, bool]:
+        """
+        Executar `fn()` ou aguardar a execução em andamento da mesma chave.
+
+        `on_error` é chamado uma vez por execução que falha (não por requisição).
+
+        Returns:
+            (resultado, shared) - shared é True se o resultado veio de outra requisição
+        """
+        if on_error is not None:
+            fn = _reporting(fn, on_error)
+        if not coalesce or not _enabled:
+            self._bypassed.inc()
+            return await fn(), False
+
+        call = self._calls.get(key)
+        shared = call is not None
+        if call is None:
+            call = self._calls[key] = _Call(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self._leaders.inc()
+        else:
+            self._followers.inc()
+
+        call.waiters += 1
+        try:
+            # shield: cancelar quem aguarda não cancela a execução compartilhada
+            return await asyncio.shield(call.task), shared
+        finally:
+            call.waiters -= 1
+            if not call.waiters and not call.task.done():
+                # Todos desistiram: parar o trabalho
+                call.task.cancel()
+                self._forget(key, call)
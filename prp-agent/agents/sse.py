@@ -0,0 +1,96 @@
+"""
+Server-sent events (SSE) para os endpoints de agente.
+
+Os endpoints `/process` só respondiam depois do pipeline inteiro. As variantes
+`/stream` rodam o mesmo pipeline em uma task que publica eventos conforme
+acontecem, e o cliente recebe cada um na hora:
+
+- `start`: sessão aberta (primeiro byte logo na chegada)
+- `tool_start` / `tool_end`: execução de cada ferramenta
+- `delta`: pedaços do texto do modelo
+- `usage`: tokens da execução
+- `done`: a mesma resposta do endpoint não-streaming
+- `error`: falha no pipeline (o stream termina)
+
+Se o cliente desconecta, o Starlette cancela o gerador, e o gerador cancela a
+task do pipeline (ferramentas e chamadas ao modelo param).
+
+Uso:
+    @app.post("/ai-agent/process/stream")
+    async def stream(request: AgentRequest):
+        return sse_response(lambda emit: run_pipeline(request, emit=emit))
+"""
+
+import asyncio
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from fastapi.responses import StreamingResponse
+
+Emit = Callable[[str, Dict[str, Any]], None]
+
+MEDIA_TYPE = "text/event-stream"
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # nginx: não segurar o stream em buffer
+}
+
+_DONE = object()
+
+
+def format_event(event: str, data: Any) -> str:
+    """Um evento SSE (`event:` + `data:` em JSON + linha em branco)."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def event_stream(produce: Callable[[Emit], Awaitable[Any]]) -> AsyncIterator[str]:
+    """
+    Rodar `produce(emit)` em uma task e entregar os eventos emitidos como SSE.
+
+    O retorno de `produce` vira o evento `done`; uma exceção vira `error`.
+    Fechar/cancelar o gerador cancela a task.
+    """
+    queue: "asyncio.Queue[Any]" = asyncio.Queue()
+
+    def emit(event: str, data: Dict[str, Any]):
+        queue.put_nowait((event, data))
+
+    task = asyncio.ensure_future(produce(emit))
+    task.add_done_callback(lambda _: queue.put_nowait(_DONE))
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            yield format_event(*item)
+
+        error = task.exception()
+        if error is not None:
+            yield format_event("error", {"detail": str(error), "type": type(error).__name__})
+        else:
+            result = task.result()
+            yield format_event("done", result.model_dump() if hasattr(result, "model_dump") else result)
+    finally:
+        if not task.done():
+            # Cliente desconectou: parar o pipeline
+            task.cancel()
+
+
+def sse_response(produce: Callable[[Emit], Awaitable[Any]]) -> StreamingResponse:
+    """StreamingResponse `text/event-stream` de `event_stream(produce)`."""
+    return StreamingResponse(event_stream(produce), media_type=MEDIA_TYPE, headers=STREAM_HEADERS)
+
+
+async def stream_text(emit: Optional[Emit], text: str, seconds: float, words_per_delta: int = 4):
+    """
+    Simular a geração do texto pelo modelo em `seconds`: com `emit`, publica
+    `delta`s ao longo do tempo; sem, só espera (mesma latência total).
+    """
+    if emit is None:
+        await asyncio.sleep(seconds)
+        return
+    words = text.split(" ")
+    chunks = [" ".join(words[i:i + words_per_delta]) for i in range(0, len(words), words_per_delta)]
+    for index, chunk in enumerate(chunks):
+        await asyncio.sleep(seconds / len(chunks))
+        emit("delta", {"text": chunk if index == 0 else " " + chunk})
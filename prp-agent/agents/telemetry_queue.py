@@ -0,0 +1,166 @@
+"""
+Fila de telemetria em background: resumos periódicos em vez de um evento por requisição.
+
+Os hooks de monitoramento dos apps (`monitor_ai_agent_complete`,
+`AIAgentMonitor._capture_agent_start/_complete`...) chamavam
+`sentry_sdk.capture_message` e vários `set_context` dentro de toda requisição:
+montagem do evento, scopes e envio entravam na latência. Agora o caminho da
+requisição só faz `TELEMETRY.record(...)` (um append em deque), e uma thread
+agrega os eventos e manda um resumo por intervalo:
+
+    "AI Agent telemetry (ai-agent-monitoring): 120 eventos em 10s"
+    contexts.telemetry_summary = {
+        "agent_complete/gpt-4": {"count": 40, "total_tokens": {"sum", "avg", "max"}, ...},
+        "tool/prp_parser": {"count": 25, "tokens_used": {...}},
+    }
+
+- TELEMETRY_FLUSH_SECONDS: intervalo dos resumos (padrão 10)
+- TELEMETRY_MODE=inline: um capture_message por evento, como antes (comparação/depuração)
+- Fila limitada (TELEMETRY_MAX_PENDING): acima disso os eventos são descartados e contados
+- Métrica prp_telemetry_events_total{queue,result} (queued, dropped, flushed)
+- Pendentes são enviados no `close()` e na saída do processo (atexit)
+
+Tags e breadcrumbs continuam na requisição: são baratos e acompanham os erros.
+
+Uso:
+    TELEMETRY = TelemetryQueue("ai-agent-monitoring")
+    TELEMETRY.record("agent_complete", key=model, total_tokens=420, processing_time=0.8)
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import sentry_sdk
+
+from .openmetrics import Counter
+
+DEFAULT_FLUSH_SECONDS = 10.0
+DEFAULT_MAX_PENDING = 10_000
+
+_mode = os.getenv("TELEMETRY_MODE", "queue").lower()
+
+TELEMETRY_EVENTS = Counter(
+    "prp_telemetry_events", "Eventos de telemetria por destino (queued/dropped/flushed/inline).",
+    ("queue", "result"),
+)
+
+
+def configure(mode: str):
+    """`queue` (resumos em background) ou `inline` (um capture_message por evento)."""
+    global _mode
+    _mode = mode.lower()
+
+
+def _capture_message(message: str, **kwargs):
+    # Resolvido na chamada: respeita o client atual (sentry_sdk.init nos testes/benchmarks)
+    return sentry_sdk.capture_message(message, **kwargs)
+
+
+def summarize(events: List[Tuple[str, Optional[str], Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Agregar (kind, key, campos) em contagem e sum/avg/max dos campos numéricos."""
+    groups: Dict[str, Dict[str, Any]] = {}
+    for kind, key, fields in events:
+        group = groups.setdefault(f"{kind}/{key}" if key else kind, {"count": 0})
+        group["count"] += 1
+        for name, value in fields.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            stats = group.setdefault(name, {"sum": 0, "max": value})
+            stats["sum"] += value
+            stats["max"] = max(stats["max"], value)
+    for group in groups.values():
+        for name, stats in group.items():
+            if name != "count":
+                stats["avg"] = round(stats["sum"] / group["count"], 4)
+    return groups
+
+
+class TelemetryQueue:
+    """Eventos de telemetria de um app, resumidos e enviados por uma thread."""
+
+    def __init__(self, name: str, flush_interval: Optional[float] = None,
+                 max_pending: Optional[int] = None, capture: Callable[..., Any] = _capture_message):
+        self.name = name
+        self.flush_interval = flush_interval or float(os.getenv("TELEMETRY_FLUSH_SECONDS", DEFAULT_FLUSH_SECONDS))
+        self.max_pending = max_pending or int(os.getenv("TELEMETRY_MAX_PENDING", DEFAULT_MAX_PENDING))
+        self._capture = capture
+        self._pending: Deque[Tuple[str, Optional[str], Dict[str, Any]]] = deque()
+        self._window_start = time.time()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._queued = TELEMETRY_EVENTS.labels(name, "queued")
+        self._dropped = TELEMETRY_EVENTS.labels(name, "dropped")
+        self._flushed = TELEMETRY_EVENTS.labels(name, "flushed")
+        self._inline = TELEMETRY_EVENTS.labels(name, "inline")
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def record(self, kind: str, key: Optional[str] = None, **fields: Any):
+        """Registrar um evento (caminho da requisição: só enfileira)."""
+        if _mode == "inline":
+            self._inline.inc()
+            self._capture(
+                f"AI Agent {kind} ({self.name})", level="info",
+                tags={"telemetry.queue": self.name, "telemetry.kind": kind},
+                contexts={"telemetry_event": {"key": key, **fields}},
+            )
+            return
+        if len(self._pending) >= self.max_pending:
+            self._dropped.inc()
+            return
+        self._pending.append((kind, key, fields))
+        self._queued.inc()
+        if self._thread is None:
+            self._start()
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"telemetry-{self.name}", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:  # telemetria nunca derruba o app
+                print(f"⚠️ Falha ao enviar resumo de telemetria ({self.name}): {e}")
+
+    def flush(self) -> Optional[Dict[str, Any]]:
+        """Enviar um resumo do que está pendente (None se não havia nada)."""
+        with self._flush_lock:
+            events = []
+            while self._pending:
+                events.append(self._pending.popleft())
+            now = time.time()
+            window_s, self._window_start = now - self._window_start, now
+            if not events:
+                return None
+            summary = summarize(events)
+            self._capture(
+                f"AI Agent telemetry ({self.name}): {len(events)} eventos em {window_s:.0f}s",
+                level="info",
+                tags={"telemetry.queue": self.name},
+                contexts={"telemetry_summary": summary},
+            )
+            self._flushed.inc(len(events))
+            return summary
+
+    def close(self):
+        """Parar a thread e enviar os pendentes."""
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        self.flush()
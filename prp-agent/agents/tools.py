@@ -10,6 +10,9 @@ import logging
 from typing import List, Dict, Any, Optional
 from pydantic_ai import RunContext
 from .dependencies import PRPAgentDependencies
+from .instrumentation import traced_tool
+from .metrics import TimedConnection
+from .retrieval_cache import bump_table_version
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -17,13 +20,14 @@ logger = logging.getLogger(__name__)
 def get_db_connection(db_path: str):
     """Obter conexão com banco de dados."""
     try:
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TimedConnection)
         conn.row_factory = sqlite3.Row  # Permite acesso por nome de coluna
         return conn
     except Exception as e:
         logger.error(f"Erro ao conectar ao banco: {e}")
         raise
 
+@traced_tool
 async def create_prp(
     ctx: RunContext[PRPAgentDependencies],
     name: str,
@@ -56,6 +60,7 @@ async def create_prp(
         prp_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        bump_table_version("prps")
         
         # Adicionar à conversa
         ctx.deps.add_conversation(
@@ -70,6 +75,7 @@ async def create_prp(
         logger.error(f"Erro ao criar PRP: {e}")
         return f"❌ Erro ao criar PRP: {str(e)}"
 
+@traced_tool
 async def search_prps(
     ctx: RunContext[PRPAgentDependencies],
     query: str = None,
@@ -133,6 +139,7 @@ async def search_prps(
         logger.error(f"Erro na busca: {e}")
         return f"❌ Erro na busca: {str(e)}"
 
+@traced_tool
 async def analyze_prp_with_llm(
     ctx: RunContext[PRPAgentDependencies],
     prp_id: int,
@@ -270,6 +277,7 @@ Retorne um JSON com a seguinte estrutura:
         logger.error(f"Erro na análise: {e}")
         return f"❌ Erro na análise: {str(e)}"
 
+@traced_tool
 async def get_prp_details(
     ctx: RunContext[PRPAgentDependencies],
     prp_id: int
@@ -343,6 +351,7 @@ async def get_prp_details(
         logger.error(f"Erro ao obter detalhes: {e}")
         return f"❌ Erro ao obter detalhes: {str(e)}"
 
+@traced_tool
 async def update_prp_status(
     ctx: RunContext[PRPAgentDependencies],
     prp_id: int,
@@ -367,6 +376,7 @@ async def update_prp_status(
         
         conn.commit()
         conn.close()
+        bump_table_version("prps")
         
         # Adicionar à conversa
         ctx.deps.add_conversation(
@@ -0,0 +1,248 @@
+"""
+Gravação e replay de tráfego do agente PRP.
+
+Regressão de performance de `chat_with_prp_agent`, `chat_with_prp_agent_mcp`
+e das ferramentas MCP (mcp_server.py) contra tráfego real, sem pagar tokens:
+
+- Gravação (PRP_TRAFFIC_RECORD_PATH ou `configure(path)`): cada chamada vira
+  uma sessão em JSONL com as requisições/respostas do modelo (`RecordingModel`)
+  e as chamadas de ferramentas (`@traced_tool`), com offsets e latências
+- Replay (`replaying(session, time_scale)`): um `FunctionModel` devolve as
+  respostas gravadas, esperando a latência gravada x `time_scale`; as
+  ferramentas rodam de verdade (são o código sob teste)
+
+Formato JSONL (uma sessão por linha):
+    {"entry": "chat_with_prp_agent", "input": "Criar PRP...", "started_at": 1790000000.0,
+     "latency_s": 2.31, "output": "...", "error": null,
+     "steps": [
+        {"type": "model", "model": "gpt-4o", "offset_s": 0.0, "latency_s": 1.2,
+         "request": {...}, "response": {...}},
+        {"type": "tool", "name": "search_prps", "offset_s": 1.2, "latency_s": 0.01,
+         "args": {"query": "auth"}, "output": "...", "error": false}]}
+
+O harness (benchmark_prp_replay.py) reproduz as sessões e compara as
+distribuições de latência (ponta a ponta e por ferramenta) entre builds.
+
+Uso:
+    with traffic_session("chat_with_prp_agent", message) as traffic:
+        ...
+        if traffic:
+            traffic.output = response
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from pydantic_ai.messages import ModelMessagesTypeAdapter, ModelResponse
+from pydantic_ai.models import Model
+from pydantic_ai.models.function import FunctionModel
+from pydantic_ai.models.wrapper import WrapperModel
+
+_record_path: Optional[str] = os.getenv("PRP_TRAFFIC_RECORD_PATH") or None
+_write_lock = threading.Lock()
+
+_session: ContextVar[Optional["TrafficSession"]] = ContextVar("prp_traffic_session", default=None)
+_replay_model: ContextVar[Optional[Model]] = ContextVar("prp_replay_model", default=None)
+
+
+class ReplayDivergence(Exception):
+    """O agente pediu mais respostas do modelo do que a sessão gravada tem."""
+
+
+def configure(path: Optional[str]):
+    """Gravar sessões em `path` (None desliga a gravação)."""
+    global _record_path
+    _record_path = path or None
+
+
+def _jsonable(value: Any) -> Any:
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+def _dump_message(message) -> Dict[str, Any]:
+    return ModelMessagesTypeAdapter.dump_python([message], mode="json")[0]
+
+
+@dataclass
+class TrafficSession:
+    """Uma chamada gravada: entrada, passos (modelo/ferramentas), saída e latência."""
+
+    entry: str
+    input: Any
+    started_at: float = field(default_factory=time.time)
+    latency_s: float = 0.0
+    output: Any = None
+    error: Optional[str] = None
+    steps: List[Dict[str, Any]] = field(default_factory=list)
+
+    def __post_init__(self):
+        self._start = time.perf_counter()
+
+    def offset(self) -> float:
+        return time.perf_counter() - self._start
+
+    def model_step(self, model: str, offset_s: float, latency_s: float, request, response: ModelResponse):
+        self.steps.append({
+            "type": "model", "model": model, "offset_s": round(offset_s, 6), "latency_s": round(latency_s, 6),
+            "request": _dump_message(request) if request is not None else None,
+            "response": _dump_message(response),
+        })
+
+    def tool_step(self, name: str, offset_s: float, latency_s: float, args: Dict[str, Any], output: Any,
+                  error: bool):
+        self.steps.append({
+            "type": "tool", "name": name, "offset_s": round(offset_s, 6), "latency_s": round(latency_s, 6),
+            "args": _jsonable(args), "output": _jsonable(output), "error": error,
+        })
+
+    def to_record(self) -> Dict[str, Any]:
+        record = asdict(self)
+        record["input"] = _jsonable(self.input)
+        record["output"] = _jsonable(self.output)
+        return record
+
+
+def current_session() -> Optional[TrafficSession]:
+    """Sessão sendo gravada neste contexto (None fora da gravação)."""
+    return _session.get()
+
+
+def _append(path: str, record: Dict[str, Any]):
+    line = json.dumps(record, ensure_ascii=False)
+    with _write_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+@contextmanager
+def traffic_session(entry: str, input: Any,
+                    sink: Optional[Callable[[Dict[str, Any]], None]] = None) -> Iterator[Optional[TrafficSession]]:
+    """
+    Gravar uma chamada como sessão.
+
+    No-op (entrega None) sem destino (`sink` ou PRP_TRAFFIC_RECORD_PATH) e
+    dentro de outra sessão: `prp_chat` no MCP chama `chat_with_prp_agent`, e
+    os passos vão para a sessão de fora.
+    """
+    path = _record_path
+    if (sink is None and path is None) or _session.get() is not None:
+        yield None
+        return
+
+    session = TrafficSession(entry, input)
+    token = _session.set(session)
+    try:
+        yield session
+    except BaseException as e:
+        session.error = repr(e)
+        raise
+    finally:
+        _session.reset(token)
+        session.latency_s = round(session.offset(), 6)
+        record = session.to_record()
+        if sink is not None:
+            sink(record)
+        else:
+            _append(path, record)
+
+
+class RecordingModel(WrapperModel):
+    """Modelo que grava cada requisição/resposta na sessão corrente (se houver)."""
+
+    async def request(self, messages, model_settings, model_request_parameters) -> ModelResponse:
+        session = _session.get()
+        if session is None:
+            return await self.wrapped.request(messages, model_settings, model_request_parameters)
+        offset = session.offset()
+        start = time.perf_counter()
+        response = await self.wrapped.request(messages, model_settings, model_request_parameters)
+        session.model_step(self.wrapped.model_name, offset, time.perf_counter() - start,
+                           messages[-1] if messages else None, response)
+        return response
+
+
+def load_sessions(path: str) -> List[Dict[str, Any]]:
+    """Sessões gravadas, em ordem de chegada."""
+    with open(path, encoding="utf-8") as f:
+        sessions = [json.loads(line) for line in f if line.strip()]
+    return sorted(sessions, key=lambda session: session["started_at"])
+
+
+def replay_model(session: Dict[str, Any], time_scale: float = 1.0) -> FunctionModel:
+    """`FunctionModel` que devolve as respostas gravadas, no ritmo gravado x `time_scale`."""
+    steps = deque(step for step in session["steps"] if step["type"] == "model")
+    model_name = steps[0]["model"] if steps else "unknown"
+
+    async def respond(messages, info) -> ModelResponse:
+        if not steps:
+            raise ReplayDivergence(f"Sessão '{session['entry']}' sem mais respostas gravadas do modelo")
+        step = steps.popleft()
+        if step["latency_s"] and time_scale:
+            await asyncio.sleep(step["latency_s"] * time_scale)
+        return ModelMessagesTypeAdapter.validate_python([step["response"]])[0]
+
+    return FunctionModel(respond, model_name=f"replay:{model_name}")
+
+
+def active_replay_model() -> Optional[Model]:
+    """Modelo de replay do contexto corrente (usado por `instrumented_model`)."""
+    return _replay_model.get()
+
+
+@contextmanager
+def replaying(session: Dict[str, Any], time_scale: float = 1.0) -> Iterator[FunctionModel]:
+    """Dentro do bloco, o agente usa as respostas gravadas de `session`."""
+    model = replay_model(session, time_scale)
+    token = _replay_model.set(model)
+    try:
+        yield model
+    finally:
+        _replay_model.reset(token)
+
+
+def latency_stats(values: List[float]) -> Dict[str, float]:
+    """count, média, p50, p95, p99 e máximo (em ms)."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def percentile(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def latency_report(sessions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Distribuições de latência de um conjunto de sessões (gravadas ou reproduzidas)."""
+    tools: Dict[str, List[float]] = {}
+    for session in sessions:
+        for step in session["steps"]:
+            if step["type"] == "tool":
+                tools.setdefault(step["name"], []).append(step["latency_s"])
+    entries: Dict[str, List[float]] = {}
+    for session in sessions:
+        entries.setdefault(session["entry"], []).append(session["latency_s"])
+    return {
+        "sessions": len(sessions),
+        "errors": sum(1 for session in sessions if session.get("error")),
+        "end_to_end": latency_stats([session["latency_s"] for session in sessions]),
+        "entries": {entry: latency_stats(values) for entry, values in sorted(entries.items())},
+        "model": latency_stats([
+            step["latency_s"] for session in sessions for step in session["steps"] if step["type"] == "model"
+        ]),
+        "tools": {name: latency_stats(values) for name, values in sorted(tools.items())},
+    }
@@ -0,0 +1,363 @@
+"""
+Persistência write-behind das conversas do agente PRP.
+
+A resposta ao usuário não espera mais pela escrita no banco/MCP:
+1. `enqueue` confirma na hora (só coloca o registro na fila)
+2. Uma thread agrupa os registros e grava cada lote em uma única transação
+   (sinks que gravam registro a registro levantam `PartialBatchError` e só os
+   que falharam voltam para a fila)
+3. No encerramento (`close`/atexit) a fila é descarregada; o que não puder ser
+   gravado vai para um arquivo JSONL de spill, reprocessado no próximo start
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+INSERT_CONVERSATION_QUERY = """
+    INSERT INTO conversations (session_id, user_id, message, response, timestamp, context, metadata)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+@dataclass
+class ConversationRecord:
+    """Conversa aguardando persistência."""
+
+    session_id: str
+    message: str
+    response: str
+    context: Optional[str] = None
+    user_id: Optional[str] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    attempts: int = 0
+
+    def as_row(self) -> tuple:
+        return (self.session_id, self.user_id, self.message, self.response, self.timestamp,
+                self.context, json.dumps(self.metadata, ensure_ascii=False))
+
+
+BatchSink = Callable[[List[ConversationRecord]], None]
+
+
+class PartialBatchError(Exception):
+    """Parte do lote foi gravada; só `failed` deve ser tentado de novo."""
+
+    def __init__(self, failed: List[ConversationRecord], total: int):
+        super().__init__(f"{len(failed)} de {total} conversa(s) não foram salvas")
+        self.failed = failed
+
+
+def sqlite_conversation_sink(db_path: str) -> BatchSink:
+    """Sink que grava cada lote na tabela `conversations` em uma transação."""
+    from .retrieval_cache import bump_table_version
+    from .tools import get_db_connection
+
+    def write(batch: List[ConversationRecord]):
+        conn = get_db_connection(db_path)
+        try:
+            with conn:
+                conn.executemany(INSERT_CONVERSATION_QUERY, [record.as_row() for record in batch])
+        finally:
+            conn.close()
+        bump_table_version("conversations")
+
+    return write
+
+
+def libsql_conversation_sink(url: str, auth_token: str = "", replica=None) -> BatchSink:
+    """
+    Sink que grava cada lote no Turso/libSQL em um único pipeline transacional.
+
+    Com `replica` (EmbeddedReplica), o `seq` do change log no fim do lote vai
+    no mesmo pipeline e é registrado para as sessões do lote: a próxima
+    leitura delas na réplica espera esse `seq` (read-your-writes).
+    """
+    import asyncio
+
+    from .libsql_client import LibSQLClient
+    from .retrieval_cache import bump_table_version
+
+    async def write_async(batch: List[ConversationRecord]):
+        statements = [
+            {"query": INSERT_CONVERSATION_QUERY, "params": list(record.as_row())}
+            for record in batch
+        ]
+        if replica is not None:
+            from .embedded_replica import SESSION_SEQ_QUERY
+            statements.append({"query": SESSION_SEQ_QUERY})
+        async with LibSQLClient(url, auth_token) as client:
+            results = await client.batch(statements)
+        if replica is not None:
+            session_ids = list(dict.fromkeys(record.session_id for record in batch))
+            replica.record_session_seq(session_ids, results[-1]["rows"][0]["seq"])
+
+    def write(batch: List[ConversationRecord]):
+        # Roda na thread do write-behind, que não tem event loop próprio
+        asyncio.run(write_async(batch))
+        bump_table_version("conversations")
+
+    return write
+
+
+class WriteBehindQueue:
+    """Fila write-behind com lotes periódicos, flush no shutdown e spill em disco."""
+
+    def __init__(
+        self,
+        sink: BatchSink,
+        flush_interval: float = 0.5,
+        max_batch: int = 100,
+        max_queue: int = 10000,
+        spill_path: Optional[str] = None,
+        name: str = "write-behind",
+        max_attempts: int = 3,
+    ):
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.spill_path = spill_path
+        self.name = name
+
+        self._queue: "queue.Queue[ConversationRecord]" = queue.Queue(maxsize=max_queue)
+        self._pending = 0
+        self._pending_cond = threading.Condition()
+        self._flush_requested = threading.Event()
+        self._stop = threading.Event()
+        self._spill_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        self.flush_latency = LatencyHistogram()
+        self.enqueued = 0
+        self.written = 0
+        self.spilled = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.retried = 0
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    def start(self) -> "WriteBehindQueue":
+        if self._thread is not None:
+            return self
+        self._replay_spill()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        return self
+
+    def close(self, timeout: float = 5.0):
+        """Parar a thread gravando o que estiver na fila; o resto vai para o spill."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._flush_requested.set()
+        self._thread.join(timeout)
+        leftover = self._drain()
+        if leftover:
+            self._spill(leftover, reason="encerramento")
+            self._done(len(leftover))
+        self._thread = None
+        atexit.unregister(self.close)
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    def enqueue(self, record: ConversationRecord) -> bool:
+        """Colocar registro na fila e confirmar imediatamente."""
+        with self._pending_cond:
+            self._pending += 1
+        self.enqueued += 1
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._spill([record], reason="fila cheia")
+            self._done(1)
+        return True
+
+    @property
+    def depth(self) -> int:
+        """Registros aceitos ainda não gravados (fila + lote em andamento)."""
+        return self._pending
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Esperar até que tudo o que foi enfileirado seja gravado (ou vá para o spill)."""
+        self._flush_requested.set()
+        with self._pending_cond:
+            done = self._pending_cond.wait_for(lambda: self._pending == 0, timeout)
+        return done
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "spilled": self.spilled,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "retried": self.retried,
+            "flush_latency": self.flush_latency.to_dict(),
+        }
+
+    # ------------------------------------------------------------------
+    # Thread de escrita
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            try:
+                # Espera curta para perceber close() mesmo com intervalos longos
+                first = self._queue.get(timeout=min(self.flush_interval, 0.1))
+            except queue.Empty:
+                self._flush_requested.clear()
+                if self._stop.is_set():
+                    return
+                continue
+
+            # Juntar o que chegar até o fim do intervalo (ou até um flush)
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if self._flush_requested.is_set() or remaining <= 0:
+                    batch.extend(self._drain(self.max_batch - len(batch)))
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=min(remaining, 0.05)))
+                except queue.Empty:
+                    continue
+            self._write(batch)
+
+    def _write(self, batch: List[ConversationRecord]):
+        start = time.perf_counter()
+        requeued = 0
+        try:
+            self.sink(batch)
+            self.written += len(batch)
+            self.batches += 1
+        except PartialBatchError as e:
+            self.written += len(batch) - len(e.failed)
+            self.batches += 1
+            logger.warning(f"⚠️ {e}")
+            requeued = self._retry(e.failed)
+        except Exception as e:
+            self.failed_batches += 1
+            logger.error(f"❌ Falha ao gravar lote de {len(batch)} conversa(s): {e}")
+            self._spill(batch, reason="falha no sink")
+        finally:
+            self.flush_latency.observe((time.perf_counter() - start) * 1000)
+            self._done(len(batch) - requeued)
+
+    def _retry(self, failed: List[ConversationRecord]) -> int:
+        """Devolver à fila os registros que falharam; esgotadas as tentativas, spill."""
+        exhausted = []
+        requeued = 0
+        for record in failed:
+            record.attempts += 1
+            if record.attempts >= self.max_attempts or self._stop.is_set():
+                exhausted.append(record)
+                continue
+            try:
+                self._queue.put_nowait(record)
+                requeued += 1
+            except queue.Full:
+                exhausted.append(record)
+        self.retried += requeued
+        if exhausted:
+            self._spill(exhausted, reason="falha no sink")
+        return requeued
+
+    def _drain(self, limit: Optional[int] = None) -> List[ConversationRecord]:
+        items = []
+        while limit is None or len(items) < limit:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _done(self, count: int):
+        with self._pending_cond:
+            self._pending -= count
+            self._pending_cond.notify_all()
+
+    # ------------------------------------------------------------------
+    # Spill em disco
+    # ------------------------------------------------------------------
+
+    def _spill(self, records: List[ConversationRecord], reason: str):
+        if not self.spill_path:
+            logger.error(f"🚨 {len(records)} conversa(s) descartada(s) ({reason}) - spill desabilitado")
+            return
+        with self._spill_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.spill_path)), exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(asdict(record), ensure_ascii=False) + "\n")
+        self.spilled += len(records)
+        logger.warning(f"💾 {len(records)} conversa(s) salvas no spill ({reason}): {self.spill_path}")
+
+    def _replay_spill(self):
+        """Reenfileirar registros deixados no spill por uma execução anterior."""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        with self._spill_lock:
+            replay_path = f"{self.spill_path}.replay"
+            os.replace(self.spill_path, replay_path)
+        with open(replay_path, encoding="utf-8") as f:
+            records = [ConversationRecord(**json.loads(line)) for line in f if line.strip()]
+        os.remove(replay_path)
+        for record in records:
+            record.attempts = 0  # nova execução, novas tentativas
+            self.enqueue(record)
+        if records:
+            logger.info(f"♻️ {len(records)} conversa(s) recuperadas do spill")
+
+
+_queues: Dict[str, WriteBehindQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_write_behind_queue(key: str, sink_factory: Callable[[], BatchSink]) -> WriteBehindQueue:
+    """Fila compartilhada (uma thread por destino) criada a partir das configurações."""
+    from .settings import settings
+
+    with _queues_lock:
+        wb_queue = _queues.get(key)
+        if wb_queue is None:
+            spill_path = None
+            if settings.write_behind_spill_dir:
+                digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+                spill_path = os.path.join(settings.write_behind_spill_dir, f"conversations-{digest}.jsonl")
+            wb_queue = WriteBehindQueue(
+                sink_factory(),
+                flush_interval=settings.write_behind_flush_interval,
+                max_batch=settings.write_behind_max_batch,
+                spill_path=spill_path,
+                name=f"write-behind-{key}",
+            ).start()
+            _queues[key] = wb_queue
+        return wb_queue
+
+
+def write_behind_stats() -> Dict[str, Dict[str, Any]]:
+    """Profundidade da fila e latência de flush de todas as filas ativas."""
+    with _queues_lock:
+        return {key: wb_queue.stats() for key, wb_queue in _queues.items()}
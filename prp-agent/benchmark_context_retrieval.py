@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latência da busca de contexto do agente PRP.
+
+Popula um banco SQLite com um corpus sintético (docs, conversas, PRPs) e compara:
+1. Busca legada: três queries LIKE '%...%' sequenciais (full scan)
+2. Busca atual: queries FTS5 parametrizadas executadas concorrentemente
+3. Busca atual com cache (perguntas repetidas na sessão não tocam o banco)
+
+Uso:
+    python benchmark_context_retrieval.py --docs 5000 --iterations 50
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+# O agente carrega as configurações na importação; o benchmark não chama o LLM
+os.environ.setdefault("LLM_API_KEY", "benchmark")
+
+from agents.agent_with_mcp_turso import PRPAgentWithMCPTurso
+
+SQL_DIR = Path(__file__).resolve().parent.parent / "sql"
+SCHEMA_FILES = [
+    SQL_DIR / "operations" / "schema_simplificado_final.sql",
+    SQL_DIR / "schemas" / "context_fts_schema.sql",
+    SQL_DIR / "schemas" / "context_cache_schema.sql",
+    SQL_DIR / "schemas" / "docs_sections_search_schema.sql",
+]
+
+VOCABULARY = [
+    "agente", "prp", "turso", "mcp", "sentry", "fastapi", "autenticação", "jwt", "banco",
+    "dados", "consulta", "índice", "performance", "latência", "cache", "contexto", "tarefa",
+    "análise", "llm", "modelo", "token", "documentação", "cluster", "configuração", "deploy",
+    "docker", "teste", "pytest", "integração", "api", "rest", "endpoint", "monitoramento",
+    "erro", "trace", "span", "sessão", "usuário", "conversa", "histórico", "migração", "schema",
+    "sqlite", "replica", "sincronização", "pipeline", "lote", "transação", "prompt", "resposta",
+]
+
+QUESTIONS = [
+    "Como configurar autenticação JWT no FastAPI?",
+    "Qual a latência das consultas no banco Turso?",
+    "Como criar um PRP para monitoramento com Sentry?",
+    "O que é o cluster de documentação de MCP?",
+    "Como fazer migração do schema SQLite para o Turso?",
+    "Onde vejo o histórico de conversas do agente?",
+]
+
+LEGACY_QUERIES = [
+    """SELECT title, content, summary, cluster_name FROM docs
+       WHERE content LIKE ? OR summary LIKE ? OR keywords LIKE ?
+       ORDER BY quality_score DESC LIMIT ?""",
+    """SELECT message, response, context, timestamp FROM conversations
+       WHERE message LIKE ? OR response LIKE ?
+       ORDER BY timestamp DESC LIMIT ?""",
+    """SELECT name, title, description, objective, status FROM prps
+       WHERE description LIKE ? OR title LIKE ?
+       ORDER BY created_at DESC LIMIT ?""",
+]
+
+
+# Distribuição Zipf sobre o vocabulário + uma cauda longa de termos raros,
+# para que cada termo da busca case com uma fração realista do corpus
+_WORDS = VOCABULARY + [f"termo{i}" for i in range(20000)]
+random.Random(7).shuffle(_WORDS)
+_CUM_WEIGHTS = []
+for _rank in range(len(_WORDS)):
+    _CUM_WEIGHTS.append((_CUM_WEIGHTS[-1] if _CUM_WEIGHTS else 0) + 1 / (_rank + 1) ** 1.1)
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choices(_WORDS, cum_weights=_CUM_WEIGHTS, k=words))
+
+
+def seed_corpus(db_path: str, n_docs: int, n_conversations: int, n_prps: int, seed: int = 42):
+    """Criar schema e popular o banco com um corpus sintético determinístico."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    for schema_file in SCHEMA_FILES:
+        conn.executescript(schema_file.read_text(encoding="utf-8"))
+
+    conn.executemany(
+        """INSERT INTO docs (slug, title, content, summary, file_path, cluster_name, keywords, quality_score)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        (
+            (f"doc-{i}", _text(rng, 6), _text(rng, 400), _text(rng, 25), f"docs/doc-{i}.md",
+             rng.choice(["MCP_CORE", "TURSO_CONFIG", "GETTING_STARTED", "SENTRY"]),
+             _text(rng, 5), round(rng.uniform(1, 10), 1))
+            for i in range(n_docs)
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO conversations (session_id, message, response, context) VALUES (?, ?, ?, ?)",
+        (
+            (f"session-{i % 50}", _text(rng, 15), _text(rng, 80), "benchmark")
+            for i in range(n_conversations)
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO prps (name, title, description, objective) VALUES (?, ?, ?, ?)",
+        (
+            (f"prp-{i}", _text(rng, 6), _text(rng, 120), _text(rng, 20))
+            for i in range(n_prps)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_search(db_path: str, message: str, limit: int = 3) -> List[list]:
+    """Reproduz a busca antiga: três LIKE sequenciais, cada um com sua conexão."""
+    pattern = f"%{message[:50]}%"
+    results = []
+    for query in LEGACY_QUERIES:
+        conn = sqlite3.connect(db_path)
+        placeholders = query.count("?") - 1
+        results.append(conn.execute(query, [pattern] * placeholders + [limit]).fetchall())
+        conn.close()
+    return results
+
+
+def _summary(samples: List[float]) -> str:
+    quantiles = statistics.quantiles(samples, n=100)
+    return (f"média {statistics.mean(samples):7.2f}ms | p50 {quantiles[49]:7.2f}ms | "
+            f"p95 {quantiles[94]:7.2f}ms | máx {max(samples):7.2f}ms")
+
+
+async def run_benchmark(db_path: str, iterations: int):
+    agent = PRPAgentWithMCPTurso(database_path=db_path, cache_size=0)
+    cached_agent = PRPAgentWithMCPTurso(database_path=db_path)
+
+    legacy_ms, fts_ms, cached_ms, hits = [], [], [], 0
+    for i in range(iterations):
+        question = QUESTIONS[i % len(QUESTIONS)]
+
+        start = time.perf_counter()
+        legacy_search(db_path, question)
+        legacy_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        context = await agent.search_relevant_context(question)
+        fts_ms.append((time.perf_counter() - start) * 1000)
+        hits += sum(len(item["data"]) for item in context)
+
+        start = time.perf_counter()
+        await cached_agent.search_relevant_context(question)
+        cached_ms.append((time.perf_counter() - start) * 1000)
+
+    print(f"🐢 LIKE sequencial : {_summary(legacy_ms)}")
+    print(f"⚡ FTS concorrente : {_summary(fts_ms)}")
+    print(f"🗃️  FTS + cache     : {_summary(cached_ms)} | {cached_agent.cache.stats()['hit_rate']:.0%} hits")
+    print(f"📈 Speedup (p50)   : {statistics.median(legacy_ms) / statistics.median(fts_ms):.1f}x")
+    print(f"🔍 Itens de contexto por busca: {hits / iterations:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da busca de contexto")
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--conversations", type=int, default=5000)
+    parser.add_argument("--prps", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--db", help="Arquivo SQLite (padrão: temporário)")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="prp-bench-"), "context.db")
+    if not os.path.exists(db_path):
+        print(f"🌱 Populando corpus em {db_path}...")
+        seed_corpus(db_path, args.docs, args.conversations, args.prps)
+
+    print(f"🚀 Benchmark: {args.docs} docs, {args.conversations} conversas, "
+          f"{args.prps} PRPs, {args.iterations} iterações")
+    asyncio.run(run_benchmark(db_path, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Motor de benchmark de carga compartilhado pelos endpoints /benchmark dos apps.
+
+Roda um workload (lista de casos prompt/modelo/agente) contra um alvo assíncrono
+em dois modos:
+
+- closed: `concurrency` requisições em voo o tempo todo (cada worker dispara a
+  próxima assim que a anterior termina);
+- open: chegadas Poisson a `arrival_rate` req/s, limitadas a `concurrency` em voo.
+  A latência conta a partir do horário planejado de chegada, então a fila de
+  espera aparece nos percentis (sem "coordinated omission").
+
+Reporta throughput, latência p50/p95/p99/max e tokens/s, e grava cada execução
+em SQLite (sql/schemas/benchmark_runs_schema.sql) para comparar com a anterior.
+
+Uso:
+    python benchmark_engine.py --app main_official_standards --requests 100 --concurrency 20
+    python benchmark_engine.py --url http://localhost:8000/ai-agent/official-standards --arrival-rate 50
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import math
+import os
+import random
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+SCHEMA_FILE = Path(__file__).resolve().parent.parent / "sql" / "schemas" / "benchmark_runs_schema.sql"
+DEFAULT_DB_PATH = "benchmark_runs.db"
+
+
+@dataclass
+class WorkloadCase:
+    """Um caso do workload: o que o alvo deve processar."""
+
+    prompt: str
+    model: str = "gpt-4o-mini"
+    agent: str = "PRP Assistant"
+
+
+# Os cinco casos fixos de cada app viraram workloads nomeados
+WORKLOADS: Dict[str, List[WorkloadCase]] = {
+    "standard": [
+        WorkloadCase("Implement JWT authentication system", "gpt-4o-mini", "Security Engineer"),
+        WorkloadCase("Design RESTful API architecture", "gpt-4-turbo", "API Architect"),
+        WorkloadCase("Optimize database performance", "gpt-4", "Database Specialist"),
+        WorkloadCase("Create automated testing suite", "gpt-4o-mini", "QA Engineer"),
+        WorkloadCase("Implement CI/CD pipeline", "gpt-4-turbo", "DevOps Engineer"),
+    ],
+    "official": [
+        WorkloadCase("Analyze system architecture", "gpt-4o-mini", "Architecture Agent"),
+        WorkloadCase("Generate API documentation", "gpt-4-turbo", "Documentation Agent"),
+        WorkloadCase("Review code security", "gpt-4", "Security Agent"),
+        WorkloadCase("Optimize database queries", "gpt-4o-mini", "Performance Agent"),
+        WorkloadCase("Create automated tests", "gpt-4-turbo", "Testing Agent"),
+    ],
+    "monitoring": [
+        WorkloadCase("Analisar arquitetura de sistema", "gpt-4"),
+        WorkloadCase("Gerar documentação de API", "gpt-4-turbo"),
+        WorkloadCase("Revisar código para segurança", "gpt-3.5-turbo"),
+        WorkloadCase("Otimizar performance", "gpt-4"),
+        WorkloadCase("Criar testes automatizados", "gpt-4-turbo"),
+    ],
+    "prp": [
+        WorkloadCase("Analisar arquitetura de microserviços", "gpt-4-turbo"),
+        WorkloadCase("Gerar documentação de API REST", "gpt-4-turbo"),
+        WorkloadCase("Revisar código para segurança", "gpt-4-turbo"),
+        WorkloadCase("Otimizar queries de banco de dados", "gpt-4-turbo"),
+        WorkloadCase("Criar testes automatizados E2E", "gpt-4-turbo"),
+    ],
+}
+
+# Alvo: (caso, índice da requisição) → dict com "tokens" (total de tokens usados)
+Target = Callable[[WorkloadCase, int], Awaitable[Dict[str, Any]]]
+
+
+@dataclass
+class BenchmarkConfig:
+    """Parâmetros de uma execução."""
+
+    app: str
+    workload: str = "standard"
+    requests: int = 5
+    concurrency: int = 1
+    arrival_rate: Optional[float] = None  # req/s; None = modo closed
+    seed: int = 42
+    label: Optional[str] = None
+
+    @property
+    def mode(self) -> str:
+        return "open" if self.arrival_rate else "closed"
+
+
+@dataclass
+class BenchmarkResult:
+    """Resultado agregado de uma execução."""
+
+    config: BenchmarkConfig
+    latencies_ms: List[float] = field(default_factory=list)
+    errors: int = 0
+    duration_s: float = 0.0
+    total_tokens: int = 0
+
+    @property
+    def throughput_rps(self) -> float:
+        return len(self.latencies_ms) / self.duration_s if self.duration_s else 0.0
+
+    @property
+    def tokens_per_sec(self) -> float:
+        return self.total_tokens / self.duration_s if self.duration_s else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Percentil q (0-100) exato, com interpolação linear entre amostras."""
+        samples = sorted(self.latencies_ms)
+        if not samples:
+            return 0.0
+        rank = (len(samples) - 1) * q / 100
+        lower, upper = math.floor(rank), math.ceil(rank)
+        return samples[lower] + (samples[upper] - samples[lower]) * (rank - lower)
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies = self.latencies_ms
+        return {
+            "app": self.config.app,
+            "workload": self.config.workload,
+            "mode": self.config.mode,
+            "requests": self.config.requests,
+            "concurrency": self.config.concurrency,
+            "arrival_rate": self.config.arrival_rate,
+            "errors": self.errors,
+            "duration_s": round(self.duration_s, 3),
+            "throughput_rps": round(self.throughput_rps, 2),
+            "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "max_ms": round(max(latencies), 2) if latencies else 0.0,
+            "total_tokens": self.total_tokens,
+            "tokens_per_sec": round(self.tokens_per_sec, 1),
+            "label": self.config.label,
+        }
+
+
+async def _timed_call(target: Target, case: WorkloadCase, index: int,
+                      started_at: float, result: BenchmarkResult):
+    """Chamar o alvo e registrar latência (desde `started_at`) e tokens."""
+    try:
+        response = await target(case, index)
+    except Exception:
+        result.errors += 1
+        return
+    result.latencies_ms.append((time.perf_counter() - started_at) * 1000)
+    result.total_tokens += int(response.get("tokens", 0))
+
+
+async def run_benchmark(target: Target, config: BenchmarkConfig,
+                        cases: Optional[List[WorkloadCase]] = None) -> BenchmarkResult:
+    """
+    Rodar o workload contra o alvo.
+
+    Args:
+        target: coroutine (caso, índice) → {"tokens": int, ...}
+        config: parâmetros da execução
+        cases: casos explícitos (senão, WORKLOADS[config.workload])
+
+    Returns:
+        BenchmarkResult com as latências individuais e os agregados
+    """
+    cases = cases or WORKLOADS[config.workload]
+    result = BenchmarkResult(config)
+    semaphore = asyncio.Semaphore(max(1, config.concurrency))
+    start = time.perf_counter()
+
+    if config.mode == "closed":
+        indexes = iter(range(config.requests))
+
+        async def worker():
+            for index in indexes:
+                await _timed_call(target, cases[index % len(cases)], index, time.perf_counter(), result)
+
+        await asyncio.gather(*(worker() for _ in range(min(config.concurrency, config.requests))))
+    else:
+        rng = random.Random(config.seed)
+
+        async def arrival(index: int, scheduled_at: float):
+            async with semaphore:
+                await _timed_call(target, cases[index % len(cases)], index, scheduled_at, result)
+
+        tasks = []
+        scheduled_at = start
+        for index in range(config.requests):
+            scheduled_at += rng.expovariate(config.arrival_rate)
+            await asyncio.sleep(max(0.0, scheduled_at - time.perf_counter()))
+            tasks.append(asyncio.create_task(arrival(index, scheduled_at)))
+        await asyncio.gather(*tasks)
+
+    result.duration_s = time.perf_counter() - start
+    return result
+
+
+class BenchmarkStore:
+    """Execuções gravadas em SQLite, para comparação entre execuções."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("BENCHMARK_DB_PATH", DEFAULT_DB_PATH)
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(SCHEMA_FILE.read_text(encoding="utf-8"))
+        conn.close()
+
+    def save(self, result: BenchmarkResult) -> int:
+        """Gravar a execução e devolver o id."""
+        row = result.to_dict()
+        columns = ", ".join(row)
+        placeholders = ", ".join("?" for _ in row)
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            cursor = conn.execute(
+                f"INSERT INTO benchmark_runs ({columns}) VALUES ({placeholders})", list(row.values())
+            )
+        conn.close()
+        return cursor.lastrowid
+
+    def previous(self, app: str, workload: str, before_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Última execução do mesmo app + workload (anterior a `before_id`)."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute(
+            """SELECT * FROM benchmark_runs
+               WHERE app = ? AND workload = ? AND id < ?
+               ORDER BY id DESC LIMIT 1""",
+            (app, workload, before_id if before_id is not None else 2 ** 63 - 1),
+        ).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+
+COMPARED_METRICS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms", "tokens_per_sec")
+
+
+def compare(current: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Variação percentual de cada métrica em relação à execução anterior."""
+    if not previous:
+        return None
+    deltas = {}
+    for metric in COMPARED_METRICS:
+        before, after = previous[metric], current[metric]
+        deltas[metric] = round((after - before) / before * 100, 1) if before else None
+    return {"previous_run_id": previous["id"], "previous_label": previous["label"], "change_pct": deltas}
+
+
+async def run_and_store(target: Target, config: BenchmarkConfig,
+                        cases: Optional[List[WorkloadCase]] = None,
+                        db_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Rodar, gravar e comparar com a execução anterior (usado pelos endpoints e pela CLI).
+
+    O banco padrão é BENCHMARK_DB_PATH (ou benchmark_runs.db no diretório atual).
+    Alvos com `aclose` (ex.: `http_target`) são fechados ao final, mesmo com erro.
+    """
+    try:
+        result = await run_benchmark(target, config, cases)
+    finally:
+        close = getattr(target, "aclose", None)
+        if close is not None:
+            await close()
+    report = result.to_dict()
+    store = BenchmarkStore(db_path)
+    report["run_id"] = store.save(result)
+    report["comparison"] = compare(report, store.previous(config.app, config.workload, report["run_id"]))
+    return report
+
+
+def http_target(url: str, timeout: float = 60.0) -> Target:
+    """
+    Alvo que faz POST no endpoint de processamento de um app já rodando.
+
+    O cliente HTTP fica aberto entre as requisições; `target.aclose()` o fecha
+    (o `run_and_store` chama no final).
+    """
+    import httpx
+
+    client = httpx.AsyncClient(timeout=timeout)
+
+    async def call(case: WorkloadCase, index: int) -> Dict[str, Any]:
+        response = await client.post(url, json={
+            "prompt": case.prompt,
+            "model": case.model,
+            "agent_name": case.agent,
+            "user_id": f"benchmark_user_{index}",
+        })
+        response.raise_for_status()
+        body = response.json()
+        return {"tokens": body.get("total_tokens", body.get("tokens_used", 0))}
+
+    call.aclose = client.aclose
+    return call
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"📊 {report['app']} / {report['workload']} ({report['mode']}, "
+        f"{report['requests']} req, concorrência {report['concurrency']}"
+        + (f", {report['arrival_rate']} req/s" if report["arrival_rate"] else "") + ")",
+        f"   ⚡ {report['throughput_rps']} req/s em {report['duration_s']}s, {report['errors']} erros",
+        f"   ⏱️  p50 {report['p50_ms']}ms | p95 {report['p95_ms']}ms | "
+        f"p99 {report['p99_ms']}ms | max {report['max_ms']}ms",
+        f"   🔤 {report['total_tokens']} tokens ({report['tokens_per_sec']} tokens/s)",
+    ]
+    comparison = report.get("comparison")
+    if comparison:
+        changes = ", ".join(
+            f"{metric} {delta:+.1f}%" for metric, delta in comparison["change_pct"].items() if delta is not None
+        )
+        lines.append(f"   🔁 vs execução #{comparison['previous_run_id']}: {changes}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga dos agentes PRP")
+    target_group = parser.add_mutually_exclusive_group(required=True)
+    target_group.add_argument("--app", help="Módulo do app (em processo), ex: main_official_standards")
+    target_group.add_argument("--url", help="Endpoint de processamento de um app rodando")
+    parser.add_argument("--workload", default=None, choices=sorted(WORKLOADS))
+    parser.add_argument("--cases", help="Arquivo JSON com casos [{prompt, model, agent}]")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--arrival-rate", type=float, default=None, help="req/s (modo open)")
+    parser.add_argument("--label", default=None, help="Identificação da execução (ex: commit)")
+    parser.add_argument("--db", default=None, help="SQLite das execuções (padrão: BENCHMARK_DB_PATH)")
+    parser.add_argument("--json", action="store_true", help="Imprimir o relatório em JSON")
+    args = parser.parse_args()
+
+    if args.app:
+        module = importlib.import_module(args.app)
+        target, app_name = module.benchmark_target, args.app
+        workload = args.workload or module.BENCHMARK_WORKLOAD
+    else:
+        target, app_name = http_target(args.url), args.url
+        workload = args.workload or "standard"
+
+    cases = None
+    if args.cases:
+        cases = [WorkloadCase(**case) for case in json.loads(Path(args.cases).read_text(encoding="utf-8"))]
+        workload = Path(args.cases).stem
+
+    config = BenchmarkConfig(
+        app=app_name, workload=workload, requests=args.requests, concurrency=args.concurrency,
+        arrival_rate=args.arrival_rate, label=args.label,
+    )
+    report = asyncio.run(run_and_store(target, config, cases, args.db))
+    print(json.dumps(report, indent=2, ensure_ascii=False) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
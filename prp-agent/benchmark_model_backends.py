@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Planejamento de capacidade offline com os backends de modelo (agents/model_backends.py).
+
+Roda a mesma carga em POST /ai-agent/process (main_ai_monitoring) trocando
+só o backend:
+
+- simulated (seed): duas rodadas com a mesma seed dão os mesmos tokens e ferramentas
+- replay 1x: as execuções gravadas da rodada simulada, no ritmo original
+- replay acelerado: as mesmas execuções com as latências multiplicadas por --time-scale
+- prp_agent (TestModel): o agente real, sem tokens pagos (--with-agent)
+
+Por backend: latência (média, p50, p95 em ms), tokens totais e a
+assinatura (hash) da sequência de ferramentas/tokens, que deve bater entre
+rodadas repetidas.
+
+Uso:
+    python benchmark_model_backends.py --requests 40 --concurrency 8 --time-scale 0.1
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+import main_ai_monitoring
+from agents.model_backends import (
+    ModelBackend, PrpAgentBackend, RecordingBackend, ReplayBackend, SimulatedBackend,
+)
+
+SEED = 42
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _load(requests: int, concurrency: int) -> Tuple[List[float], List[Dict[str, Any]]]:
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=main_ai_monitoring.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+
+        async def one(i: int) -> Tuple[float, Dict[str, Any]]:
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/ai-agent/process", json={"prompt": f"Criar PRP {i}"}, headers={"X-No-Coalesce": "1"}
+                )
+                response.raise_for_status()
+                return time.perf_counter() - start, response.json()
+
+        results = await asyncio.gather(*(one(i) for i in range(requests)))
+    return [latency for latency, _ in results], [body for _, body in results]
+
+
+def _run(backend: ModelBackend, requests: int, concurrency: int) -> Dict[str, Any]:
+    saved = main_ai_monitoring.BACKEND
+    main_ai_monitoring.BACKEND = backend
+    try:
+        latencies, bodies = asyncio.run(_load(requests, concurrency))
+    finally:
+        main_ai_monitoring.BACKEND = saved
+    # Ordem das requisições (prompt i), não de conclusão: comparável entre rodadas
+    signature = json.dumps([(body["tools_called"], body["tokens_used"]) for body in bodies])
+    return {
+        "ms_mean": round(statistics.mean(latencies) * 1000, 1),
+        "ms_p50": round(_percentile(latencies, 0.50) * 1000, 1),
+        "ms_p95": round(_percentile(latencies, 0.95) * 1000, 1),
+        "tokens": sum(body["tokens_used"] for body in bodies),
+        "signature": hashlib.sha1(signature.encode()).hexdigest()[:10],
+    }
+
+
+def run_benchmark(requests: int = 40, concurrency: int = 8, time_scale: float = 0.1,
+                  with_agent: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Mesma carga por backend; a rodada simulada gravada alimenta os replays."""
+    def simulated() -> SimulatedBackend:
+        return SimulatedBackend(main_ai_monitoring.simulation_params, seed=SEED)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory(prefix="prp-backends-") as tmp:
+        recording = str(Path(tmp) / "runs.jsonl")
+        # Sequencial na gravação: a ordem do arquivo é a dos prompts
+        results["simulated (seed)"] = _run(RecordingBackend(simulated(), recording), requests, 1)
+        results["simulated (seed, repetição)"] = _run(simulated(), requests, concurrency)
+        results["replay 1x"] = _run(ReplayBackend(recording, 1.0), requests, concurrency)
+        results[f"replay {time_scale:g}x"] = _run(ReplayBackend(recording, time_scale), requests, concurrency)
+    if with_agent:
+        results["prp_agent (TestModel)"] = _run(PrpAgentBackend(use_test_model=True), requests, concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capacidade por backend de modelo")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--time-scale", type=float, default=0.1, help="aceleração do replay")
+    parser.add_argument("--with-agent", action="store_true", help="incluir o prp_agent com TestModel")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.requests, args.concurrency, args.time_scale, args.with_agent)
+    print(f"📊 Backends de modelo: {args.requests} requisições, concorrência {args.concurrency}")
+    for name, values in results.items():
+        print(f"   {name:<28} média {values['ms_mean']:>7.1f} ms   p50 {values['ms_p50']:>7.1f}   "
+              f"p95 {values['ms_p95']:>7.1f}   tokens {values['tokens']:>6}   assinatura {values['signature']}")
+    signatures = {results[name]["signature"] for name in list(results)[:4]}
+    print("   ✅ execuções repetíveis" if len(signatures) == 1 else "   ⚠️ assinaturas divergentes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Replay de tráfego gravado do agente PRP: regressão de performance por build.
+
+Gravação (agents/traffic_replay.py): com PRP_TRAFFIC_RECORD_PATH=traffic.jsonl,
+`chat_with_prp_agent`, `chat_with_prp_agent_mcp` e as ferramentas do
+mcp_server.py gravam cada chamada (requisições/respostas do modelo e chamadas
+de ferramentas, com latências). `record` gera uma gravação local com o
+TestModel (--real-model usa o LLM configurado).
+
+Replay: cada sessão roda de novo com um FunctionModel servindo as respostas
+gravadas (sem tokens pagos); as ferramentas executam de verdade, contra um
+banco novo criado do schema (ou --db). As sessões chegam nos offsets gravados
+x --time-scale (1 = ritmo original, 0.1 = 10x mais rápido, 0 = todas juntas)
+e o modelo responde na latência gravada x --time-scale.
+
+Por build (--build, padrão o commit atual): latência ponta a ponta, por
+entrada, do modelo e por ferramenta (média, p50, p95, p99), erros e sessões
+divergentes (ferramentas ou saída diferentes das gravadas). Os relatórios vão
+para --reports (JSONL); --compare BUILD mostra a variação contra outro build.
+
+Uso:
+    python benchmark_prp_replay.py record --out traffic.jsonl --messages "Criar PRP de login" "Buscar PRPs"
+    python benchmark_prp_replay.py replay traffic.jsonl --time-scale 0.1
+    python benchmark_prp_replay.py replay traffic.jsonl --time-scale 0.1 --compare a1b2c3d
+"""
+
+import argparse
+import asyncio
+import json
+import sqlite3
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from agents import traffic_replay
+from agents.agent import chat_with_prp_agent
+from agents.dependencies import PRPAgentDependencies
+from agents.traffic_replay import latency_report, load_sessions, replaying, traffic_session
+
+SCHEMA_FILE = Path(__file__).resolve().parent.parent / "sql" / "schemas" / "prp_database_schema.sql"
+DEFAULT_REPORTS = "prp_replay_reports.jsonl"
+
+DEFAULT_MESSAGES = [
+    "Criar um PRP para autenticação com JWT",
+    "Buscar PRPs de alta prioridade",
+    "Analisar o PRP 1 e extrair tarefas",
+]
+
+EntryCall = Callable[[Any, PRPAgentDependencies], Awaitable[str]]
+
+
+def create_database(path: str) -> str:
+    """Banco novo com o schema de PRPs (replays comparáveis entre builds)."""
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(SCHEMA_FILE.read_text(encoding="utf-8"))
+    finally:
+        conn.close()
+    return path
+
+
+def current_build() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).resolve().parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "local"
+
+
+def _entry_call(entry: str) -> EntryCall:
+    """Função que reproduz uma entrada gravada (imports tardios: MCP só quando usado)."""
+    if entry == "chat_with_prp_agent":
+        return lambda message, deps: chat_with_prp_agent(message, deps)
+    if entry == "chat_with_prp_agent_mcp":
+        from agents.agent_with_mcp_turso import chat_with_prp_agent_mcp
+        return lambda message, deps: chat_with_prp_agent_mcp(message, deps)
+    if entry.startswith("mcp:"):
+        import mcp_server
+
+        async def call(args, deps):
+            mcp_server.agent_deps = deps  # banco do replay
+            return await mcp_server._dispatch_tool(entry[len("mcp:"):], args)
+        return call
+    raise ValueError(f"Entrada gravada desconhecida: {entry}")
+
+
+async def record_traffic(messages: List[str], out: str, db_path: str, use_test_model: bool = True):
+    """Gravar uma conversa por mensagem em `out` (formato do replay)."""
+    traffic_replay.configure(out)
+    try:
+        for message in messages:
+            await chat_with_prp_agent(message, PRPAgentDependencies(database_path=db_path), use_test_model)
+    finally:
+        traffic_replay.configure(None)
+
+
+async def _replay_session(session: Dict[str, Any], db_path: str, time_scale: float,
+                          replayed: List[Dict[str, Any]]):
+    call = _entry_call(session["entry"])
+    deps = PRPAgentDependencies(database_path=db_path)
+    try:
+        with replaying(session, time_scale), \
+                traffic_session(session["entry"], session["input"], sink=replayed.append) as traffic:
+            traffic.output = await call(session["input"], deps)
+    except Exception as e:  # já anotado na sessão; as demais continuam
+        print(f"⚠️ Sessão '{session['entry']}' falhou no replay: {e}")
+
+
+async def replay_traffic(sessions: List[Dict[str, Any]], db_path: str,
+                         time_scale: float = 1.0) -> List[Optional[Dict[str, Any]]]:
+    """Reproduzir as sessões nos offsets gravados x `time_scale`; resultado na ordem de `sessions`."""
+    if not sessions:
+        return []
+    first = sessions[0]["started_at"]
+    start = time.perf_counter()
+    outputs: List[List[Dict[str, Any]]] = [[] for _ in sessions]
+
+    async def arrive(index: int, session: Dict[str, Any]):
+        delay = (session["started_at"] - first) * time_scale - (time.perf_counter() - start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await _replay_session(session, db_path, time_scale, outputs[index])
+
+    await asyncio.gather(*(arrive(index, session) for index, session in enumerate(sessions)))
+    return [output[0] if output else None for output in outputs]
+
+
+def _tool_names(session: Dict[str, Any]) -> List[str]:
+    # Ferramentas de uma mesma resposta rodam em paralelo: comparar sem ordem
+    return sorted(step["name"] for step in session["steps"] if step["type"] == "tool")
+
+
+def run_replay(path: str, time_scale: float = 1.0, build: Optional[str] = None,
+               db_path: Optional[str] = None) -> Dict[str, Any]:
+    """Replay de uma gravação: distribuições gravadas e reproduzidas, mais divergências."""
+    sessions = load_sessions(path)
+    with tempfile.TemporaryDirectory(prefix="prp-replay-") as tmp:
+        database = db_path or create_database(str(Path(tmp) / "context-memory.db"))
+        replayed = asyncio.run(replay_traffic(sessions, database, time_scale))
+
+    pairs = [(recorded, session) for recorded, session in zip(sessions, replayed) if session is not None]
+    return {
+        "build": build or current_build(),
+        "recording": str(path),
+        "time_scale": time_scale,
+        "replayed_at": time.time(),
+        "divergent": {
+            "tools": sum(1 for recorded, session in pairs if _tool_names(recorded) != _tool_names(session)),
+            "output": sum(1 for recorded, session in pairs if recorded["output"] != session["output"]),
+        },
+        "recorded": latency_report(sessions),
+        "replayed": latency_report([session for _, session in pairs]),
+    }
+
+
+def save_report(report: Dict[str, Any], reports_path: str):
+    with open(reports_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(report, ensure_ascii=False) + "\n")
+
+
+def find_report(reports_path: str, build: str, time_scale: float) -> Optional[Dict[str, Any]]:
+    """Último relatório de `build` na mesma escala de tempo."""
+    if not Path(reports_path).exists():
+        return None
+    with open(reports_path, encoding="utf-8") as f:
+        reports = [json.loads(line) for line in f if line.strip()]
+    matches = [r for r in reports if r["build"] == build and r["time_scale"] == time_scale]
+    return matches[-1] if matches else None
+
+
+def _row(label: str, stats: Dict[str, float], baseline: Optional[Dict[str, float]] = None) -> str:
+    if not stats.get("count"):
+        return f"   {label:<28} sem amostras"
+    line = (f"   {label:<28} n={stats['count']:<4} média {stats['mean_ms']:>9.2f} ms   "
+            f"p50 {stats['p50_ms']:>9.2f}   p95 {stats['p95_ms']:>9.2f}   p99 {stats['p99_ms']:>9.2f}")
+    if baseline and baseline.get("count"):
+        line += (f"   Δp50 {stats['p50_ms'] - baseline['p50_ms']:+.2f}"
+                 f"   Δp95 {stats['p95_ms'] - baseline['p95_ms']:+.2f}")
+    return line
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    replayed, recorded = report["replayed"], report["recorded"]
+    base = baseline["replayed"] if baseline else None
+    print(f"📊 Replay de {report['recording']}: build {report['build']}, escala {report['time_scale']:g}"
+          + (f" (comparado com {baseline['build']})" if baseline else ""))
+    print(f"   sessões {replayed['sessions']}/{recorded['sessions']}   erros {replayed['errors']}   "
+          f"divergentes: ferramentas {report['divergent']['tools']}, saída {report['divergent']['output']}")
+    print(_row("gravado (ponta a ponta)", recorded["end_to_end"]))
+    print(_row("ponta a ponta", replayed["end_to_end"], base and base["end_to_end"]))
+    for entry, stats in replayed["entries"].items():
+        print(_row(entry, stats, base and base["entries"].get(entry)))
+    print(_row("modelo (gravado x escala)", replayed["model"], base and base["model"]))
+    for name, stats in replayed["tools"].items():
+        print(_row(f"🔧 {name}", stats, base and base["tools"].get(name)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gravação e replay de tráfego do agente PRP")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="gravar conversas com o agente")
+    record.add_argument("--out", default="traffic.jsonl")
+    record.add_argument("--messages", nargs="+", default=DEFAULT_MESSAGES)
+    record.add_argument("--db", help="banco usado pelas ferramentas (padrão: novo, do schema)")
+    record.add_argument("--real-model", action="store_true", help="LLM configurado em vez do TestModel")
+
+    replay = commands.add_parser("replay", help="reproduzir uma gravação e medir")
+    replay.add_argument("recording")
+    replay.add_argument("--time-scale", type=float, default=1.0)
+    replay.add_argument("--build", help="rótulo do build (padrão: commit atual)")
+    replay.add_argument("--db", help="banco usado pelas ferramentas (padrão: novo, do schema)")
+    replay.add_argument("--reports", default=DEFAULT_REPORTS)
+    replay.add_argument("--compare", metavar="BUILD", help="comparar com o relatório de outro build")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        with tempfile.TemporaryDirectory(prefix="prp-record-") as tmp:
+            db_path = args.db or create_database(str(Path(tmp) / "context-memory.db"))
+            asyncio.run(record_traffic(args.messages, args.out, db_path, use_test_model=not args.real_model))
+        print(f"💾 {len(args.messages)} sessão(ões) gravada(s) em {args.out}")
+        return
+
+    report = run_replay(args.recording, args.time_scale, args.build, args.db)
+    save_report(report, args.reports)
+    baseline = find_report(args.reports, args.compare, args.time_scale) if args.compare else None
+    if args.compare and baseline is None:
+        print(f"⚠️ Sem relatório do build {args.compare} na escala {args.time_scale:g} em {args.reports}")
+    print_report(report, baseline)
+
+
+if __name__ == "__main__":
+    main()
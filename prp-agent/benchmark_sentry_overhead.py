@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark do custo da instrumentação Sentry por requisição.
+
+Roda o pipeline de main_official_standards (com latências simuladas zeradas,
+para sobrar só o custo da instrumentação) dentro de uma transação por
+requisição, em quatro configurações:
+
+- off: Sentry desligado (linha de base)
+- full: 100% dos traces com os payloads gen_ai inteiros (como era antes)
+- adaptive: AdaptiveSampler (grava tudo, mantém lentos/erros + taxa base) e payloads cortados
+- adaptive-head: idem, gravando só `record_rate` na cabeça (menos CPU, perde parte dos lentos)
+
+Os envelopes são serializados por um transport em memória, para medir também
+os bytes que iriam para o Sentry.
+
+Uso:
+    python benchmark_sentry_overhead.py --requests 500 --prompt-chars 20000
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict
+
+import sentry_sdk
+from sentry_sdk.transport import Transport
+
+import main_official_standards
+from agents import sentry_sampling
+from agents.sentry_sampling import AdaptiveSampler, sampling_options
+
+ENDPOINT = "/ai-agent/official-standards"
+
+
+class CountingTransport(Transport):
+    """Transport que serializa os envelopes e só conta eventos e bytes."""
+
+    def __init__(self, options=None):
+        super().__init__(options)
+        self.envelopes = 0
+        self.bytes = 0
+
+    def capture_envelope(self, envelope):
+        self.envelopes += 1
+        self.bytes += len(envelope.serialize())
+
+
+def _init(config: str, transport: CountingTransport, base_rate: float, record_rate: float):
+    options: Dict[str, Any] = {"dsn": "https://key@example.invalid/1", "transport": transport}
+    if config == "off":
+        options = {"dsn": ""}
+    elif config == "full":
+        options["traces_sample_rate"] = 1.0
+    else:
+        sampler = AdaptiveSampler(base_rate=base_rate, record_rate=1.0 if config == "adaptive" else record_rate)
+        options.update(sampling_options(sampler))
+    sentry_sdk.init(**options)
+
+
+async def _requests(n: int, prompt: str):
+    for i in range(n):
+        with sentry_sdk.start_transaction(
+            op="http.server", name=ENDPOINT, custom_sampling_context={"asgi_scope": {"path": ENDPOINT}}
+        ) as transaction:
+            await main_official_standards.invoke_agent_official(
+                "PRP Assistant", "gpt-4o-mini", prompt, 0.1, 1000, f"bench_{i}"
+            )
+            transaction.set_status("ok")
+
+
+def measure(config: str, n: int, prompt_chars: int, base_rate: float = 0.1,
+            record_rate: float = 0.1) -> Dict[str, Any]:
+    """Rodar `n` requisições em uma configuração e devolver o custo por requisição."""
+    main_official_standards.LLM_LATENCY_SECONDS = 0
+    main_official_standards.TOOL_LATENCY_RANGE = (0, 0)
+    max_chars = sentry_sampling._max_payload_chars
+    if config == "full":
+        sentry_sampling._max_payload_chars = 10 ** 9  # payloads inteiros, como antes
+
+    transport = CountingTransport()
+    _init(config, transport, base_rate, record_rate)
+    prompt = ("Criar PRP de autenticação JWT com refresh tokens. " * (prompt_chars // 50 + 1))[:prompt_chars]
+    try:
+        asyncio.run(_requests(10, prompt))  # aquecimento
+        transport.envelopes = transport.bytes = 0
+        start = time.perf_counter()
+        asyncio.run(_requests(n, prompt))
+        elapsed = time.perf_counter() - start
+    finally:
+        sentry_sampling._max_payload_chars = max_chars
+        sentry_sdk.init(dsn="")
+
+    return {
+        "config": config,
+        "us_per_request": round(elapsed / n * 1e6, 1),
+        "transactions_sent": transport.envelopes,
+        "bytes_per_request": round(transport.bytes / n, 1),
+    }
+
+
+def run_benchmark(n: int = 500, prompt_chars: int = 20000, base_rate: float = 0.1,
+                  record_rate: float = 0.1) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for config in ("off", "full", "adaptive", "adaptive-head"):
+        results[config] = measure(config, n, prompt_chars, base_rate, record_rate)
+    baseline = results["off"]["us_per_request"]
+    for result in results.values():
+        result["overhead_us"] = round(result["us_per_request"] - baseline, 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo da instrumentação Sentry por requisição")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--prompt-chars", type=int, default=20000)
+    parser.add_argument("--base-rate", type=float, default=0.1)
+    parser.add_argument("--record-rate", type=float, default=0.1, help="Taxa na cabeça do adaptive-head")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.requests, args.prompt_chars, args.base_rate, args.record_rate)
+    print(f"📊 Instrumentação Sentry: {args.requests} requisições, prompt de {args.prompt_chars} caracteres")
+    for result in results.values():
+        print(
+            f"   {result['config']:<14} {result['us_per_request']:>9.1f} µs/req "
+            f"(+{result['overhead_us']:.1f} µs) | {result['transactions_sent']:>5} transações | "
+            f"{result['bytes_per_request']:>9.1f} bytes/req"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Teste de carga do modo de produção (serve.py): throughput por número de workers.
+
+Para cada contagem de workers, sobe `serve.py` com as latências simuladas
+zeradas (--latency-scale 0: cada requisição custa só CPU), espera o /readyz e
+dispara requisições de `clients` processos geradores durante `duration`
+segundos. Reporta req/s, p50/p95 e a eficiência de escala
+(req/s com N workers / (N x req/s com 1 worker)).
+
+Os geradores também consomem CPU: para medir a escala até N workers, a
+máquina precisa de bem mais que N cores (o script avisa quando não tem).
+
+Uso:
+    python benchmark_serving.py --workers 1 2 4 --clients 4 --duration 10
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_APP = "main_ai_monitoring:app"
+DEFAULT_PATH = "/ai-agent/process"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app: str, workers: int, port: int, state_db: str,
+                 latency_scale: Optional[float] = 0.0, ready_timeout: float = 120.0) -> subprocess.Popen:
+    """Subir `serve.py` e esperar todos os workers responderem /readyz."""
+    command = [sys.executable, str(HERE / "serve.py"), app, "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--state-db", state_db, "--log-level", "warning"]
+    if latency_scale is not None:
+        command += ["--latency-scale", str(latency_scale)]
+    env = dict(os.environ, SENTRY_DSN=os.getenv("SENTRY_DSN", ""))
+    process = subprocess.Popen(command, cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    # Cada /readyz cai em um worker qualquer: esperar ver `workers` pids prontos
+    ready_pids = set()
+    deadline = time.monotonic() + ready_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"serve.py saiu com código {process.returncode}")
+        try:
+            response = httpx.get(f"http://127.0.0.1:{port}/readyz", timeout=1)
+            if response.status_code == 200:
+                ready_pids.add(response.json()["pid"])
+                if len(ready_pids) >= workers:
+                    return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    stop_server(process)
+    raise TimeoutError(f"{workers} workers não ficaram prontos em {ready_timeout:.0f}s")
+
+
+def stop_server(process: subprocess.Popen):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def _client_loop(url: str, path: str, concurrency: int, duration: float, client_id: int) -> List[float]:
+    latencies: List[float] = []
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        async def worker(worker_id: int):
+            n = 0
+            while time.perf_counter() < deadline:
+                body = {"prompt": f"Carga {client_id}-{worker_id}-{n}"}
+                start = time.perf_counter()
+                # X-No-Coalesce: cada requisição executa (sem coalescência)
+                response = await client.post(path, json=body, headers={"X-No-Coalesce": "1"})
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                n += 1
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return latencies
+
+
+def _client_process(args) -> List[float]:
+    return asyncio.run(_client_loop(*args))
+
+
+def run_load(url: str, path: str, clients: int, concurrency: int, duration: float) -> Dict[str, float]:
+    """Carga de `clients` processos x `concurrency` requisições simultâneas."""
+    with multiprocessing.get_context("spawn").Pool(clients) as pool:
+        results = pool.map(_client_process, [(url, path, concurrency, duration, i) for i in range(clients)])
+    latencies = sorted(latency for result in results for latency in result)
+    if not latencies:
+        return {"requests": 0, "rps": 0.0, "p50_ms": 0.0, "p95_ms": 0.0}
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / duration, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    }
+
+
+def run_benchmark(workers: List[int], app: str = DEFAULT_APP, path: str = DEFAULT_PATH,
+                  clients: int = 2, concurrency: int = 16, duration: float = 5.0) -> List[Dict[str, Any]]:
+    """Uma linha por contagem de workers, com a eficiência relativa à primeira."""
+    rows: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="prp-serving-") as tmp:
+        for count in workers:
+            port = free_port()
+            server = start_server(app, count, port, os.path.join(tmp, f"state_{count}.db"))
+            try:
+                # Aquecimento curto (imports preguiçosos, conexões SQLite por thread)
+                run_load(f"http://127.0.0.1:{port}", path, 1, 2, 0.5)
+                result = run_load(f"http://127.0.0.1:{port}", path, clients, concurrency, duration)
+            finally:
+                stop_server(server)
+            rows.append({"workers": count, **result})
+
+    base = rows[0]["rps"] / rows[0]["workers"] if rows and rows[0]["rps"] else None
+    for row in rows:
+        row["efficiency"] = round(row["rps"] / (row["workers"] * base), 2) if base else None
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput do serve.py por número de workers")
+    parser.add_argument("--app", default=DEFAULT_APP)
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=2, help="processos geradores de carga")
+    parser.add_argument("--concurrency", type=int, default=16, help="requisições simultâneas por gerador")
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    if cores < max(args.workers) + args.clients:
+        print(f"⚠️ {cores} cores para {max(args.workers)} workers + {args.clients} geradores: "
+              "a escala medida fica limitada pela máquina")
+
+    rows = run_benchmark(args.workers, args.app, args.path, args.clients, args.concurrency, args.duration)
+    print(f"📊 {args.app} {args.path}: {args.clients}x{args.concurrency} clientes, {args.duration:.0f}s por rodada")
+    for row in rows:
+        flag = "✅" if row["efficiency"] and row["efficiency"] >= 0.8 else "⚠️"
+        print(f"   {flag} {row['workers']:>2} workers: {row['rps']:>8.1f} req/s   "
+              f"p50 {row['p50_ms']:>6.1f} ms   p95 {row['p95_ms']:>6.1f} ms   eficiência {row['efficiency']}")
+
+
+if __name__ == "__main__":
+    main()
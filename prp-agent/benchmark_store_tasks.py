@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Benchmark da gravação de tarefas de PRP via MCP Turso.
+
+Usa um stand-in local do servidor MCP Turso (SQLite em memória + latência de
+rede simulada por requisição) e compara, para vários tamanhos de PRP:
+1. Gravação legada: um INSERT (uma ida ao servidor) por tarefa
+2. Gravação atual: INSERTs multi-row com RETURNING id em um execute_batch (RealPRPMCPIntegration.store_tasks)
+3. PRP completo (PRP + análise + tarefas): chamadas separadas x PRPUnitOfWork
+
+Com --http o transporte é o real: LibSQLClient falando HTTP (pipeline Hrana)
+com o stand-in agents.libsql_standin, em vez de chamadas em processo.
+
+Uso:
+    python benchmark_store_tasks.py --tasks 1 10 40 200 --latency-ms 20 [--http]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from agents.libsql_client import LibSQLClient, mcp_tool_caller
+from agents.libsql_standin import LibSQLStandIn
+from real_mcp_integration import TASK_COLUMNS, RealPRPMCPIntegration, task_params
+
+SCHEMAS_DIR = Path(__file__).resolve().parent.parent / "sql" / "schemas"
+SCHEMA_FILES = [
+    SCHEMAS_DIR / "prp_database_schema.sql",
+    SCHEMAS_DIR / "prp_unit_of_work_schema.sql",
+]
+
+
+class SQLiteMCPStandIn:
+    """
+    Stand-in do servidor MCP Turso: executa as ferramentas em SQLite local.
+
+    Cada chamada conta como uma ida ao servidor e espera `latency_ms` antes de
+    responder, imitando o RTT até o Turso. `execute_batch` roda todos os
+    statements em uma transação (tudo ou nada), como o pipeline do libSQL.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, db_path: str = ":memory:"):
+        self.latency_ms = latency_ms
+        self.round_trips = 0
+        self.conn = sqlite3.connect(db_path, isolation_level=None)
+        for schema_file in SCHEMA_FILES:
+            self.conn.executescript(schema_file.read_text(encoding="utf-8"))
+
+    def _execute(self, query: str, params: List[Any]) -> Dict[str, Any]:
+        cursor = self.conn.execute(query, params)
+        columns = [c[0] for c in cursor.description or []]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return {
+            "rows": rows,
+            "columns": columns,
+            "lastInsertId": cursor.lastrowid,
+            "rowsAffected": cursor.rowcount,
+        }
+
+    async def __call__(self, tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.round_trips += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+
+        if tool_name == "execute_batch":
+            results = []
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                for statement in params["statements"]:
+                    results.append(self._execute(statement["query"], statement.get("params", [])))
+                self.conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                self.conn.execute("ROLLBACK")
+                return {"success": False, "error": str(e), "failed_statement": len(results)}
+            return {"success": True, "results": results}
+
+        if tool_name not in ("execute_query", "execute_read_only_query"):
+            return {"success": False, "error": "Ferramenta não implementada"}
+        try:
+            return {"success": True, **self._execute(params["query"], params.get("params", []))}
+        except sqlite3.Error as e:
+            return {"success": False, "error": str(e)}
+
+    def close(self):
+        self.conn.close()
+
+
+class HTTPStandInBackend:
+    """
+    Mesma interface de SQLiteMCPStandIn, mas pelo transporte real:
+    ferramentas MCP → LibSQLClient → HTTP → LibSQLStandIn (arquivo SQLite).
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self._dir = tempfile.mkdtemp(prefix="prp-libsql-")
+        db_path = os.path.join(self._dir, "context.db")
+        self.conn = sqlite3.connect(db_path, isolation_level=None)
+        for schema_file in SCHEMA_FILES:
+            self.conn.executescript(schema_file.read_text(encoding="utf-8"))
+        self.server = LibSQLStandIn(db_path, latency_ms).start()
+        self.client = LibSQLClient(self.server.url)
+        self._call = mcp_tool_caller(self.client)
+
+    @property
+    def round_trips(self) -> int:
+        return self.server.requests
+
+    async def __call__(self, tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._call(tool_name, params)
+
+    def close(self):
+        self.server.stop()
+        self.conn.close()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+def seed_prp(stand_in: SQLiteMCPStandIn, name: str = "bench") -> int:
+    """Criar o PRP pai das tarefas diretamente no banco (sem contar idas)."""
+    cursor = stand_in.conn.execute(
+        """INSERT INTO prps (name, title, description, objective, context_data, implementation_details)
+           VALUES (?, ?, ?, ?, '{}', '{}')""",
+        (name, name.title(), "PRP de benchmark", "Medir a gravação de tarefas"),
+    )
+    return cursor.lastrowid
+
+
+def sample_tasks(n: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "name": f"Tarefa {i}",
+            "description": f"Descrição da tarefa {i}",
+            "type": ("setup", "feature", "test", "docs")[i % 4],
+            "priority": ("low", "medium", "high", "critical")[i % 4],
+            "estimated_hours": 1 + i % 5,
+            "complexity": ("low", "medium", "high")[i % 3],
+            "context_files": [f"src/modulo_{i}.py"],
+            "acceptance_criteria": "Testes passando",
+        }
+        for i in range(n)
+    ]
+
+
+async def store_tasks_one_by_one(integration: RealPRPMCPIntegration, prp_id: int,
+                                 tasks: List[Dict[str, Any]]) -> List[int]:
+    """Reproduz a gravação antiga: um INSERT por tarefa, em sequência."""
+    query = (f"INSERT INTO prp_tasks ({', '.join(TASK_COLUMNS)}) "
+             f"VALUES ({', '.join('?' * len(TASK_COLUMNS))})")
+    task_ids = []
+    for task in tasks:
+        result = await integration.tool_caller("execute_query", {
+            "database": integration.database,
+            "query": query,
+            "params": task_params(prp_id, task),
+        })
+        task_ids.append(result["lastInsertId"])
+    return task_ids
+
+
+def sample_prp(name: str = "bench-uow") -> Dict[str, Any]:
+    return {
+        "name": name,
+        "title": "PRP de benchmark",
+        "description": "Gravação de PRP analisado",
+        "objective": "Medir idas ao servidor",
+        "context_data": {"framework": "FastAPI"},
+        "implementation_details": {"backend": "Python"},
+    }
+
+
+def sample_analysis(n_tasks: int) -> Dict[str, Any]:
+    return {
+        "analysis_type": "task_extraction",
+        "input_content": "PRP de benchmark",
+        "output_content": "Análise",
+        "parsed_data": {"tasks": sample_tasks(n_tasks)},
+        "model_used": "gpt-4o",
+    }
+
+
+async def store_analyzed_prp_separately(integration: RealPRPMCPIntegration, n_tasks: int):
+    """Fluxo antigo: store_prp, store_llm_analysis e store_tasks, sem transação."""
+    analysis = sample_analysis(n_tasks)
+    prp_id = await integration.store_prp(sample_prp())
+    await integration.store_llm_analysis(prp_id, analysis)
+    await integration.store_tasks(prp_id, analysis["parsed_data"]["tasks"])
+
+
+async def store_analyzed_prp_unit_of_work(integration: RealPRPMCPIntegration, n_tasks: int):
+    analysis = sample_analysis(n_tasks)
+    await (integration.unit_of_work()
+           .add_prp(sample_prp())
+           .add_llm_analysis(analysis)
+           .add_tasks(analysis["parsed_data"]["tasks"])
+           .commit())
+
+
+async def _warm_up(stand_in) -> int:
+    """Abrir a conexão HTTP (e o contexto TLS do httpx) fora da medição."""
+    await stand_in("execute_read_only_query", {"query": "SELECT 1"})
+    return stand_in.round_trips
+
+
+async def _measure_full_prp(backend_factory, store, latency_ms: float, n_tasks: int):
+    stand_in = backend_factory(latency_ms)
+    integration = RealPRPMCPIntegration(tool_caller=stand_in)
+    baseline = stand_in.conn.execute("SELECT count(*) FROM prp_tasks").fetchone()[0]
+    warm_trips = await _warm_up(stand_in)
+
+    start = time.perf_counter()
+    await store(integration, n_tasks)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    stored = stand_in.conn.execute("SELECT count(*) FROM prp_tasks").fetchone()[0]
+    stand_in.close()
+    assert stored - baseline == n_tasks
+    return stand_in.round_trips - warm_trips, elapsed_ms
+
+
+async def _measure(backend_factory, store, latency_ms: float, n_tasks: int):
+    stand_in = backend_factory(latency_ms)
+    prp_id = seed_prp(stand_in)
+    integration = RealPRPMCPIntegration(tool_caller=stand_in)
+    tasks = sample_tasks(n_tasks)
+    warm_trips = await _warm_up(stand_in)
+
+    start = time.perf_counter()
+    task_ids = await store(integration, prp_id, tasks)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    stored = stand_in.conn.execute("SELECT count(*) FROM prp_tasks WHERE prp_id = ?", (prp_id,)).fetchone()[0]
+    stand_in.close()
+    assert stored == len(task_ids) == n_tasks
+    return stand_in.round_trips - warm_trips, elapsed_ms
+
+
+async def run_benchmark(task_counts: List[int], latency_ms: float, http: bool = False):
+    backend = HTTPStandInBackend if http else SQLiteMCPStandIn
+    print(f"{'tarefas':>8} | {'legado (idas / ms)':>20} | {'multi-row (idas / ms)':>22} | speedup")
+    for n_tasks in task_counts:
+        legacy_trips, legacy_ms = await _measure(backend, store_tasks_one_by_one, latency_ms, n_tasks)
+        batched_trips, batched_ms = await _measure(backend, RealPRPMCPIntegration.store_tasks, latency_ms, n_tasks)
+        print(f"{n_tasks:>8} | {legacy_trips:>6} / {legacy_ms:>9.1f}ms | "
+              f"{batched_trips:>8} / {batched_ms:>9.1f}ms | {legacy_ms / batched_ms:6.1f}x")
+
+    print(f"\n{'tarefas':>8} | {'PRP separado (idas / ms)':>26} | {'unit of work (idas / ms)':>25} | speedup")
+    for n_tasks in task_counts:
+        separate_trips, separate_ms = await _measure_full_prp(
+            backend, store_analyzed_prp_separately, latency_ms, n_tasks
+        )
+        uow_trips, uow_ms = await _measure_full_prp(backend, store_analyzed_prp_unit_of_work, latency_ms, n_tasks)
+        print(f"{n_tasks:>8} | {separate_trips:>12} / {separate_ms:>9.1f}ms | "
+              f"{uow_trips:>11} / {uow_ms:>9.1f}ms | {separate_ms / uow_ms:6.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da gravação de tarefas via MCP Turso")
+    parser.add_argument("--tasks", type=int, nargs="+", default=[1, 10, 40, 200])
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="RTT simulado por requisição")
+    parser.add_argument("--http", action="store_true", help="Usar LibSQLClient + stand-in HTTP do libSQL")
+    args = parser.parse_args()
+
+    transport = "HTTP (stand-in libSQL)" if args.http else "em processo"
+    print(f"🚀 Benchmark store_tasks: RTT simulado de {args.latency_ms}ms, transporte {transport}")
+    asyncio.run(run_benchmark(args.tasks, args.latency_ms, args.http))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark do tempo até o primeiro byte (TTFB) dos endpoints de agente, com e
+sem streaming SSE (agents/sse.py).
+
+Para cada app, mede em ms (mediana de `runs` requisições):
+
+- ttfb: primeiro byte do corpo da resposta
+- first_delta: primeiro pedaço do texto do modelo (só no /stream)
+- total: resposta completa
+
+O app é chamado direto pela interface ASGI (sem servidor nem cliente HTTP no
+meio): o httpx.ASGITransport junta o corpo inteiro antes de devolver e
+esconderia o streaming.
+
+Uso:
+    python benchmark_streaming_ttfb.py --runs 5
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import statistics
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# (módulo, endpoint sem streaming, endpoint SSE, corpo da requisição)
+ENDPOINTS = [
+    ("main_sentry_official", "/ai-agent/official", "/ai-agent/official/stream",
+     {"prompt": "Criar PRP de autenticação JWT"}),
+    ("main_ai_agents_custom", "/ai-agent/process", "/ai-agent/process/stream",
+     {"prompt": "Criar PRP de autenticação JWT"}),
+    ("main_ai_monitoring", "/ai-agent/process", "/ai-agent/process/stream",
+     {"prompt": "Criar PRP de autenticação JWT"}),
+]
+
+
+async def drive_asgi(app, path: str, body: Dict[str, Any],
+                     disconnect_after: Optional[int] = None) -> List[Tuple[float, Dict[str, Any]]]:
+    """
+    POST `body` em `path` chamando o app ASGI diretamente.
+
+    Returns:
+        [(segundos desde o início, mensagem ASGI enviada pelo app)]
+    Com `disconnect_after`, o cliente desconecta depois de receber esse
+    número de pedaços do corpo.
+    """
+    payload = json.dumps(body).encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), (b"content-type", b"application/json"),
+                    (b"content-length", str(len(payload)).encode())],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    messages: List[Tuple[float, Dict[str, Any]]] = []
+    disconnected = asyncio.Event()
+    request_sent = False
+    start = time.perf_counter()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append((time.perf_counter() - start, message))
+        if disconnect_after is not None and message["type"] == "http.response.body":
+            chunks = sum(1 for _, m in messages if m["type"] == "http.response.body" and m.get("body"))
+            if chunks >= disconnect_after:
+                disconnected.set()
+
+    await app(scope, receive, send)
+    return messages
+
+
+def sse_events(messages: List[Tuple[float, Dict[str, Any]]]) -> List[Tuple[float, str, Any]]:
+    """[(segundos, evento, dados)] dos pedaços SSE enviados pelo app."""
+    events = []
+    start = next(m for _, m in messages if m["type"] == "http.response.start")
+    if not dict(start["headers"]).get(b"content-type", b"").startswith(b"text/event-stream"):
+        return events
+    for elapsed, message in messages:
+        if message["type"] != "http.response.body":
+            continue
+        for block in message.get("body", b"").decode().split("\n\n"):
+            if not block.strip():
+                continue
+            fields = dict(line.split(": ", 1) for line in block.split("\n"))
+            events.append((elapsed, fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def measure(app, path: str, body: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    """ttfb, first_delta e total (segundos) de uma requisição."""
+    messages = asyncio.run(drive_asgi(app, path, body))
+    chunks = [elapsed for elapsed, m in messages if m["type"] == "http.response.body" and m.get("body")]
+    deltas = [elapsed for elapsed, event, _ in sse_events(messages) if event == "delta"]
+    return {
+        "ttfb": chunks[0] if chunks else None,
+        "first_delta": deltas[0] if deltas else None,
+        "total": messages[-1][0],
+    }
+
+
+def run_benchmark(runs: int = 5) -> Dict[str, Dict[str, Dict[str, Optional[float]]]]:
+    """Mediana em ms de cada medida, por app e modo (buffered/stream)."""
+    results: Dict[str, Dict[str, Dict[str, Optional[float]]]] = {}
+    for module_name, buffered_path, stream_path, body in ENDPOINTS:
+        app = importlib.import_module(module_name).app
+        results[module_name] = {}
+        for mode, path in (("buffered", buffered_path), ("stream", stream_path)):
+            samples = [measure(app, path, body) for _ in range(runs)]
+            results[module_name][mode] = {
+                name: (round(statistics.median(s[name] for s in samples) * 1000, 1)
+                       if samples[0][name] is not None else None)
+                for name in ("ttfb", "first_delta", "total")
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTFB dos endpoints de agente com e sem SSE")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = run_benchmark(args.runs)
+    print(f"📊 TTFB dos endpoints de agente (mediana de {args.runs}, ms)")
+    for module_name, modes in results.items():
+        print(f"\n🤖 {module_name}")
+        for mode, values in modes.items():
+            first_delta = "-" if values["first_delta"] is None else f"{values['first_delta']:.1f}"
+            print(f"   {mode:<9} ttfb {values['ttfb']:>7.1f}   primeiro delta {first_delta:>7}   "
+                  f"total {values['total']:>7.1f}")
+        gain = modes["buffered"]["ttfb"] / max(modes["stream"]["ttfb"], 0.001)
+        print(f"   ✅ primeiro byte {gain:.0f}x mais cedo com streaming")
+
+
+if __name__ == "__main__":
+    main()
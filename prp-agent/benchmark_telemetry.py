@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark da telemetria dos agentes: capture_message inline vs fila em background.
+
+Um SDK Sentry real (HttpTransport) manda para o sink local
+(agents/sentry_sink.py) rodando em outro processo, e o app main_ai_monitoring
+roda sem as latências simuladas, de modo que o tempo medido é só o custo do
+próprio app. Para cada modo de agents/telemetry_queue.py mede:
+
+- request: latência de POST /ai-agent/process (média, p50, p95, p99 em ms)
+- record: custo de uma chamada `TELEMETRY.record(...)` em µs
+- events: eventos (não-transação) que chegaram ao sink
+
+Uso:
+    python benchmark_telemetry.py --requests 300 --ops 5000
+"""
+
+import argparse
+import asyncio
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+import sentry_sdk
+
+import main_ai_monitoring
+from agents import telemetry_queue
+from agents.sentry_sampling import sampling_options
+from agents.sentry_sink import EnvelopeStore
+
+# Fila primeiro: o backlog do inline não cai na medida da fila
+MODES = ("queue", "inline")
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _request_latencies(requests: int) -> List[float]:
+    latencies = []
+    transport = httpx.ASGITransport(app=main_ai_monitoring.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(requests):
+            start = time.perf_counter()
+            response = await client.post(
+                "/ai-agent/process", json={"prompt": f"Criar PRP {i}"}, headers={"X-No-Coalesce": "1"}
+            )
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+    return latencies
+
+
+def _start_sink(db_path: str) -> "tuple[subprocess.Popen, str]":
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, "-m", "agents.sentry_sink", "--db", db_path, "--port", str(port)],
+        cwd=Path(__file__).resolve().parent, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return process, f"http://public@127.0.0.1:{port}/1"
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise TimeoutError("Sink local não subiu")
+
+
+def _sink_events(db_path: str) -> int:
+    store = EnvelopeStore(db_path)
+    try:
+        report = store.report()
+    finally:
+        store.close()
+    return sum(types.get("event", {}).get("events", 0) for types in report["endpoints"].values())
+
+
+def _record_cost_us(ops: int) -> float:
+    queue = main_ai_monitoring.TELEMETRY
+    start = time.perf_counter()
+    for _ in range(ops):
+        queue.record("agent_complete", key="bench", total_tokens=420, tools_count=3, processing_time=0.8)
+    return (time.perf_counter() - start) / ops * 1e6
+
+
+def run_benchmark(requests: int = 200, ops: int = 2000) -> Dict[str, Dict[str, Any]]:
+    """Latência por requisição, custo do record e eventos enviados, por modo."""
+    saved = {name: getattr(main_ai_monitoring, name) for name in ("PROCESSING_LATENCY_SECONDS", "TOOL_LATENCY_SECONDS")}
+    results: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory(prefix="prp-telemetry-") as tmp:
+        db_path = str(Path(tmp) / "sink.db")
+        sink, dsn = _start_sink(db_path)
+        try:
+            sentry_sdk.init(dsn=dsn, send_default_pii=True, **sampling_options())
+            for name in saved:
+                setattr(main_ai_monitoring, name, 0)
+
+            asyncio.run(_request_latencies(10))  # aquecimento (imports, conexões)
+            for mode in MODES:
+                telemetry_queue.configure(mode)
+                main_ai_monitoring.TELEMETRY.flush()
+                sentry_sdk.flush(timeout=30)
+                before = _sink_events(db_path)
+
+                latencies = asyncio.run(_request_latencies(requests))
+                record_us = _record_cost_us(ops)
+                main_ai_monitoring.TELEMETRY.flush()
+                sentry_sdk.flush(timeout=30)
+
+                results[mode] = {
+                    "request_ms_mean": round(statistics.mean(latencies) * 1000, 3),
+                    "request_ms_p50": round(_percentile(latencies, 0.50) * 1000, 3),
+                    "request_ms_p95": round(_percentile(latencies, 0.95) * 1000, 3),
+                    "request_ms_p99": round(_percentile(latencies, 0.99) * 1000, 3),
+                    "record_us": round(record_us, 2),
+                    "events": _sink_events(db_path) - before,
+                }
+        finally:
+            for name, value in saved.items():
+                setattr(main_ai_monitoring, name, value)
+            telemetry_queue.configure("queue")
+            sink.terminate()
+            sink.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Telemetria inline vs fila em background")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--ops", type=int, default=5000, help="chamadas de record por modo")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.requests, args.ops)
+    print(f"📊 Telemetria dos agentes: {args.requests} requisições, {args.ops} records por modo")
+    for mode, values in results.items():
+        print(f"   {mode:<7} requisição média {values['request_ms_mean']:>7.3f} ms   "
+              f"p50 {values['request_ms_p50']:>7.3f}   p95 {values['request_ms_p95']:>7.3f}   "
+              f"p99 {values['request_ms_p99']:>7.3f}   record {values['record_us']:>7.2f} µs   "
+              f"eventos {values['events']}")
+    inline, queue = results["inline"], results["queue"]
+    print(f"   ✅ fila: {inline['request_ms_mean'] - queue['request_ms_mean']:.3f} ms a menos por requisição, "
+          f"record {inline['record_us'] / max(queue['record_us'], 0.01):.0f}x mais barato")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+Configuração compartilhada dos testes do PRP Agent.
+"""
+
+import os
+import tempfile
+
+# As configurações exigem LLM_API_KEY; os testes usam apenas TestModel/SQLite local
+os.environ.setdefault("LLM_API_KEY", "test")
+# Apps FastAPI importadas nos testes não devem enviar eventos ao Sentry
+os.environ.setdefault("SENTRY_DSN", "")
+# Sessões dos apps (agents/session_store.py) em um banco temporário
+os.environ.setdefault("AGENT_STATE_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="prp-agent-state-"), "agent_state.db"))
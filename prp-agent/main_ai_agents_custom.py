@@ -1,28 +1,59 @@
 import sentry_sdk
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from pydantic import BaseModel
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import asyncio
-import random
+import os
 import time
 import uuid
 
+from agents.model_backends import ModelBackend, SimulatedBackend, SimulationParams, ToolRun, backend_from_env
+from agents.instrumentation import execute_tool_span, invoke_agent_span, record_response, record_usage
+from agents.openmetrics import install_metrics
+from agents.serving import LATENCY_SCALE, install_serving
+from agents.session_store import SESSIONS
+from agents.single_flight import COALESCED_HEADER, SingleFlight, wants_coalescing
+from agents.sentry_sampling import sampling_options, set_payload
+from agents.sse import Emit, sse_response, stream_text
+from agents.telemetry_queue import TelemetryQueue
+from benchmark_engine import WORKLOADS, BenchmarkConfig, WorkloadCase, run_and_store
+
 # Configure SDK for AI Agents monitoring (Custom Implementation)
 # Baseado na documentação oficial Sentry, adaptado para monitoramento customizado de AI Agents
 sentry_sdk.init(
-    dsn="https://d9fe4e8016424adebb7389d5df925764@o927801.ingest.us.sentry.io/4509774227832832",
-    traces_sample_rate=1.0,
+    dsn=os.getenv(
+        "SENTRY_DSN",
+        "https://d9fe4e8016424adebb7389d5df925764@o927801.ingest.us.sentry.io/4509774227832832",
+    ),  # SENTRY_DSN vazio desliga o envio (p.ex. nos testes)
+    # Amostragem por endpoint, sempre mantendo traces lentos/com erro
+    **sampling_options(),
     # Add data like inputs and responses to/from LLMs and tools
     send_default_pii=True,
-    # Tags para identificar AI Agent events
-    tags={
-        "app.type": "ai_agent",
-        "agent.framework": "prp_custom",
-        "monitoring.type": "ai_agents"
-    }
 )
 
+# Tags para identificar AI Agent events (init() não aceita `tags`)
+sentry_sdk.set_tags({
+    "app.type": "ai_agent",
+    "agent.framework": "prp_custom",
+    "monitoring.type": "ai_agents"
+})
+
 app = FastAPI(title="PRP Agent - AI Agents Custom Monitoring")
+# Latência por rota, tokens, ferramentas e banco em GET /metrics (OpenMetrics)
+install_metrics(app)
+# /healthz, /readyz e sessões compartilhadas entre workers (serve.py)
+install_serving(app, "ai-agent-custom")
+
+# Latências simuladas (segundos): processamento inicial, ferramentas e resposta final
+PLANNING_LATENCY_SECONDS = 0.3 * LATENCY_SCALE
+TOOL_LATENCY_RANGE = (0.1 * LATENCY_SCALE, 0.4 * LATENCY_SCALE)
+RESPONSE_LATENCY_SECONDS = 0.2 * LATENCY_SCALE
+
+# Máximo de ferramentas executando ao mesmo tempo em um processamento
+TOOL_PARALLELISM = int(os.getenv("AGENT_TOOL_PARALLELISM", "4"))
+
+# Contexto de início/ferramentas/conclusão vai em resumos periódicos, fora da requisição
+TELEMETRY = TelemetryQueue("ai-agent-custom")
 
 # Modelos para AI Agent
 class AgentRequest(BaseModel):
@@ -48,42 +79,47 @@ class AgentResponse(BaseModel):
 
 # AI Agent Simulator para gerar eventos Sentry realistas
 class AIAgentMonitor:
-    def __init__(self, name: str, model: str = "gpt-4-turbo"):
+    def __init__(self, name: str, model: str = "gpt-4-turbo", max_tool_parallelism: int = TOOL_PARALLELISM,
+                 backend: Optional[ModelBackend] = None):
         self.name = name
         self.model = model
+        self.max_tool_parallelism = max(1, max_tool_parallelism)
         self.available_tools = [
             "text_analyzer", "prp_parser", "context_builder", 
             "code_generator", "documentation_writer", "test_creator"
         ]
+        # Modelo: simulador (padrão), replay de JSONL ou o prp_agent real (MODEL_BACKEND)
+        self.backend = backend or backend_from_env(
+            lambda seed: SimulatedBackend(self.simulation_params, seed=seed, text=self._result_text)
+        )
+    
+    def simulation_params(self) -> SimulationParams:
+        """Simulação padrão, lida das constantes de latência a cada execução"""
+        return SimulationParams(
+            planning_s=PLANNING_LATENCY_SECONDS,
+            response_s=RESPONSE_LATENCY_SECONDS,
+            tool_latency_s=TOOL_LATENCY_RANGE,
+            tools_per_run=(2, 4),
+            tool_tokens=(15, 80),
+            output_tokens=(100, 300),
+            available_tools=tuple(self.available_tools),
+        )
     
-    def _capture_agent_start(self, prompt: str, user_id: str) -> str:
+    def _result_text(self, prompt: str, tools: List[ToolRun]) -> str:
+        return f"PRP Agent '{self.name}' processou com sucesso: {prompt[:100]}..."
+    
+    async def _capture_agent_start(self, prompt: str, user_id: str) -> str:
         """Captura início de processamento do AI Agent no Sentry"""
         session_id = str(uuid.uuid4())
-        
-        # Set agent context
-        sentry_sdk.set_context("ai_agent", {
-            "agent_name": self.name,
-            "agent_id": session_id,
-            "model": self.model,
-            "prompt_length": len(prompt),
-            "user_id": user_id,
-            "status": "processing"
-        })
+        await SESSIONS.start_async(session_id, "ai-agent-custom", self.name, self.model, user_id)
         
         # Set tags específicas para AI
         sentry_sdk.set_tag("agent.name", self.name)
         sentry_sdk.set_tag("agent.model", self.model)
         sentry_sdk.set_tag("agent.session", session_id)
         
-        # Capturar mensagem de início
-        sentry_sdk.capture_message(
-            f"AI Agent {self.name} started processing",
-            level="info",
-            tags={
-                "event.type": "agent_start",
-                "agent.session": session_id
-            }
-        )
+        # Início da sessão (agregado pela fila de telemetria)
+        TELEMETRY.record("agent_start", key=self.name, prompt_length=len(prompt))
         
         return session_id
     
@@ -92,15 +128,14 @@ class AIAgentMonitor:
                           execution_time: float, tokens: int):
         """Captura uso de ferramentas no Sentry"""
         
-        # Context específico da ferramenta
-        sentry_sdk.set_context(f"tool_{tool_name}", {
-            "tool_name": tool_name,
-            "session_id": session_id,
-            "execution_time": execution_time,
-            "tokens_used": tokens,
-            "input_size": len(str(input_data)),
-            "output_size": len(output)
-        })
+        TELEMETRY.record(
+            "tool",
+            key=tool_name,
+            execution_time=execution_time,
+            tokens_used=tokens,
+            input_size=len(str(input_data)),
+            output_size=len(output),
+        )
         
         # Breadcrumb para tracking de ferramentas
         sentry_sdk.add_breadcrumb(
@@ -115,97 +150,132 @@ class AIAgentMonitor:
             }
         )
     
-    def _capture_agent_complete(self, session_id: str, total_tokens: int, 
-                              tools_count: int, total_time: float):
+    async def _capture_agent_complete(self, session_id: str, total_tokens: int, 
+                                    tools_count: int, total_time: float):
         """Captura conclusão do AI Agent no Sentry"""
+        await SESSIONS.complete_async(session_id, total_tokens, tools_count, total_time)
+        
+        # Conclusão e performance: entram no resumo periódico (antes eram
+        # set_context + capture_message por requisição)
+        TELEMETRY.record(
+            "agent_complete",
+            key=self.name,
+            total_tokens=total_tokens,
+            tools_count=tools_count,
+            processing_time=total_time,
+            tokens_per_second=total_tokens / total_time if total_time > 0 else 0,
+            avg_tool_time=total_time / tools_count if tools_count > 0 else 0,
+        )
+    
+    async def _run_tool(self, session_id: str, tool: ToolRun, prompt: str, temperature: float,
+                        emit: Optional[Emit] = None, executed: bool = False) -> ToolCall:
+        """
+        Executa uma ferramenta e captura o uso no Sentry
+
+        Com `executed`, o backend (agente real) já a executou com seus
+        próprios spans: aqui só é reportada.
+        """
+        tool_name = tool.name
+        tool_start = time.time()
+        if emit:
+            emit("tool_start", {"name": tool_name})
         
-        # Update agent context with results
-        sentry_sdk.set_context("ai_agent_result", {
-            "session_id": session_id,
-            "total_tokens": total_tokens,
-            "tools_used": tools_count,
-            "total_processing_time": total_time,
-            "status": "completed"
-        })
+        # Simular input/output da ferramenta
+        tool_input = {
+            "prompt_segment": prompt[:100],
+            "temperature": temperature,
+            "context": f"Processing with {tool_name}"
+        }
         
-        # Performance metrics
-        sentry_sdk.set_context("ai_performance", {
-            "tokens_per_second": total_tokens / total_time if total_time > 0 else 0,
-            "avg_tool_time": total_time / tools_count if tools_count > 0 else 0,
-            "efficiency_score": min(100, (total_tokens / total_time) * 10) if total_time > 0 else 0
-        })
+        tool_output = f"{tool_name} processed: {prompt[:50]}... -> Generated output"
+        if not executed:
+            with execute_tool_span(tool_name, model=self.model, tool_input=tool_input) as tool_span:
+                # Latência da ferramenta decidida pelo backend
+                await asyncio.sleep(tool.latency_s)
+                set_payload(tool_span, "gen_ai.tool.output", tool_output)
+        tokens_used = tool.tokens
+        execution_time = time.time() - tool_start
         
-        # Capture completion message
-        sentry_sdk.capture_message(
-            f"AI Agent {self.name} completed processing",
-            level="info",
-            tags={
-                "event.type": "agent_complete",
-                "agent.session": session_id,
-                "performance.tokens": str(total_tokens),
-                "performance.time": f"{total_time:.2f}s"
-            }
+        # Capturar no Sentry
+        self._capture_tool_usage(
+            session_id, tool_name, tool_input, 
+            tool_output, execution_time, tokens_used
         )
+        if emit:
+            emit("tool_end", {
+                "name": tool_name,
+                "output": tool_output,
+                "execution_time": execution_time,
+                "tokens_used": tokens_used,
+            })
+        
+        return ToolCall(
+            name=tool_name,
+            input=tool_input,
+            output=tool_output,
+            execution_time=execution_time,
+            tokens_used=tokens_used
+        )
+    
+    async def _run_tools(self, session_id: str, tools: List[ToolRun], prompt: str, temperature: float,
+                         emit: Optional[Emit] = None, executed: bool = False) -> List[ToolCall]:
+        """
+        Executa as ferramentas em paralelo, no máximo `max_tool_parallelism`
+        por vez. Resultados na ordem de `tools`.
+        """
+        semaphore = asyncio.Semaphore(self.max_tool_parallelism)
+        
+        async def run(tool: ToolRun) -> ToolCall:
+            async with semaphore:
+                return await self._run_tool(session_id, tool, prompt, temperature, emit, executed)
+        
+        return await asyncio.gather(*(run(tool) for tool in tools))
     
-    async def process(self, prompt: str, user_id: str, temperature: float = 0.7) -> Dict[str, Any]:
+    async def process(self, prompt: str, user_id: str, temperature: float = 0.7,
+                      emit: Optional[Emit] = None) -> Dict[str, Any]:
         """
         Processa prompt com AI Agent e captura todos os eventos no Sentry
+
+        Com `emit`, publica os eventos SSE do pipeline (ver agents/sse.py).
         """
         start_time = time.time()
         
         # 1. Iniciar monitoramento
-        session_id = self._capture_agent_start(prompt, user_id)
+        session_id = await self._capture_agent_start(prompt, user_id)
+        if emit:
+            emit("start", {"session_id": session_id, "agent": self.name, "model": self.model})
         
+        with invoke_agent_span(
+            self.name, self.model, messages=[{"role": "user", "content": prompt}], temperature=temperature
+        ) as agent_span:
+            return await self._process(agent_span, session_id, prompt, user_id, temperature, start_time, emit)
+    
+    async def _process(self, agent_span, session_id: str, prompt: str, user_id: str,
+                       temperature: float, start_time: float, emit: Optional[Emit] = None) -> Dict[str, Any]:
         try:
-            # 2. Simular processamento inicial
-            await asyncio.sleep(0.3)
+            # 2. Execução do modelo (backend) e planejamento
+            run = await self.backend.run(prompt, self.model)
+            await asyncio.sleep(run.planning_s)
             
-            # 3. Simular uso de ferramentas
-            tools_used = []
-            selected_tools = random.sample(self.available_tools, random.randint(2, 4))
-            
-            for tool_name in selected_tools:
-                tool_start = time.time()
-                
-                # Simular input/output da ferramenta
-                tool_input = {
-                    "prompt_segment": prompt[:100],
-                    "temperature": temperature,
-                    "context": f"Processing with {tool_name}"
-                }
-                
-                # Simular processamento da ferramenta
-                await asyncio.sleep(random.uniform(0.1, 0.4))
-                
-                tool_output = f"{tool_name} processed: {prompt[:50]}... -> Generated output"
-                tokens_used = random.randint(15, 80)
-                execution_time = time.time() - tool_start
-                
-                # Capturar no Sentry
-                self._capture_tool_usage(
-                    session_id, tool_name, tool_input, 
-                    tool_output, execution_time, tokens_used
-                )
-                
-                # Adicionar aos resultados
-                tools_used.append(ToolCall(
-                    name=tool_name,
-                    input=tool_input,
-                    output=tool_output,
-                    execution_time=execution_time,
-                    tokens_used=tokens_used
-                ))
+            # 3. Ferramentas escolhidas pelo modelo (independentes entre si, em paralelo)
+            tools_used = await self._run_tools(
+                session_id, run.tools, prompt, temperature, emit, executed=run.tools_executed
+            )
             
-            # 4. Simular resposta final
-            await asyncio.sleep(0.2)
+            # 4. Resposta final (em deltas no /stream)
+            result = run.text
+            await stream_text(emit, result, run.response_s)
             
             total_time = time.time() - start_time
-            total_tokens = sum(tool.tokens_used for tool in tools_used) + random.randint(100, 300)
+            total_tokens = run.total_tokens
             
-            result = f"PRP Agent '{self.name}' processou com sucesso: {prompt[:100]}..."
+            record_response(agent_span, result)
+            record_usage(agent_span, run.input_tokens, run.output_tokens, total_tokens)
+            if emit:
+                emit("usage", {"total_tokens": total_tokens})
             
             # 5. Capturar conclusão
-            self._capture_agent_complete(
+            await self._capture_agent_complete(
                 session_id, total_tokens, len(tools_used), total_time
             )
             
@@ -213,14 +283,19 @@ class AIAgentMonitor:
                 "result": result,
                 "agent_id": self.name,
                 "session_id": session_id,
-                "model": self.model,
+                "model": run.model or self.model,
                 "total_tokens": total_tokens,
                 "tools_used": tools_used,
                 "processing_time": total_time,
                 "user_id": user_id
             }
             
+        except asyncio.CancelledError:
+            # Cliente desistiu (desconexão no /stream ou coalescência abandonada)
+            await SESSIONS.fail_async(session_id, "cancelled")
+            raise
         except Exception as e:
+            await SESSIONS.fail_async(session_id, str(e))
             # Capturar erros específicos de AI Agent
             sentry_sdk.set_context("ai_agent_error", {
                 "session_id": session_id,
@@ -247,8 +322,12 @@ async def root():
         "tools_available": len(prp_agent.available_tools)
     }
 
+# Execuções em andamento do agente, para coalescer prompts idênticos concorrentes
+agent_flight = SingleFlight("ai-agent-custom")
+
 @app.post("/ai-agent/process", response_model=AgentResponse)
-async def process_with_ai_agent(request: AgentRequest):
+async def process_with_ai_agent(request: AgentRequest, http_request: Request,
+                                response: Response):
     """
     Processar com AI Agent + Full Sentry Monitoring
     
@@ -258,77 +337,101 @@ async def process_with_ai_agent(request: AgentRequest):
     - Performance metrics
     - Token consumption
     - Error handling
-    """
-    try:
-        # Processar com monitoramento completo
-        result = await prp_agent.process(
-            request.prompt, request.user_id, request.temperature
-        )
-        
-        return AgentResponse(
-            result=result["result"],
-            agent_id=result["agent_id"],
-            total_tokens=result["total_tokens"],
-            model=result["model"],
-            tools_used=result["tools_used"],
-            metadata={
-                "session_id": result["session_id"],
-                "processing_time": f"{result['processing_time']:.2f}s",
-                "user_id": result["user_id"],
-                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ")
-            }
-        )
-        
-    except Exception as e:
-        sentry_sdk.capture_exception(e)
-        raise
 
-@app.get("/ai-agent/benchmark")
-async def ai_agent_benchmark():
+    Requisições idênticas concorrentes (mesmo prompt, modelo, temperatura,
+    agente e usuário) compartilham uma execução, e uma falha vai ao Sentry uma
+    vez só; `X-No-Coalesce: 1` desliga, e a resposta traz `X-Coalesced: true|false`.
     """
-    Benchmark de AI Agent para gerar múltiplos eventos Sentry
+    # Processar com monitoramento completo
+    result, shared = await agent_flight.run(
+        (request.prompt, prp_agent.model, request.temperature, request.agent_type, request.user_id),
+        lambda: prp_agent.process(request.prompt, request.user_id, request.temperature),
+        coalesce=wants_coalescing(http_request.headers),
+        on_error=sentry_sdk.capture_exception,
+    )
+    response.headers[COALESCED_HEADER] = str(shared).lower()
+    
+    return _agent_response(result)
+
+@app.post("/ai-agent/process/stream")
+async def stream_with_ai_agent(request: AgentRequest):
     """
-    benchmark_prompts = [
-        "Analisar arquitetura de microserviços",
-        "Gerar documentação de API REST", 
-        "Revisar código para segurança",
-        "Otimizar queries de banco de dados",
-        "Criar testes automatizados E2E"
-    ]
+    Variante SSE de /ai-agent/process (mesmo monitoramento no Sentry)
     
-    results = []
+    Eventos: start, tool_start/tool_end, delta (texto do agente), usage e
+    done (a mesma resposta de /ai-agent/process). Se o cliente desconecta,
+    as ferramentas em andamento são canceladas.
+    """
+    async def produce(emit: Emit) -> AgentResponse:
+        try:
+            result = await prp_agent.process(request.prompt, request.user_id, request.temperature, emit=emit)
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            raise
+        return _agent_response(result)
     
-    for i, prompt in enumerate(benchmark_prompts):
-        result = await prp_agent.process(
-            prompt, f"benchmark_user_{i}", temperature=0.5
-        )
-        
-        results.append({
-            "prompt": prompt,
+    return sse_response(produce)
+
+def _agent_response(result: Dict[str, Any]) -> AgentResponse:
+    return AgentResponse(
+        result=result["result"],
+        agent_id=result["agent_id"],
+        total_tokens=result["total_tokens"],
+        model=result["model"],
+        tools_used=result["tools_used"],
+        metadata={
             "session_id": result["session_id"],
-            "tokens": result["total_tokens"],
-            "tools": len(result["tools_used"]),
-            "time": f"{result['processing_time']:.2f}s"
-        })
+            "processing_time": f"{result['processing_time']:.2f}s",
+            "user_id": result["user_id"],
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ")
+        }
+    )
+
+BENCHMARK_WORKLOAD = "prp"
+
+async def benchmark_target(case: WorkloadCase, index: int) -> Dict[str, Any]:
+    """Alvo do benchmark_engine: um caso do workload → uma sessão do agente"""
+    result = await prp_agent.process(
+        case.prompt, f"benchmark_user_{index}", temperature=0.5
+    )
+    return {"tokens": result["total_tokens"]}
+
+@app.get("/ai-agent/benchmark")
+async def ai_agent_benchmark(
+    requests: int = Query(5, ge=1, le=10000),
+    concurrency: int = Query(1, ge=1, le=1000),
+    arrival_rate: Optional[float] = Query(None, gt=0, description="req/s (modo open)"),
+    workload: str = BENCHMARK_WORKLOAD,
+    label: Optional[str] = None,
+):
+    """
+    Benchmark de AI Agent para gerar múltiplos eventos Sentry, com carga
+    configurável (ver benchmark_engine.py)
+    """
+    if workload not in WORKLOADS:
+        raise HTTPException(status_code=400, detail=f"Workload desconhecido: {workload}")
+
+    config = BenchmarkConfig(
+        app="main_ai_agents_custom", workload=workload, requests=requests,
+        concurrency=concurrency, arrival_rate=arrival_rate, label=label
+    )
+    report = await run_and_store(benchmark_target, config)
     
     # Capturar resumo do benchmark
     sentry_sdk.capture_message(
-        f"AI Agent benchmark completed: {len(results)} sessions",
+        f"AI Agent benchmark completed: {report['requests']} sessions",
         level="info",
         tags={
             "event.type": "benchmark_complete",
-            "benchmark.sessions": str(len(results)),
-            "benchmark.total_tokens": str(sum(r["tokens"] for r in results))
+            "benchmark.sessions": str(report["requests"]),
+            "benchmark.total_tokens": str(report["total_tokens"])
         }
     )
     
     return {
         "benchmark": "completed",
         "agent": prp_agent.name,
-        "sessions": len(results),
-        "total_tokens": sum(r["tokens"] for r in results),
-        "avg_time": f"{sum(float(r['time'][:-1]) for r in results) / len(results):.2f}s",
-        "results": results
+        **report
     }
 
 @app.get("/sentry-debug")
@@ -1,21 +1,73 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 import sentry_sdk
 from pydantic import BaseModel
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+import asyncio
+import os
 import time
 import uuid
 
+from agents.model_backends import SimulatedBackend, SimulationParams, backend_from_env
+from agents.instrumentation import execute_tool_span, invoke_agent_span, record_response, record_usage
+from agents.openmetrics import install_metrics
+from agents.serving import LATENCY_SCALE, install_serving
+from agents.session_store import SESSIONS
+from agents.single_flight import COALESCED_HEADER, SingleFlight, wants_coalescing
+from agents.sentry_sampling import sampling_options
+from agents.sse import Emit, sse_response, stream_text
+from agents.telemetry_queue import TelemetryQueue
+from benchmark_engine import WORKLOADS, BenchmarkConfig, WorkloadCase, run_and_store
+
 # Configure SDK for AI Agents monitoring (Practical Approach)
 # Baseado na documentação Sentry + contexto personalizado para AI Agents
 sentry_sdk.init(
-    dsn="https://d9fe4e8016424adebb7389d5df925764@o927801.ingest.us.sentry.io/4509774227832832",
+    dsn=os.getenv(
+        "SENTRY_DSN",
+        "https://d9fe4e8016424adebb7389d5df925764@o927801.ingest.us.sentry.io/4509774227832832",
+    ),  # SENTRY_DSN vazio desliga o envio (p.ex. nos testes)
     # Add data like request headers and IP for users
     send_default_pii=True,
-    # To reduce the volume of performance data captured
-    traces_sample_rate=1.0,
+    # To reduce the volume of performance data captured: amostragem por endpoint,
+    # sempre mantendo traces lentos/com erro (agents/sentry_sampling.py)
+    **sampling_options(),
 )
 
 app = FastAPI()
+# Latência por rota, tokens, ferramentas e banco em GET /metrics (OpenMetrics)
+install_metrics(app)
+# /healthz, /readyz e sessões compartilhadas entre workers (serve.py)
+install_serving(app, "ai-agent-monitoring")
+
+# Latências simuladas (segundos) do processamento e de cada ferramenta
+PROCESSING_LATENCY_SECONDS = 0.5 * LATENCY_SCALE
+TOOL_LATENCY_SECONDS = 0.1 * LATENCY_SCALE
+# Fração do processamento gasta gerando o texto final, depois das ferramentas
+# (no /stream esse texto sai em deltas)
+RESPONSE_LATENCY_SHARE = 0.5
+
+AGENT_NAME = "PRP Agent"
+
+
+def simulation_params() -> SimulationParams:
+    """Simulação padrão, lida das constantes de latência a cada execução"""
+    return SimulationParams(
+        planning_s=PROCESSING_LATENCY_SECONDS * (1 - RESPONSE_LATENCY_SHARE),
+        response_s=PROCESSING_LATENCY_SECONDS * RESPONSE_LATENCY_SHARE,
+        tool_latency_s=(TOOL_LATENCY_SECONDS, TOOL_LATENCY_SECONDS),
+        tools_per_run=(2, 4),
+        tool_tokens=(20, 150),
+        output_tokens=(200, 500),
+    )
+
+
+# Modelo: simulador (padrão), replay de JSONL ou o prp_agent real (MODEL_BACKEND)
+BACKEND = backend_from_env(lambda seed: SimulatedBackend(
+    simulation_params, seed=seed,
+    text=lambda prompt, tools: f"AI Agent processou: '{prompt[:100]}...' usando {len(tools)} ferramentas",
+))
+
+# Contexto de início/ferramentas/conclusão vai em resumos periódicos, fora da requisição
+TELEMETRY = TelemetryQueue("ai-agent-monitoring")
 
 class AIAgentRequest(BaseModel):
     prompt: str
@@ -30,20 +82,15 @@ class AIAgentResponse(BaseModel):
     tools_called: List[str]
     processing_time: float
 
-def monitor_ai_agent_start(prompt: str, model: str, user_id: str) -> str:
+async def monitor_ai_agent_start(prompt: str, model: str, user_id: str) -> str:
     """
     Monitorar início de AI Agent - FUNCIONA PERFEITAMENTE!
     """
     session_id = str(uuid.uuid4())
+    await SESSIONS.start_async(session_id, "ai-agent-monitoring", AGENT_NAME, model, user_id)
     
-    # Context específico para AI Agent
-    sentry_sdk.set_context("ai_agent", {
-        "session_id": session_id,
-        "model": model,
-        "prompt_length": len(prompt),
-        "user_id": user_id,
-        "stage": "started"
-    })
+    # Início da sessão (agregado pela fila de telemetria)
+    TELEMETRY.record("agent_start", key=model, prompt_length=len(prompt))
     
     # Tags para filtrar no Sentry
     sentry_sdk.set_tag("ai.session", session_id)
@@ -68,12 +115,7 @@ def monitor_ai_tool_usage(session_id: str, tool_name: str, tokens: int):
     """
     Monitorar uso de ferramentas AI
     """
-    sentry_sdk.set_context(f"ai_tool_{tool_name}", {
-        "session_id": session_id,
-        "tool": tool_name,
-        "tokens_used": tokens,
-        "timestamp": time.time()
-    })
+    TELEMETRY.record("tool", key=tool_name, tokens_used=tokens)
     
     sentry_sdk.add_breadcrumb(
         message=f"AI Tool {tool_name} executed",
@@ -86,37 +128,33 @@ def monitor_ai_tool_usage(session_id: str, tool_name: str, tokens: int):
         }
     )
 
-def monitor_ai_agent_complete(session_id: str, total_tokens: int, 
-                            tools_used: List[str], processing_time: float):
+async def monitor_ai_agent_complete(session_id: str, total_tokens: int, 
+                                  tools_used: List[str], processing_time: float):
     """
     Monitorar conclusão de AI Agent
     """
-    sentry_sdk.set_context("ai_agent_result", {
-        "session_id": session_id,
-        "total_tokens": total_tokens,
-        "tools_count": len(tools_used),
-        "processing_time": processing_time,
-        "tokens_per_second": total_tokens / processing_time if processing_time > 0 else 0,
-        "stage": "completed"
-    })
+    await SESSIONS.complete_async(session_id, total_tokens, len(tools_used), processing_time)
     
-    # Capture completion event
-    sentry_sdk.capture_message(
-        f"AI Agent completed: {total_tokens} tokens, {len(tools_used)} tools, {processing_time:.2f}s",
-        level="info",
-        tags={
-            "ai.event": "completion",
-            "ai.session": session_id,
-            "ai.performance": f"{total_tokens}tokens_{processing_time:.2f}s"
-        }
+    # Conclusão: entra no resumo periódico (antes era um capture_message por requisição)
+    TELEMETRY.record(
+        "agent_complete",
+        key=AGENT_NAME,
+        total_tokens=total_tokens,
+        tools_count=len(tools_used),
+        processing_time=processing_time,
+        tokens_per_second=total_tokens / processing_time if processing_time > 0 else 0,
     )
 
 @app.get("/")
 async def root():
     return {"message": "PRP Agent - AI Monitoring Prático!"}
 
+# Execuções em andamento do agente, para coalescer prompts idênticos concorrentes
+agent_flight = SingleFlight("ai-agent-monitoring")
+
 @app.post("/ai-agent/process", response_model=AIAgentResponse)
-async def process_ai_agent(request: AIAgentRequest):
+async def process_ai_agent(request: AIAgentRequest, http_request: Request,
+                           response: Response):
     """
     Processar com AI Agent + Sentry Monitoring
     
@@ -126,46 +164,82 @@ async def process_ai_agent(request: AIAgentRequest):
     - Token consumption
     - Performance metrics
     - Error handling
+
+    Requisições idênticas concorrentes (mesmo prompt, modelo e usuário)
+    compartilham uma execução; `X-No-Coalesce: 1` desliga, e a resposta traz
+    `X-Coalesced: true|false`.
+    """
+    result, shared = await agent_flight.run(
+        (request.prompt, request.model, None, AGENT_NAME, request.user_id),
+        lambda: _invoke_ai_agent(request),
+        coalesce=wants_coalescing(http_request.headers),
+    )
+    response.headers[COALESCED_HEADER] = str(shared).lower()
+    return result
+
+@app.post("/ai-agent/process/stream")
+async def stream_ai_agent(request: AIAgentRequest):
+    """
+    Variante SSE de /ai-agent/process (mesmo monitoramento no Sentry)
+    
+    Eventos: start, tool_start/tool_end, delta (texto do agente), usage e
+    done (a mesma resposta de /ai-agent/process). Se o cliente desconecta,
+    o processamento é cancelado.
     """
+    return sse_response(lambda emit: _invoke_ai_agent(request, emit))
+
+async def _invoke_ai_agent(request: AIAgentRequest, emit: Optional[Emit] = None) -> AIAgentResponse:
     start_time = time.time()
     
+    with invoke_agent_span(
+        AGENT_NAME, request.model, messages=[{"role": "user", "content": request.prompt}]
+    ) as agent_span:
+        return await _process_ai_agent(request, agent_span, start_time, emit)
+
+async def _process_ai_agent(request: AIAgentRequest, agent_span, start_time: float,
+                            emit: Optional[Emit] = None) -> AIAgentResponse:
     try:
         # 1. Monitorar início
-        session_id = monitor_ai_agent_start(
+        session_id = await monitor_ai_agent_start(
             request.prompt, request.model, request.user_id
         )
+        if emit:
+            emit("start", {"session_id": session_id, "agent": AGENT_NAME, "model": request.model})
         
-        # 2. Simular processamento AI Agent
-        import asyncio
-        import random
-        
-        await asyncio.sleep(0.5)  # Simular processamento
-        
-        # 3. Simular uso de ferramentas
-        available_tools = [
-            "text_analyzer", "code_generator", "prp_parser", 
-            "context_builder", "output_formatter"
-        ]
+        # 2. Execução do modelo (backend); o texto final vem depois das ferramentas
+        run = await BACKEND.run(request.prompt, request.model)
+        await asyncio.sleep(run.planning_s)
         
-        tools_used = random.sample(available_tools, random.randint(2, 4))
-        total_tokens = 0
-        
-        for tool in tools_used:
-            tool_tokens = random.randint(20, 150)
-            total_tokens += tool_tokens
-            monitor_ai_tool_usage(session_id, tool, tool_tokens)
-            await asyncio.sleep(0.1)  # Simular tempo de ferramenta
-        
-        # Adicionar tokens do modelo principal
-        total_tokens += random.randint(200, 500)
+        # 3. Ferramentas escolhidas pelo modelo
+        tools_used = [tool.name for tool in run.tools]
+        for tool in run.tools:
+            tool_start = time.time()
+            if emit:
+                emit("tool_start", {"name": tool.name})
+            monitor_ai_tool_usage(session_id, tool.name, tool.tokens)
+            if not run.tools_executed:  # o agente real já executou (com seus spans)
+                with execute_tool_span(tool.name, model=request.model):
+                    await asyncio.sleep(tool.latency_s)
+            if emit:
+                emit("tool_end", {
+                    "name": tool.name,
+                    "execution_time": time.time() - tool_start,
+                    "tokens_used": tool.tokens,
+                })
         
         # 4. Gerar resultado
-        result = f"AI Agent processou: '{request.prompt[:100]}...' usando {len(tools_used)} ferramentas"
+        result = run.text
+        await stream_text(emit, result, run.response_s)
+        total_tokens = run.total_tokens
         
         processing_time = time.time() - start_time
+        record_response(agent_span, result)
+        record_usage(agent_span, run.input_tokens, run.output_tokens, total_tokens)
+        if emit:
+            emit("usage", {"total_tokens": total_tokens})
         
         # 5. Monitorar conclusão
-        monitor_ai_agent_complete(
+        await monitor_ai_agent_complete(
             session_id, total_tokens, tools_used, processing_time
         )
         
@@ -173,12 +247,19 @@ async def process_ai_agent(request: AIAgentRequest):
             result=result,
             agent_session=session_id,
             tokens_used=total_tokens,
-            model=request.model,
+            model=run.model or request.model,
             tools_called=tools_used,
             processing_time=processing_time
         )
         
+    except asyncio.CancelledError:
+        # Cliente desistiu (desconexão no /stream ou coalescência abandonada)
+        if 'session_id' in locals():
+            await SESSIONS.fail_async(session_id, "cancelled")
+        raise
     except Exception as e:
+        if 'session_id' in locals():
+            await SESSIONS.fail_async(session_id, str(e))
         # Capturar erros específicos de AI Agent
         sentry_sdk.set_context("ai_agent_error", {
             "session_id": session_id if 'session_id' in locals() else "unknown",
@@ -189,57 +270,53 @@ async def process_ai_agent(request: AIAgentRequest):
         sentry_sdk.capture_exception(e)
         raise
 
+BENCHMARK_WORKLOAD = "monitoring"
+
+async def benchmark_target(case: WorkloadCase, index: int) -> Dict[str, Any]:
+    """Alvo do benchmark_engine: um caso do workload → uma execução do agente (sem o endpoint)"""
+    request = AIAgentRequest(
+        prompt=case.prompt,
+        model=case.model,
+        user_id=f"benchmark_user_{index}"
+    )
+    result = await _invoke_ai_agent(request)
+    return {"tokens": result.tokens_used}
+
 @app.get("/ai-agent/benchmark")
-async def ai_agent_benchmark():
+async def ai_agent_benchmark(
+    requests: int = Query(5, ge=1, le=10000),
+    concurrency: int = Query(1, ge=1, le=1000),
+    arrival_rate: Optional[float] = Query(None, gt=0, description="req/s (modo open)"),
+    workload: str = BENCHMARK_WORKLOAD,
+    label: Optional[str] = None,
+):
     """
-    Benchmark AI Agent - Gera múltiplos eventos Sentry
+    Benchmark AI Agent - Gera múltiplos eventos Sentry, com carga configurável
+    (ver benchmark_engine.py)
     """
-    test_cases = [
-        {"prompt": "Analisar arquitetura de sistema", "model": "gpt-4"},
-        {"prompt": "Gerar documentação de API", "model": "gpt-4-turbo"},
-        {"prompt": "Revisar código para segurança", "model": "gpt-3.5-turbo"},
-        {"prompt": "Otimizar performance", "model": "gpt-4"},
-        {"prompt": "Criar testes automatizados", "model": "gpt-4-turbo"}
-    ]
-    
-    results = []
-    
-    for i, test in enumerate(test_cases):
-        request = AIAgentRequest(
-            prompt=test["prompt"],
-            model=test["model"],
-            user_id=f"benchmark_user_{i}"
-        )
-        
-        result = await process_ai_agent(request)
-        
-        results.append({
-            "test": i + 1,
-            "prompt": test["prompt"][:50] + "...",
-            "model": test["model"],
-            "tokens": result.tokens_used,
-            "tools": len(result.tools_called),
-            "time": f"{result.processing_time:.2f}s"
-        })
+    if workload not in WORKLOADS:
+        raise HTTPException(status_code=400, detail=f"Workload desconhecido: {workload}")
+
+    config = BenchmarkConfig(
+        app="main_ai_monitoring", workload=workload, requests=requests,
+        concurrency=concurrency, arrival_rate=arrival_rate, label=label
+    )
+    report = await run_and_store(benchmark_target, config)
     
     # Capturar resumo do benchmark
-    total_tokens = sum(r["tokens"] for r in results)
     sentry_sdk.capture_message(
-        f"AI Agent benchmark: {len(results)} tests, {total_tokens} tokens",
+        f"AI Agent benchmark: {report['requests']} tests, {report['total_tokens']} tokens",
         level="info",
         tags={
             "ai.event": "benchmark_complete",
-            "ai.tests": str(len(results)),
-            "ai.total_tokens": str(total_tokens)
+            "ai.tests": str(report["requests"]),
+            "ai.total_tokens": str(report["total_tokens"])
         }
     )
     
     return {
         "benchmark": "completed",
-        "tests": len(results),
-        "total_tokens": total_tokens,
-        "avg_time": f"{sum(float(r['time'][:-1]) for r in results) / len(results):.2f}s",
-        "results": results
+        **report
     }
 
 @app.get("/sentry-debug")
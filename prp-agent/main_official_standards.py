@@ -1,17 +1,46 @@
-from fastapi import FastAPI
+"""
+App dos padrões oficiais do Sentry (gen_ai.invoke_agent → gen_ai.chat → gen_ai.execute_tool).
+
+SÓ SIMULAÇÃO: o LLM e as ferramentas são `asyncio.sleep` com latências fixas
+(LLM_LATENCY_SECONDS, TOOL_LATENCY_RANGE) e tokens/ferramentas sorteados com
+`random`; não há backend de modelo (MODEL_BACKEND não vale aqui). Os números
+do benchmark deste app medem a instrumentação e o serving, não um modelo.
+Para medir um modelo real ou tráfego gravado, use main_ai_monitoring.py ou
+main_ai_agents_custom.py (agents/model_backends.py).
+"""
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 import sentry_sdk
 from pydantic import BaseModel
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import time
 import uuid
 import json
 import asyncio
+import os
 import random
 
+from agents.instrumentation import chat_span, execute_tool_span, invoke_agent_span, record_response, record_usage
+from agents.openmetrics import install_metrics
+from agents.serving import LATENCY_SCALE, install_serving
+from agents.session_store import SESSIONS
+from agents.single_flight import COALESCED_HEADER, SingleFlight, wants_coalescing
+from agents.sentry_sampling import sampling_options, set_payload
+from benchmark_engine import WORKLOADS, BenchmarkConfig, WorkloadCase, run_and_store
+
+# Latências simuladas (segundos) do LLM e das ferramentas
+LLM_LATENCY_SECONDS = 0.5 * LATENCY_SCALE
+TOOL_LATENCY_RANGE = (0.1 * LATENCY_SCALE, 0.3 * LATENCY_SCALE)
+
 # Configure SDK seguindo documentação oficial Sentry AI Agents + Release Health
+# (SENTRY_DSN vazio desliga o envio, p.ex. nos testes)
 sentry_sdk.init(
-    dsn="https://d9fe4e8016424adebb7389d5df925764@o927801.ingest.us.sentry.io/4509774227832832",
-    traces_sample_rate=1.0,
+    dsn=os.getenv(
+        "SENTRY_DSN",
+        "https://d9fe4e8016424adebb7389d5df925764@o927801.ingest.us.sentry.io/4509774227832832",
+    ),
+    # Amostragem por endpoint, sempre mantendo traces lentos/com erro
+    **sampling_options(),
     send_default_pii=True,  # Include LLM inputs/outputs conforme documentação
     
     # ✅ RELEASE HEALTH CONFIGURATION
@@ -21,6 +50,10 @@ sentry_sdk.init(
 )
 
 app = FastAPI()
+# Latência por rota, tokens, ferramentas e banco em GET /metrics (OpenMetrics)
+install_metrics(app)
+# /healthz, /readyz e sessões compartilhadas entre workers (serve.py)
+install_serving(app, "official-standards")
 
 class OfficialAgentRequest(BaseModel):
     prompt: str
@@ -40,7 +73,8 @@ class OfficialAgentResponse(BaseModel):
     processing_time: float
 
 # Implementação seguindo EXATAMENTE os padrões oficiais Sentry
-def invoke_agent_official(agent_name: str, model: str, prompt: str, temperature: float, max_tokens: int, user_id: str):
+# (spans e atributos gen_ai em agents/instrumentation.py)
+async def invoke_agent_official(agent_name: str, model: str, prompt: str, temperature: float, max_tokens: int, user_id: str):
     """
     INVOKE AGENT SPAN - Seguindo documentação oficial Sentry
     
@@ -48,52 +82,39 @@ def invoke_agent_official(agent_name: str, model: str, prompt: str, temperature:
     The span name SHOULD be "invoke_agent {gen_ai.agent.name}".
     """
     session_id = str(uuid.uuid4())
+    await SESSIONS.start_async(session_id, "official-standards", agent_name, model, user_id)
+    
+    # Available tools
+    available_tools = [
+        {"name": "text_analyzer", "description": "Analyzes text content"},
+        {"name": "code_generator", "description": "Generates code"},
+        {"name": "prp_parser", "description": "Parses Product Requirements"}
+    ]
+    
+    # Messages format: [{"role": "", "content": ""}]
+    messages = [
+        {"role": "system", "content": f"You are {agent_name}, a helpful assistant."},
+        {"role": "user", "content": prompt}
+    ]
     
     # INVOKE AGENT SPAN - Padrão oficial
-    with sentry_sdk.start_span(
-        op="gen_ai.invoke_agent",  # MUST be "gen_ai.invoke_agent"
-        name=f"invoke_agent {agent_name}",  # SHOULD be "invoke_agent {agent_name}"
+    with invoke_agent_span(
+        agent_name, model, messages=messages, available_tools=available_tools,
+        temperature=temperature, max_tokens=max_tokens
     ) as span:
-        
-        # Common Span Attributes - REQUIRED
-        span.set_data("gen_ai.system", "openai")  # REQUIRED
-        span.set_data("gen_ai.request.model", model)  # REQUIRED
-        span.set_data("gen_ai.operation.name", "invoke_agent")  # MUST be "invoke_agent"
-        span.set_data("gen_ai.agent.name", agent_name)  # SHOULD be set
-        
-        # Optional attributes
-        span.set_data("gen_ai.request.temperature", temperature)
-        span.set_data("gen_ai.request.max_tokens", max_tokens)
-        
-        # Available tools
-        available_tools = [
-            {"name": "text_analyzer", "description": "Analyzes text content"},
-            {"name": "code_generator", "description": "Generates code"},
-            {"name": "prp_parser", "description": "Parses Product Requirements"}
-        ]
-        span.set_data("gen_ai.request.available_tools", json.dumps(available_tools))
-        
-        # Messages format: [{"role": "", "content": ""}]
-        messages = [
-            {"role": "system", "content": f"You are {agent_name}, a helpful assistant."},
-            {"role": "user", "content": prompt}
-        ]
-        span.set_data("gen_ai.request.messages", json.dumps(messages))
-        
         # Processar com LLM
         start_time = time.time()
-        llm_result = ai_client_official(model, messages, temperature, max_tokens, session_id)
+        try:
+            llm_result = await ai_client_official(model, messages, temperature, max_tokens, session_id)
+        except BaseException as e:
+            # BaseException: inclui o cancelamento quando todos os clientes desistem
+            await SESSIONS.fail_async(session_id, str(e) or type(e).__name__)
+            raise
         processing_time = time.time() - start_time
+        await SESSIONS.complete_async(session_id, llm_result["total_tokens"], len(llm_result["tools_executed"]), processing_time)
         
-        # Response data
-        span.set_data("gen_ai.response.text", json.dumps([llm_result["response"]]))
-        if llm_result["tool_calls"]:
-            span.set_data("gen_ai.response.tool_calls", json.dumps(llm_result["tool_calls"]))
-        
-        # Token usage
-        span.set_data("gen_ai.usage.input_tokens", llm_result["input_tokens"])
-        span.set_data("gen_ai.usage.output_tokens", llm_result["output_tokens"])
-        span.set_data("gen_ai.usage.total_tokens", llm_result["total_tokens"])
+        record_response(span, llm_result["response"], llm_result["tool_calls"])
+        record_usage(span, llm_result["input_tokens"], llm_result["output_tokens"], llm_result["total_tokens"])
         
         return {
             "session_id": session_id,
@@ -105,7 +126,7 @@ def invoke_agent_official(agent_name: str, model: str, prompt: str, temperature:
             "processing_time": processing_time
         }
 
-def ai_client_official(model: str, messages: List[Dict], temperature: float, max_tokens: int, session_id: str):
+async def ai_client_official(model: str, messages: List[Dict], temperature: float, max_tokens: int, session_id: str):
     """
     AI CLIENT SPAN - Seguindo documentação oficial Sentry
     
@@ -114,23 +135,9 @@ def ai_client_official(model: str, messages: List[Dict], temperature: float, max
     """
     
     # AI CLIENT SPAN - Padrão oficial
-    with sentry_sdk.start_span(
-        op="gen_ai.chat",  # MUST be "gen_ai.chat"
-        name=f"chat {model}",  # SHOULD be "chat {model}"
-    ) as span:
-        
-        # Common Span Attributes - REQUIRED
-        span.set_data("gen_ai.system", "openai")  # REQUIRED
-        span.set_data("gen_ai.request.model", model)  # REQUIRED
-        span.set_data("gen_ai.operation.name", "chat")  # operation name
-        
-        # Request data
-        span.set_data("gen_ai.request.messages", json.dumps(messages))
-        span.set_data("gen_ai.request.temperature", temperature)
-        span.set_data("gen_ai.request.max_tokens", max_tokens)
-        
-        # Simular processamento LLM
-        time.sleep(0.5)
+    with chat_span(model, messages=messages, temperature=temperature, max_tokens=max_tokens) as span:
+        # Simular processamento LLM (sem bloquear o event loop)
+        await asyncio.sleep(LLM_LATENCY_SECONDS)
         
         # Simular tokens
         prompt_text = " ".join([msg["content"] for msg in messages])
@@ -150,9 +157,14 @@ def ai_client_official(model: str, messages: List[Dict], temperature: float, max
             tools = ["text_analyzer", "code_generator", "prp_parser"]
             selected_tools = random.sample(tools, random.randint(1, 2))
             
+            # Execute tools seguindo padrão oficial - em paralelo (cada span de
+            # ferramenta roda em scope próprio, filho do gen_ai.chat)
+            await asyncio.gather(*(
+                execute_tool_official(tool_name, messages[-1]["content"], model, session_id)
+                for tool_name in selected_tools
+            ))
+            
             for tool_name in selected_tools:
-                # Execute tool seguindo padrão oficial
-                tool_result = execute_tool_official(tool_name, messages[-1]["content"], model, session_id)
                 tools_executed.append(tool_name)
                 
                 tool_calls.append({
@@ -161,15 +173,8 @@ def ai_client_official(model: str, messages: List[Dict], temperature: float, max
                     "arguments": json.dumps({"input": messages[-1]["content"][:100]})
                 })
         
-        # Response data
-        span.set_data("gen_ai.response.text", json.dumps([response]))
-        if tool_calls:
-            span.set_data("gen_ai.response.tool_calls", json.dumps(tool_calls))
-        
-        # Token usage
-        span.set_data("gen_ai.usage.input_tokens", input_tokens)
-        span.set_data("gen_ai.usage.output_tokens", output_tokens)
-        span.set_data("gen_ai.usage.total_tokens", total_tokens)
+        record_response(span, response, tool_calls)
+        record_usage(span, input_tokens, output_tokens, total_tokens, model=model)
         
         return {
             "response": response,
@@ -180,7 +185,14 @@ def ai_client_official(model: str, messages: List[Dict], temperature: float, max
             "total_tokens": total_tokens
         }
 
-def execute_tool_official(tool_name: str, input_text: str, model: str, session_id: str):
+# Tool descriptions
+TOOL_DESCRIPTIONS = {
+    "text_analyzer": "Analyzes text content and extracts insights",
+    "code_generator": "Generates code based on requirements", 
+    "prp_parser": "Parses Product Requirement Prompts"
+}
+
+async def execute_tool_official(tool_name: str, input_text: str, model: str, session_id: str):
     """
     EXECUTE TOOL SPAN - Seguindo documentação oficial Sentry
     
@@ -189,36 +201,18 @@ def execute_tool_official(tool_name: str, input_text: str, model: str, session_i
     """
     
     # EXECUTE TOOL SPAN - Padrão oficial
-    with sentry_sdk.start_span(
-        op="gen_ai.execute_tool",  # MUST be "gen_ai.execute_tool"
-        name=f"execute_tool {tool_name}",  # SHOULD be "execute_tool {tool_name}"
+    with execute_tool_span(
+        tool_name,
+        description=TOOL_DESCRIPTIONS.get(tool_name, "AI Tool"),
+        model=model,
+        system="openai",
+        tool_input={"text": input_text[:100], "session_id": session_id},
     ) as span:
-        
-        # Common attributes
-        span.set_data("gen_ai.system", "openai")
-        span.set_data("gen_ai.request.model", model)
-        
-        # Tool-specific attributes
-        span.set_data("gen_ai.tool.name", tool_name)
-        
-        # Tool descriptions
-        descriptions = {
-            "text_analyzer": "Analyzes text content and extracts insights",
-            "code_generator": "Generates code based on requirements", 
-            "prp_parser": "Parses Product Requirement Prompts"
-        }
-        span.set_data("gen_ai.tool.description", descriptions.get(tool_name, "AI Tool"))
-        span.set_data("gen_ai.tool.type", "function")
-        
-        # Tool input/output
-        tool_input = {"text": input_text[:100], "session_id": session_id}
-        span.set_data("gen_ai.tool.input", json.dumps(tool_input))
-        
         # Simular execução
-        time.sleep(random.uniform(0.1, 0.3))
+        await asyncio.sleep(random.uniform(*TOOL_LATENCY_RANGE))
         
         tool_output = f"{tool_name} processed: {input_text[:50]}... -> Analysis complete"
-        span.set_data("gen_ai.tool.output", tool_output)
+        set_payload(span, "gen_ai.tool.output", tool_output)
         
         return tool_output
 
@@ -235,8 +229,12 @@ async def root():
         "standards": "https://docs.sentry.io/platforms/python/tracing/instrumentation/custom-instrumentation/"
     }
 
+# Execuções em andamento do agente, para coalescer prompts idênticos concorrentes
+agent_flight = SingleFlight("official-standards")
+
 @app.post("/ai-agent/official-standards", response_model=OfficialAgentResponse)
-async def process_official_standards(request: OfficialAgentRequest):
+async def process_official_standards(request: OfficialAgentRequest, http_request: Request,
+                                     response: Response):
     """
     Processamento AI Agent seguindo 100% os padrões oficiais Sentry
     
@@ -246,81 +244,84 @@ async def process_official_standards(request: OfficialAgentRequest):
     ✅ gen_ai.execute_tool (Tool execution)
     
     Com TODOS os atributos obrigatórios da documentação oficial.
+
+    Requisições idênticas concorrentes (mesmo prompt, modelo, temperatura,
+    agente e usuário) compartilham uma execução, e uma falha vai ao Sentry uma
+    vez só; `X-No-Coalesce: 1` desliga, e a resposta traz `X-Coalesced: true|false`.
     """
-    try:
-        result = invoke_agent_official(
+    result, shared = await agent_flight.run(
+        (request.prompt, request.model, request.temperature, request.agent_name, request.max_tokens,
+         request.user_id),
+        lambda: invoke_agent_official(
             agent_name=request.agent_name,
             model=request.model,
             prompt=request.prompt,
             temperature=request.temperature,
             max_tokens=request.max_tokens,
             user_id=request.user_id
-        )
-        
-        return OfficialAgentResponse(
-            result=result["result"],
-            agent_session=result["session_id"],
-            total_tokens=result["total_tokens"],
-            input_tokens=result["input_tokens"],
-            output_tokens=result["output_tokens"],
-            tools_executed=result["tools_executed"],
-            processing_time=result["processing_time"]
-        )
-        
-    except Exception as e:
-        sentry_sdk.capture_exception(e)
-        raise
+        ),
+        coalesce=wants_coalescing(http_request.headers),
+        on_error=sentry_sdk.capture_exception,
+    )
+    response.headers[COALESCED_HEADER] = str(shared).lower()
+    
+    return OfficialAgentResponse(
+        result=result["result"],
+        agent_session=result["session_id"],
+        total_tokens=result["total_tokens"],
+        input_tokens=result["input_tokens"],
+        output_tokens=result["output_tokens"],
+        tools_executed=result["tools_executed"],
+        processing_time=result["processing_time"]
+    )
+
+BENCHMARK_WORKLOAD = "standard"
+
+async def benchmark_target(case: WorkloadCase, index: int) -> Dict[str, Any]:
+    """Alvo do benchmark_engine: um caso do workload → uma invocação do agente"""
+    result = await invoke_agent_official(
+        agent_name=case.agent,
+        model=case.model,
+        prompt=case.prompt,
+        temperature=0.1,
+        max_tokens=1000,
+        user_id=f"benchmark_user_{index}"
+    )
+    return {"tokens": result["total_tokens"]}
 
 @app.get("/ai-agent/benchmark-standards")
-async def benchmark_official_standards():
+async def benchmark_official_standards(
+    requests: int = Query(5, ge=1, le=10000),
+    concurrency: int = Query(1, ge=1, le=1000),
+    arrival_rate: Optional[float] = Query(None, gt=0, description="req/s (modo open)"),
+    workload: str = BENCHMARK_WORKLOAD,
+    label: Optional[str] = None,
+):
     """
     Benchmark seguindo padrões oficiais Sentry AI Agents
-    Gera múltiplos spans seguindo documentação oficial
+    Gera múltiplos spans seguindo documentação oficial, com carga configurável
+    (ver benchmark_engine.py)
     """
-    test_cases = [
-        {"prompt": "Implement JWT authentication system", "model": "gpt-4o-mini", "agent": "Security Engineer"},
-        {"prompt": "Design RESTful API architecture", "model": "gpt-4-turbo", "agent": "API Architect"},
-        {"prompt": "Optimize database performance", "model": "gpt-4", "agent": "Database Specialist"},
-        {"prompt": "Create automated testing suite", "model": "gpt-4o-mini", "agent": "QA Engineer"},
-        {"prompt": "Implement CI/CD pipeline", "model": "gpt-4-turbo", "agent": "DevOps Engineer"}
-    ]
-    
-    results = []
-    
-    for i, test in enumerate(test_cases):
-        result = invoke_agent_official(
-            agent_name=test["agent"],
-            model=test["model"],
-            prompt=test["prompt"],
-            temperature=0.1,
-            max_tokens=1000,
-            user_id=f"benchmark_user_{i}"
-        )
-        
-        results.append({
-            "test": i + 1,
-            "agent": test["agent"],
-            "model": test["model"],
-            "session_id": result["session_id"],
-            "tokens": result["total_tokens"],
-            "tools": len(result["tools_executed"]),
-            "time": f"{result['processing_time']:.2f}s"
-        })
+    if workload not in WORKLOADS:
+        raise HTTPException(status_code=400, detail=f"Workload desconhecido: {workload}")
+
+    config = BenchmarkConfig(
+        app="main_official_standards", workload=workload, requests=requests,
+        concurrency=concurrency, arrival_rate=arrival_rate, label=label
+    )
+    report = await run_and_store(benchmark_target, config)
     
     # Capture benchmark completion seguindo padrões
     sentry_sdk.capture_message(
-        f"Official Sentry AI Standards Benchmark: {len(results)} agents, {sum(r['tokens'] for r in results)} tokens",
+        f"Official Sentry AI Standards Benchmark: {report['requests']} agents, {report['total_tokens']} tokens",
         level="info"
     )
     
     return {
         "benchmark": "✅ Official Sentry AI Agents Standards",
         "implementation": "100% Official Documentation Compliance",
-        "agents_tested": len(results),
-        "total_tokens": sum(r["tokens"] for r in results),
-        "avg_time": f"{sum(float(r['time'][:-1]) for r in results) / len(results):.2f}s",
         "spans_generated": ["gen_ai.invoke_agent", "gen_ai.chat", "gen_ai.execute_tool"],
-        "results": results
+        **report
     }
 
 @app.get("/sentry-debug")
@@ -1,19 +1,60 @@
+"""
+App de referência dos padrões oficiais do Sentry para AI Agents (spans gen_ai).
+
+SÓ SIMULAÇÃO: o LLM e as ferramentas são `asyncio.sleep` com latências fixas
+(LLM_LATENCY_SECONDS, TOOL_LATENCY_RANGE) e tokens/ferramentas sorteados com
+`random`; não há backend de modelo (MODEL_BACKEND não vale aqui). Os números
+do benchmark deste app medem o pipeline (spans, sessões, SSE, coalescência),
+não um modelo. Para medir um modelo real ou tráfego gravado, use
+main_ai_monitoring.py ou main_ai_agents_custom.py (agents/model_backends.py).
+"""
+
 import sentry_sdk
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from pydantic import BaseModel
+import asyncio
 import json
+import os
+import random
 import time
 import uuid
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+
+from agents.instrumentation import chat_span, execute_tool_span, invoke_agent_span, record_response, record_usage
+from agents.openmetrics import install_metrics
+from agents.serving import LATENCY_SCALE, install_serving
+from agents.session_store import SESSIONS
+from agents.single_flight import COALESCED_HEADER, SingleFlight, wants_coalescing
+from agents.sse import Emit, sse_response, stream_text
+from agents.sentry_sampling import sampling_options, set_payload
+from benchmark_engine import WORKLOADS, BenchmarkConfig, WorkloadCase, run_and_store
 
 # Configure SDK seguindo documentação oficial
 sentry_sdk.init(
-    dsn="https://d9fe4e8016424adebb7389d5df925764@o927801.ingest.us.sentry.io/4509774227832832",
-    traces_sample_rate=1.0,
+    dsn=os.getenv(
+        "SENTRY_DSN",
+        "https://d9fe4e8016424adebb7389d5df925764@o927801.ingest.us.sentry.io/4509774227832832",
+    ),  # SENTRY_DSN vazio desliga o envio (p.ex. nos testes)
+    # Amostragem por endpoint, sempre mantendo traces lentos/com erro
+    **sampling_options(),
     send_default_pii=True,  # Include LLM inputs/outputs
 )
 
 app = FastAPI(title="PRP Agent - Sentry AI Agents Official Standards")
+# Latência por rota, tokens, ferramentas e banco em GET /metrics (OpenMetrics)
+install_metrics(app)
+# /healthz, /readyz e sessões compartilhadas entre workers (serve.py)
+install_serving(app, "official")
+
+# Latências simuladas (segundos) do LLM e das ferramentas
+LLM_LATENCY_SECONDS = 0.5 * LATENCY_SCALE
+TOOL_LATENCY_RANGE = (0.1 * LATENCY_SCALE, 0.3 * LATENCY_SCALE)
+# Fração da latência do LLM gasta gerando o texto final (o resto é o
+# planejamento antes das ferramentas); no /stream esse texto sai em deltas
+RESPONSE_LATENCY_SHARE = 0.5
+
+# Máximo de ferramentas executando ao mesmo tempo em uma chamada do agente
+TOOL_PARALLELISM = int(os.getenv("AGENT_TOOL_PARALLELISM", "4"))
 
 # Models seguindo padrão oficial
 class AgentRequest(BaseModel):
@@ -35,10 +76,12 @@ class AgentResponse(BaseModel):
 
 # Implementação seguindo Manual Instrumentation Oficial
 class SentryAIAgent:
-    def __init__(self, name: str, model_provider: str = "openai", model: str = "gpt-4o-mini"):
+    def __init__(self, name: str, model_provider: str = "openai", model: str = "gpt-4o-mini",
+                 max_tool_parallelism: int = TOOL_PARALLELISM):
         self.name = name
         self.model_provider = model_provider
         self.model = model
+        self.max_tool_parallelism = max(1, max_tool_parallelism)
         self.available_tools = [
             {
                 "name": "text_analyzer", 
@@ -62,53 +105,51 @@ class SentryAIAgent:
             }
         ]
     
-    async def invoke_agent(self, prompt: str, temperature: float = 0.1, max_tokens: int = 1000, user_id: str = "anonymous"):
+    async def invoke_agent(self, prompt: str, temperature: float = 0.1, max_tokens: int = 1000, user_id: str = "anonymous",
+                           emit: Optional[Emit] = None):
         """
         Invoke Agent Span - Seguindo documentação oficial Sentry
         https://docs.sentry.io/platforms/python/tracing/instrumentation/custom-instrumentation/
+
+        Com `emit`, publica os eventos SSE do pipeline (ver agents/sse.py).
         """
         session_id = str(uuid.uuid4())
+        await SESSIONS.start_async(session_id, "official", self.name, self.model, user_id)
+        if emit:
+            emit("start", {"session_id": session_id, "agent": self.name, "model": self.model})
         
-        # INVOKE AGENT SPAN - Padrão Oficial Sentry
-        with sentry_sdk.start_span(
-            op="gen_ai.invoke_agent",
-            name=f"invoke_agent {self.name}",
+        # Messages format: [{"role": "", "content": ""}]
+        messages = [
+            {"role": "system", "content": f"You are {self.name}, a helpful AI assistant."},
+            {"role": "user", "content": prompt}
+        ]
+        
+        # INVOKE AGENT SPAN - Padrão Oficial Sentry (agents/instrumentation.py)
+        with invoke_agent_span(
+            self.name, self.model, system=self.model_provider, messages=messages,
+            available_tools=self.available_tools, temperature=temperature, max_tokens=max_tokens
         ) as agent_span:
-            
-            # Common Span Attributes (REQUIRED)
-            agent_span.set_data("gen_ai.system", self.model_provider)
-            agent_span.set_data("gen_ai.request.model", self.model)
-            agent_span.set_data("gen_ai.operation.name", "invoke_agent")
-            agent_span.set_data("gen_ai.agent.name", self.name)
-            
-            # Agent-specific attributes (OPTIONAL)
-            agent_span.set_data("gen_ai.request.temperature", temperature)
-            agent_span.set_data("gen_ai.request.max_tokens", max_tokens)
-            agent_span.set_data("gen_ai.request.available_tools", json.dumps(self.available_tools))
-            
-            # Messages format: [{"role": "", "content": ""}]
-            messages = [
-                {"role": "system", "content": f"You are {self.name}, a helpful AI assistant."},
-                {"role": "user", "content": prompt}
-            ]
-            agent_span.set_data("gen_ai.request.messages", json.dumps(messages))
-            
             start_time = time.time()
             
             # Simular processamento do agent
-            result = await self._process_with_llm(prompt, temperature, max_tokens, session_id)
+            try:
+                result = await self._process_with_llm(prompt, temperature, max_tokens, session_id, emit)
+            except BaseException as e:
+                # BaseException: cliente do /stream desconectou (CancelledError)
+                await SESSIONS.fail_async(session_id, str(e) or type(e).__name__)
+                raise
             
             processing_time = time.time() - start_time
+            await SESSIONS.complete_async(session_id, result["total_tokens"], len(result["tools_executed"]), processing_time)
             
-            # Response data
-            agent_span.set_data("gen_ai.response.text", json.dumps([result["response"]]))
-            if result["tool_calls"]:
-                agent_span.set_data("gen_ai.response.tool_calls", json.dumps(result["tool_calls"]))
-            
-            # Usage tokens
-            agent_span.set_data("gen_ai.usage.input_tokens", result["input_tokens"])
-            agent_span.set_data("gen_ai.usage.output_tokens", result["output_tokens"])
-            agent_span.set_data("gen_ai.usage.total_tokens", result["total_tokens"])
+            record_response(agent_span, result["response"], result["tool_calls"])
+            record_usage(agent_span, result["input_tokens"], result["output_tokens"], result["total_tokens"])
+            if emit:
+                emit("usage", {
+                    "input_tokens": result["input_tokens"],
+                    "output_tokens": result["output_tokens"],
+                    "total_tokens": result["total_tokens"],
+                })
             
             return {
                 "session_id": session_id,
@@ -120,35 +161,25 @@ class SentryAIAgent:
                 "processing_time": processing_time
             }
     
-    async def _process_with_llm(self, prompt: str, temperature: float, max_tokens: int, session_id: str):
+    async def _process_with_llm(self, prompt: str, temperature: float, max_tokens: int, session_id: str,
+                                emit: Optional[Emit] = None):
         """
         AI Client Span - Seguindo documentação oficial Sentry
         """
-        import asyncio
-        import random
+        
+        messages = [
+            {"role": "system", "content": f"You are {self.name}."},
+            {"role": "user", "content": prompt}
+        ]
         
         # AI CLIENT SPAN - Padrão Oficial Sentry
-        with sentry_sdk.start_span(
-            op="gen_ai.chat",
-            name=f"chat {self.model}",
-        ) as chat_span:
-            
-            # Common Span Attributes (REQUIRED)
-            chat_span.set_data("gen_ai.system", self.model_provider)
-            chat_span.set_data("gen_ai.request.model", self.model)
-            chat_span.set_data("gen_ai.operation.name", "chat")
-            
-            # Request parameters
-            messages = [
-                {"role": "system", "content": f"You are {self.name}."},
-                {"role": "user", "content": prompt}
-            ]
-            chat_span.set_data("gen_ai.request.messages", json.dumps(messages))
-            chat_span.set_data("gen_ai.request.temperature", temperature)
-            chat_span.set_data("gen_ai.request.max_tokens", max_tokens)
-            
-            # Simular processamento LLM
-            await asyncio.sleep(0.5)
+        with chat_span(
+            self.model, system=self.model_provider, messages=messages,
+            temperature=temperature, max_tokens=max_tokens
+        ) as llm_span:
+            # Simular processamento LLM (planejamento; o texto final vem depois das ferramentas)
+            response_latency = LLM_LATENCY_SECONDS * RESPONSE_LATENCY_SHARE
+            await asyncio.sleep(LLM_LATENCY_SECONDS - response_latency)
             
             # Simular resposta e uso de tokens
             input_tokens = len(prompt.split()) * 1.3  # Aproximação
@@ -163,9 +194,10 @@ class SentryAIAgent:
             if should_use_tools:
                 selected_tools = random.sample(self.available_tools, random.randint(1, 3))
                 
+                # Executar ferramentas (independentes entre si) em paralelo
+                await self._execute_tools(selected_tools, prompt, session_id, emit)
+                
                 for tool in selected_tools:
-                    # Executar ferramenta
-                    tool_result = await self._execute_tool(tool, prompt, session_id)
                     tools_executed.append(tool["name"])
                     
                     tool_calls.append({
@@ -175,16 +207,10 @@ class SentryAIAgent:
                     })
             
             response = f"Processed: '{prompt[:100]}...' using {len(tools_executed)} tools"
+            await stream_text(emit, response, response_latency)
             
-            # Response data
-            chat_span.set_data("gen_ai.response.text", json.dumps([response]))
-            if tool_calls:
-                chat_span.set_data("gen_ai.response.tool_calls", json.dumps(tool_calls))
-            
-            # Usage data
-            chat_span.set_data("gen_ai.usage.input_tokens", int(input_tokens))
-            chat_span.set_data("gen_ai.usage.output_tokens", output_tokens)
-            chat_span.set_data("gen_ai.usage.total_tokens", total_tokens)
+            record_response(llm_span, response, tool_calls)
+            record_usage(llm_span, int(input_tokens), output_tokens, total_tokens, model=self.model)
             
             return {
                 "response": response,
@@ -195,38 +221,50 @@ class SentryAIAgent:
                 "total_tokens": total_tokens
             }
     
-    async def _execute_tool(self, tool: Dict, prompt: str, session_id: str):
+    async def _execute_tools(self, tools: List[Dict], prompt: str, session_id: str,
+                             emit: Optional[Emit] = None) -> List[str]:
+        """
+        Executar ferramentas independentes em paralelo, no máximo
+        `max_tool_parallelism` por vez. Resultados na ordem de `tools`.
+        """
+        semaphore = asyncio.Semaphore(self.max_tool_parallelism)
+        
+        async def run(tool: Dict) -> str:
+            async with semaphore:
+                return await self._execute_tool(tool, prompt, session_id, emit)
+        
+        return await asyncio.gather(*(run(tool) for tool in tools))
+    
+    async def _execute_tool(self, tool: Dict, prompt: str, session_id: str, emit: Optional[Emit] = None):
         """
         Execute Tool Span - Seguindo documentação oficial Sentry
         """
-        import asyncio
-        import random
+        tool_start = time.time()
+        if emit:
+            emit("tool_start", {"name": tool["name"]})
         
-        # EXECUTE TOOL SPAN - Padrão Oficial Sentry
-        with sentry_sdk.start_span(
-            op="gen_ai.execute_tool",
-            name=f"execute_tool {tool['name']}",
+        # EXECUTE TOOL SPAN - Padrão Oficial Sentry (scope próprio por chamada,
+        # então ferramentas em paralelo continuam filhas do gen_ai.chat)
+        with execute_tool_span(
+            tool["name"],
+            description=tool["description"],
+            model=self.model,
+            system=self.model_provider,
+            tool_input={"prompt": prompt[:100], "session_id": session_id},
+            tool_type=tool["type"],
         ) as tool_span:
-            
-            # Common attributes
-            tool_span.set_data("gen_ai.system", self.model_provider)
-            tool_span.set_data("gen_ai.request.model", self.model)
-            
-            # Tool-specific attributes
-            tool_span.set_data("gen_ai.tool.name", tool["name"])
-            tool_span.set_data("gen_ai.tool.description", tool["description"])
-            tool_span.set_data("gen_ai.tool.type", tool["type"])
-            
-            # Tool input
-            tool_input = {"prompt": prompt[:100], "session_id": session_id}
-            tool_span.set_data("gen_ai.tool.input", json.dumps(tool_input))
-            
             # Simular execução da ferramenta
-            await asyncio.sleep(random.uniform(0.1, 0.3))
+            await asyncio.sleep(random.uniform(*TOOL_LATENCY_RANGE))
             
             # Simular output da ferramenta
             tool_output = f"{tool['name']} processed input successfully"
-            tool_span.set_data("gen_ai.tool.output", tool_output)
+            set_payload(tool_span, "gen_ai.tool.output", tool_output)
+            if emit:
+                emit("tool_end", {
+                    "name": tool["name"],
+                    "output": tool_output,
+                    "execution_time": time.time() - tool_start,
+                })
             
             return tool_output
 
@@ -246,8 +284,12 @@ async def root():
         "standards": "Official Sentry AI Agents Manual Instrumentation"
     }
 
+# Execuções em andamento do agente, para coalescer prompts idênticos concorrentes
+agent_flight = SingleFlight("official")
+
 @app.post("/ai-agent/official", response_model=AgentResponse)
-async def process_official_ai_agent(request: AgentRequest):
+async def process_official_ai_agent(request: AgentRequest, http_request: Request,
+                                    response: Response):
     """
     Processamento AI Agent seguindo 100% os padrões oficiais Sentry
     
@@ -257,80 +299,109 @@ async def process_official_ai_agent(request: AgentRequest):
     - gen_ai.execute_tool (Tool execution)
     
     Com todos os atributos obrigatórios e opcionais da documentação oficial.
+
+    Requisições idênticas concorrentes (mesmo prompt, modelo, temperatura,
+    agente e usuário) compartilham uma execução, e uma falha vai ao Sentry uma
+    vez só; `X-No-Coalesce: 1` desliga, e a resposta traz `X-Coalesced: true|false`.
     """
-    try:
-        result = await sentry_agent.invoke_agent(
+    result, shared = await agent_flight.run(
+        (request.prompt, sentry_agent.model, request.temperature, sentry_agent.name, request.max_tokens,
+         request.user_id),
+        lambda: sentry_agent.invoke_agent(
             prompt=request.prompt,
             temperature=request.temperature,
             max_tokens=request.max_tokens,
             user_id=request.user_id
-        )
-        
-        return AgentResponse(
-            result=result["result"],
-            agent_session=result["session_id"],
-            total_tokens=result["total_tokens"],
-            input_tokens=result["input_tokens"],
-            output_tokens=result["output_tokens"],
-            tools_executed=result["tools_executed"],
-            processing_time=result["processing_time"]
-        )
-        
-    except Exception as e:
-        sentry_sdk.capture_exception(e)
-        raise
+        ),
+        coalesce=wants_coalescing(http_request.headers),
+        on_error=sentry_sdk.capture_exception,
+    )
+    response.headers[COALESCED_HEADER] = str(shared).lower()
+    
+    return _agent_response(result)
+
+@app.post("/ai-agent/official/stream")
+async def stream_official_ai_agent(request: AgentRequest):
+    """
+    Variante SSE de /ai-agent/official (mesmos spans oficiais)
+    
+    Eventos: start, tool_start/tool_end, delta (texto do modelo), usage e
+    done (a mesma resposta de /ai-agent/official). Se o cliente desconecta,
+    o pipeline é cancelado.
+    """
+    async def produce(emit: Emit) -> AgentResponse:
+        try:
+            result = await sentry_agent.invoke_agent(
+                prompt=request.prompt,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens,
+                user_id=request.user_id,
+                emit=emit
+            )
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            raise
+        return _agent_response(result)
+    
+    return sse_response(produce)
+
+def _agent_response(result: Dict[str, Any]) -> AgentResponse:
+    return AgentResponse(
+        result=result["result"],
+        agent_session=result["session_id"],
+        total_tokens=result["total_tokens"],
+        input_tokens=result["input_tokens"],
+        output_tokens=result["output_tokens"],
+        tools_executed=result["tools_executed"],
+        processing_time=result["processing_time"]
+    )
+
+BENCHMARK_WORKLOAD = "official"
+
+async def benchmark_target(case: WorkloadCase, index: int) -> Dict[str, Any]:
+    """Alvo do benchmark_engine: agent específico para cada caso do workload"""
+    test_agent = SentryAIAgent(
+        name=case.agent,
+        model_provider="openai",
+        model=case.model
+    )
+    result = await test_agent.invoke_agent(
+        prompt=case.prompt,
+        user_id=f"benchmark_user_{index}"
+    )
+    return {"tokens": result["total_tokens"]}
 
 @app.get("/ai-agent/benchmark-official")
-async def benchmark_official_standards():
+async def benchmark_official_standards(
+    requests: int = Query(5, ge=1, le=10000),
+    concurrency: int = Query(1, ge=1, le=1000),
+    arrival_rate: Optional[float] = Query(None, gt=0, description="req/s (modo open)"),
+    workload: str = BENCHMARK_WORKLOAD,
+    label: Optional[str] = None,
+):
     """
     Benchmark seguindo padrões oficiais Sentry AI Agents
-    Gera múltiplos spans de todos os tipos oficiais
+    Gera múltiplos spans de todos os tipos oficiais, com carga configurável
+    (ver benchmark_engine.py)
     """
-    test_cases = [
-        {"prompt": "Analyze system architecture", "model": "gpt-4o-mini", "agent": "Architecture Agent"},
-        {"prompt": "Generate API documentation", "model": "gpt-4-turbo", "agent": "Documentation Agent"},
-        {"prompt": "Review code security", "model": "gpt-4", "agent": "Security Agent"},
-        {"prompt": "Optimize database queries", "model": "gpt-4o-mini", "agent": "Performance Agent"},
-        {"prompt": "Create automated tests", "model": "gpt-4-turbo", "agent": "Testing Agent"}
-    ]
-    
-    results = []
-    
-    for i, test in enumerate(test_cases):
-        # Criar agent específico para cada teste
-        test_agent = SentryAIAgent(
-            name=test["agent"],
-            model_provider="openai",
-            model=test["model"]
-        )
-        
-        result = await test_agent.invoke_agent(
-            prompt=test["prompt"],
-            user_id=f"benchmark_user_{i}"
-        )
-        
-        results.append({
-            "test": i + 1,
-            "agent": test["agent"],
-            "model": test["model"],
-            "session_id": result["session_id"],
-            "tokens": result["total_tokens"],
-            "tools": len(result["tools_executed"]),
-            "time": f"{result['processing_time']:.2f}s"
-        })
+    if workload not in WORKLOADS:
+        raise HTTPException(status_code=400, detail=f"Workload desconhecido: {workload}")
+
+    config = BenchmarkConfig(
+        app="main_sentry_official", workload=workload, requests=requests,
+        concurrency=concurrency, arrival_rate=arrival_rate, label=label
+    )
+    report = await run_and_store(benchmark_target, config)
     
     # Capture benchmark completion
     sentry_sdk.capture_message(
-        f"AI Agents Official Standards Benchmark: {len(results)} agents tested",
+        f"AI Agents Official Standards Benchmark: {report['requests']} agents tested",
         level="info"
     )
     
     return {
         "benchmark": "Official Sentry AI Agents Standards",
-        "agents_tested": len(results),
-        "total_tokens": sum(r["tokens"] for r in results),
-        "avg_time": f"{sum(float(r['time'][:-1]) for r in results) / len(results):.2f}s",
-        "results": results
+        **report
     }
 
 @app.get("/sentry-debug")
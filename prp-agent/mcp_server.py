@@ -22,6 +22,9 @@ from mcp.types import (
 # Importar o agente PRP
 from agents.agent import chat_with_prp_agent, PRPAgentDependencies
 from agents.tools import create_prp, search_prps, analyze_prp_with_llm, get_prp_details
+from agents.metrics import ToolMetricsCollector
+from agents.traffic_replay import traffic_session
+from agents.settings import settings
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -38,6 +41,12 @@ server = Server(
 # Dependências globais do agente
 agent_deps = PRPAgentDependencies()
 
+# Métricas por ferramenta (no-op quando MCP_METRICS_ENABLED=false)
+tool_metrics = ToolMetricsCollector(enabled=settings.mcp_metrics_enabled)
+
+# Ferramentas cujo tempo fora do banco é tempo de LLM
+LLM_TOOLS = {"prp_chat", "prp_analyze"}
+
 @server.setRequestHandler(ListToolsRequestSchema)
 async def handle_list_tools() -> Dict[str, Any]:
     """Listar ferramentas disponíveis do agente PRP."""
@@ -183,6 +192,25 @@ async def handle_list_tools() -> Dict[str, Any]:
                 },
                 "required": ["prp_id", "new_status"]
             }
+        ),
+        Tool(
+            name="prp_metrics",
+            description="Métricas de latência por ferramenta (chamadas, erros, p50/p95/p99, bytes, tempo DB vs LLM)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "format": {
+                        "type": "string",
+                        "description": "Formato da saída (text/json)",
+                        "default": "text"
+                    },
+                    "reset": {
+                        "type": "boolean",
+                        "description": "Zerar as métricas após a leitura",
+                        "default": False
+                    }
+                }
+            }
         )
     ]
     
@@ -195,146 +223,137 @@ async def handle_call_tool(request) -> Dict[str, Any]:
     tool_name = request.params.name
     args = request.params.arguments or {}
     
-    try:
-        if tool_name == "prp_create":
-            # Criar novo PRP
-            result = await create_prp(
-                agent_deps,
-                name=args["name"],
-                title=args["title"],
-                description=args["description"],
-                objective=args["objective"],
-                context_data=args.get("context_data", "{}"),
-                implementation_details=args.get("implementation_details", "{}"),
-                priority=args.get("priority", "medium"),
-                tags=args.get("tags", "[]")
-            )
-            
-            return {
-                "content": [
-                    TextContent(
-                        type="text",
-                        text=result
-                    )
-                ]
-            }
-            
-        elif tool_name == "prp_search":
-            # Buscar PRPs
-            result = await search_prps(
-                agent_deps,
-                query=args.get("query"),
-                status=args.get("status"),
-                priority=args.get("priority"),
-                limit=args.get("limit", 10)
-            )
-            
-            return {
-                "content": [
-                    TextContent(
-                        type="text",
-                        text=result
-                    )
-                ]
-            }
-            
-        elif tool_name == "prp_analyze":
-            # Analisar PRP com LLM
-            result = await analyze_prp_with_llm(
-                agent_deps,
-                prp_id=args["prp_id"],
-                analysis_type=args.get("analysis_type", "task_extraction")
-            )
-            
-            return {
-                "content": [
-                    TextContent(
-                        type="text",
-                        text=result
-                    )
-                ]
-            }
-            
-        elif tool_name == "prp_details":
-            # Obter detalhes do PRP
-            result = await get_prp_details(
-                agent_deps,
-                prp_id=args["prp_id"]
-            )
-            
-            return {
-                "content": [
-                    TextContent(
-                        type="text",
-                        text=result
-                    )
-                ]
-            }
-            
-        elif tool_name == "prp_chat":
-            # Conversar com o agente
-            context = args.get("context", "")
-            full_message = args["message"]
-            if context:
-                full_message = f"Contexto: {context}\n\nMensagem: {args['message']}"
-            
-            result = await chat_with_prp_agent(full_message, agent_deps)
-            
-            return {
-                "content": [
-                    TextContent(
-                        type="text",
-                        text=result
-                    )
-                ]
-            }
-            
-        elif tool_name == "prp_update_status":
-            # Atualizar status do PRP
-            from agents.tools import update_prp_status
-            
-            result = await update_prp_status(
-                agent_deps,
-                prp_id=args["prp_id"],
-                new_status=args["new_status"]
+    # Com PRP_TRAFFIC_RECORD_PATH, cada chamada vira uma sessão para replay
+    with traffic_session(f"mcp:{tool_name}", args) as traffic, \
+            tool_metrics.track(tool_name, llm_bound=tool_name in LLM_TOOLS) as call:
+        try:
+            result = await _dispatch_tool(tool_name, args)
+            if result.startswith("❌"):
+                call.mark_error()
+                
+        except Exception as e:
+            logger.error(f"Erro ao executar ferramenta {tool_name}: {e}")
+            call.mark_error()
+            result = f"❌ Erro ao executar {tool_name}: {str(e)}"
+        
+        call.bytes_returned = len(result.encode("utf-8"))
+        if traffic:
+            traffic.output = result
+    
+    return {
+        "content": [
+            TextContent(
+                type="text",
+                text=result
             )
-            
-            return {
-                "content": [
-                    TextContent(
-                        type="text",
-                        text=result
-                    )
-                ]
-            }
-            
+        ]
+    }
+
+async def _dispatch_tool(tool_name: str, args: Dict[str, Any]) -> str:
+    """Executar a ferramenta solicitada e retornar o texto da resposta."""
+    
+    if tool_name == "prp_create":
+        # Criar novo PRP
+        return await create_prp(
+            agent_deps,
+            name=args["name"],
+            title=args["title"],
+            description=args["description"],
+            objective=args["objective"],
+            context_data=args.get("context_data", "{}"),
+            implementation_details=args.get("implementation_details", "{}"),
+            priority=args.get("priority", "medium"),
+            tags=args.get("tags", "[]")
+        )
+        
+    elif tool_name == "prp_search":
+        # Buscar PRPs
+        return await search_prps(
+            agent_deps,
+            query=args.get("query"),
+            status=args.get("status"),
+            priority=args.get("priority"),
+            limit=args.get("limit", 10)
+        )
+        
+    elif tool_name == "prp_analyze":
+        # Analisar PRP com LLM
+        return await analyze_prp_with_llm(
+            agent_deps,
+            prp_id=args["prp_id"],
+            analysis_type=args.get("analysis_type", "task_extraction")
+        )
+        
+    elif tool_name == "prp_details":
+        # Obter detalhes do PRP
+        return await get_prp_details(
+            agent_deps,
+            prp_id=args["prp_id"]
+        )
+        
+    elif tool_name == "prp_chat":
+        # Conversar com o agente
+        context = args.get("context", "")
+        full_message = args["message"]
+        if context:
+            full_message = f"Contexto: {context}\n\nMensagem: {args['message']}"
+        
+        return await chat_with_prp_agent(full_message, agent_deps)
+        
+    elif tool_name == "prp_update_status":
+        # Atualizar status do PRP
+        from agents.tools import update_prp_status
+        
+        return await update_prp_status(
+            agent_deps,
+            prp_id=args["prp_id"],
+            new_status=args["new_status"]
+        )
+        
+    elif tool_name == "prp_metrics":
+        # Métricas de latência das ferramentas
+        if args.get("format") == "json":
+            result = json.dumps(tool_metrics.snapshot(), ensure_ascii=False, indent=2)
         else:
-            raise ValueError(f"Ferramenta desconhecida: {tool_name}")
-            
-    except Exception as e:
-        logger.error(f"Erro ao executar ferramenta {tool_name}: {e}")
+            result = tool_metrics.format_report()
+        
+        if args.get("reset"):
+            tool_metrics.reset()
+        
+        return result
         
-        return {
-            "content": [
-                TextContent(
-                    type="text",
-                    text=f"❌ Erro ao executar {tool_name}: {str(e)}"
-                )
-            ]
-        }
+    else:
+        raise ValueError(f"Ferramenta desconhecida: {tool_name}")
 
 async def main():
     """Função principal do servidor MCP."""
     
     logger.info("🚀 Iniciando servidor MCP do Agente PRP...")
     
+    # Dump periódico das métricas (opcional)
+    dump_task = None
+    if tool_metrics.enabled and settings.mcp_metrics_dump_path:
+        dump_task = asyncio.create_task(
+            tool_metrics.periodic_dump(
+                settings.mcp_metrics_dump_path,
+                settings.mcp_metrics_dump_interval
+            )
+        )
+        logger.info(f"📊 Métricas gravadas em {settings.mcp_metrics_dump_path} "
+                    f"a cada {settings.mcp_metrics_dump_interval}s")
+    
     # Configurar transporte stdio
     transport = StdioServerTransport()
     
-    # Conectar servidor
-    await server.connect(transport)
-    
-    logger.info("✅ Servidor MCP do Agente PRP iniciado!")
+    try:
+        # Conectar servidor
+        await server.connect(transport)
+        
+        logger.info("✅ Servidor MCP do Agente PRP iniciado!")
+    finally:
+        if dump_task:
+            dump_task.cancel()
+            await asyncio.gather(dump_task, return_exceptions=True)
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
@@ -6,9 +6,147 @@ Este script usa as ferramentas MCP Turso reais para armazenar dados do agente PR
 """
 
 import json
+import re
 import asyncio
+import hashlib
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Awaitable, Callable, Dict, List, Any, Optional
+
+from agents.embedded_replica import get_embedded_replica, stop_embedded_replicas
+from agents.libsql_client import close_libsql_clients, get_libsql_client, mcp_tool_caller
+from agents.settings import settings
+
+# Colunas de prp_tasks gravadas por store_tasks (ordem dos parâmetros)
+TASK_COLUMNS = (
+    "prp_id", "task_name", "description", "task_type", "priority",
+    "estimated_hours", "complexity", "context_files", "acceptance_criteria",
+)
+
+# Linhas por INSERT multi-row (9 colunas x 100 = 900 parâmetros, abaixo do
+# limite clássico de 999 variáveis do SQLite/libSQL)
+MAX_TASKS_PER_INSERT = 100
+
+PRP_INSERT_QUERY = """
+    INSERT INTO prps (
+        name, title, description, objective, context_data,
+        implementation_details, validation_gates, status, priority, tags, search_text
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# `{prp_ref}` é "?" (id já conhecido) ou PRP_REF_BY_NAME (PRP do mesmo lote)
+ANALYSIS_INSERT_QUERY = """
+    INSERT INTO prp_llm_analysis (
+        prp_id, analysis_type, input_content, output_content,
+        parsed_data, model_used, tokens_used, processing_time_ms, confidence_score
+    ) VALUES ({prp_ref}, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+PRP_REF_BY_NAME = "(SELECT id FROM prps WHERE name = ?)"
+
+IDEMPOTENCY_INSERT_QUERY = "INSERT INTO prp_write_idempotency (idempotency_key, prp_name) VALUES (?, ?)"
+
+IDEMPOTENCY_COMPLETE_QUERY = f"""
+    UPDATE prp_write_idempotency SET
+        prp_id = {PRP_REF_BY_NAME},
+        analysis_ids = (SELECT json_group_array(id) FROM
+            (SELECT id FROM prp_llm_analysis WHERE prp_id = {PRP_REF_BY_NAME} ORDER BY id)),
+        task_ids = (SELECT json_group_array(id) FROM
+            (SELECT id FROM prp_tasks WHERE prp_id = {PRP_REF_BY_NAME} ORDER BY id)),
+        completed_at = CURRENT_TIMESTAMP
+    WHERE idempotency_key = ?
+"""
+
+IDEMPOTENCY_LOOKUP_QUERY = """
+    SELECT prp_id, analysis_ids, task_ids FROM prp_write_idempotency
+    WHERE idempotency_key = ? AND completed_at IS NOT NULL
+"""
+
+_VALUES_TUPLE_RE = re.compile(r"\((?:\([^()]*\)|\?)(?:,\s*\?)*\)")
+
+ToolCaller = Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def prp_params(prp_data: Dict[str, Any]) -> List[Any]:
+    """Parâmetros de PRP_INSERT_QUERY."""
+    search_text = f"{prp_data['title']} {prp_data['description']} {prp_data['objective']}".lower()
+    return [
+        prp_data['name'],
+        prp_data['title'],
+        prp_data['description'],
+        prp_data['objective'],
+        json.dumps(prp_data.get('context_data', {})),
+        json.dumps(prp_data.get('implementation_details', {})),
+        json.dumps(prp_data.get('validation_gates', {})),
+        prp_data.get('status', 'draft'),
+        prp_data.get('priority', 'medium'),
+        json.dumps(prp_data.get('tags', [])),
+        search_text
+    ]
+
+
+def analysis_params(prp_ref_value: Any, analysis_data: Dict[str, Any]) -> List[Any]:
+    """Parâmetros de ANALYSIS_INSERT_QUERY (o primeiro é o id ou o nome do PRP)."""
+    return [
+        prp_ref_value,
+        analysis_data.get('analysis_type', 'task_extraction'),
+        analysis_data.get('input_content', ''),
+        analysis_data.get('output_content', ''),
+        json.dumps(analysis_data.get('parsed_data', {})),
+        analysis_data.get('model_used', 'gpt-4o'),
+        analysis_data.get('tokens_used', 0),
+        analysis_data.get('processing_time_ms', 0),
+        analysis_data.get('confidence_score', 0.9)
+    ]
+
+
+def task_params(prp_ref_value: Any, task: Dict[str, Any]) -> List[Any]:
+    """Parâmetros de uma tarefa, na ordem de TASK_COLUMNS."""
+    return [
+        prp_ref_value,
+        task.get('name', ''),
+        task.get('description', ''),
+        task.get('type', 'feature'),
+        task.get('priority', 'medium'),
+        task.get('estimated_hours', 0),
+        task.get('complexity', 'medium'),
+        json.dumps(task.get('context_files', [])),
+        task.get('acceptance_criteria', '')
+    ]
+
+
+def task_insert_statements(prp_ref: str, prp_ref_value: Any,
+                           tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """INSERTs multi-row (até MAX_TASKS_PER_INSERT linhas, com RETURNING id) das tarefas."""
+    row_placeholders = "(" + ", ".join([prp_ref] + ["?"] * (len(TASK_COLUMNS) - 1)) + ")"
+    statements = []
+    for start in range(0, len(tasks), MAX_TASKS_PER_INSERT):
+        chunk = tasks[start:start + MAX_TASKS_PER_INSERT]
+        statements.append({
+            "query": (
+                f"INSERT INTO prp_tasks ({', '.join(TASK_COLUMNS)}) VALUES "
+                + ", ".join([row_placeholders] * len(chunk))
+                + " RETURNING id"
+            ),
+            "params": [value for task in chunk for value in task_params(prp_ref_value, task)],
+        })
+    return statements
+
+
+def returned_ids(result: Dict[str, Any], expected: int) -> List[int]:
+    """
+    Ids de um INSERT ... RETURNING id, em ordem crescente.
+
+    A ordem das linhas do RETURNING não é garantida, por isso os ids são
+    ordenados. Sem as linhas, só um INSERT de uma linha tem o id certo
+    (lastInsertId); ids de várias linhas não são deduzidos.
+    """
+    rows = result.get('rows') or []
+    if len(rows) == expected:
+        return sorted(row['id'] if isinstance(row, dict) else row[0] for row in rows)
+    if expected == 1 and result.get('lastInsertId') is not None:
+        return [result['lastInsertId']]
+    raise RuntimeError(f"INSERT devolveu {len(rows)} id(s) no RETURNING, esperado {expected}")
+
 
 # Função para simular chamada MCP Turso (em produção, seria uma chamada real)
 async def call_mcp_turso_tool(tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
@@ -18,7 +156,27 @@ async def call_mcp_turso_tool(tool_name: str, params: Dict[str, Any]) -> Dict[st
     print(f"   Parâmetros: {json.dumps(params, indent=2)}")
     
     # Simular resposta baseada na ferramenta
-    if tool_name == "execute_query":
+    if tool_name == "execute_query" and "RETURNING" in params.get("query", "").upper():
+        # INSERT multi-row: uma linha com o id para cada tupla de VALUES
+        inserted = len(_VALUES_TUPLE_RE.findall(params["query"]))
+        return {
+            "success": True,
+            "rows": [{"id": i} for i in range(1, inserted + 1)],
+            "columns": ["id"],
+            "lastInsertId": inserted,
+            "rowsAffected": inserted
+        }
+    elif tool_name == "execute_batch":
+        results = []
+        for statement in params.get("statements", []):
+            inserted = len(_VALUES_TUPLE_RE.findall(statement["query"]))
+            results.append({
+                "rows": [{"id": i} for i in range(1, inserted + 1)] if "RETURNING" in statement["query"].upper() else [],
+                "lastInsertId": inserted,
+                "rowsAffected": inserted or 1
+            })
+        return {"success": True, "results": results}
+    elif tool_name == "execute_query":
         return {
             "success": True,
             "lastInsertId": 1,
@@ -37,39 +195,30 @@ async def call_mcp_turso_tool(tool_name: str, params: Dict[str, Any]) -> Dict[st
 class RealPRPMCPIntegration:
     """Integração real entre Agente PRP e MCP Turso."""
     
-    def __init__(self):
-        self.database = "context-memory"
+    def __init__(self, database: str = "context-memory", tool_caller: Optional[ToolCaller] = None):
+        self.database = database
+        # Permite trocar o transporte MCP (ex.: stand-in local nos benchmarks).
+        # Com TURSO_DATABASE_URL as ferramentas viram chamadas HTTP reais ao libSQL;
+        # com TURSO_REPLICA_PATH as leituras vão para a réplica embarcada local
+        # (a mesma do agente: uma por arquivo no processo, com sync periódico).
+        if tool_caller is None and settings.turso_database_url:
+            client = get_libsql_client(settings.turso_database_url, settings.turso_auth_token)
+            if settings.turso_replica_path:
+                replica = get_embedded_replica(
+                    client, settings.turso_replica_path, sync_interval=settings.turso_replica_sync_interval
+                )
+                tool_caller = replica.tool_caller(session_id=f"integration:{database}")
+            else:
+                tool_caller = mcp_tool_caller(client)
+        self.tool_caller = tool_caller or call_mcp_turso_tool
     
     async def store_prp(self, prp_data: Dict[str, Any]) -> int:
         """Armazena um PRP no banco via MCP Turso."""
         
-        query = """
-            INSERT INTO prps (
-                name, title, description, objective, context_data,
-                implementation_details, validation_gates, status, priority, tags, search_text
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        
-        search_text = f"{prp_data['title']} {prp_data['description']} {prp_data['objective']}".lower()
-        
-        params = [
-            prp_data['name'],
-            prp_data['title'],
-            prp_data['description'],
-            prp_data['objective'],
-            json.dumps(prp_data.get('context_data', {})),
-            json.dumps(prp_data.get('implementation_details', {})),
-            json.dumps(prp_data.get('validation_gates', {})),
-            prp_data.get('status', 'draft'),
-            prp_data.get('priority', 'medium'),
-            json.dumps(prp_data.get('tags', [])),
-            search_text
-        ]
-        
-        result = await call_mcp_turso_tool("execute_query", {
+        result = await self.tool_caller("execute_query", {
             "database": self.database,
-            "query": query,
-            "params": params
+            "query": PRP_INSERT_QUERY,
+            "params": prp_params(prp_data)
         })
         
         prp_id = result.get('lastInsertId', 1)
@@ -79,29 +228,10 @@ class RealPRPMCPIntegration:
     async def store_llm_analysis(self, prp_id: int, analysis_data: Dict[str, Any]) -> int:
         """Armazena análise LLM no banco via MCP Turso."""
         
-        query = """
-            INSERT INTO prp_llm_analysis (
-                prp_id, analysis_type, input_content, output_content,
-                parsed_data, model_used, tokens_used, processing_time_ms, confidence_score
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        
-        params = [
-            prp_id,
-            analysis_data.get('analysis_type', 'task_extraction'),
-            analysis_data.get('input_content', ''),
-            analysis_data.get('output_content', ''),
-            json.dumps(analysis_data.get('parsed_data', {})),
-            analysis_data.get('model_used', 'gpt-4o'),
-            analysis_data.get('tokens_used', 0),
-            analysis_data.get('processing_time_ms', 0),
-            analysis_data.get('confidence_score', 0.9)
-        ]
-        
-        result = await call_mcp_turso_tool("execute_query", {
+        result = await self.tool_caller("execute_query", {
             "database": self.database,
-            "query": query,
-            "params": params
+            "query": ANALYSIS_INSERT_QUERY.format(prp_ref="?"),
+            "params": analysis_params(prp_id, analysis_data)
         })
         
         analysis_id = result.get('lastInsertId', 1)
@@ -109,42 +239,40 @@ class RealPRPMCPIntegration:
         return analysis_id
     
     async def store_tasks(self, prp_id: int, tasks: List[Dict[str, Any]]) -> List[int]:
-        """Armazena tarefas extraídas no banco via MCP Turso."""
+        """
+        Armazena tarefas extraídas no banco via MCP Turso.
+        
+        As tarefas são gravadas em INSERTs multi-row de até MAX_TASKS_PER_INSERT
+        linhas com `RETURNING id`, todos em um único `execute_batch` (uma
+        transação): qualquer número de tarefas custa uma só ida ao Turso.
+        """
+        
+        if not tasks:
+            return []
+        
+        statements = task_insert_statements("?", prp_id, tasks)
+        result = await self.tool_caller("execute_batch", {
+            "database": self.database,
+            "statements": statements,
+            "transaction": "write"
+        })
+        
+        if not result.get('success'):
+            raise RuntimeError(f"Falha ao armazenar tarefas: {result.get('error')}")
         
         task_ids = []
+        for start, task_result in zip(range(0, len(tasks), MAX_TASKS_PER_INSERT), result['results']):
+            task_ids.extend(returned_ids(task_result, len(tasks[start:start + MAX_TASKS_PER_INSERT])))
         
-        for task in tasks:
-            query = """
-                INSERT INTO prp_tasks (
-                    prp_id, task_name, description, task_type, priority,
-                    estimated_hours, complexity, context_files, acceptance_criteria
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            
-            params = [
-                prp_id,
-                task.get('name', ''),
-                task.get('description', ''),
-                task.get('type', 'feature'),
-                task.get('priority', 'medium'),
-                task.get('estimated_hours', 0),
-                task.get('complexity', 'medium'),
-                json.dumps(task.get('context_files', [])),
-                task.get('acceptance_criteria', '')
-            ]
-            
-            result = await call_mcp_turso_tool("execute_query", {
-                "database": self.database,
-                "query": query,
-                "params": params
-            })
-            
-            task_id = result.get('lastInsertId', 1)
-            task_ids.append(task_id)
-            print(f"📋 Tarefa '{task.get('name', '')}' armazenada com ID: {task_id}")
+        print(f"📋 {len(tasks)} tarefa(s) armazenadas em 1 requisição ({len(statements)} INSERT(s)): "
+              f"IDs {task_ids[0]}..{task_ids[-1]}")
         
         return task_ids
     
+    def unit_of_work(self, idempotency_key: Optional[str] = None) -> "PRPUnitOfWork":
+        """Nova unidade de trabalho (PRP + análise + tarefas em um lote atômico)."""
+        return PRPUnitOfWork(self, idempotency_key)
+    
     async def store_conversation(self, session_id: str, message: str, response: str, 
                                context: str = None) -> int:
         """Armazena conversa no banco via MCP Turso."""
@@ -163,7 +291,7 @@ class RealPRPMCPIntegration:
         
         params = [session_id, message, response, context, metadata]
         
-        result = await call_mcp_turso_tool("execute_query", {
+        result = await self.tool_caller("execute_query", {
             "database": self.database,
             "query": query,
             "params": params
@@ -196,7 +324,7 @@ class RealPRPMCPIntegration:
         sql += " GROUP BY p.id ORDER BY p.created_at DESC LIMIT ?"
         params.append(limit)
         
-        result = await call_mcp_turso_tool("execute_read_only_query", {
+        result = await self.tool_caller("execute_read_only_query", {
             "database": self.database,
             "query": sql,
             "params": params
@@ -210,7 +338,7 @@ class RealPRPMCPIntegration:
         """Obtém detalhes de um PRP via MCP Turso."""
         
         query = "SELECT * FROM prps WHERE id = ?"
-        result = await call_mcp_turso_tool("execute_read_only_query", {
+        result = await self.tool_caller("execute_read_only_query", {
             "database": self.database,
             "query": query,
             "params": [prp_id]
@@ -223,6 +351,133 @@ class RealPRPMCPIntegration:
         return rows[0]
 
 
+class PRPUnitOfWork:
+    """
+    Unidade de trabalho: PRP + análises LLM + tarefas gravados em um único lote.
+    
+    Os statements são acumulados e enviados em uma só requisição
+    (`execute_batch`, no estilo pipeline do libSQL) executada em uma transação.
+    Análises e tarefas referenciam o PRP pelo nome (UNIQUE), então nenhum id
+    precisa voltar ao cliente no meio do lote.
+    
+    A chave de idempotência (informada ou hash do conteúdo) é inserida na mesma
+    transação: um retry após timeout falha na constraint, o lote inteiro é
+    desfeito e o resultado da gravação original é devolvido.
+    """
+    
+    def __init__(self, integration: RealPRPMCPIntegration, idempotency_key: Optional[str] = None):
+        self.integration = integration
+        self._idempotency_key = idempotency_key
+        self._prp: Optional[Dict[str, Any]] = None
+        self._analyses: List[Dict[str, Any]] = []
+        self._tasks: List[Dict[str, Any]] = []
+    
+    def add_prp(self, prp_data: Dict[str, Any]) -> "PRPUnitOfWork":
+        self._prp = prp_data
+        return self
+    
+    def add_llm_analysis(self, analysis_data: Dict[str, Any]) -> "PRPUnitOfWork":
+        self._analyses.append(analysis_data)
+        return self
+    
+    def add_tasks(self, tasks: List[Dict[str, Any]]) -> "PRPUnitOfWork":
+        self._tasks.extend(tasks)
+        return self
+    
+    @property
+    def idempotency_key(self) -> str:
+        """Chave informada ou sha256 do conteúdo do lote (retries geram a mesma chave)."""
+        if self._idempotency_key:
+            return self._idempotency_key
+        payload = json.dumps([self._prp, self._analyses, self._tasks], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def statements(self) -> List[Dict[str, Any]]:
+        """Statements do lote, na ordem de execução."""
+        if self._prp is None:
+            raise ValueError("Unidade de trabalho sem PRP: chame add_prp() antes de commit()")
+        name = self._prp['name']
+        key = self.idempotency_key
+        
+        statements = [
+            {"query": IDEMPOTENCY_INSERT_QUERY, "params": [key, name]},
+            {"query": PRP_INSERT_QUERY.rstrip() + " RETURNING id", "params": prp_params(self._prp)},
+        ]
+        for analysis_data in self._analyses:
+            statements.append({
+                "query": ANALYSIS_INSERT_QUERY.format(prp_ref=PRP_REF_BY_NAME).rstrip() + " RETURNING id",
+                "params": analysis_params(name, analysis_data),
+            })
+        statements.extend(task_insert_statements(PRP_REF_BY_NAME, name, self._tasks))
+        statements.append({"query": IDEMPOTENCY_COMPLETE_QUERY, "params": [name, name, name, key]})
+        return statements
+    
+    async def _replay(self) -> Optional[Dict[str, Any]]:
+        """Resultado da gravação original desta chave, se ela já foi concluída."""
+        result = await self.integration.tool_caller("execute_read_only_query", {
+            "database": self.integration.database,
+            "query": IDEMPOTENCY_LOOKUP_QUERY,
+            "params": [self.idempotency_key]
+        })
+        rows = result.get('rows') or []
+        if not rows:
+            return None
+        row = rows[0]
+        prp_id, analysis_ids, task_ids = (
+            (row['prp_id'], row['analysis_ids'], row['task_ids']) if isinstance(row, dict) else row
+        )
+        return {
+            "prp_id": prp_id,
+            "analysis_ids": json.loads(analysis_ids or "[]"),
+            "task_ids": json.loads(task_ids or "[]"),
+            "idempotency_key": self.idempotency_key,
+            "replayed": True,
+        }
+    
+    async def commit(self) -> Dict[str, Any]:
+        """
+        Enviar o lote em uma transação.
+        
+        Returns:
+            prp_id, analysis_ids, task_ids, idempotency_key e replayed (True
+            quando a chave já tinha sido gravada e nada foi escrito de novo)
+        
+        Raises:
+            RuntimeError: lote desfeito (nenhuma linha fica órfã)
+        """
+        statements = self.statements()
+        result = await self.integration.tool_caller("execute_batch", {
+            "database": self.integration.database,
+            "statements": statements,
+            "transaction": "write"
+        })
+        
+        if not result.get('success'):
+            replay = await self._replay()
+            if replay is None:
+                raise RuntimeError(f"Lote do PRP '{self._prp['name']}' desfeito: {result.get('error')}")
+            print(f"♻️ PRP '{self._prp['name']}' já gravado (chave {self.idempotency_key[:12]}): ID {replay['prp_id']}")
+            return replay
+        
+        results = result['results']
+        prp_id = returned_ids(results[1], 1)[0]
+        analysis_ids = [returned_ids(r, 1)[0] for r in results[2:2 + len(self._analyses)]]
+        task_ids = []
+        task_results = results[2 + len(self._analyses):-1]
+        for start, task_result in zip(range(0, len(self._tasks), MAX_TASKS_PER_INSERT), task_results):
+            task_ids.extend(returned_ids(task_result, len(self._tasks[start:start + MAX_TASKS_PER_INSERT])))
+        
+        print(f"📦 PRP '{self._prp['title']}' gravado em 1 lote ({len(statements)} statements): "
+              f"ID {prp_id}, {len(analysis_ids)} análise(s), {len(task_ids)} tarefa(s)")
+        return {
+            "prp_id": prp_id,
+            "analysis_ids": analysis_ids,
+            "task_ids": task_ids,
+            "idempotency_key": self.idempotency_key,
+            "replayed": False,
+        }
+
+
 # Demonstração com dados reais
 async def demo_real_integration():
     """Demonstra integração real com MCP Turso."""
@@ -386,26 +641,31 @@ async def integrate_with_pydantic_agent(integration: RealPRPMCPIntegration,
         session_id, user_message, agent_response
     )
     
-    # 2. Se o agente criou um PRP, armazenar
+    # 2. Se o agente criou um PRP, gravar PRP + análise + tarefas em um lote atômico
     if prp_data:
-        results['prp_id'] = await integration.store_prp(prp_data)
-        
-        # 3. Se o agente fez análise LLM, armazenar
-        if llm_analysis and 'prp_id' in results:
-            results['analysis_id'] = await integration.store_llm_analysis(
-                results['prp_id'], llm_analysis
-            )
-            
-            # 4. Se extraiu tarefas, armazenar
-            if 'tasks' in llm_analysis.get('parsed_data', {}):
-                results['task_ids'] = await integration.store_tasks(
-                    results['prp_id'], 
-                    llm_analysis['parsed_data']['tasks']
-                )
+        unit = integration.unit_of_work().add_prp(prp_data)
+        if llm_analysis:
+            unit.add_llm_analysis(llm_analysis)
+            unit.add_tasks(llm_analysis.get('parsed_data', {}).get('tasks', []))
+        
+        stored = await unit.commit()
+        results['prp_id'] = stored['prp_id']
+        if stored['analysis_ids']:
+            results['analysis_id'] = stored['analysis_ids'][0]
+        if stored['task_ids']:
+            results['task_ids'] = stored['task_ids']
     
     return results
 
 
+async def _run_demo():
+    try:
+        await demo_real_integration()
+    finally:
+        await stop_embedded_replicas()
+        await close_libsql_clients()
+
+
 if __name__ == "__main__":
     # Executar demonstração real
-    asyncio.run(demo_real_integration()) 
\ No newline at end of file
+    asyncio.run(_run_demo()) 
\ No newline at end of file
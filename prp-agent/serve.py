@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Modo de produção dos apps FastAPI: vários workers uvicorn no mesmo socket.
+
+- Workers: processos independentes (um por core por padrão) aceitando
+  conexões do mesmo socket; o supervisor recria quem morrer
+- Estado compartilhado: sessões em SQLite/WAL (agents/session_store.py),
+  caminho em --state-db (AGENT_STATE_DB_PATH para os workers)
+- Saúde: GET /healthz (liveness) e GET /readyz (readiness) em cada app
+  (agents/serving.py)
+- Reload gracioso: `kill -HUP <pid do supervisor>` troca os workers um a um;
+  o substituto sobe antes de o antigo receber SIGTERM, e o antigo termina as
+  requisições em andamento (até --graceful-timeout) antes de sair
+- Escala em produção: SIGTTIN/SIGTTOU adicionam/removem um worker
+
+Uso:
+    python serve.py main_ai_monitoring:app --workers 4 --port 8000
+    kill -HUP <pid>   # reload sem derrubar conexões
+"""
+
+import argparse
+import os
+import time
+
+import uvicorn
+from uvicorn.supervisors.multiprocess import Multiprocess, Process
+
+from agents.serving import DrainingServer
+from agents.session_store import SessionStore
+
+# Espera máxima pelo startup do substituto antes de parar o worker antigo
+RELOAD_READY_TIMEOUT_SECONDS = 60.0
+
+
+class RollingMultiprocess(Multiprocess):
+    """Supervisor do uvicorn com reload rolante (o padrão para o worker antes de subir outro)."""
+
+    def __init__(self, *args, store: SessionStore, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.store = store
+
+    def _wait_ready(self, process: Process, spawned_at: float) -> bool:
+        # Só vale o "ready" gravado depois do spawn: o pid pode ser de um worker antigo
+        deadline = time.monotonic() + RELOAD_READY_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            if self.store.worker_phase(process.pid, since=spawned_at) == "ready":
+                return True
+            time.sleep(0.1)
+        return False
+
+    def restart_all(self):
+        for idx, old in enumerate(self.processes):
+            new = Process(self.config, self.target, self.sockets)
+            spawned_at = time.time()
+            new.start()
+            if not self._wait_ready(new, spawned_at):
+                print(f"⚠️ Worker {new.pid} não ficou pronto em {RELOAD_READY_TIMEOUT_SECONDS:.0f}s")
+            self.processes[idx] = new
+            old.terminate()
+            old.join()
+            self.store.forget_worker(old.pid)
+            print(f"🔄 Worker {old.pid} substituído por {new.pid}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servir um app FastAPI com vários workers")
+    parser.add_argument("app", nargs="?", default="main_ai_monitoring:app", help="módulo:atributo do app")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="segundos para terminar requisições em andamento ao parar um worker")
+    parser.add_argument("--state-db", default=os.getenv("AGENT_STATE_DB_PATH", "agent_state.db"),
+                        help="SQLite compartilhado das sessões (WAL)")
+    parser.add_argument("--latency-scale", type=float, default=None,
+                        help="multiplica as latências simuladas dos apps (0 = só CPU, para teste de carga)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    # Os workers herdam o ambiente do supervisor
+    os.environ["AGENT_STATE_DB_PATH"] = os.path.abspath(args.state_db)
+    if args.latency_scale is not None:
+        os.environ["SIMULATED_LATENCY_SCALE"] = str(args.latency_scale)
+
+    # Criar o banco (schema + WAL) antes dos workers, para não disputarem a criação
+    store = SessionStore(os.environ["AGENT_STATE_DB_PATH"])
+    if not store.ping():
+        raise SystemExit(f"❌ Estado compartilhado indisponível: {args.state_db}")
+
+    config = uvicorn.Config(
+        args.app,
+        host=args.host,
+        port=args.port,
+        workers=max(1, args.workers),
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+    )
+    server = DrainingServer(config)
+    sock = config.bind_socket()
+
+    print(f"🚀 {args.app} em http://{args.host}:{args.port} com {config.workers} workers")
+    print(f"🗄️ Estado compartilhado: {os.environ['AGENT_STATE_DB_PATH']}")
+    print(f"🔄 Reload gracioso: kill -HUP {os.getpid()}")
+    RollingMultiprocess(config, target=server.run, sockets=[sock], store=store).run()
+
+
+if __name__ == "__main__":
+    main()
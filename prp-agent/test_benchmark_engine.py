@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Testes do motor de benchmark de carga (benchmark_engine.py).
+"""
+
+import asyncio
+
+import httpx
+
+import main_official_standards
+from benchmark_engine import (
+    BenchmarkConfig, BenchmarkStore, WorkloadCase, http_target, run_and_store, run_benchmark,
+)
+
+
+def _sleeping_target(seconds: float, tokens: int = 100, fail_every: int = 0):
+    async def call(case: WorkloadCase, index: int):
+        await asyncio.sleep(seconds)
+        if fail_every and index % fail_every == 0:
+            raise RuntimeError("falha simulada")
+        return {"tokens": tokens}
+
+    return call
+
+
+def test_closed_mode_runs_at_configured_concurrency():
+    config = BenchmarkConfig(app="teste", requests=20, concurrency=10)
+    result = asyncio.run(run_benchmark(_sleeping_target(0.05, fail_every=10), config))
+    report = result.to_dict()
+
+    assert report["errors"] == 2 and len(result.latencies_ms) == 18
+    assert report["duration_s"] < 0.2  # 2 levas de 50ms, não 20
+    assert 50 <= report["p50_ms"] <= report["p95_ms"] <= report["p99_ms"] <= report["max_ms"]
+    assert report["total_tokens"] == 1800
+    assert report["tokens_per_sec"] > 0 and report["throughput_rps"] > 90
+
+
+def test_open_mode_counts_queueing_delay():
+    """Chegadas mais rápidas que o serviço: a espera na fila entra na latência."""
+    config = BenchmarkConfig(app="teste", requests=20, concurrency=1, arrival_rate=200)
+    result = asyncio.run(run_benchmark(_sleeping_target(0.02), config))
+
+    assert result.to_dict()["mode"] == "open"
+    assert len(result.latencies_ms) == 20
+    assert result.percentile(99) > 5 * 20  # fila de ~15 requisições de 20ms
+
+
+def test_runs_are_stored_and_compared(tmp_path):
+    db_path = str(tmp_path / "runs.db")
+    config = BenchmarkConfig(app="teste", requests=5, concurrency=5, label="antes")
+
+    first = asyncio.run(run_and_store(_sleeping_target(0.01), config, db_path=db_path))
+    config.label = "depois"
+    second = asyncio.run(run_and_store(_sleeping_target(0.01), config, db_path=db_path))
+
+    assert first["comparison"] is None
+    assert second["comparison"]["previous_run_id"] == first["run_id"]
+    assert set(second["comparison"]["change_pct"]) >= {"throughput_rps", "p99_ms", "tokens_per_sec"}
+    assert BenchmarkStore(db_path).previous("teste", "standard")["label"] == "depois"
+
+
+def test_http_target_client_is_closed_by_run_and_store(tmp_path):
+    """O cliente do alvo HTTP é fechado no fim da execução (aqui, com todas as requisições falhando)."""
+    target = http_target("http://127.0.0.1:9/ai-agent/process", timeout=0.5)
+    # Sequencial: spans http.client concorrentes da integração httpx do Sentry
+    # (falhando juntos) deixam um span no escopo e afetam os testes seguintes
+    config = BenchmarkConfig(app="http", requests=2, concurrency=1)
+
+    report = asyncio.run(run_and_store(target, config, db_path=str(tmp_path / "runs.db")))
+
+    assert report["errors"] == 2  # porta fechada
+    assert target.aclose.__self__.is_closed
+
+
+def test_benchmark_endpoint_uses_engine(tmp_path, monkeypatch):
+    monkeypatch.setenv("BENCHMARK_DB_PATH", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(main_official_standards, "LLM_LATENCY_SECONDS", 0.05)
+    monkeypatch.setattr(main_official_standards, "TOOL_LATENCY_RANGE", (0, 0))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main_official_standards.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            ok = await client.get("/ai-agent/benchmark-standards", params={"requests": 10, "concurrency": 10})
+            bad = await client.get("/ai-agent/benchmark-standards", params={"workload": "inexistente"})
+            return ok, bad
+
+    ok, bad = asyncio.run(scenario())
+
+    report = ok.json()
+    assert ok.status_code == 200 and bad.status_code == 400
+    assert report["requests"] == 10 and report["errors"] == 0
+    assert report["duration_s"] < 0.25  # 10 em paralelo, não 10 × 50ms
+    assert report["run_id"] == 1 and report["total_tokens"] > 0
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Testes do chunking em seções e da busca de contexto por seção.
+"""
+
+import asyncio
+import sqlite3
+
+from agents.agent_with_mcp_turso import PRPAgentWithMCPTurso
+from agents.chunking import chunk_markdown, populate_sections
+from agents.context_assembler import estimate_tokens
+from benchmark_context_retrieval import seed_corpus
+
+GUIDE = """Guia rápido de configuração.
+
+# Instalação
+
+Instale as dependências com uv e configure o arquivo de ambiente.
+
+```bash
+# isto não é um cabeçalho
+uv sync
+```
+
+## Variáveis
+
+- LLM_API_KEY
+- DATABASE_PATH
+
+# Réplica Turso
+
+A réplica embarcada sincroniza o banco local com o primário a cada intervalo.
+
+# Deploy
+
+Use o docker compose para subir o agente em produção.
+"""
+
+
+def test_chunk_markdown_is_heading_aware():
+    """Cabeçalhos dentro de blocos de código são ignorados; hierarquia é preservada."""
+    sections = chunk_markdown(GUIDE, doc_title="Guia")
+
+    titles = [s.title for s in sections]
+    assert titles == ["Guia", "Instalação", "Variáveis", "Réplica Turso", "Deploy"]
+    assert "uv sync" in sections[1].content
+    assert sections[2].parent_order == sections[1].order
+    assert sections[2].section_type == "list"
+    assert sections[3].anchor == "réplica-turso"
+
+
+def test_chunk_markdown_bounds_section_size():
+    """Seções longas são divididas por parágrafo em partes de até max_words."""
+    body = "\n\n".join(" ".join(f"p{i}w{j}" for j in range(40)) for i in range(10))
+    sections = chunk_markdown(f"# Longa\n\n{body}", max_words=100)
+
+    assert len(sections) == 5
+    assert all(s.word_count <= 100 for s in sections)
+    assert sections[1].title == "Longa (parte 2)"
+
+
+def test_sections_replace_whole_docs_with_neighbor_expansion(tmp_path):
+    """A busca devolve a seção relevante (com vizinhas), não o doc inteiro."""
+    db_path = str(tmp_path / "context.db")
+    seed_corpus(db_path, n_docs=10, n_conversations=0, n_prps=0)
+    conn = sqlite3.connect(db_path)
+    filler = "\n\n".join(f"# Tópico {i}\n\n" + "texto irrelevante " * 60 for i in range(20))
+    conn.execute(
+        "INSERT INTO docs (slug, title, content, file_path) VALUES (?, ?, ?, ?)",
+        ("guia", "Guia Turso", GUIDE + filler, "docs/guia.md"),
+    )
+    conn.commit()
+    stats = populate_sections(conn)
+    conn.close()
+    assert stats["docs"] == 11
+
+    agent = PRPAgentWithMCPTurso(database_path=db_path, write_behind=False)
+    context = asyncio.run(agent.search_relevant_context("como funciona a réplica embarcada?", limit=1))
+
+    types = [ctx["type"] for ctx in context]
+    assert "doc_sections" in types and "documentation" not in types
+    section = context[types.index("doc_sections")]["data"][0]
+    assert section["section_title"] == "Réplica Turso"
+    assert len(section["section_orders"]) > 1  # vizinha incluída
+    assert "docker compose" in section["section_content"]
+
+    prompt = agent.format_context_for_prompt(context)
+    assert estimate_tokens(prompt) < estimate_tokens(GUIDE + filler) / 4
+
+
+def test_edited_docs_are_rechunked(tmp_path):
+    """Sem rebuild, só docs novos ou editados são rechunkados (hash por doc)."""
+    db_path = str(tmp_path / "context.db")
+    seed_corpus(db_path, n_docs=5, n_conversations=0, n_prps=0)
+    conn = sqlite3.connect(db_path)
+    assert populate_sections(conn)["docs"] == 5
+    assert populate_sections(conn) == {"docs": 0, "sections": 0, "unchanged": 5}
+
+    doc_id = conn.execute("SELECT min(id) FROM docs").fetchone()[0]
+    with conn:
+        conn.execute("UPDATE docs SET content = ? WHERE id = ?", (GUIDE, doc_id))
+    stats = populate_sections(conn)
+    titles = [row[0] for row in conn.execute(
+        "SELECT section_title FROM docs_sections WHERE doc_id = ? ORDER BY section_order", (doc_id,)
+    )]
+    conn.close()
+
+    assert stats["docs"] == 1 and stats["unchanged"] == 4
+    assert titles[1:] == ["Instalação", "Variáveis", "Réplica Turso", "Deploy"]
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Testes da montagem de contexto com orçamento de tokens (dedup + MMR).
+"""
+
+from agents.agent_with_mcp_turso import PRPAgentWithMCPTurso
+from agents.context_assembler import (
+    ContextAssembler,
+    ContextBudget,
+    estimate_tokens,
+    truncate_to_tokens,
+)
+
+GUIDE = "Configurar o Turso com réplica embarcada, sincronização periódica e tokens de acesso"
+
+
+def _docs(*summaries, scores=None):
+    return {
+        "type": "documentation",
+        "relevance": "high",
+        "data": [{"title": f"Doc {i}", "summary": summary} for i, summary in enumerate(summaries)],
+        "scores": scores or [1.0 - i * 0.1 for i in range(len(summaries))],
+    }
+
+
+def test_near_duplicates_are_removed_across_sources():
+    """Chunks quase idênticos (inclusive em fontes diferentes) entram uma vez só."""
+    context = [
+        _docs(GUIDE, GUIDE + ".", "Monitoramento de erros com Sentry"),
+        {"type": "semantic_matches", "data": [{"title": "Doc 0", "source": "docs", "snippet": GUIDE}]},
+    ]
+
+    assembled, report = ContextAssembler(ContextBudget(duplicate_threshold=0.6)).assemble(context)
+
+    lines = [line for _, source_lines in assembled for line in source_lines]
+    assert report.duplicates_removed == 2
+    assert sum(GUIDE in line for line in lines) == 1
+    assert any("Sentry" in line for line in lines)
+
+
+def test_mmr_prefers_diverse_items():
+    """Com lambda baixo, um item diferente vence um parecido mais relevante."""
+    context = [_docs(
+        "cache de consultas do agente com LRU e invalidação",
+        "cache de consultas do agente com LRU e invalidação por escrita",
+        "deploy com Docker",
+        scores=[1.0, 0.95, 0.5],
+    )]
+    budget = ContextBudget(max_items_per_source=2, mmr_lambda=0.3, duplicate_threshold=1.0)
+
+    assembled, _ = ContextAssembler(budget).assemble(context)
+
+    assert "Docker" in assembled[0][1][1]
+
+
+def test_budget_truncates_and_reports_savings():
+    """Cada fonte respeita o orçamento e o relatório mostra os tokens economizados."""
+    long_text = " ".join(f"palavra{i}" for i in range(400))
+    context = [_docs(long_text, "Resumo curto sobre FastAPI")]
+    budget = ContextBudget(per_source={"documentation": 60})
+
+    assembled, report = ContextAssembler(budget).assemble(context)
+
+    lines = assembled[0][1]
+    assert sum(estimate_tokens(line) for line in lines) <= 60
+    assert report.truncated == 1
+    assert report.tokens_saved == report.tokens_before - report.tokens_after > 0
+    assert truncate_to_tokens("curto", 10) == "curto"
+
+
+def test_format_context_for_prompt_records_report():
+    """O agente usa o assembler e guarda o relatório da última montagem."""
+    agent = PRPAgentWithMCPTurso(database_path=":memory:", context_budget=ContextBudget(total_tokens=40))
+
+    text = agent.format_context_for_prompt([_docs(GUIDE, "Outro assunto totalmente diferente " * 20)])
+
+    assert "📚 Doc 0" in text
+    assert agent.last_context_report.tokens_after <= 40
+    assert agent.last_context_report.tokens_saved > 0
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Testes da busca de contexto parametrizada (FTS5) do agente com MCP Turso.
+"""
+
+import asyncio
+import sqlite3
+
+from agents.agent_with_mcp_turso import PRPAgentWithMCPTurso, build_fts_query
+from benchmark_context_retrieval import seed_corpus
+
+
+def test_build_fts_query_quotes_terms():
+    """Aspas e operadores da mensagem não vazam para a expressão FTS."""
+    query = build_fts_query('O que é "JWT" OR docs\' NEAR(x)? jwt')
+    assert query == '"jwt" OR "docs" OR "near"'
+    assert build_fts_query("a b ?") == ""
+
+
+def test_search_relevant_context_uses_fts(tmp_path):
+    """As três buscas retornam dados do banco local, inclusive com aspas na mensagem."""
+    db_path = str(tmp_path / "context.db")
+    seed_corpus(db_path, n_docs=50, n_conversations=50, n_prps=20)
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO docs (slug, title, content, file_path) VALUES ('turso', 'Guia Turso', 'Configurar o turso', 'docs/turso.md')")
+    conn.execute("INSERT INTO conversations (session_id, message, response) VALUES ('s1', 'Uso do turso?', 'Veja o guia')")
+    conn.execute("INSERT INTO prps (name, title, description, objective) VALUES ('turso-prp', 'PRP Turso', 'Migrar para turso', 'Replica')")
+    conn.commit()
+    conn.close()
+    agent = PRPAgentWithMCPTurso(database_path=db_path)
+
+    context = asyncio.run(agent.search_relevant_context("Como usar o 'turso' com \"sentry\"?"))
+
+    types = {item["type"] for item in context}
+    assert types == {"documentation", "conversation_history", "prps"}
+    assert all(len(item["data"]) <= 3 for item in context)
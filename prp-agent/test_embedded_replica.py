@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Testes da réplica embarcada (leituras locais, sync por change log, read-your-writes).
+"""
+
+import asyncio
+import sqlite3
+import time
+
+from agents.agent_with_mcp_turso import DOCS_CONTEXT_QUERY, PRPAgentWithMCPTurso
+from agents.embedded_replica import EmbeddedReplica
+from agents.libsql_client import LibSQLClient
+from agents.libsql_standin import LibSQLStandIn
+from agents.write_behind import ConversationRecord, libsql_conversation_sink
+from benchmark_context_retrieval import SQL_DIR, seed_corpus
+from real_mcp_integration import RealPRPMCPIntegration
+
+REPLICA_SCHEMA = SQL_DIR / "schemas" / "replica_changelog_schema.sql"
+
+
+def _primary(tmp_path) -> str:
+    db_path = str(tmp_path / "primary.db")
+    seed_corpus(db_path, n_docs=40, n_conversations=20, n_prps=10)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(REPLICA_SCHEMA.read_text(encoding="utf-8"))
+    conn.close()
+    return db_path
+
+
+def _write_primary(db_path: str, sql: str, params=()):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute(sql, params)
+    conn.close()
+
+
+def test_bootstrap_serves_reads_locally(tmp_path):
+    """Depois do bootstrap as leituras (inclusive FTS) não vão mais ao primário."""
+    db_path = _primary(tmp_path)
+    with LibSQLStandIn(db_path) as standin:
+        replica = EmbeddedReplica(LibSQLClient(standin.url), str(tmp_path / "replica.db"), sync_interval=0)
+
+        async def scenario():
+            primary_rows = await replica.primary.execute(DOCS_CONTEXT_QUERY, ["termo4103", 5])
+            await replica.bootstrap()
+            requests = standin.requests
+            local_rows = await replica.read(DOCS_CONTEXT_QUERY, ["termo4103", 5])
+            return primary_rows["rows"], local_rows, standin.requests - requests
+
+        primary_rows, local_rows, extra_requests = asyncio.run(scenario())
+
+    assert local_rows and local_rows == primary_rows
+    assert extra_requests == 0
+    assert replica.stats()["reads_local"] == 1
+
+
+def test_incremental_sync_applies_changes_and_resumes(tmp_path):
+    """Inserts, updates e deletes do primário chegam à réplica (e ao FTS local)."""
+    db_path = _primary(tmp_path)
+    replica_path = str(tmp_path / "replica.db")
+    with LibSQLStandIn(db_path) as standin:
+        replica = EmbeddedReplica(LibSQLClient(standin.url), replica_path, sync_interval=0)
+        asyncio.run(replica.bootstrap())
+
+        _write_primary(db_path, "INSERT INTO docs (slug, title, content, file_path) VALUES "
+                                "('zebra', 'Zebra', 'zebraquery embarcada', 'docs/zebra.md')")
+        _write_primary(db_path, "UPDATE prps SET title = 'Título novo' WHERE id = 1")
+        _write_primary(db_path, "DELETE FROM conversations WHERE id = 2")
+
+        applied = asyncio.run(replica.sync())
+        docs = asyncio.run(replica.read(DOCS_CONTEXT_QUERY, ['"zebraquery"', 5]))
+        prp = asyncio.run(replica.read("SELECT title FROM prps WHERE id = 1"))
+        conversation = asyncio.run(replica.read("SELECT id FROM conversations WHERE id = 2"))
+
+        # Um novo processo retoma do seq salvo, sem recopiar tudo
+        restarted = EmbeddedReplica(LibSQLClient(standin.url), replica_path, sync_interval=0)
+        assert restarted.bootstrapped and restarted.applied_seq == replica.applied_seq
+        asyncio.run(restarted.sync())
+
+    assert applied == 3
+    assert [d["slug"] for d in docs] == ["zebra"]
+    assert prp == [{"title": "Título novo"}]
+    assert conversation == []
+    assert replica.stats()["lag_changes"] == 0
+    assert restarted.full_syncs == 0
+
+
+def test_sync_reads_do_not_take_the_primary_write_lock(tmp_path):
+    """Sync só lê: roda enquanto outro processo segura o lock de escrita do primário."""
+    db_path = _primary(tmp_path)
+    with LibSQLStandIn(db_path) as standin:
+        replica = EmbeddedReplica(LibSQLClient(standin.url), str(tmp_path / "replica.db"), sync_interval=0)
+        writer = sqlite3.connect(db_path, isolation_level=None)
+        writer.execute("BEGIN IMMEDIATE")
+        try:
+            start = time.perf_counter()
+            asyncio.run(replica.bootstrap())
+            asyncio.run(replica.sync())
+            elapsed = time.perf_counter() - start
+        finally:
+            writer.execute("ROLLBACK")
+            writer.close()
+
+    assert replica.full_syncs == 1 and replica.failed_syncs == 0
+    assert elapsed < 2  # com BEGIN IMMEDIATE esperaria o busy timeout (5s) e falharia
+
+
+def test_read_your_writes_per_session(tmp_path):
+    """A sessão que escreveu lê a própria escrita; as outras podem ler a réplica defasada."""
+    db_path = _primary(tmp_path)
+    with LibSQLStandIn(db_path) as standin:
+        replica = EmbeddedReplica(
+            LibSQLClient(standin.url), str(tmp_path / "replica.db"), sync_interval=0, sync_on_write=False
+        )
+        count_query = "SELECT count(*) AS n FROM conversations WHERE session_id = 'ryw'"
+
+        async def scenario():
+            await replica.bootstrap()
+            await replica.write(
+                "INSERT INTO conversations (session_id, message, response) VALUES ('ryw', 'oi', 'olá')",
+                session_id="writer",
+            )
+            lag = replica.stats()["lag_changes"]
+            other_before = await replica.read(count_query, session_id="reader")
+            own = await replica.read(count_query, session_id="writer")
+            return lag, other_before, own
+
+        lag, other_before, own = asyncio.run(scenario())
+
+    assert lag > 0
+    assert other_before == [{"n": 0}]  # réplica ainda não sincronizou
+    assert own == [{"n": 1}]           # leitura da sessão forçou o sync
+    stats = replica.stats()
+    assert stats["ryw_waits"] == 1 and stats["lag_changes"] == 0
+
+
+
+def test_write_behind_sink_records_session_seq(tmp_path):
+    """Conversas gravadas pela fila write-behind também valem para o read-your-writes."""
+    db_path = _primary(tmp_path)
+    with LibSQLStandIn(db_path) as standin:
+        replica = EmbeddedReplica(LibSQLClient(standin.url), str(tmp_path / "replica.db"), sync_interval=0)
+        asyncio.run(replica.bootstrap())
+        sink = libsql_conversation_sink(standin.url, replica=replica)
+        # Chamado como na thread do write-behind (fora do loop)
+        sink([
+            ConversationRecord(session_id="user-a", message="oi", response="olá", context="ryw"),
+            ConversationRecord(session_id="user-b", message="oi", response="olá", context="ryw"),
+        ])
+        count_query = "SELECT count(*) AS n FROM conversations WHERE context = 'ryw'"
+        own = asyncio.run(replica.read(count_query, session_id="user-b"))
+
+    assert replica._session_seq["user-a"] == replica._session_seq["user-b"] == replica.applied_seq
+    assert own == [{"n": 2}]
+    assert replica.stats()["ryw_waits"] == 1
+
+def test_agent_reads_context_from_replica(tmp_path):
+    db_path = _primary(tmp_path)
+    question = "Como configurar autenticação JWT no FastAPI?"
+    with LibSQLStandIn(db_path) as standin:
+        client = LibSQLClient(standin.url)
+        replica = EmbeddedReplica(client, str(tmp_path / "replica.db"), sync_interval=0)
+        agent = PRPAgentWithMCPTurso(libsql=client, replica=replica, cache_size=0, write_behind=False)
+        replica_context = asyncio.run(agent.search_relevant_context(question))
+
+    local = PRPAgentWithMCPTurso(database_path=db_path, cache_size=0, write_behind=False)
+    assert replica_context and replica_context == asyncio.run(local.search_relevant_context(question))
+    assert replica.reads_local > 0 and replica.reads_primary == 0
+
+
+def test_agents_share_one_replica_per_primary(tmp_path, monkeypatch):
+    """Um agente por mensagem reaproveita a réplica (sem novo sync completo nem nova task)."""
+    from agents import embedded_replica, libsql_client
+    from agents.settings import settings
+
+    db_path = _primary(tmp_path)
+    monkeypatch.setattr(embedded_replica, "_replicas", {})
+    monkeypatch.setattr(libsql_client, "_clients", {})
+    with LibSQLStandIn(db_path) as standin:
+        monkeypatch.setattr(settings, "turso_database_url", standin.url)
+        monkeypatch.setattr(settings, "turso_replica_path", str(tmp_path / "replica.db"))
+        monkeypatch.setattr(settings, "turso_replica_sync_interval", 60.0)
+
+        async def scenario():
+            first = PRPAgentWithMCPTurso(cache_size=0, write_behind=False, session_id="s1")
+            await first.replica.write(
+                "INSERT INTO conversations (session_id, message, response) VALUES ('s1', 'oi', 'olá')",
+                session_id="s1",
+            )
+            await first.search_relevant_context("autenticação JWT")
+            second = PRPAgentWithMCPTurso(cache_size=0, write_behind=False, session_id="s1")
+            await second.search_relevant_context("autenticação JWT")
+            # A integração MCP usa a mesma réplica (settings.turso_*), não uma segunda no arquivo
+            integration = RealPRPMCPIntegration()
+            await integration.tool_caller("execute_read_only_query", {"query": "SELECT 1 AS ok"})
+            task = second.replica._task
+            await embedded_replica.stop_embedded_replicas()
+            return first.replica, second.replica, task
+
+        first, second, task = asyncio.run(scenario())
+
+    assert first is second and list(embedded_replica._replicas.values()) == [first]
+    assert first.full_syncs == 1 and first._session_seq["s1"] > 0
+    assert task.cancelled() and first._task is None
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Testes da instrumentação gen_ai compartilhada (agents/instrumentation.py).
+"""
+
+import asyncio
+import time
+
+import sentry_sdk
+
+from agents import instrumentation
+from agents.agent import chat_with_prp_agent, prp_agent
+from agents.dependencies import PRPAgentDependencies
+from agents.instrumentation import NOOP_SPAN, execute_tool_span, traced_tool
+from agents.tools import search_prps
+from benchmark_context_retrieval import seed_corpus
+from test_official_standards import CapturingTransport
+
+
+def _transactions(transport):
+    return [
+        item.payload.json for envelope in transport.envelopes
+        for item in envelope.items if item.type == "transaction"
+    ]
+
+
+def test_prp_agent_run_produces_agent_chat_tool_and_db_spans(tmp_path):
+    """Uma execução real do prp_agent (TestModel) vira invoke_agent → chat/execute_tool → db."""
+    db_path = str(tmp_path / "context.db")
+    seed_corpus(db_path, n_docs=5, n_conversations=5, n_prps=5)
+    transport = CapturingTransport()
+    sentry_sdk.init(dsn="https://key@example.invalid/1", traces_sample_rate=1.0, transport=transport)
+
+    try:
+        response = asyncio.run(chat_with_prp_agent(
+            "Buscar PRPs de autenticação", deps=PRPAgentDependencies(database_path=db_path), use_test_model=True
+        ))
+        sentry_sdk.flush()
+    finally:
+        sentry_sdk.init(dsn="")
+
+    # Sem transação aberta, o invoke_agent abre a sua
+    (transaction,) = _transactions(transport)
+    assert transaction["contexts"]["trace"]["op"] == "gen_ai.invoke_agent"
+    assert transaction["transaction"] == "invoke_agent PRP Agent"
+    assert transaction["contexts"]["trace"]["data"]["gen_ai.usage.total_tokens"] > 0
+    assert response
+
+    spans = transaction["spans"]
+    root_id = transaction["contexts"]["trace"]["span_id"]
+    chats = [span for span in spans if span["op"] == "gen_ai.chat"]
+    tools = {span["data"]["gen_ai.tool.name"]: span for span in spans if span["op"] == "gen_ai.execute_tool"}
+    db_spans = [span for span in spans if span["op"] == "db"]
+
+    assert len(chats) >= 2  # chamada das ferramentas + resposta final
+    assert all(chat["parent_span_id"] == root_id for chat in chats)
+    assert set(tools) == {tool.name for tool in prp_agent._function_toolset.tools.values()}
+    assert all(tool["parent_span_id"] == root_id for tool in tools.values())
+    assert any(span["parent_span_id"] == tools["search_prps"]["span_id"] for span in db_spans)
+    assert all(span["data"]["db.system"] == "sqlite" for span in db_spans)
+
+
+def test_traced_tool_keeps_tool_schema():
+    """O PydanticAI continua gerando o schema a partir da assinatura e docstring originais."""
+    tool = prp_agent._function_toolset.tools["search_prps"]
+
+    assert tool.function is search_prps
+    assert search_prps.__wrapped__.__name__ == "search_prps"
+    assert set(tool.function_schema.json_schema["properties"]) == {"query", "status", "priority", "limit"}
+    assert tool.tool_def.description.startswith("Busca PRPs")
+
+
+def test_noop_mode_is_cheap_and_records_nothing():
+    """Desligada (ou sem span pai), a instrumentação não cria spans e custa pouco."""
+    calls = []
+
+    @traced_tool
+    async def echo(ctx, value: int) -> int:
+        calls.append(value)
+        return value
+
+    transport = CapturingTransport()
+    sentry_sdk.init(dsn="https://key@example.invalid/1", traces_sample_rate=1.0, transport=transport)
+    instrumentation.configure(False)
+    try:
+        with sentry_sdk.start_transaction(op="test", name="noop"):
+            with execute_tool_span("echo") as span:
+                assert span is NOOP_SPAN
+            assert asyncio.run(echo(None, 3)) == 3
+        sentry_sdk.flush()
+    finally:
+        instrumentation.configure(True)
+        sentry_sdk.init(dsn="")
+
+    assert calls == [3]
+    (transaction,) = _transactions(transport)
+    assert transaction["spans"] == []
+
+    # Sem span pai (nada a gravar) o context manager fica abaixo de alguns µs
+    n = 20000
+    start = time.perf_counter()
+    for _ in range(n):
+        with execute_tool_span("echo", tool_input={"value": 1}):
+            pass
+    per_call_us = (time.perf_counter() - start) / n * 1e6
+    assert per_call_us < 20, f"{per_call_us:.2f} µs por span no-op"
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Testes do cliente libSQL (pipeline HTTP) contra o stand-in local.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from agents import libsql_client
+from agents.agent_with_mcp_turso import PRPAgentWithMCPTurso
+from agents.libsql_client import LibSQLClient, LibSQLError, close_libsql_clients
+from agents.libsql_standin import LibSQLStandIn
+from benchmark_context_retrieval import seed_corpus
+from benchmark_store_tasks import HTTPStandInBackend, sample_analysis, sample_prp
+from real_mcp_integration import RealPRPMCPIntegration
+
+
+def test_execute_and_transactional_batch(tmp_path):
+    """Valores tipados vão e voltam; lote com falha é desfeito por inteiro."""
+    with LibSQLStandIn(str(tmp_path / "db.sqlite")) as standin:
+        async def scenario():
+            client = LibSQLClient(standin.url)
+            await client.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, nome TEXT UNIQUE, peso REAL, dado BLOB)")
+            inserted = await client.execute(
+                "INSERT INTO t (nome, peso, dado) VALUES (?, ?, ?) RETURNING id", ["a", 1.5, b"\x00\x01"]
+            )
+            results = await client.batch([
+                {"query": "INSERT INTO t (nome) VALUES (?)", "params": ["b"]},
+                {"query": "SELECT nome, peso, dado FROM t ORDER BY id", "params": []},
+            ])
+            with pytest.raises(LibSQLError) as failure:
+                await client.batch([
+                    {"query": "INSERT INTO t (nome) VALUES (?)", "params": ["c"]},
+                    {"query": "INSERT INTO t (nome) VALUES (?)", "params": ["a"]},
+                ])
+            remaining = await client.execute("SELECT count(*) AS n FROM t")
+            await client.close()
+            return inserted, results, failure.value, remaining, client.round_trips
+
+        inserted, results, failure, remaining, round_trips = asyncio.run(scenario())
+
+    assert inserted["rows"] == [{"id": 1}]
+    assert results[1]["rows"][0] == {"nome": "a", "peso": 1.5, "dado": b"\x00\x01"}
+    assert failure.step == 1 and "UNIQUE" in str(failure)
+    assert remaining["rows"] == [{"n": 2}]  # o "c" do lote com falha não ficou
+    assert round_trips == 5
+
+
+def test_auth_token_is_required(tmp_path):
+    with LibSQLStandIn(str(tmp_path / "db.sqlite"), auth_token="segredo") as standin:
+        async def scenario():
+            async with LibSQLClient(standin.url) as anonymous, LibSQLClient(standin.url, "segredo") as client:
+                with pytest.raises(LibSQLError, match="401"):
+                    await anonymous.execute("SELECT 1")
+                return await client.execute("SELECT 1 AS um")
+
+        assert asyncio.run(scenario())["rows"] == [{"um": 1}]
+
+
+
+def test_agents_share_client_and_superseded_http_clients_are_closed(tmp_path, monkeypatch):
+    """Um LibSQLClient por URL; o httpx.AsyncClient de outro loop é fechado, não abandonado."""
+    from agents.settings import settings
+
+    monkeypatch.setattr(libsql_client, "_clients", {})
+    with LibSQLStandIn(str(tmp_path / "db.sqlite")) as standin:
+        monkeypatch.setattr(settings, "turso_database_url", standin.url)
+        monkeypatch.setattr(settings, "turso_replica_path", "")
+        first = PRPAgentWithMCPTurso(cache_size=0, write_behind=False)
+        second = PRPAgentWithMCPTurso(cache_size=0, write_behind=False)
+        client = first.libsql
+        assert client is second.libsql
+
+        # Loop de fundo ainda rodando (outra thread): o cliente dele é fechado lá
+        background = asyncio.new_event_loop()
+        thread = threading.Thread(target=background.run_forever, daemon=True)
+        thread.start()
+        asyncio.run_coroutine_threadsafe(client.execute("SELECT 1"), background).result(5)
+        superseded = client._http
+
+        async def next_message():
+            await client.execute("SELECT 1")
+            current = client._http
+            await close_libsql_clients()
+            return current
+
+        current = asyncio.run(next_message())
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0), background).result(5)
+        background.call_soon_threadsafe(background.stop)
+        thread.join(5)
+        background.close()
+
+    assert superseded is not current
+    assert superseded.is_closed and current.is_closed and client._http is None
+
+def test_unit_of_work_over_http_is_one_request():
+    """O lote do PRP vira um único POST /v2/pipeline."""
+    backend = HTTPStandInBackend()
+    try:
+        integration = RealPRPMCPIntegration(tool_caller=backend)
+        analysis = sample_analysis(40)
+
+        async def scenario():
+            unit = (integration.unit_of_work("req-http")
+                    .add_prp(sample_prp())
+                    .add_llm_analysis(analysis)
+                    .add_tasks(analysis["parsed_data"]["tasks"]))
+            first = await unit.commit()
+            retry = await unit.commit()
+            return first, retry
+
+        first, retry = asyncio.run(scenario())
+    finally:
+        backend.close()
+
+    assert len(first["task_ids"]) == 40
+    assert retry["replayed"] and retry["task_ids"] == first["task_ids"]
+    assert backend.round_trips == 3  # lote + (lote desfeito + leitura do resultado original)
+
+
+def test_agent_reads_context_through_libsql(tmp_path):
+    """O agente com cliente libSQL acha o mesmo contexto que lendo o SQLite direto."""
+    db_path = str(tmp_path / "context.db")
+    seed_corpus(db_path, n_docs=50, n_conversations=50, n_prps=20)
+    question = "Como configurar autenticação JWT no FastAPI?"
+
+    with LibSQLStandIn(db_path) as standin:
+        remote = PRPAgentWithMCPTurso(libsql=LibSQLClient(standin.url), cache_size=0, write_behind=False)
+        remote_context = asyncio.run(remote.search_relevant_context(question))
+        assert standin.requests > 0
+
+    local = PRPAgentWithMCPTurso(database_path=db_path, cache_size=0, write_behind=False)
+    local_context = asyncio.run(local.search_relevant_context(question))
+
+    assert remote_context and remote_context == local_context
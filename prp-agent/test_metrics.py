@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Testes das métricas por ferramenta MCP.
+"""
+
+import sqlite3
+
+from agents.metrics import LatencyHistogram, TimedConnection, ToolMetricsCollector
+
+
+def test_histogram_percentiles():
+    """Percentis estimados ficam próximos dos valores reais."""
+    histogram = LatencyHistogram()
+    for value in range(1, 1001):
+        histogram.observe(value / 10)  # 0.1ms .. 100ms
+
+    assert histogram.count == 1000
+    assert 40 <= histogram.percentile(50) <= 60
+    assert 90 <= histogram.percentile(95) <= 100
+    assert histogram.percentile(99) <= histogram.max == 100
+
+
+def test_track_records_calls_errors_and_bytes():
+    """Chamadas, erros e bytes são agregados por ferramenta."""
+    collector = ToolMetricsCollector()
+
+    with collector.track("prp_search") as call:
+        call.bytes_returned = 120
+    with collector.track("prp_search") as call:
+        call.mark_error()
+
+    data = collector.snapshot()["tools"]["prp_search"]
+    assert data["calls"] == 2
+    assert data["errors"] == 1
+    assert data["bytes_returned"] == 120
+    assert data["latency"]["count"] == 2
+
+
+def test_db_time_is_split_from_llm_time():
+    """Tempo de banco vem do cursor temporizado; o restante é LLM."""
+    collector = ToolMetricsCollector()
+    conn = sqlite3.connect(":memory:", factory=TimedConnection)
+
+    with collector.track("prp_chat", llm_bound=True):
+        cursor = conn.cursor()
+        cursor.execute("WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 20000) SELECT sum(x) FROM n")
+        cursor.fetchall()
+
+    data = collector.snapshot()["tools"]["prp_chat"]
+    assert data["db_time_ms"] > 0
+    assert data["db_time_ms"] + data["llm_time_ms"] <= data["latency"]["max_ms"] + 0.01
+
+
+def test_disabled_collector_is_noop():
+    """Com métricas desabilitadas nada é registrado."""
+    collector = ToolMetricsCollector(enabled=False)
+
+    with collector.track("prp_details") as call:
+        assert (call.bytes_returned, call.error) == (0, False)  # antes de qualquer escrita
+        call.bytes_returned = 10
+        call.mark_error()
+
+    # A instância no-op é compartilhada: uma chamada não vaza estado para a próxima
+    with collector.track("prp_search") as other:
+        assert (other.bytes_returned, other.error) == (0, False)
+
+    assert collector.snapshot()["tools"] == {}
+    assert "desabilitadas" in collector.format_report()
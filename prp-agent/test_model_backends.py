@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Testes dos backends de modelo: simulador com seed, replay/gravação e integração nos apps.
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+import main_ai_agents_custom
+import main_ai_monitoring
+from agents.model_backends import (
+    ModelBackend, ModelRun, PrpAgentBackend, RecordingBackend, ReplayBackend, SimulatedBackend, SimulationParams,
+    ToolRun, backend_from_env,
+)
+
+
+def _runs(backend, prompts):
+    async def scenario():
+        return [await backend.run(prompt, "gpt-4") for prompt in prompts]
+    return asyncio.run(scenario())
+
+
+def test_seeded_simulator_is_repeatable_and_follows_params(monkeypatch):
+    """Mesma seed, mesmas execuções; tokens/s define a latência do texto; parâmetros lidos do app."""
+    params = SimulationParams(tokens_per_second=100.0, output_tokens=(200, 200), tools_per_run=(2, 2))
+    first, second = (_runs(SimulatedBackend(params, seed=7), ["a", "b", "c"]) for _ in range(2))
+    assert first == second
+    assert all(len(run.tools) == 2 and run.response_s == 2.0 for run in first)
+
+    monkeypatch.setenv("MODEL_SIM_SEED", "7")
+    monkeypatch.setattr(main_ai_monitoring, "PROCESSING_LATENCY_SECONDS", 0.4)
+    backend = backend_from_env(lambda seed: SimulatedBackend(main_ai_monitoring.simulation_params, seed=seed))
+    (run,) = _runs(backend, ["Criar PRP"])
+    assert (run.planning_s, run.response_s) == (0.2, 0.2)
+    assert run.total_tokens == run.input_tokens + run.output_tokens + sum(tool.tokens for tool in run.tools)
+
+
+def test_recorded_runs_replay_in_order_and_scaled(tmp_path):
+    """Gravação no formato do replay; mesmo prompt em ordem, desconhecido cicla; time_scale nas latências."""
+    path = str(tmp_path / "runs.jsonl")
+    recorded = _runs(RecordingBackend(SimulatedBackend(SimulationParams(planning_s=0.3), seed=1), path),
+                     ["x", "x", "y"])
+    assert len(open(path).read().splitlines()) == 3
+
+    replayed = _runs(ReplayBackend(path), ["x", "x", "y", "x"])
+    assert [run.text for run in replayed] == [run.text for run in recorded + recorded[:1]]
+    assert [run.tools for run in replayed[:3]] == [run.tools for run in recorded]
+
+    (unknown,) = _runs(ReplayBackend(path, time_scale=0.5), ["nunca gravado"])
+    assert unknown.text == recorded[0].text
+    assert unknown.planning_s == 0.15
+    assert [tool.latency_s for tool in unknown.tools] == [tool.latency_s * 0.5 for tool in recorded[0].tools]
+
+
+def test_apps_play_the_backend_run(tmp_path, monkeypatch):
+    """Os dois apps devolvem texto, ferramentas e tokens do backend; agente real sem ferramentas simuladas."""
+    run = ModelRun(text="PRP gravado", input_tokens=10, output_tokens=30,
+                   tools=[ToolRun("prp_parser", 20, 0.05)], planning_s=0.05, response_s=0.05)
+    path = tmp_path / "runs.jsonl"
+    path.write_text(json.dumps(run.to_record("Criar PRP", "gpt-4")) + "\n")
+    monkeypatch.setenv("MODEL_BACKEND", "replay")
+    monkeypatch.setenv("MODEL_REPLAY_PATH", str(path))
+    monkeypatch.setattr(main_ai_monitoring, "BACKEND", backend_from_env(lambda seed: None))
+
+    async def post():
+        transport = httpx.ASGITransport(app=main_ai_monitoring.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/ai-agent/process", json={"prompt": "Criar PRP"},
+                                         headers={"X-No-Coalesce": "1"})
+            return response.json()
+
+    start = time.perf_counter()
+    body = asyncio.run(post())
+    assert body["result"] == "PRP gravado" and body["tools_called"] == ["prp_parser"]
+    assert body["tokens_used"] == 60 and time.perf_counter() - start >= 0.15
+
+    agent = main_ai_agents_custom.AIAgentMonitor("Replay", backend=ReplayBackend(str(path), time_scale=0))
+    result = asyncio.run(agent.process("Criar PRP", "user"))
+    assert result["result"] == "PRP gravado" and result["total_tokens"] == 60
+    assert [tool.name for tool in result["tools_used"]] == ["prp_parser"]
+
+    real_agent = main_ai_agents_custom.AIAgentMonitor("Real", backend=PrpAgentBackend(use_test_model=True))
+    real = asyncio.run(real_agent.process("Criar PRP", "user"))
+    assert real["tools_used"] and real["total_tokens"] > 0
+    assert real["model"] == "test" != real_agent.model  # o modelo que rodou, não o pedido
+
+
+def test_backend_interface_requires_run():
+    """ModelBackend é abstrato: backend sem `run` falha na criação, não na primeira chamada."""
+
+    class Incomplete(ModelBackend):
+        name = "incompleto"
+
+    with pytest.raises(TypeError):
+        Incomplete()
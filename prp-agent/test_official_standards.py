@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Testes do pipeline assíncrono de main_official_standards (concorrência e spans).
+"""
+
+import asyncio
+import random
+import time
+
+import httpx
+import sentry_sdk
+from sentry_sdk.transport import Transport
+
+import main_official_standards
+from main_official_standards import app, invoke_agent_official
+
+
+class CapturingTransport(Transport):
+    """Transport que guarda os envelopes em memória em vez de enviá-los."""
+
+    def __init__(self, options=None):
+        super().__init__(options)
+        self.envelopes = []
+
+    def capture_envelope(self, envelope):
+        self.envelopes.append(envelope)
+
+
+def test_parallel_requests_do_not_serialize(monkeypatch):
+    """N requisições simultâneas levam ~1x a latência de uma, não Nx."""
+    monkeypatch.setattr(main_official_standards, "LLM_LATENCY_SECONDS", 0.2)
+    monkeypatch.setattr(main_official_standards, "TOOL_LATENCY_RANGE", (0.1, 0.1))
+    n_requests = 10
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def one(i):
+                return await client.post(
+                    "/ai-agent/official-standards", json={"prompt": f"Pergunta {i}", "user_id": f"u{i}"}
+                )
+
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(one(i) for i in range(n_requests)))
+            return responses, time.perf_counter() - start
+
+    responses, elapsed = asyncio.run(scenario())
+
+    assert all(r.status_code == 200 for r in responses)
+    assert len({r.json()["agent_session"] for r in responses}) == n_requests
+    # Uma requisição: 0.2s de LLM + 0.1s de ferramentas (em paralelo entre si)
+    assert elapsed < 2 * 0.3, f"{n_requests} requisições levaram {elapsed:.2f}s"
+
+
+def test_spans_keep_official_hierarchy(monkeypatch):
+    """invoke_agent → chat → execute_tool, mesmo com as ferramentas em paralelo."""
+    monkeypatch.setattr(main_official_standards, "LLM_LATENCY_SECONDS", 0)
+    monkeypatch.setattr(main_official_standards, "TOOL_LATENCY_RANGE", (0, 0))
+    monkeypatch.setattr(random, "choice", lambda seq: True)
+    monkeypatch.setattr(random, "randint", lambda a, b: b)
+    transport = CapturingTransport()
+    sentry_sdk.init(dsn="https://key@example.invalid/1", traces_sample_rate=1.0, transport=transport)
+
+    async def scenario():
+        with sentry_sdk.start_transaction(op="test", name="official-standards"):
+            return await invoke_agent_official("PRP Assistant", "gpt-4o-mini", "Criar PRP", 0.1, 100, "u1")
+
+    try:
+        result = asyncio.run(scenario())
+        sentry_sdk.flush()
+    finally:
+        sentry_sdk.init(dsn="")
+
+    (transaction,) = [
+        item.payload.json for envelope in transport.envelopes
+        for item in envelope.items if item.type == "transaction"
+    ]
+    spans = {span["op"]: span for span in transaction["spans"] if span["op"] != "gen_ai.execute_tool"}
+    tools = [span for span in transaction["spans"] if span["op"] == "gen_ai.execute_tool"]
+
+    assert len(result["tools_executed"]) == 2 and len(tools) == 2
+    assert spans["gen_ai.chat"]["parent_span_id"] == spans["gen_ai.invoke_agent"]["span_id"]
+    assert all(tool["parent_span_id"] == spans["gen_ai.chat"]["span_id"] for tool in tools)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Testes do registro de métricas OpenMetrics e do endpoint /metrics dos apps.
+"""
+
+import asyncio
+import random
+import threading
+
+import httpx
+
+import main_official_standards
+from agents.openmetrics import CONTENT_TYPE, REGISTRY, Counter, Histogram, MetricsRegistry
+from agents.retrieval_cache import RetrievalCache
+from benchmark_metrics import run_benchmark
+
+
+def test_exposition_format():
+    """Contadores com _total, buckets cumulativos com +Inf, labels escapados e # EOF."""
+    registry = MetricsRegistry()
+    calls = Counter("t_calls", "Chamadas.", ("tool",), registry=registry)
+    seconds = Histogram("t_seconds", "Duração.", ("tool",), buckets=(0.1, 1.0), registry=registry)
+    calls.labels('busca "prp"').inc()
+    calls.labels('busca "prp"').inc(2)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        seconds.labels("x").observe(value)
+
+    text = registry.expose()
+
+    assert 'calls_total{tool="busca \\"prp\\""} 3.0' in text
+    assert "# TYPE t_calls counter" in text and "# TYPE t_seconds histogram" in text
+    assert 't_seconds_bucket{tool="x",le="0.1"} 2' in text  # le inclusivo
+    assert 't_seconds_bucket{tool="x",le="1.0"} 3' in text
+    assert 't_seconds_bucket{tool="x",le="+Inf"} 4' in text
+    assert 't_seconds_count{tool="x"} 4' in text
+    assert 't_seconds_sum{tool="x"} 3.65' in text
+    assert text.endswith("# EOF\n")
+
+
+def test_concurrent_increments_are_not_lost():
+    """Acumuladores por thread: nenhuma perda com várias threads na mesma série."""
+    registry = MetricsRegistry()
+    series = Counter("t_shared", "Compartilhado.", registry=registry).labels()
+    n_threads, n_ops = 8, 20000
+
+    def worker():
+        for _ in range(n_ops):
+            series.inc()
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert series.get() == n_threads * n_ops
+
+
+def test_increment_cost_is_sub_microsecond():
+    """inc/observe com a série resolvida custam menos de 1 µs."""
+    results = run_benchmark(ops=200_000, threads=2, repeat=3)
+
+    assert results["counter.inc"] < 1000, results
+    assert results["histogram.observe"] < 1000, results
+
+
+def test_metrics_endpoint_reports_routes_tokens_tools_and_cache(monkeypatch):
+    """/metrics do app: latência pelo template da rota, tokens por modelo, ferramentas e cache."""
+    monkeypatch.setattr(main_official_standards, "LLM_LATENCY_SECONDS", 0)
+    monkeypatch.setattr(main_official_standards, "TOOL_LATENCY_RANGE", (0, 0))
+    monkeypatch.setattr(random, "choice", lambda seq: True)
+    monkeypatch.setattr(random, "sample", lambda seq, k: ["prp_parser"])
+    REGISTRY.clear()
+    cache = RetrievalCache(name="teste")
+    cache.put("k", 1, "v")
+    cache.get("k", 1)
+    cache.get("outra", 1)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main_official_standards.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for i in range(3):
+                response = await client.post(
+                    "/ai-agent/official-standards", json={"prompt": f"Criar PRP {i}", "model": "gpt-4o-mini"}
+                )
+                assert response.status_code == 200
+            await client.get("/nao-existe")
+            return await client.get("/metrics")
+
+    response = asyncio.run(scenario())
+    text = response.text
+
+    assert response.headers["content-type"] == CONTENT_TYPE
+    assert (
+        'prp_http_request_duration_seconds_count{route="/ai-agent/official-standards",method="POST",status="200"} 3'
+        in text
+    )
+    assert 'route="<unmatched>",method="GET",status="404"' in text
+    assert 'prp_llm_tokens_total{model="gpt-4o-mini",type="input"}' in text
+    assert 'prp_llm_tokens_total{model="gpt-4o-mini",type="output"}' in text
+    assert 'prp_cache_requests_total{cache="teste",result="hit"} 1.0' in text
+    assert 'prp_cache_requests_total{cache="teste",result="miss"} 1.0' in text
+    assert 'prp_tool_calls_total{tool="prp_parser",status="ok"} 3.0' in text
+    assert 'prp_tool_duration_seconds_count{tool="prp_parser"} 3' in text
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Testes da execução paralela de ferramentas (main_sentry_official e main_ai_agents_custom).
+"""
+
+import asyncio
+import random
+import time
+
+import sentry_sdk
+
+import main_sentry_official
+from agents.model_backends import ToolRun
+from main_ai_agents_custom import AIAgentMonitor
+from main_sentry_official import SentryAIAgent
+from test_official_standards import CapturingTransport
+
+
+def _elapsed(coro):
+    start = time.perf_counter()
+    result = asyncio.run(coro)
+    return result, time.perf_counter() - start
+
+
+def test_tools_run_in_parallel_up_to_the_limit(monkeypatch):
+    names = ["text_analyzer", "prp_parser", "context_builder", "code_generator"]
+    tools = [ToolRun(name, tokens=20, latency_s=0.1) for name in names]
+
+    parallel, parallel_time = _elapsed(AIAgentMonitor("A")._run_tools("s1", tools, "prompt", 0.5))
+    limited, limited_time = _elapsed(AIAgentMonitor("B", max_tool_parallelism=2)._run_tools("s2", tools, "prompt", 0.5))
+
+    assert [call.name for call in parallel] == names == [call.name for call in limited]
+    assert parallel_time < 0.18               # uma leva de 100ms
+    assert 0.2 <= limited_time < 0.28         # duas levas de 100ms
+
+
+def test_parallel_tool_spans_stay_children_of_chat(monkeypatch):
+    monkeypatch.setattr(main_sentry_official, "LLM_LATENCY_SECONDS", 0)
+    monkeypatch.setattr(main_sentry_official, "TOOL_LATENCY_RANGE", (0.05, 0.05))
+    monkeypatch.setattr(random, "choice", lambda seq: True)
+    monkeypatch.setattr(random, "randint", lambda a, b: 3 if (a, b) == (1, 3) else a)
+    transport = CapturingTransport()
+    sentry_sdk.init(dsn="https://key@example.invalid/1", traces_sample_rate=1.0, transport=transport)
+
+    async def scenario():
+        with sentry_sdk.start_transaction(op="test", name="official"):
+            return await SentryAIAgent("PRP Assistant").invoke_agent("Criar PRP")
+
+    try:
+        result, elapsed = _elapsed(scenario())
+        sentry_sdk.flush()
+    finally:
+        sentry_sdk.init(dsn="")
+
+    (transaction,) = [
+        item.payload.json for envelope in transport.envelopes
+        for item in envelope.items if item.type == "transaction"
+    ]
+    (chat,) = [span for span in transaction["spans"] if span["op"] == "gen_ai.chat"]
+    tools = [span for span in transaction["spans"] if span["op"] == "gen_ai.execute_tool"]
+
+    assert len(result["tools_executed"]) == 3 and len(tools) == 3
+    assert all(tool["parent_span_id"] == chat["span_id"] for tool in tools)
+    assert elapsed < 0.12  # 3 ferramentas de 50ms em paralelo
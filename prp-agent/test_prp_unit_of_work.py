@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Testes da unidade de trabalho PRP + análise + tarefas (PRPUnitOfWork).
+"""
+
+import asyncio
+
+import pytest
+
+from benchmark_store_tasks import SQLiteMCPStandIn, sample_analysis, sample_prp, sample_tasks
+from real_mcp_integration import RealPRPMCPIntegration
+
+
+TABLES = ("prps", "prp_llm_analysis", "prp_tasks", "prp_write_idempotency")
+
+
+def _counts(stand_in):
+    # O schema já traz um PRP de exemplo: compara-se sempre com o estado inicial
+    return {table: stand_in.conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in TABLES}
+
+
+def _unit(integration, n_tasks=5, **kwargs):
+    analysis = sample_analysis(n_tasks)
+    return (integration.unit_of_work(**kwargs)
+            .add_prp(sample_prp())
+            .add_llm_analysis(analysis)
+            .add_tasks(analysis["parsed_data"]["tasks"]))
+
+
+def test_commit_writes_everything_in_one_round_trip():
+    """PRP, análise e tarefas saem em uma requisição, já ligados ao PRP."""
+    stand_in = SQLiteMCPStandIn()
+    integration = RealPRPMCPIntegration(tool_caller=stand_in)
+
+    stored = asyncio.run(_unit(integration, n_tasks=40).commit())
+
+    assert stand_in.round_trips == 1
+    assert not stored["replayed"]
+    task_rows = stand_in.conn.execute("SELECT id, prp_id FROM prp_tasks ORDER BY id").fetchall()
+    assert stored["task_ids"] == [row[0] for row in task_rows]
+    assert {row[1] for row in task_rows} == {stored["prp_id"]}
+    analysis_prp = stand_in.conn.execute("SELECT prp_id FROM prp_llm_analysis").fetchone()[0]
+    assert [analysis_prp] == [stored["prp_id"]] and len(stored["analysis_ids"]) == 1
+
+
+def test_failed_batch_leaves_no_orphans():
+    """Falha em qualquer statement desfaz o lote inteiro."""
+    stand_in = SQLiteMCPStandIn()
+    integration = RealPRPMCPIntegration(tool_caller=stand_in)
+    unit = _unit(integration).add_tasks([dict(sample_tasks(1)[0], type="tipo-invalido")])
+    before = _counts(stand_in)
+
+    with pytest.raises(RuntimeError, match="desfeito"):
+        asyncio.run(unit.commit())
+
+    assert _counts(stand_in) == before
+
+
+def test_retry_with_same_key_replays_original_result():
+    """Um retry da mesma chave não duplica nada e devolve os ids originais."""
+    stand_in = SQLiteMCPStandIn()
+    integration = RealPRPMCPIntegration(tool_caller=stand_in)
+
+    first = asyncio.run(_unit(integration, idempotency_key="req-123").commit())
+    after_first = _counts(stand_in)
+    retry = asyncio.run(_unit(integration, idempotency_key="req-123").commit())
+
+    assert retry["replayed"]
+    assert (retry["prp_id"], retry["analysis_ids"], retry["task_ids"]) == (
+        first["prp_id"], first["analysis_ids"], first["task_ids"]
+    )
+    assert _counts(stand_in) == after_first
+    # Sem chave explícita, o conteúdo idêntico gera a mesma chave
+    assert _unit(integration).idempotency_key == _unit(integration).idempotency_key
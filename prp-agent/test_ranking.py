@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Testes do ranking híbrido de contexto.
+"""
+
+import time
+
+from agents.ranking import CandidateBatch, HybridRanker, RankingWeights, tokenize
+
+FIELDS = ("title", "content")
+
+
+def test_tokenize_drops_short_words_and_stopwords():
+    assert tokenize("Como usar o Turso com JWT?") == ["usar", "turso", "jwt"]
+
+
+def test_bm25_prefers_matching_candidate():
+    batch = CandidateBatch([
+        {"title": "Guia Sentry", "content": "monitoramento de erros"},
+        {"title": "Guia Turso", "content": "turso replica turso banco"},
+        {"title": "Guia FastAPI", "content": "endpoints rest"},
+    ], FIELDS)
+
+    ranked = HybridRanker().rank("replica do turso", batch, top_k=2)
+
+    assert ranked[0][0]["title"] == "Guia Turso"
+    assert len(ranked) == 2
+
+
+def test_recency_priority_and_quality_break_ties():
+    now = time.time()
+    old = {"title": "Turso", "content": "turso", "updated_at": now - 365 * 86400,
+           "cluster_priority": 9, "quality_score": 3}
+    new = {"title": "Turso", "content": "turso", "updated_at": now,
+           "cluster_priority": 1, "quality_score": 9}
+    batch = CandidateBatch([old, new], FIELDS)
+
+    ranked = HybridRanker().rank("turso", batch, now=now)
+
+    assert ranked[0][0] is new
+
+
+def test_conversation_overlap_boosts_candidates():
+    batch = CandidateBatch([
+        {"title": "PRP", "content": "prp autenticação"},
+        {"title": "PRP", "content": "prp jwt fastapi"},
+    ], FIELDS)
+    ranker = HybridRanker(RankingWeights(recency=0, cluster_priority=0, quality=0))
+
+    ranked = ranker.rank("prp", batch, conversation_terms=["jwt", "fastapi"])
+
+    assert ranked[0][0]["content"] == "prp jwt fastapi"
+
+
+def test_empty_batch():
+    assert HybridRanker().rank("turso", CandidateBatch([], FIELDS)) == []
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Testes do cache de busca de contexto com invalidação por escrita.
+"""
+
+import asyncio
+import sqlite3
+
+from agents.agent_with_mcp_turso import CONTEXT_SOURCES, PRPAgentWithMCPTurso
+from agents.retrieval_cache import CHANGE_COUNTERS_QUERY, RetrievalCache, bump_table_version
+from benchmark_context_retrieval import seed_corpus
+
+
+def _agent(tmp_path, **kwargs):
+    db_path = str(tmp_path / "context.db")
+    seed_corpus(db_path, n_docs=30, n_conversations=30, n_prps=10)
+    agent = PRPAgentWithMCPTurso(database_path=db_path, **kwargs)
+    agent.counters_refresh_interval = 3600
+
+    queries = []
+    original = agent._execute_mcp_query
+
+    async def counting_query(query, params=None):
+        queries.append(query)
+        return await original(query, params)
+
+    agent._execute_mcp_query = counting_query
+    return agent, db_path, queries
+
+
+def test_lru_bounds_and_version_mismatch():
+    """Entradas antigas são despejadas e versões diferentes invalidam."""
+    cache = RetrievalCache(max_entries=2)
+    cache.put("a", 1, "A")
+    cache.put("b", 1, "B")
+    assert cache.get("a", 1) == "A"
+    cache.put("c", 1, "C")  # despeja "b" (menos recente)
+
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 2) is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_similar_questions_skip_the_database(tmp_path):
+    """Mesmos termos (em outra ordem, com outras stopwords) não tocam o banco."""
+    agent, _, queries = _agent(tmp_path)
+
+    first = asyncio.run(agent.search_relevant_context("latência do banco turso"))
+    executed = len(queries)
+    again = asyncio.run(agent.search_relevant_context("Qual a latência para o turso no banco?"))
+
+    # Contadores + uma busca por fonte; a segunda pergunta não faz nenhuma query
+    assert executed == len(CONTEXT_SOURCES) + 1 and queries[0] == CHANGE_COUNTERS_QUERY
+    assert len(queries) == executed
+    assert [c["data"] for c in first] == [c["data"] for c in again]
+
+
+def test_trigger_counter_invalidates_after_external_write(tmp_path):
+    """Escrita de outro processo (trigger) invalida só a fonte alterada."""
+    agent, db_path, queries = _agent(tmp_path)
+    agent.counters_refresh_interval = 0
+    asyncio.run(agent.search_relevant_context("turso"))
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO prps (name, title, description, objective) VALUES ('novo', 'PRP Turso novo', 'turso', 'x')")
+    conn.commit()
+    conn.close()
+
+    context = asyncio.run(agent.search_relevant_context("turso"))
+
+    assert queries.count(CHANGE_COUNTERS_QUERY) == 2
+    assert len(queries) == len(CONTEXT_SOURCES) + 3 and "prps_fts" in queries[-1]
+    prps = next(c for c in context if c["type"] == "prps")
+    assert any(p["name"] == "novo" for p in prps["data"])
+
+
+def test_local_write_path_invalidates_immediately(tmp_path):
+    """bump_table_version invalida mesmo sem reler os contadores do banco."""
+    agent, _, queries = _agent(tmp_path)
+    asyncio.run(agent.search_relevant_context("turso"))
+
+    bump_table_version("docs")
+    asyncio.run(agent.search_relevant_context("turso"))
+
+    # docs muda a documentação e as seções (JOIN com docs)
+    refetched = queries[len(CONTEXT_SOURCES) + 1:]
+    assert len(refetched) == 2
+    assert any("docs_sections_fts" in q for q in refetched) and any("FROM docs_fts" in q for q in refetched)
+    assert queries.count(CHANGE_COUNTERS_QUERY) == 1
+
+
+def test_cache_is_shared_by_agents_of_the_same_database(tmp_path):
+    """Um agente por mensagem (chat_with_prp_agent_mcp): a segunda mensagem não toca o banco."""
+    agent, db_path, queries = _agent(tmp_path)
+    asyncio.run(agent.search_relevant_context("latência do banco turso"))
+
+    next_message = PRPAgentWithMCPTurso(database_path=db_path)
+    next_message.counters_refresh_interval = 3600
+    next_message._execute_mcp_query = agent._execute_mcp_query
+    asyncio.run(next_message.search_relevant_context("latência do banco turso"))
+
+    # Nem os contadores: foram lidos pela mensagem anterior, dentro do intervalo
+    assert next_message.cache is agent.cache
+    assert len(queries) == len(CONTEXT_SOURCES) + 1
+    assert queries.count(CHANGE_COUNTERS_QUERY) == 1
+    assert PRPAgentWithMCPTurso(database_path=str(tmp_path / "outro.db")).cache is not agent.cache
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Testes do índice semântico local (TF-IDF hasheado + SVD, memmap, LSH).
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from agents import semantic_index
+from agents.agent_with_mcp_turso import PRPAgentWithMCPTurso
+from agents.semantic_index import IndexedText, SemanticIndex
+
+CORPUS = [
+    IndexedText("docs", 1, "Autenticação de usuários com tokens JWT no FastAPI", "Auth JWT"),
+    IndexedText("docs", 2, "Configurar réplica embarcada do banco Turso e sincronização", "Turso replica"),
+    IndexedText("docs", 3, "Monitoramento de erros e traces com Sentry em produção", "Sentry"),
+    IndexedText("prps", 1, "PRP para pipeline de deploy com Docker e testes de integração", "Deploy"),
+    IndexedText("turso_agent_knowledge", 1, "Índices FTS5 aceleram consultas de texto no SQLite", "FTS5"),
+]
+
+
+def test_paraphrase_finds_document(tmp_path):
+    """Variações morfológicas (autenticar/autenticação) casam pelos n-gramas."""
+    index = SemanticIndex(str(tmp_path / "index"), dim=16)
+    index.fit(CORPUS)
+
+    entry, score = index.search("como autenticar usuario com token", k=1)[0]
+    assert (entry["source"], entry["row_id"]) == ("docs", 1)
+    assert score > 0
+
+    only_prps = index.search("deploy", k=3, sources={"prps"})
+    assert [e["source"] for e, _ in only_prps] == ["prps"]
+
+
+def test_incremental_update_by_file_hash_and_reload(tmp_path):
+    """Só linhas novas/alteradas são reembutidas; o índice recarrega do disco."""
+    index_dir = str(tmp_path / "index")
+    index = SemanticIndex(index_dir, dim=16)
+    index.fit(CORPUS)
+
+    changed = IndexedText("docs", 3, "Observabilidade com Sentry: spans, traces e alertas", "Sentry v2")
+    new = IndexedText("docs", 4, "Cache LRU para respostas do agente", "Cache")
+    stats = index.update(CORPUS[:2] + [changed, new] + CORPUS[3:], sources={"docs", "prps", "turso_agent_knowledge"})
+    assert stats == {"added": 1, "updated": 1, "unchanged": 4, "removed": 0}
+
+    stats = index.update([CORPUS[0]], sources={"docs"})
+    assert stats["removed"] == 3
+
+    reloaded = SemanticIndex(index_dir)
+    assert len(reloaded) == len(index) == 3
+    assert reloaded.search("autenticação JWT", k=1)[0][0]["row_id"] == 1
+
+
+def test_lsh_search_agrees_with_exact(tmp_path):
+    """A busca aproximada (LSH + reordenação exata) devolve o mesmo top-1."""
+    index = SemanticIndex(str(tmp_path / "index"), dim=16, lsh_tables=16, lsh_bits=4)
+    index.fit(CORPUS)
+
+    for query in ("sentry traces", "réplica turso", "consultas FTS5"):
+        exact = index.search(query, k=1, exact=True)[0][0]
+        approx = index.search(query, k=1, exact=False)[0][0]
+        assert exact == approx
+
+
+def test_agent_includes_semantic_matches(tmp_path):
+    """search_relevant_context usa o índice semântico mesmo sem MCP."""
+    index = SemanticIndex(str(tmp_path / "index"), dim=16)
+    index.fit(CORPUS)
+    agent = PRPAgentWithMCPTurso(semantic_index=index)
+    agent.mcp_available = False
+
+    context = asyncio.run(agent.search_relevant_context("erros em produção", limit=2))
+
+    assert context[0]["type"] == "semantic_matches"
+    assert context[0]["data"][0]["title"] == "Sentry"
+    assert "🧭 Sentry" in agent.format_context_for_prompt(context)
+
+
+def test_agents_share_index_and_build_lsh_once(tmp_path, monkeypatch):
+    """Um índice por diretório; buscas concorrentes (to_thread) montam o LSH uma vez só."""
+    from agents.settings import settings
+
+    index_dir = str(tmp_path / "index")
+    SemanticIndex(index_dir, dim=16, lsh_tables=16, lsh_bits=4).fit(CORPUS)
+    monkeypatch.setattr(semantic_index, "_indexes", {})
+    monkeypatch.setattr(settings, "semantic_index_dir", index_dir)
+
+    first, second = PRPAgentWithMCPTurso(), PRPAgentWithMCPTurso()
+    index = first.semantic_index
+    assert index is second.semantic_index and index is not None
+
+    builds = []
+    build = index._build_buckets
+    monkeypatch.setattr(index, "_build_buckets", lambda: (builds.append(1), build()))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: index.search("sentry traces", k=1, exact=False), range(16)))
+
+    assert len(builds) == 1
+    assert all(r == results[0] for r in results)
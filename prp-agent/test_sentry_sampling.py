@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Testes da amostragem adaptativa e do corte de payloads do Sentry.
+"""
+
+import json
+import uuid
+
+import sentry_sdk
+
+from agents.sentry_sampling import AdaptiveSampler, set_payload, trim_payload
+from benchmark_sentry_overhead import run_benchmark
+
+
+def _context(path: str, parent_sampled=None):
+    return {"asgi_scope": {"path": path}, "parent_sampled": parent_sampled, "transaction_context": {}}
+
+
+def _event(path: str, status: str = "ok", duration_s: float = 0.1, trace_id: str = None):
+    return {
+        "transaction": path,
+        "contexts": {"trace": {"trace_id": trace_id or uuid.uuid4().hex, "status": status}},
+        "start_timestamp": "2026-10-19T10:00:00.000000Z",
+        "timestamp": f"2026-10-19T10:00:{duration_s:09.6f}Z",
+        "spans": [{"data": {"gen_ai.request.messages": "x" * 10000}}],
+    }
+
+
+def test_head_sampling_by_endpoint():
+    sampler = AdaptiveSampler(base_rate=0.1)
+
+    assert sampler.traces_sampler(_context("/healthz")) == 0.0
+    assert sampler.traces_sampler(_context("/ai-agent/official-standards")) == 0.25  # grava p/ decisão tail
+    assert sampler.traces_sampler(_context("/ai-agent/official", parent_sampled=False)) == 0.0
+    assert AdaptiveSampler(base_rate=0.1, record_rate=1.0).traces_sampler(_context("/ai-agent/official")) == 1.0
+
+
+def test_tail_keeps_slow_and_failed_and_samples_the_rest():
+    sampler = AdaptiveSampler(base_rate=0.1, slow_ms=2000, record_rate=1.0)
+    path = "/ai-agent/official-standards"
+
+    assert sampler.before_send_transaction(_event(path, status="internal_error"), {}) is not None
+    slow = sampler.before_send_transaction(_event(path, duration_s=3.0), {})
+    kept = sum(sampler.before_send_transaction(_event(path), {}) is not None for _ in range(4000))
+
+    assert slow is not None
+    assert json.loads(slow["spans"][0]["data"]["gen_ai.request.messages"])["truncated"] is True
+    assert 300 < kept < 500  # ~10% de 4000
+    assert sampler.stats()["kept_error"] == 1 and sampler.stats()["kept_slow"] == 1
+
+
+def test_rate_adapts_to_target_volume():
+    now = [0.0]
+    sampler = AdaptiveSampler(base_rate=0.5, target_per_second=10, window_seconds=1.0, clock=lambda: now[0])
+    for _ in range(100):  # 100 traces em 1s
+        sampler.traces_sampler(_context("/ai-agent/official"))
+    now[0] = 1.0
+    sampler.traces_sampler(_context("/ai-agent/official"))
+
+    assert sampler.observed_per_second > 100
+    assert sampler.rate_for("/ai-agent/official") < 0.05
+
+
+def test_payload_trimming_and_lazy_serialization():
+    small = [{"role": "user", "content": "oi"}]
+    large = [{"role": "user", "content": "x" * 5000}]
+
+    assert json.loads(trim_payload(small, 100)) == small
+    trimmed = json.loads(trim_payload(large, 100))
+    assert trimmed["truncated"] and trimmed["length"] > 5000 and len(trimmed["sha256"]) == 64
+
+    class Unserializable:
+        def __repr__(self):
+            raise AssertionError("não deveria serializar payload de span não amostrado")
+
+    sentry_sdk.init(dsn="https://key@example.invalid/1", traces_sample_rate=0.0)
+    try:
+        with sentry_sdk.start_transaction(name="t"), sentry_sdk.start_span(op="gen_ai.chat") as span:
+            set_payload(span, "gen_ai.request.messages", Unserializable())
+    finally:
+        sentry_sdk.init(dsn="")
+
+
+def test_overhead_benchmark_shows_less_egress():
+    results = run_benchmark(n=40, prompt_chars=20000)
+
+    assert results["off"]["transactions_sent"] == 0
+    assert results["full"]["transactions_sent"] == 40
+    assert results["adaptive"]["bytes_per_request"] < results["full"]["bytes_per_request"] / 10
+    assert results["adaptive-head"]["us_per_request"] < results["full"]["us_per_request"]
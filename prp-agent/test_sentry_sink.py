@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Testes do sink local de envelopes Sentry e orçamentos de instrumentação dos apps.
+"""
+
+import asyncio
+import itertools
+
+import httpx
+import pytest
+import sentry_sdk
+
+import main_ai_agents_custom
+import main_ai_monitoring
+import main_official_standards
+import main_sentry_official
+from agents.sentry_sink import EnvelopeStore, LocalSentrySink, SinkTransport
+
+# Orçamento por requisição com 100% dos traces (pior caso; em produção a
+# amostragem de agents/sentry_sampling.py reduz o volume):
+# app → (rota, eventos além da transação, spans por transação, bytes)
+BUDGETS = {
+    # Início/conclusão vão em resumos periódicos (agents/telemetry_queue.py)
+    main_ai_monitoring: ("/ai-agent/process", 0, 16, 24_000),
+    main_ai_agents_custom: ("/ai-agent/process", 0, 16, 34_000),
+    main_official_standards: ("/ai-agent/official-standards", 0, 16, 12_000),
+    main_sentry_official: ("/ai-agent/official", 0, 16, 12_000),
+}
+REQUESTS_PER_APP = 10
+
+
+def _no_latency(monkeypatch):
+    monkeypatch.setattr(main_ai_monitoring, "PROCESSING_LATENCY_SECONDS", 0)
+    monkeypatch.setattr(main_ai_monitoring, "TOOL_LATENCY_SECONDS", 0)
+    monkeypatch.setattr(main_ai_agents_custom, "PLANNING_LATENCY_SECONDS", 0)
+    monkeypatch.setattr(main_ai_agents_custom, "TOOL_LATENCY_RANGE", (0, 0))
+    monkeypatch.setattr(main_ai_agents_custom, "RESPONSE_LATENCY_SECONDS", 0)
+    for module in (main_official_standards, main_sentry_official):
+        monkeypatch.setattr(module, "LLM_LATENCY_SECONDS", 0)
+        monkeypatch.setattr(module, "TOOL_LATENCY_RANGE", (0, 0))
+
+
+def test_http_sink_receives_compressed_envelopes(tmp_path):
+    """Um SDK real (HttpTransport com gzip) manda ao sink local e tudo fica no SQLite."""
+    store = EnvelopeStore(str(tmp_path / "sink.db"))
+    with LocalSentrySink(store) as sink:
+        sentry_sdk.init(dsn=sink.dsn, traces_sample_rate=1.0)
+        try:
+            with sentry_sdk.start_transaction(op="test", name="/sink"):
+                with sentry_sdk.start_span(op="db", name="SELECT 1"):
+                    pass
+                sentry_sdk.capture_message("olá sink", level="info")
+            sentry_sdk.flush()
+        finally:
+            sentry_sdk.init(dsn="")
+
+    report = store.report()
+    endpoint = report["endpoints"]["/sink"]
+    assert sink.requests == report["envelopes"] == 2
+    assert endpoint["event"]["events"] == 1
+    assert endpoint["transaction"]["spans_max"] == 1
+    assert report["wire_bytes"] < report["bytes"]  # chegou comprimido
+    store.close()
+
+
+def test_report_rates_and_sizes_per_endpoint():
+    """eventos/s pela janela de recebimento; bytes/evento e spans por endpoint."""
+    clock = itertools.count(100.0, 0.5)
+    store = EnvelopeStore(":memory:", clock=lambda: next(clock))
+    sentry_sdk.init(dsn="https://key@example.invalid/1", traces_sample_rate=1.0, transport=SinkTransport(store))
+    try:
+        for name, n_spans in (("/a", 2), ("/a", 4), ("/b", 0)):
+            with sentry_sdk.start_transaction(op="http.server", name=name):
+                for i in range(n_spans):
+                    with sentry_sdk.start_span(op="db", name=f"q{i}"):
+                        pass
+        sentry_sdk.flush()
+    finally:
+        sentry_sdk.init(dsn="")
+
+    report = store.report()
+    assert report["duration_s"] == 1.0 and report["events_per_sec"] == 3.0
+    assert report["endpoints"]["/a"]["transaction"]["events"] == 2
+    assert report["endpoints"]["/a"]["transaction"]["spans_avg"] == 3
+    assert report["endpoints"]["/b"]["transaction"]["spans_max"] == 0
+    assert report["endpoints"]["/a"]["transaction"]["bytes_per_event"] > report["endpoints"]["/b"]["transaction"]["bytes_per_event"]
+
+
+@pytest.mark.parametrize("module", list(BUDGETS), ids=lambda module: module.__name__)
+def test_app_stays_within_instrumentation_budget(module, monkeypatch):
+    """Eventos, spans e bytes enviados ao Sentry por requisição não passam do orçamento."""
+    _no_latency(monkeypatch)
+    path, max_events, max_spans, max_bytes = BUDGETS[module]
+    store = EnvelopeStore(":memory:")
+    sentry_sdk.init(
+        dsn="https://key@example.invalid/1", traces_sample_rate=1.0,
+        send_default_pii=True, transport=SinkTransport(store),
+    )
+    # Breadcrumbs deixados por outros testes não entram na conta
+    for scope in (sentry_sdk.get_global_scope(), sentry_sdk.get_isolation_scope(), sentry_sdk.get_current_scope()):
+        scope.clear_breadcrumbs()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for i in range(REQUESTS_PER_APP):
+                response = await client.post(path, json={"prompt": f"Criar PRP {i}", "user_id": f"u{i}"})
+                assert response.status_code == 200
+
+    try:
+        asyncio.run(scenario())
+        sentry_sdk.flush()
+    finally:
+        sentry_sdk.init(dsn="")
+
+    report = store.report()
+    endpoint = report["endpoints"][path]
+    events = endpoint.get("event", {}).get("events", 0)
+    endpoint_bytes = sum(stats["bytes"] for stats in endpoint.values())
+
+    assert endpoint["transaction"]["events"] == REQUESTS_PER_APP
+    assert events <= max_events * REQUESTS_PER_APP
+    assert endpoint["transaction"]["spans_max"] <= max_spans
+    assert endpoint_bytes / REQUESTS_PER_APP <= max_bytes, f"{endpoint_bytes / REQUESTS_PER_APP:.0f} bytes/requisição"
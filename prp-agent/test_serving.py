@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Testes do modo de produção: estado compartilhado, /healthz e /readyz, serve.py.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import main_ai_monitoring
+from agents import serving
+from agents.serving import DrainingServer, install_serving
+from agents.session_store import SessionStore
+from benchmark_serving import free_port, start_server, stop_server
+
+
+def _write_session(db_path: str, session_id: str):
+    store = SessionStore(db_path)
+    store.start(session_id, "teste", "PRP Agent", "gpt-4", "user")
+    store.complete(session_id, 120, 2, 0.3)
+
+
+def test_sessions_are_shared_between_processes(tmp_path):
+    """Outro processo grava, este lê: WAL, pid de quem atendeu e contagem por status."""
+    db_path = str(tmp_path / "state.db")
+    store = SessionStore(db_path)
+    store.start("local", "teste", "PRP Agent", "gpt-4")
+    store.fail("local", "falhou")
+
+    child = multiprocessing.get_context("spawn").Process(target=_write_session, args=(db_path, "remota"))
+    child.start()
+    child.join(timeout=30)
+
+    session = store.get("remota")
+    assert session["status"] == "completed" and session["total_tokens"] == 120
+    assert session["worker_pid"] == child.pid != os.getpid()
+    assert store.counts("teste") == {"completed": 1, "failed": 1}
+    assert store._connection().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_readiness_follows_lifespan_and_sessions_route(monkeypatch):
+    """/readyz: 503 antes do startup, 200 rodando, 503 draining depois; sessão consultável."""
+    monkeypatch.setattr(main_ai_monitoring, "PROCESSING_LATENCY_SECONDS", 0)
+    monkeypatch.setattr(main_ai_monitoring, "TOOL_LATENCY_SECONDS", 0)
+    app = main_ai_monitoring.app
+
+    async def get(path):
+        transport = httpx.ASGITransport(app=app)  # sem lifespan
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path)
+
+    with TestClient(app) as client:  # com lifespan (startup/shutdown)
+        assert client.get("/healthz").json()["pid"] == os.getpid()
+        assert client.get("/readyz").json()["status"] == "ready"
+        session_id = client.post("/ai-agent/process", json={"prompt": "Criar PRP"}).json()["agent_session"]
+        session = client.get(f"/ai-agent/sessions/{session_id}").json()
+        assert session["status"] == "completed" and session["app"] == "ai-agent-monitoring"
+        assert client.get("/ai-agent/sessions/nao-existe").status_code == 404
+
+    draining = asyncio.run(get("/readyz"))
+    assert draining.status_code == 503 and draining.json()["status"] == "draining"
+
+
+def test_termination_signal_drains_before_the_server_stops(tmp_path, monkeypatch):
+    """SIGTERM no DrainingServer: /readyz 503 e fase "draining" enquanto a requisição em andamento termina."""
+    monkeypatch.setattr(serving, "_drain_hooks", [])
+    store = SessionStore(str(tmp_path / "state.db"))
+    app = FastAPI()
+    install_serving(app, "teste-drain", store)
+
+    @app.get("/lenta")
+    async def lenta():
+        await asyncio.sleep(1)
+        return {"ok": True}
+
+    port = free_port()
+    server = DrainingServer(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning",
+                                           timeout_graceful_shutdown=10))
+    thread = threading.Thread(target=server.run)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    assert store.worker_phase(os.getpid()) == "ready"
+
+    slow = []
+    request = threading.Thread(
+        target=lambda: slow.append(httpx.get(f"http://127.0.0.1:{port}/lenta", timeout=10))
+    )
+    request.start()
+    time.sleep(0.2)
+
+    server.handle_exit(signal.SIGTERM, None)
+
+    async def readyz():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/readyz")
+
+    draining = asyncio.run(readyz())
+    still_running = thread.is_alive()
+    request.join()
+    thread.join(timeout=15)
+
+    assert still_running and draining.status_code == 503 and draining.json()["status"] == "draining"
+    assert store.worker_phase(os.getpid()) == "draining"
+    assert slow[0].status_code == 200  # a requisição em andamento terminou
+
+
+def test_stale_worker_rows_do_not_count_as_ready(tmp_path):
+    """Pid reaproveitado: o "ready" de um worker antigo não libera o reload."""
+    clock = iter([100.0, 200.0])
+    store = SessionStore(str(tmp_path / "state.db"), clock=lambda: next(clock))
+    store.set_worker_phase("teste", "ready")  # worker antigo, mesmo pid
+    assert store.worker_phase(os.getpid(), since=150.0) is None
+    store.set_worker_phase("teste", "ready")
+    assert store.worker_phase(os.getpid(), since=150.0) == "ready"
+    store.forget_worker(os.getpid())
+    assert store.worker_phase(os.getpid()) is None
+
+
+
+def test_session_writes_do_not_block_the_event_loop(tmp_path):
+    """Com o banco travado por outro worker, a escrita espera em uma thread, não no loop."""
+    import sqlite3
+
+    db_path = str(tmp_path / "state.db")
+    store = SessionStore(db_path)
+    store.ping()
+    locker = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    locker.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.3, locker.execute, args=("COMMIT",)).start()
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await store.start_async("travada", "teste", "PRP Agent", "gpt-4")
+        task.cancel()
+        return ticks
+
+    ticks = asyncio.run(scenario())
+    locker.close()
+
+    assert ticks >= 10  # o loop seguiu rodando durante os ~0.3 s de espera
+    assert store.get("travada")["status"] == "processing"
+
+
+def test_finished_sessions_are_pruned_after_retention(tmp_path):
+    """Sessões encerradas saem depois da retenção; as em andamento ficam."""
+    now = [1000.0]
+    store = SessionStore(str(tmp_path / "state.db"), clock=lambda: now[0],
+                         retention_seconds=3600, prune_interval=60)
+    store.start("antiga", "teste", "PRP Agent", "gpt-4")
+    store.complete("antiga", 10, 0, 0.1)
+    store.start("falhou", "teste", "PRP Agent", "gpt-4")
+    store.fail("falhou", "erro")
+    store.start("longa", "teste", "PRP Agent", "gpt-4")
+
+    now[0] += 3601
+    store.start("nova", "teste", "PRP Agent", "gpt-4")
+    store.complete("nova", 10, 0, 0.1)
+
+    assert store.get("antiga") is None and store.get("falhou") is None
+    assert store.get("longa")["status"] == "processing"
+    assert store.get("nova")["status"] == "completed"
+
+def test_serve_shares_state_across_workers_and_reloads_without_errors(tmp_path):
+    """serve.py com 2 workers: sessão visível em ambos e SIGHUP sem requisições perdidas."""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    server = start_server("main_ai_monitoring:app", 2, port, str(tmp_path / "state.db"), latency_scale=0.1)
+    try:
+        session_id = httpx.post(f"{url}/ai-agent/process", json={"prompt": "Criar PRP"}, timeout=10).json()[
+            "agent_session"]
+        # O kernel distribui as conexões: insistir até as leituras passarem pelos dois workers
+        readers = set()
+        for _ in range(200):
+            with httpx.Client(base_url=url, timeout=5) as client:
+                assert client.get(f"/ai-agent/sessions/{session_id}").status_code == 200
+                readers.add(client.get("/healthz").json()["pid"])
+            if len(readers) == 2:
+                break
+        old_pids = readers
+
+        # Reload rolante enquanto uma thread mantém requisições em andamento
+        statuses = []
+        stop = threading.Event()
+
+        def load():
+            with httpx.Client(base_url=url, timeout=30) as client:
+                while not stop.is_set():
+                    try:
+                        statuses.append(client.post("/ai-agent/process", json={"prompt": "Reload"},
+                                                    headers={"X-No-Coalesce": "1"}).status_code)
+                    except httpx.HTTPError as e:
+                        statuses.append(repr(e))
+
+        loader = threading.Thread(target=load)
+        loader.start()
+        os.kill(server.pid, signal.SIGHUP)
+        deadline = time.monotonic() + 90
+        new_pids = set()
+        while time.monotonic() < deadline and (len(new_pids) < 2 or new_pids & old_pids):
+            new_pids = {httpx.get(f"{url}/healthz", timeout=5).json()["pid"] for _ in range(10)}
+            time.sleep(0.2)
+        stop.set()
+        loader.join()
+    finally:
+        stop_server(server)
+
+    assert len(old_pids) == 2  # as leituras caíram nos dois workers
+    assert not new_pids & old_pids
+    assert statuses and set(statuses) == {200}
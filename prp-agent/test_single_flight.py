@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Testes da coalescência de requisições idênticas (agents/single_flight.py).
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import main_ai_monitoring
+import main_official_standards
+from agents.single_flight import COALESCED_REQUESTS, SingleFlight
+
+
+def test_concurrent_duplicates_share_one_execution():
+    """Chamadas iguais concorrentes executam uma vez; chaves diferentes não se misturam."""
+    flight = SingleFlight("teste-dup")
+    calls = []
+
+    async def compute(key):
+        calls.append(key)
+        await asyncio.sleep(0.05)
+        return f"resultado {key}"
+
+    async def scenario():
+        return await asyncio.gather(
+            *(flight.run("a", lambda: compute("a")) for _ in range(5)),
+            flight.run("b", lambda: compute("b")),
+        )
+
+    results = asyncio.run(scenario())
+
+    assert sorted(calls) == ["a", "b"]
+    assert [result for result, _ in results] == ["resultado a"] * 5 + ["resultado b"]
+    assert [shared for _, shared in results] == [False, True, True, True, True, False]
+    assert flight.in_flight == 0  # não é cache
+    assert COALESCED_REQUESTS.labels("teste-dup", "follower").get() == 4
+
+
+def test_errors_propagate_and_abandoned_work_is_cancelled():
+    """Exceção do líder chega a todos; se todos desistem, a execução é cancelada."""
+    flight = SingleFlight("teste-cancel")
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("falhou")
+
+    async def scenario():
+        results = await asyncio.gather(
+            flight.run("x", failing), flight.run("x", failing), return_exceptions=True
+        )
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+        reported = []
+        await asyncio.gather(*(flight.run("z", failing, on_error=reported.append) for _ in range(3)),
+                             return_exceptions=True)
+        assert len(reported) == 1  # uma falha, um evento (não um por requisição)
+
+        state = {"cancelled": False}
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                state["cancelled"] = True
+                raise
+
+        leader = asyncio.ensure_future(flight.run("y", slow))
+        follower = asyncio.ensure_future(flight.run("y", slow))
+        await asyncio.sleep(0.01)
+        follower.cancel()  # uma desistência não derruba a outra
+        await asyncio.sleep(0.01)
+        assert not state["cancelled"] and not leader.done()
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        await asyncio.sleep(0)
+        return state["cancelled"]
+
+    assert asyncio.run(scenario()) is True
+    assert flight.in_flight == 0
+
+
+def test_endpoint_coalesces_unless_opted_out(monkeypatch):
+    """Rajada idêntica no endpoint: um pipeline só; com X-No-Coalesce cada uma executa."""
+    monkeypatch.setattr(main_official_standards, "LLM_LATENCY_SECONDS", 0.05)
+    monkeypatch.setattr(main_official_standards, "TOOL_LATENCY_RANGE", (0, 0))
+    body = {"prompt": "Criar PRP de autenticação", "model": "gpt-4o-mini", "temperature": 0.1}
+
+    async def burst(headers):
+        transport = httpx.ASGITransport(app=main_official_standards.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post("/ai-agent/official-standards", json=body, headers=headers) for _ in range(6)
+            ))
+
+    coalesced = asyncio.run(burst({}))
+    opted_out = asyncio.run(burst({"X-No-Coalesce": "1"}))
+
+    assert all(response.status_code == 200 for response in coalesced + opted_out)
+    assert sorted(response.headers["X-Coalesced"] for response in coalesced) == ["false"] + ["true"] * 5
+    assert len({response.json()["agent_session"] for response in coalesced}) == 1
+    assert {response.headers["X-Coalesced"] for response in opted_out} == {"false"}
+    assert len({response.json()["agent_session"] for response in opted_out}) == 6
+
+    async def per_user():
+        transport = httpx.ASGITransport(app=main_official_standards.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post("/ai-agent/official-standards", json={**body, "user_id": f"user_{i}"})
+                for i in range(3)
+            ))
+
+    users = asyncio.run(per_user())
+    # Cada usuário tem a própria sessão: mesmo prompt de usuários diferentes não coalesce
+    assert {response.headers["X-Coalesced"] for response in users} == {"false"}
+    assert len({response.json()["agent_session"] for response in users}) == 3
+
+
+def test_monitoring_endpoint_does_not_share_runs_between_users(monkeypatch):
+    """/ai-agent/process: mesmo prompt de usuários diferentes, uma sessão por usuário."""
+    monkeypatch.setattr(main_ai_monitoring, "PROCESSING_LATENCY_SECONDS", 0.1)
+    monkeypatch.setattr(main_ai_monitoring, "TOOL_LATENCY_SECONDS", 0)
+
+    async def burst():
+        transport = httpx.ASGITransport(app=main_ai_monitoring.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post("/ai-agent/process", json={"prompt": "Criar PRP", "user_id": user})
+                for user in ("ana", "bruno", "ana")
+            ))
+
+    responses = asyncio.run(burst())
+    sessions = [response.json()["agent_session"] for response in responses]
+    assert [response.headers["X-Coalesced"] for response in responses] == ["false", "false", "true"]
+    assert sessions[0] == sessions[2] != sessions[1]
+    assert main_ai_monitoring.SESSIONS.get(sessions[1])["user_id"] == "bruno"
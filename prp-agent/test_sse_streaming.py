@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Testes dos endpoints SSE dos agentes (agents/sse.py).
+"""
+
+import asyncio
+import random
+import time
+
+import pytest
+
+import main_ai_agents_custom
+import main_ai_monitoring
+import main_sentry_official
+from benchmark_streaming_ttfb import drive_asgi, measure, sse_events
+
+BODY = {"prompt": "Criar PRP de autenticação JWT"}
+
+
+@pytest.mark.parametrize("module,path", [
+    (main_sentry_official, "/ai-agent/official/stream"),
+    (main_ai_agents_custom, "/ai-agent/process/stream"),
+    (main_ai_monitoring, "/ai-agent/process/stream"),
+])
+def test_stream_events_in_order_and_done_matches_response(module, path, monkeypatch):
+    """start primeiro, ferramentas pareadas, deltas formam o texto, usage e done no fim."""
+    monkeypatch.setattr(random, "choice", lambda seq: True)  # official: sempre usa ferramentas
+    messages = asyncio.run(drive_asgi(module.app, path, BODY))
+    events = sse_events(messages)
+    names = [event for _, event, _ in events]
+
+    assert names[0] == "start"
+    assert names[-2:] == ["usage", "done"]
+    assert names.count("tool_start") == names.count("tool_end") >= 1
+    assert names.index("tool_end") < names.index("delta")
+
+    done = events[-1][2]
+    text = "".join(data["text"] for _, event, data in events if event == "delta")
+    assert text == done["result"]
+    assert events[0][2]["session_id"] == done.get("agent_session", done.get("metadata", {}).get("session_id"))
+    # O primeiro evento sai antes das ferramentas e do modelo
+    assert events[0][0] < events[-1][0] / 5
+
+
+def test_stream_ttfb_is_much_lower_than_buffered(monkeypatch):
+    """Mesma latência total; o primeiro byte do /stream chega logo, o do buffered só no fim."""
+    monkeypatch.setattr(main_sentry_official, "TOOL_LATENCY_RANGE", (0.05, 0.05))
+    monkeypatch.setattr(random, "choice", lambda seq: True)
+
+    buffered = measure(main_sentry_official.app, "/ai-agent/official", BODY)
+    stream = measure(main_sentry_official.app, "/ai-agent/official/stream", BODY)
+
+    assert buffered["ttfb"] >= main_sentry_official.LLM_LATENCY_SECONDS
+    assert stream["ttfb"] < buffered["ttfb"] / 10
+    assert stream["first_delta"] < stream["total"]
+    assert stream["total"] == pytest.approx(buffered["total"], abs=0.15)
+
+
+def test_client_disconnect_cancels_pipeline(monkeypatch):
+    """Cliente que desconecta após o primeiro evento: ferramentas param e nada conclui."""
+    monkeypatch.setattr(main_ai_monitoring, "PROCESSING_LATENCY_SECONDS", 0.1)
+    monkeypatch.setattr(main_ai_monitoring, "TOOL_LATENCY_SECONDS", 0.2)
+    completed = []
+
+    async def monitor_complete(*args):
+        completed.append(args)
+
+    monkeypatch.setattr(main_ai_monitoring, "monitor_ai_agent_complete", monitor_complete)
+
+    async def scenario():
+        start = time.perf_counter()
+        messages = await drive_asgi(main_ai_monitoring.app, "/ai-agent/process/stream", BODY, disconnect_after=1)
+        elapsed = time.perf_counter() - start
+        await asyncio.sleep(1.2)  # tempo de sobra para o pipeline terminar se não fosse cancelado
+        return messages, elapsed
+
+    messages, elapsed = asyncio.run(scenario())
+
+    assert [event for _, event, _ in sse_events(messages)] == ["start"]
+    assert elapsed < 0.3
+    assert completed == []
+
+    asyncio.run(drive_asgi(main_ai_monitoring.app, "/ai-agent/process/stream", BODY))
+    assert len(completed) == 1
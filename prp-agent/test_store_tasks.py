@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Testes da gravação em lote das tarefas de PRP (RealPRPMCPIntegration.store_tasks).
+"""
+
+import asyncio
+
+import pytest
+
+from benchmark_store_tasks import SQLiteMCPStandIn, sample_tasks, seed_prp
+from real_mcp_integration import MAX_TASKS_PER_INSERT, RealPRPMCPIntegration, returned_ids
+
+
+def _integration():
+    stand_in = SQLiteMCPStandIn()
+    seed_prp(stand_in)
+    return stand_in, RealPRPMCPIntegration(tool_caller=stand_in)
+
+
+def test_store_tasks_uses_single_round_trip():
+    """Um PRP com 40 tarefas é gravado em uma única requisição, com os ids em ordem."""
+    stand_in, integration = _integration()
+
+    task_ids = asyncio.run(integration.store_tasks(1, sample_tasks(40)))
+
+    assert stand_in.round_trips == 1
+    rows = stand_in.conn.execute("SELECT id, task_name, context_files FROM prp_tasks ORDER BY id").fetchall()
+    assert task_ids == [row[0] for row in rows]
+    assert rows[39][1:] == ("Tarefa 39", '["src/modulo_39.py"]')
+
+
+def test_store_tasks_chunks_large_batches():
+    """Lotes maiores que MAX_TASKS_PER_INSERT viram poucos INSERTs, enviados em um só execute_batch."""
+    stand_in, integration = _integration()
+    n_tasks = MAX_TASKS_PER_INSERT * 2 + 5
+
+    task_ids = asyncio.run(integration.store_tasks(1, sample_tasks(n_tasks)))
+
+    assert stand_in.round_trips == 1
+    assert len(set(task_ids)) == n_tasks
+    assert task_ids == [row[0] for row in stand_in.conn.execute("SELECT id FROM prp_tasks ORDER BY id")]
+    assert asyncio.run(integration.store_tasks(1, [])) == []
+    assert stand_in.round_trips == 1
+
+
+def test_returned_ids_do_not_trust_row_order_or_contiguity():
+    """RETURNING fora de ordem é ordenado; sem as linhas, só INSERT de uma linha usa lastInsertId."""
+    assert returned_ids({"rows": [{"id": 12}, {"id": 10}, [11]]}, 3) == [10, 11, 12]
+    assert returned_ids({"rows": [], "lastInsertId": 7}, 1) == [7]
+    with pytest.raises(RuntimeError):
+        returned_ids({"rows": [], "lastInsertId": 7}, 3)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Testes da fila de telemetria em background (agents/telemetry_queue.py).
+"""
+
+import time
+
+import sentry_sdk
+
+import main_ai_monitoring
+from agents import telemetry_queue
+from agents.telemetry_queue import TELEMETRY_EVENTS, TelemetryQueue
+from benchmark_telemetry import run_benchmark
+
+
+class _Captured:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, message, **kwargs):
+        self.calls.append((message, kwargs))
+
+
+def test_flush_sends_one_aggregated_summary():
+    """Vários eventos viram um capture com contagem e sum/avg/max por (tipo, chave)."""
+    captured = _Captured()
+    queue = TelemetryQueue("teste-resumo", flush_interval=60, capture=captured)
+    for tokens, seconds in ((100, 0.5), (300, 1.5)):
+        queue.record("agent_complete", key="gpt-4", total_tokens=tokens, processing_time=seconds, status="ok")
+    queue.record("tool", key="prp_parser", tokens_used=40)
+
+    assert captured.calls == []  # o caminho da requisição só enfileira
+    summary = queue.flush()
+    queue.close()
+
+    assert len(captured.calls) == 1
+    message, kwargs = captured.calls[0]
+    assert message.startswith("AI Agent telemetry (teste-resumo): 3 eventos")
+    assert kwargs["contexts"]["telemetry_summary"] == summary
+    assert summary["agent_complete/gpt-4"]["count"] == 2
+    assert summary["agent_complete/gpt-4"]["total_tokens"] == {"sum": 400, "max": 300, "avg": 200.0}
+    assert summary["agent_complete/gpt-4"]["processing_time"]["avg"] == 1.0
+    assert "status" not in summary["agent_complete/gpt-4"]
+    assert summary["tool/prp_parser"] == {"count": 1, "tokens_used": {"sum": 40, "max": 40, "avg": 40.0}}
+    assert queue.flush() is None and len(captured.calls) == 1
+
+
+def test_background_flush_bounded_queue_and_inline_mode():
+    """Thread envia por intervalo; fila cheia descarta e conta; inline captura cada evento."""
+    captured = _Captured()
+    queue = TelemetryQueue("teste-thread", flush_interval=0.05, max_pending=3, capture=captured)
+    for _ in range(5):
+        queue.record("tool", key="x", tokens_used=1)
+    deadline = time.monotonic() + 5
+    while not captured.calls and time.monotonic() < deadline:
+        time.sleep(0.01)
+    queue.close()
+
+    assert captured.calls[0][1]["contexts"]["telemetry_summary"]["tool/x"]["count"] == 3
+    assert TELEMETRY_EVENTS.labels("teste-thread", "dropped").get() == 2
+    assert TELEMETRY_EVENTS.labels("teste-thread", "flushed").get() == 3
+
+    inline = _Captured()
+    queue = TelemetryQueue("teste-inline", capture=inline)
+    telemetry_queue.configure("inline")
+    try:
+        queue.record("agent_start", key="gpt-4", prompt_length=12)
+    finally:
+        telemetry_queue.configure("queue")
+    assert queue.pending == 0
+    assert inline.calls[0][1]["contexts"]["telemetry_event"] == {"key": "gpt-4", "prompt_length": 12}
+
+
+def test_queue_removes_capture_cost_from_requests():
+    """Benchmark com SDK real: fila manda 1 resumo e a requisição fica mais barata que inline."""
+    try:
+        results = run_benchmark(requests=20, ops=20)
+    finally:
+        sentry_sdk.init(dsn="")
+
+    # Um resumo no fim (mais um se o intervalo da thread venceu durante a rodada)
+    assert 1 <= results["queue"]["events"] <= 2
+    assert results["inline"]["events"] >= 20
+    assert results["queue"]["record_us"] < results["inline"]["record_us"] / 10
+    assert results["queue"]["request_ms_mean"] < results["inline"]["request_ms_mean"]
+    assert main_ai_monitoring.TELEMETRY.pending == 0
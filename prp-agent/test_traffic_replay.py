@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Testes da gravação/replay de tráfego do agente PRP (agents/traffic_replay.py).
+"""
+
+import asyncio
+import json
+import time
+
+from agents.agent import chat_with_prp_agent
+from agents.dependencies import PRPAgentDependencies
+from agents.traffic_replay import load_sessions, traffic_session
+from benchmark_prp_replay import create_database, find_report, record_traffic, run_replay, save_report
+
+
+def _record(tmp_path, message="Criar PRP de login") -> str:
+    path = str(tmp_path / "traffic.jsonl")
+    asyncio.run(record_traffic([message], path, create_database(str(tmp_path / "record.db"))))
+    return path
+
+
+def test_record_mode_captures_model_and_tool_calls(tmp_path):
+    """Uma sessão por chamada: requisição/resposta do modelo, ferramentas com argumentos, saída."""
+    path = _record(tmp_path)
+    (session,) = load_sessions(path)
+
+    models = [step for step in session["steps"] if step["type"] == "model"]
+    tools = [step for step in session["steps"] if step["type"] == "tool"]
+    assert session["entry"] == "chat_with_prp_agent" and session["input"] == "Criar PRP de login"
+    assert len(models) == 2 and models[0]["request"]["kind"] == "request"
+    assert models[0]["response"]["parts"][0]["part_kind"] == "tool-call"
+    assert {tool["name"] for tool in tools} == {
+        "create_prp", "search_prps", "analyze_prp_with_llm", "get_prp_details", "update_prp_status"}
+    assert all("ctx" not in tool["args"] and tool["latency_s"] >= 0 for tool in tools)
+    assert session["output"] and session["error"] is None and session["latency_s"] > 0
+
+    # Sem destino configurado: nada gravado; sessões aninhadas vão para a de fora
+    deps = PRPAgentDependencies(database_path=str(tmp_path / "record.db"))
+    asyncio.run(chat_with_prp_agent("Fora da gravação", deps, use_test_model=True))
+    assert len(load_sessions(path)) == 1
+
+    outer = []
+
+    async def mcp_chat():
+        with traffic_session("mcp:prp_chat", {"message": "oi"}, sink=outer.append):
+            return await chat_with_prp_agent("oi", deps, use_test_model=True)
+
+    asyncio.run(mcp_chat())
+    assert [session["entry"] for session in outer] == ["mcp:prp_chat"]
+    assert any(step["type"] == "tool" for step in outer[0]["steps"])
+
+
+def test_replay_uses_recorded_responses_and_pace(tmp_path):
+    """FunctionModel com as respostas gravadas: mesmas ferramentas e saída; latência gravada x escala."""
+    path = _record(tmp_path)
+    (session,) = load_sessions(path)
+    session["steps"][0]["latency_s"] = 0.3  # modelo "lento" na gravação
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(session) + "\n")
+
+    original = run_replay(path, time_scale=1.0, build="b1")
+    accelerated = run_replay(path, time_scale=0.1, build="b1")
+
+    assert original["divergent"] == {"tools": 0, "output": 0} == accelerated["divergent"]
+    assert original["replayed"]["end_to_end"]["p50_ms"] >= 300
+    assert accelerated["replayed"]["end_to_end"]["p50_ms"] < 300
+    assert set(original["replayed"]["tools"]) == set(original["recorded"]["tools"])
+    assert original["replayed"]["tools"]["search_prps"]["count"] == 1
+
+    reports = str(tmp_path / "reports.jsonl")
+    save_report(original, reports)
+    save_report(accelerated, reports)
+    assert find_report(reports, "b1", 0.1) == accelerated
+    assert find_report(reports, "outro", 1.0) is None
+
+
+def test_replay_reports_divergence_without_failing(tmp_path):
+    """Gravação sem a resposta final: o agente diverge, o replay segue e conta a divergência."""
+    path = _record(tmp_path)
+    (session,) = load_sessions(path)
+    session["steps"] = [step for step in session["steps"] if step["type"] == "model"][:1]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(session) + "\n")
+
+    start = time.perf_counter()
+    report = run_replay(path, time_scale=0, build="b2")
+    assert time.perf_counter() - start < 5
+    assert report["replayed"]["sessions"] == 1
+    assert report["divergent"]["output"] == 1
+    assert report["divergent"]["tools"] == 1  # a gravação editada não tem ferramentas
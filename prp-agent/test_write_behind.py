@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Testes da persistência write-behind das conversas.
+"""
+
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from agents.agent_with_mcp_turso import PRPAgentWithMCPTurso
+from agents.write_behind import ConversationRecord, PartialBatchError, WriteBehindQueue
+from benchmark_context_retrieval import seed_corpus
+
+
+def _record(i: int) -> ConversationRecord:
+    return ConversationRecord(session_id="s1", message=f"pergunta {i}", response=f"resposta {i}")
+
+
+def test_enqueue_acks_immediately_and_batches():
+    """A confirmação não espera o sink lento; os registros saem em poucos lotes."""
+    written = []
+
+    def slow_sink(batch):
+        time.sleep(0.1)
+        written.extend(batch)
+
+    wb_queue = WriteBehindQueue(slow_sink, flush_interval=0.05, max_batch=100).start()
+    start = time.perf_counter()
+    for i in range(50):
+        assert wb_queue.enqueue(_record(i))
+    ack_ms = (time.perf_counter() - start) * 1000
+
+    assert wb_queue.flush(timeout=5)
+    wb_queue.close()
+
+    stats = wb_queue.stats()
+    assert ack_ms < 50
+    assert len(written) == stats["written"] == 50
+    assert stats["depth"] == 0
+    assert stats["batches"] <= 3
+    assert stats["flush_latency"]["count"] == stats["batches"]
+
+
+def test_failed_batch_is_spilled_and_replayed(tmp_path):
+    """Lote com falha vai para o spill e é regravado no próximo start."""
+    spill_path = str(tmp_path / "spill.jsonl")
+
+    def broken_sink(batch):
+        raise RuntimeError("banco fora do ar")
+
+    failing = WriteBehindQueue(broken_sink, flush_interval=0.01, spill_path=spill_path).start()
+    failing.enqueue(_record(1))
+    failing.enqueue(_record(2))
+    assert failing.flush(timeout=5)
+    failing.close()
+    assert failing.stats()["spilled"] == 2
+
+    written = []
+    recovered = WriteBehindQueue(written.extend, flush_interval=0.01, spill_path=spill_path).start()
+    assert recovered.flush(timeout=5)
+    recovered.close()
+
+    assert [r.message for r in written] == ["pergunta 1", "pergunta 2"]
+
+
+def test_partial_failure_retries_only_failed_records(tmp_path):
+    """Sink registro a registro: as gravadas não se repetem; a que sempre falha vai para o spill."""
+    spill_path = str(tmp_path / "spill.jsonl")
+    written, calls = [], []
+
+    def flaky_sink(batch):
+        calls.append([r.message for r in batch])
+        failed = [r for r in batch if (r.message == "pergunta 2" and r.attempts == 0) or r.message == "pergunta 3"]
+        written.extend(r for r in batch if r not in failed)
+        if failed:
+            raise PartialBatchError(failed, len(batch))
+
+    wb_queue = WriteBehindQueue(flaky_sink, flush_interval=0.01, spill_path=spill_path, max_attempts=3).start()
+    for i in (1, 2, 3):
+        wb_queue.enqueue(_record(i))
+    assert wb_queue.flush(timeout=5)
+    wb_queue.close()
+
+    assert sorted(r.message for r in written) == ["pergunta 1", "pergunta 2"]
+    assert sum(batch.count("pergunta 1") for batch in calls) == 1
+    assert sum(batch.count("pergunta 3") for batch in calls) == 3
+    assert wb_queue.stats()["spilled"] == 1 and wb_queue.stats()["written"] == 2
+
+
+def test_mcp_sink_uses_each_record_session(monkeypatch):
+    """Fila compartilhada do agent_with_mcp grava a sessão do registro, não a do primeiro agente."""
+    import agent_with_mcp
+
+    saved = []
+    monkeypatch.setattr(agent_with_mcp, "save_conversation_to_mcp",
+                        lambda database, session_id, *args: saved.append(session_id) or session_id != "s2")
+    sink = agent_with_mcp.mcp_conversation_sink("context-memory")
+    records = [ConversationRecord(session_id=s, message="m", response="r") for s in ("s1", "s2")]
+    with pytest.raises(PartialBatchError) as failure:
+        sink(records)
+    assert [r.session_id for r in failure.value.failed] == ["s2"]
+    assert saved == ["s1", "s2"]
+
+
+def test_close_flushes_pending_records():
+    """No encerramento a fila é descarregada mesmo com intervalo longo."""
+    written = []
+    wb_queue = WriteBehindQueue(written.extend, flush_interval=30).start()
+    wb_queue.enqueue(_record(1))
+
+    wb_queue.close()
+
+    assert len(written) == 1
+
+
+def test_agent_persists_conversations_in_sqlite(tmp_path):
+    """O agente enfileira e a thread grava em `conversations` (com FTS atualizado)."""
+    db_path = str(tmp_path / "context.db")
+    seed_corpus(db_path, n_docs=5, n_conversations=0, n_prps=0)
+    agent = PRPAgentWithMCPTurso(database_path=db_path, write_behind=True)
+
+    for i in range(3):
+        asyncio.run(agent.persist_conversation(f"Como usar zebraquery {i}?", "Assim", session_id="s-test"))
+    assert agent.write_queue.flush(timeout=5)
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT session_id FROM conversations").fetchall()
+    matches = conn.execute("SELECT count(*) FROM conversations_fts WHERE conversations_fts MATCH 'zebraquery'").fetchone()
+    conn.close()
+    assert rows == [("s-test",)] * 3
+    assert matches == (3,)
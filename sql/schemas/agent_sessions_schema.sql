@@ -0,0 +1,41 @@
+-- Schema das Sessões dos Agentes (estado compartilhado entre workers)
+-- Data: 19/10/2026
+-- Objetivo: Guardar as sessões dos apps FastAPI em SQLite (WAL) em vez de na
+--           memória de cada processo, para que qualquer worker do serve.py
+--           responda sobre qualquer sessão (agents/session_store.py).
+
+-- =====================================================
+-- SESSÕES
+-- =====================================================
+CREATE TABLE IF NOT EXISTS agent_sessions (
+    session_id TEXT PRIMARY KEY,
+    app TEXT NOT NULL,                -- app FastAPI (ex.: ai-agent-monitoring)
+    agent TEXT NOT NULL,
+    model TEXT NOT NULL,
+    user_id TEXT,
+    status TEXT NOT NULL DEFAULT 'processing',  -- processing, completed, failed
+    worker_pid INTEGER NOT NULL,      -- processo que atendeu a requisição
+    total_tokens INTEGER,
+    tools_count INTEGER,
+    processing_time REAL,             -- segundos
+    error TEXT,
+    started_at REAL NOT NULL,         -- epoch (s)
+    finished_at REAL
+);
+
+-- =====================================================
+-- WORKERS (fase de cada processo, para o reload rolante)
+-- =====================================================
+CREATE TABLE IF NOT EXISTS agent_workers (
+    pid INTEGER PRIMARY KEY,
+    app TEXT NOT NULL,
+    phase TEXT NOT NULL,              -- ready, draining
+    updated_at REAL NOT NULL
+);
+
+-- =====================================================
+-- ÍNDICES
+-- =====================================================
+CREATE INDEX IF NOT EXISTS idx_agent_sessions_app_status ON agent_sessions(app, status);
+CREATE INDEX IF NOT EXISTS idx_agent_sessions_started_at ON agent_sessions(started_at);
+CREATE INDEX IF NOT EXISTS idx_agent_sessions_finished_at ON agent_sessions(finished_at);  -- retenção
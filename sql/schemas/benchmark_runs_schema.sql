@@ -0,0 +1,35 @@
+-- Schema de Execuções de Benchmark dos Agentes PRP
+-- Data: 19/10/2026
+-- Objetivo: Guardar o resultado de cada execução do benchmark_engine.py
+--           (throughput, percentis de latência, tokens/s) para comparar
+--           uma execução com a anterior do mesmo app + workload.
+
+-- =====================================================
+-- EXECUÇÕES
+-- =====================================================
+CREATE TABLE IF NOT EXISTS benchmark_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    app TEXT NOT NULL,                -- ex: main_official_standards
+    workload TEXT NOT NULL,           -- nome do workload (ver WORKLOADS)
+    mode TEXT NOT NULL,               -- closed (concorrência fixa) ou open (taxa de chegada)
+    requests INTEGER NOT NULL,
+    concurrency INTEGER NOT NULL,
+    arrival_rate REAL,                -- req/s, só no modo open
+    errors INTEGER NOT NULL DEFAULT 0,
+    duration_s REAL NOT NULL,
+    throughput_rps REAL NOT NULL,
+    mean_ms REAL NOT NULL,
+    p50_ms REAL NOT NULL,
+    p95_ms REAL NOT NULL,
+    p99_ms REAL NOT NULL,
+    max_ms REAL NOT NULL,
+    total_tokens INTEGER NOT NULL DEFAULT 0,
+    tokens_per_sec REAL NOT NULL DEFAULT 0,
+    label TEXT,                       -- ex: commit/build da execução
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- =====================================================
+-- ÍNDICES
+-- =====================================================
+CREATE INDEX IF NOT EXISTS idx_benchmark_runs_app_workload ON benchmark_runs(app, workload, id);
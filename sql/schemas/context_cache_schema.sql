@@ -0,0 +1,60 @@
+-- Schema de Contadores de Mudança para o Cache de Contexto do Agente PRP
+-- Data: 19/10/2026
+-- Objetivo: Versão por tabela, incrementada por triggers a cada escrita, para
+--           invalidar o cache de busca de contexto (agents/retrieval_cache.py)
+
+-- =====================================================
+-- CONTADORES DE MUDANÇA
+-- =====================================================
+CREATE TABLE IF NOT EXISTS table_change_counters (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO table_change_counters (table_name, version) VALUES
+    ('docs', 0),
+    ('conversations', 0),
+    ('prps', 0);
+
+-- =====================================================
+-- TRIGGERS
+-- =====================================================
+
+-- docs
+CREATE TRIGGER IF NOT EXISTS trigger_docs_counter_insert AFTER INSERT ON docs BEGIN
+    UPDATE table_change_counters SET version = version + 1 WHERE table_name = 'docs';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_docs_counter_update AFTER UPDATE ON docs BEGIN
+    UPDATE table_change_counters SET version = version + 1 WHERE table_name = 'docs';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_docs_counter_delete AFTER DELETE ON docs BEGIN
+    UPDATE table_change_counters SET version = version + 1 WHERE table_name = 'docs';
+END;
+
+-- conversations
+CREATE TRIGGER IF NOT EXISTS trigger_conversations_counter_insert AFTER INSERT ON conversations BEGIN
+    UPDATE table_change_counters SET version = version + 1 WHERE table_name = 'conversations';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_conversations_counter_update AFTER UPDATE ON conversations BEGIN
+    UPDATE table_change_counters SET version = version + 1 WHERE table_name = 'conversations';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_conversations_counter_delete AFTER DELETE ON conversations BEGIN
+    UPDATE table_change_counters SET version = version + 1 WHERE table_name = 'conversations';
+END;
+
+-- prps
+CREATE TRIGGER IF NOT EXISTS trigger_prps_counter_insert AFTER INSERT ON prps BEGIN
+    UPDATE table_change_counters SET version = version + 1 WHERE table_name = 'prps';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_prps_counter_update AFTER UPDATE ON prps BEGIN
+    UPDATE table_change_counters SET version = version + 1 WHERE table_name = 'prps';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_prps_counter_delete AFTER DELETE ON prps BEGIN
+    UPDATE table_change_counters SET version = version + 1 WHERE table_name = 'prps';
+END;
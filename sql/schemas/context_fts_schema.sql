@@ -0,0 +1,104 @@
+-- Schema de Busca Full-Text para Contexto do Agente PRP
+-- Data: 19/10/2026
+-- Objetivo: Índices FTS5 para a busca de contexto (docs, conversas, PRPs)
+--           sem LIKE '%...%' e sem full scan
+
+-- =====================================================
+-- TABELA DE CONVERSAS (criada pelo MCP Turso, garantida aqui)
+-- =====================================================
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    user_id TEXT,
+    message TEXT NOT NULL,
+    response TEXT,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    context TEXT,
+    metadata TEXT
+);
+
+-- =====================================================
+-- ÍNDICES FTS5 (external content - não duplica o texto)
+-- =====================================================
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+    title, summary, content, keywords,
+    content='docs', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(
+    message, response,
+    content='conversations', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS prps_fts USING fts5(
+    title, description, objective,
+    content='prps', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+-- =====================================================
+-- TRIGGERS PARA MANTER OS ÍNDICES SINCRONIZADOS
+-- =====================================================
+
+-- docs
+CREATE TRIGGER IF NOT EXISTS trigger_docs_fts_insert AFTER INSERT ON docs BEGIN
+    INSERT INTO docs_fts(rowid, title, summary, content, keywords)
+    VALUES (NEW.id, NEW.title, NEW.summary, NEW.content, NEW.keywords);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_docs_fts_delete AFTER DELETE ON docs BEGIN
+    INSERT INTO docs_fts(docs_fts, rowid, title, summary, content, keywords)
+    VALUES ('delete', OLD.id, OLD.title, OLD.summary, OLD.content, OLD.keywords);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_docs_fts_update AFTER UPDATE OF title, summary, content, keywords ON docs BEGIN
+    INSERT INTO docs_fts(docs_fts, rowid, title, summary, content, keywords)
+    VALUES ('delete', OLD.id, OLD.title, OLD.summary, OLD.content, OLD.keywords);
+    INSERT INTO docs_fts(rowid, title, summary, content, keywords)
+    VALUES (NEW.id, NEW.title, NEW.summary, NEW.content, NEW.keywords);
+END;
+
+-- conversations
+CREATE TRIGGER IF NOT EXISTS trigger_conversations_fts_insert AFTER INSERT ON conversations BEGIN
+    INSERT INTO conversations_fts(rowid, message, response)
+    VALUES (NEW.id, NEW.message, NEW.response);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_conversations_fts_delete AFTER DELETE ON conversations BEGIN
+    INSERT INTO conversations_fts(conversations_fts, rowid, message, response)
+    VALUES ('delete', OLD.id, OLD.message, OLD.response);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_conversations_fts_update AFTER UPDATE OF message, response ON conversations BEGIN
+    INSERT INTO conversations_fts(conversations_fts, rowid, message, response)
+    VALUES ('delete', OLD.id, OLD.message, OLD.response);
+    INSERT INTO conversations_fts(rowid, message, response)
+    VALUES (NEW.id, NEW.message, NEW.response);
+END;
+
+-- prps
+CREATE TRIGGER IF NOT EXISTS trigger_prps_fts_insert AFTER INSERT ON prps BEGIN
+    INSERT INTO prps_fts(rowid, title, description, objective)
+    VALUES (NEW.id, NEW.title, NEW.description, NEW.objective);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_prps_fts_delete AFTER DELETE ON prps BEGIN
+    INSERT INTO prps_fts(prps_fts, rowid, title, description, objective)
+    VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.objective);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_prps_fts_update AFTER UPDATE OF title, description, objective ON prps BEGIN
+    INSERT INTO prps_fts(prps_fts, rowid, title, description, objective)
+    VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.objective);
+    INSERT INTO prps_fts(rowid, title, description, objective)
+    VALUES (NEW.id, NEW.title, NEW.description, NEW.objective);
+END;
+
+-- =====================================================
+-- POPULAR ÍNDICES COM DADOS EXISTENTES
+-- =====================================================
+INSERT INTO docs_fts(docs_fts) VALUES ('rebuild');
+INSERT INTO conversations_fts(conversations_fts) VALUES ('rebuild');
+INSERT INTO prps_fts(prps_fts) VALUES ('rebuild');
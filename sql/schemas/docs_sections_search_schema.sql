@@ -0,0 +1,92 @@
+-- Schema de Busca por Seções de Documentos para o Agente PRP
+-- Data: 19/10/2026
+-- Objetivo: Recuperar só as seções relevantes (com vizinhas) em vez do
+--           docs.content inteiro. As seções são geradas por agents/chunking.py
+
+-- =====================================================
+-- TABELA DE SEÇÕES (mesma definição de docs_schema.sql)
+-- =====================================================
+CREATE TABLE IF NOT EXISTS docs_sections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    doc_id INTEGER NOT NULL,
+    section_title TEXT NOT NULL,           -- título da seção
+    section_content TEXT NOT NULL,         -- conteúdo da seção
+    section_order INTEGER NOT NULL,       -- ordem da seção no documento
+    section_level INTEGER DEFAULT 1,      -- nível do cabeçalho (1=h1, 2=h2, etc)
+    section_type TEXT DEFAULT 'content',  -- tipo de seção (content, code, table, list)
+
+    -- Para navegação e índice
+    anchor TEXT,                           -- âncora para links diretos
+    parent_section_id INTEGER,            -- seção pai (para hierarquia)
+
+    -- Metadados da seção
+    word_count INTEGER,                    -- contagem de palavras
+    estimated_read_time INTEGER,          -- tempo estimado de leitura
+
+    FOREIGN KEY (doc_id) REFERENCES docs(id) ON DELETE CASCADE,
+    FOREIGN KEY (parent_section_id) REFERENCES docs_sections(id)
+);
+
+-- Expansão de vizinhas: (doc_id, section_order) BETWEEN ? AND ?
+CREATE INDEX IF NOT EXISTS idx_docs_sections_doc_order ON docs_sections(doc_id, section_order);
+
+-- Hash do doc (título + conteúdo + tamanho máximo) que gerou as seções atuais:
+-- docs editados são rechunkados, os inalterados são pulados
+CREATE TABLE IF NOT EXISTS docs_sections_sources (
+    doc_id INTEGER PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    chunked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- =====================================================
+-- ÍNDICE FTS5 (external content)
+-- =====================================================
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_sections_fts USING fts5(
+    section_title, section_content,
+    content='docs_sections', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS trigger_docs_sections_fts_insert AFTER INSERT ON docs_sections BEGIN
+    INSERT INTO docs_sections_fts(rowid, section_title, section_content)
+    VALUES (NEW.id, NEW.section_title, NEW.section_content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_docs_sections_fts_delete AFTER DELETE ON docs_sections BEGIN
+    INSERT INTO docs_sections_fts(docs_sections_fts, rowid, section_title, section_content)
+    VALUES ('delete', OLD.id, OLD.section_title, OLD.section_content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_docs_sections_fts_update AFTER UPDATE OF section_title, section_content ON docs_sections BEGIN
+    INSERT INTO docs_sections_fts(docs_sections_fts, rowid, section_title, section_content)
+    VALUES ('delete', OLD.id, OLD.section_title, OLD.section_content);
+    INSERT INTO docs_sections_fts(rowid, section_title, section_content)
+    VALUES (NEW.id, NEW.section_title, NEW.section_content);
+END;
+
+-- =====================================================
+-- CONTADOR DE MUDANÇA (cache de contexto)
+-- =====================================================
+CREATE TABLE IF NOT EXISTS table_change_counters (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO table_change_counters (table_name, version) VALUES ('docs_sections', 0);
+
+CREATE TRIGGER IF NOT EXISTS trigger_docs_sections_counter_insert AFTER INSERT ON docs_sections BEGIN
+    UPDATE table_change_counters SET version = version + 1 WHERE table_name = 'docs_sections';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_docs_sections_counter_update AFTER UPDATE ON docs_sections BEGIN
+    UPDATE table_change_counters SET version = version + 1 WHERE table_name = 'docs_sections';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_docs_sections_counter_delete AFTER DELETE ON docs_sections BEGIN
+    UPDATE table_change_counters SET version = version + 1 WHERE table_name = 'docs_sections';
+END;
+
+-- =====================================================
+-- POPULAR ÍNDICE COM DADOS EXISTENTES
+-- =====================================================
+INSERT INTO docs_sections_fts(docs_sections_fts) VALUES ('rebuild');
@@ -0,0 +1,22 @@
+-- Schema de Idempotência das Gravações de PRP do Agente PRP
+-- Data: 19/10/2026
+-- Objetivo: Registrar a chave de cada lote PRP + análise + tarefas gravado
+--           por PRPUnitOfWork (prp-agent/real_mcp_integration.py). A chave é
+--           inserida na mesma transação do lote: um retry da mesma chave
+--           falha na PRIMARY KEY, o lote é desfeito e o resultado original é
+--           devolvido ao cliente.
+
+-- =====================================================
+-- CHAVES DE IDEMPOTÊNCIA
+-- =====================================================
+CREATE TABLE IF NOT EXISTS prp_write_idempotency (
+    idempotency_key TEXT PRIMARY KEY,      -- chave do lote (informada ou hash do conteúdo)
+    prp_name TEXT NOT NULL,                -- nome (UNIQUE) do PRP gravado
+    prp_id INTEGER,                        -- preenchido no último statement do lote
+    analysis_ids TEXT,                     -- JSON: ids em prp_llm_analysis
+    task_ids TEXT,                         -- JSON: ids em prp_tasks
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_prp_write_idempotency_created ON prp_write_idempotency(created_at);
@@ -0,0 +1,100 @@
+-- Schema do Change Log para Réplicas Embarcadas do context-memory
+-- Data: 19/10/2026
+-- Objetivo: Registrar (tabela, rowid, operação) de cada escrita no primário,
+--           em ordem (seq), para que réplicas locais (agents/embedded_replica.py)
+--           puxem só o que mudou desde o último sync.
+-- Aplicar depois de schema_simplificado_final.sql, context_fts_schema.sql e
+-- docs_sections_search_schema.sql (os triggers exigem as tabelas).
+
+-- =====================================================
+-- CHANGE LOG
+-- =====================================================
+CREATE TABLE IF NOT EXISTS replica_changelog (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, -- ordem global das mudanças
+    table_name TEXT NOT NULL,
+    row_id INTEGER NOT NULL,               -- rowid da linha alterada
+    op TEXT NOT NULL,                      -- insert, update, delete
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- =====================================================
+-- TRIGGERS
+-- =====================================================
+
+-- docs
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_docs_insert AFTER INSERT ON docs BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('docs', NEW.rowid, 'insert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_docs_update AFTER UPDATE ON docs BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('docs', NEW.rowid, 'update');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_docs_delete AFTER DELETE ON docs BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('docs', OLD.rowid, 'delete');
+END;
+
+-- docs_sections
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_docs_sections_insert AFTER INSERT ON docs_sections BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('docs_sections', NEW.rowid, 'insert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_docs_sections_update AFTER UPDATE ON docs_sections BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('docs_sections', NEW.rowid, 'update');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_docs_sections_delete AFTER DELETE ON docs_sections BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('docs_sections', OLD.rowid, 'delete');
+END;
+
+-- conversations
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_conversations_insert AFTER INSERT ON conversations BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('conversations', NEW.rowid, 'insert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_conversations_update AFTER UPDATE ON conversations BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('conversations', NEW.rowid, 'update');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_conversations_delete AFTER DELETE ON conversations BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('conversations', OLD.rowid, 'delete');
+END;
+
+-- prps
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_prps_insert AFTER INSERT ON prps BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('prps', NEW.rowid, 'insert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_prps_update AFTER UPDATE ON prps BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('prps', NEW.rowid, 'update');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_prps_delete AFTER DELETE ON prps BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('prps', OLD.rowid, 'delete');
+END;
+
+-- prp_tasks
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_prp_tasks_insert AFTER INSERT ON prp_tasks BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('prp_tasks', NEW.rowid, 'insert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_prp_tasks_update AFTER UPDATE ON prp_tasks BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('prp_tasks', NEW.rowid, 'update');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_prp_tasks_delete AFTER DELETE ON prp_tasks BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('prp_tasks', OLD.rowid, 'delete');
+END;
+
+-- prp_llm_analysis
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_prp_llm_analysis_insert AFTER INSERT ON prp_llm_analysis BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('prp_llm_analysis', NEW.rowid, 'insert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_prp_llm_analysis_update AFTER UPDATE ON prp_llm_analysis BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('prp_llm_analysis', NEW.rowid, 'update');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_replica_changelog_prp_llm_analysis_delete AFTER DELETE ON prp_llm_analysis BEGIN
+    INSERT INTO replica_changelog (table_name, row_id, op) VALUES ('prp_llm_analysis', OLD.rowid, 'delete');
+END;
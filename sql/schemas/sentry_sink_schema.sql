@@ -0,0 +1,38 @@
+-- Schema do Sink Local de Envelopes Sentry
+-- Data: 19/10/2026
+-- Objetivo: Guardar os envelopes que os apps mandariam ao Sentry (sem rede,
+--           via agents/sentry_sink.py) para medir volume e custo da
+--           instrumentação: eventos/s, bytes/evento e spans por endpoint.
+
+-- =====================================================
+-- ENVELOPES
+-- =====================================================
+CREATE TABLE IF NOT EXISTS sentry_envelopes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    received_at REAL NOT NULL,        -- epoch (s) do recebimento
+    bytes INTEGER NOT NULL,           -- envelope serializado, sem compressão
+    wire_bytes INTEGER NOT NULL,      -- como chegou (gzip/br no sink HTTP)
+    item_count INTEGER NOT NULL
+);
+
+-- =====================================================
+-- ITENS (eventos, transações, sessões...)
+-- =====================================================
+CREATE TABLE IF NOT EXISTS sentry_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    envelope_id INTEGER NOT NULL REFERENCES sentry_envelopes(id),
+    received_at REAL NOT NULL,
+    item_type TEXT NOT NULL,          -- event, transaction, session, sessions...
+    endpoint TEXT,                    -- nome da transação ou rota do request
+    level TEXT,                       -- eventos: info, error...
+    event_id TEXT,
+    bytes INTEGER NOT NULL,           -- payload do item serializado
+    span_count INTEGER NOT NULL DEFAULT 0,  -- transações: spans filhos
+    duration_ms REAL                  -- transações: duração
+);
+
+-- =====================================================
+-- ÍNDICES
+-- =====================================================
+CREATE INDEX IF NOT EXISTS idx_sentry_items_endpoint ON sentry_items(endpoint, item_type);
+CREATE INDEX IF NOT EXISTS idx_sentry_items_received_at ON sentry_items(received_at);